@@ -1,11 +1,26 @@
-from app.domain.services.ml_handler.ml_handler import carregar_modelo_global
+from app.domain.services.ml_handler.ml_handler import carregar_modelo_global, is_preloaded
 from contextlib import asynccontextmanager
 from app.routers import api as api_router
 from fastapi import FastAPI
 from app.config.settings import get_settings
 from app.config.logging import configure_logging
 from app.config.datadog_config import configure_datadog
+from app.domain.validators.ticker_registry import get_ticker_registry
+from app.domain.services.inference_batcher import start_inference_scheduler, stop_inference_scheduler
+from app.domain.services.inference_executor import shutdown_inference_executor
+from app.domain.services.inference_process_pool import (
+    ProcessPoolBackend,
+    start_inference_process_pool,
+    stop_inference_process_pool,
+)
+from app.domain.services.async_market_data import close_async_http_client
+from app.domain.services.market_data_provider import close_market_data_provider
+from app.domain.services.ml_handler.model_registry import get_model_registry
+from app.domain.services.forecast_precompute import start_forecast_precompute, stop_forecast_precompute
+from app.config.process_memory import memory_snapshot
 import logging
+import os
+import time
 
 settings = get_settings()
 logger = logging.getLogger(__name__)
@@ -24,17 +39,65 @@ async def lifespan(app: FastAPI):
 
     caminho_modelo = settings.MODEL_PATH 
 
+    memoria_antes = memory_snapshot()
+    inicio = time.perf_counter()
     modelo = carregar_modelo_global(caminho_modelo)
 
     app.state.model = modelo
+    # Tempo de carga e memória do worker (comparar formatos de pesos e o preload)
+    app.state.startup_report = relatorio = {
+        "pid": os.getpid(),
+        "weights_format": settings.MODEL_WEIGHTS_FORMAT,
+        "preloaded": is_preloaded(caminho_modelo),
+        "model_load_seconds": round(time.perf_counter() - inicio, 3),
+        "memory_before_mb": memoria_antes,
+        "memory_after_mb": memory_snapshot(),
+    }
 
     if modelo:
-        logger.info("[Startup] Modelo carregado e pronto.")
+        logger.info("[Startup] Modelo carregado e pronto em %.3f s (pid %d, pesos %s, preload %s): RSS %.1f -> %.1f MB.",
+                    relatorio["model_load_seconds"], relatorio["pid"], relatorio["weights_format"],
+                    relatorio["preloaded"], memoria_antes["rss_mb"], relatorio["memory_after_mb"]["rss_mb"])
     else:
         logger.error("[Startup] Falha ao carregar modelo.")
 
+    if modelo:
+        # O modelo padrão fica residente fixo no registro (model_id igual ao padrão não recarrega)
+        get_model_registry().adopt(settings.DEFAULT_MODEL_ID, modelo)
+
+    backend_pool = None
+    if modelo and settings.INFERENCE_PROCESS_POOL_ENABLED:
+        pool = start_inference_process_pool(modelo, caminho_modelo)
+        backend_pool = ProcessPoolBackend(pool)
+        logger.info("[Startup] Pool de processos de inferência ativo (%d workers, %d thread(s) torch cada).",
+                    pool.workers, pool.threads_per_worker)
+
+    if modelo and settings.INFERENCE_BATCHING_ENABLED:
+        # Com o pool ativo, cada lote agrupado vai para um worker
+        start_inference_scheduler(modelo, backend=backend_pool)
+        logger.info("[Startup] Micro-batching de inferência ativo (espera máx. %.1f ms, lote máx. %d).",
+                    settings.INFERENCE_BATCH_MAX_WAIT_MS, settings.INFERENCE_BATCH_MAX_SIZE)
+
+    ticker_registry = get_ticker_registry()
+    carregados = ticker_registry.load_snapshot()
+    logger.info("[Startup] Registro de tickers: %d entradas restauradas do snapshot.", carregados)
+
+    if modelo and settings.PRECOMPUTE_ENABLED:
+        agendador = start_forecast_precompute(modelo)
+        logger.info("[Startup] Pré-cálculo da watchlist ativo (%d tickers, %d dias úteis, às %s).",
+                    len(agendador.watchlist), agendador.horizon_days, settings.PRECOMPUTE_RUN_AT)
+
     yield 
 
+    # --- SHUTDOWN ---
+    stop_forecast_precompute()
+    await close_async_http_client()
+    close_market_data_provider()
+    shutdown_inference_executor()
+    stop_inference_scheduler()
+    stop_inference_process_pool()
+    ticker_registry.save_snapshot()
+
 app = FastAPI(lifespan=lifespan, title="Tech Challenge 4")
 
 # Incluir rotas
@@ -0,0 +1,50 @@
+'''
+Memória do processo atual (RSS/PSS) para o relatório de startup e benchmarks.
+
+RSS conta páginas compartilhadas (bibliotecas, pesos mapeados, páginas herdadas
+do fork) inteiras em cada worker; PSS divide cada página compartilhada pelo
+número de processos que a usam, então a soma do PSS dos workers é o consumo
+real. Lê /proc/self/smaps_rollup (Linux); sem ele, cai para o VmRSS de
+/proc/self/status ou para o pico do getrusage, sem PSS.
+'''
+
+import os
+import sys
+from typing import Dict, Optional
+
+_CAMPOS_SMAPS = {
+    "Rss": "rss_mb",
+    "Pss": "pss_mb",
+    "Shared_Clean": "shared_clean_mb",
+    "Shared_Dirty": "shared_dirty_mb",
+    "Private_Clean": "private_clean_mb",
+    "Private_Dirty": "private_dirty_mb",
+}
+
+
+def _ler_kb(caminho: str, campos: Dict[str, str]) -> Optional[Dict[str, float]]:
+    try:
+        with open(caminho) as f:
+            linhas = f.readlines()
+    except OSError:
+        return None
+    valores = {}
+    for linha in linhas:
+        nome, _, resto = linha.partition(":")
+        if nome in campos:
+            valores[campos[nome]] = round(int(resto.split()[0]) / 1024, 1)
+    return valores or None
+
+
+def memory_snapshot() -> Dict[str, float]:
+    """Memória do processo em MB (rss_mb sempre; pss_mb e a divisão compartilhada/privada quando disponíveis)."""
+    valores = _ler_kb(f"/proc/{os.getpid()}/smaps_rollup", _CAMPOS_SMAPS)
+    if valores is None:
+        valores = _ler_kb(f"/proc/{os.getpid()}/status", {"VmRSS": "rss_mb"})
+    if valores is None:
+        import resource
+
+        # ru_maxrss é o pico: KB no Linux, bytes no macOS
+        pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        valores = {"rss_mb": round(pico / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)}
+    return valores
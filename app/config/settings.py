@@ -1,4 +1,5 @@
 from pathlib import Path
+from typing import List, Optional
 from functools import lru_cache
 
 class Settings():
@@ -8,12 +9,130 @@ class Settings():
     SEQ_LENGTH: int = 30
     DEVICE: str = "cpu"
     MODEL_VERSION: str = "lstm_39"
+    # Previsão recursiva: "exact" (idêntico à janela completa) ou "fast" (estado do LSTM carregado)
+    FORECAST_ENGINE_MODE: str = "exact"
+
+    # Micro-batching da inferência (agrupa forwards de requisições concorrentes)
+    INFERENCE_BATCHING_ENABLED: bool = False
+    INFERENCE_BATCH_MAX_WAIT_MS: float = 2.0
+    INFERENCE_BATCH_MAX_SIZE: int = 64
+    # Tempo máximo que uma requisição espera pelo resultado do lote
+    INFERENCE_BATCH_RESULT_TIMEOUT_SECONDS: float = 30.0
+
+    # Pool de processos de inferência (forwards fora do GIL da API, janelas via memória compartilhada).
+    # Cada worker carrega o modelo com MODEL_BACKEND e usa TORCH_THREADS threads intra-op;
+    # SLOT_WINDOWS x MAX_SEQ_LENGTH define o segmento por worker (lotes maiores são fatiados)
+    INFERENCE_PROCESS_POOL_ENABLED: bool = False
+    INFERENCE_PROCESS_POOL_WORKERS: int = 4
+    INFERENCE_PROCESS_POOL_TORCH_THREADS: int = 1
+    # Fixa cada worker em um bloco de CPUs a partir da CPU 0. Só vale com um único processo da API:
+    # com vários (gunicorn/uvicorn --workers) os pools de cada um caem nas mesmas CPUs
+    INFERENCE_PROCESS_POOL_PIN_CPUS: bool = False
+    INFERENCE_PROCESS_POOL_SLOT_WINDOWS: int = 4096
+    INFERENCE_PROCESS_POOL_MAX_SEQ_LENGTH: int = 128
+    # Tempo máximo de um forward no worker; estourado, o worker é recriado e a chamada falha
+    INFERENCE_PROCESS_POOL_CALL_TIMEOUT_SECONDS: float = 30.0
+    # "spawn" evita herdar o estado das threads OpenMP do torch do processo pai (fork pode travar)
+    INFERENCE_PROCESS_POOL_START_METHOD: str = "spawn"
+
+    # Caminho assíncrono: executor limitado para CPU e cliente HTTP não bloqueante.
+    # Com o micro-batching ativo o executor cresce até INFERENCE_BATCH_MAX_SIZE threads
+    INFERENCE_EXECUTOR_WORKERS: int = 4
+    YAHOO_CHART_URL: str = "https://query2.finance.yahoo.com/v8/finance/chart/{symbol}"
+    YAHOO_HTTP_TIMEOUT_SECONDS: float = 10.0
+    YAHOO_HTTP_MAX_CONNECTIONS: int = 100
+    YAHOO_HTTP_CONNECT_TIMEOUT_SECONDS: float = 3.0
+    # Novas tentativas em erro de conexão, HTTP 429 e 5xx (backoff exponencial a partir do valor base)
+    YAHOO_HTTP_RETRIES: int = 2
+    YAHOO_HTTP_RETRY_BACKOFF_SECONDS: float = 0.25
+
+    # Negociação de conteúdo das rotas de previsão: compressão (br/gzip) só acima do limiar
+    RESPONSE_COMPRESSION_MIN_BYTES: int = 1024
+    RESPONSE_GZIP_LEVEL: int = 5
+    RESPONSE_BROTLI_QUALITY: int = 4
+    # Respostas com pelo menos N pontos são serializadas e comprimidas fora do event loop
+    RESPONSE_ENCODE_OFFLOAD_MIN_POINTS: int = 64
+
+    # Single-flight: downloads e previsões idênticos em andamento compartilham uma execução
+    SINGLE_FLIGHT_ENABLED: bool = True
+
+    # Cache de respostas de previsão: invalidado por novo pregão ou troca de modelo (sem TTL)
+    RESPONSE_CACHE_ENABLED: bool = True
+    RESPONSE_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    RESPONSE_CACHE_MAX_ENTRY_BYTES: int = 4 * 1024 * 1024
+
+    # Pré-cálculo após o fechamento: previsões dos próximos N dias úteis da watchlist,
+    # usadas pela previsão de dia alvo enquanto não entrar um novo pregão
+    PRECOMPUTE_ENABLED: bool = False
+    PRECOMPUTE_WATCHLIST: List[str] = ["PETR4.SA", "VALE3.SA", "ITUB4.SA", "BBDC4.SA", "BBAS3.SA", "ABEV3.SA"]
+    PRECOMPUTE_HORIZON_DAYS: int = 5
+    PRECOMPUTE_RUN_AT: str = "18:30"
+    PRECOMPUTE_TIMEZONE: str = "America/Sao_Paulo"
+    PRECOMPUTE_ON_STARTUP: bool = True
+
+    # Previsão em lote (/v1/previsao-lote): um download e um forward para todos os tickers
+    BATCH_MAX_TICKERS: int = 100
+
+    # Modo streaming (NDJSON) da previsão entre datas: janelas por forward
+    STREAM_CHUNK_SIZE: int = 256
     
     # Caminhos Base (Dinâmicos para funcionar em qualquer OS/Container)
     BASE_DIR: Path = Path(__file__).resolve().parent.parent
     CONFIG_DIR: Path = BASE_DIR / "config"
     MODEL_PATH: Path = BASE_DIR / "models" / "modelo_lstm_39.pkl"
 
+    # Backend de inferência: "eager", "torchscript" (artefato gerado por
+    # python -m app.domain.services.ml_handler.model_export), "compile" (torch.compile),
+    # "quantized" (int8 dinâmico, só ativado se passar no gate de acurácia)
+    # ou "onnxruntime" (precisa de onnxruntime instalado)
+    MODEL_BACKEND: str = "eager"
+    # Formato dos pesos: "pickle" (.pkl) ou "mmap" (artefato .weights.pt ao lado do .pkl,
+    # mapeado em memória e compartilhado entre workers). Com "mmap", gere o artefato no
+    # build/deploy (python -m app.domain.services.ml_handler.mmap_weights); se ele faltar
+    # ou estiver velho, a primeira carga o grava ao lado do .pkl
+    MODEL_WEIGHTS_FORMAT: str = "pickle"
+    MODEL_TORCHSCRIPT_PATH: Path = BASE_DIR / "models" / "modelo_lstm_39.torchscript.pt"
+    MODEL_QUANTIZED_PATH: Path = BASE_DIR / "models" / "modelo_lstm_39.int8.torchscript.pt"
+    MODEL_ONNX_PATH: Path = BASE_DIR / "models" / "modelo_lstm_39.onnx"
+    ONNX_INTRA_OP_THREADS: int = 1
+    ONNX_INTER_OP_THREADS: int = 1
+
+    # Registro de modelos (best_strategy_2.csv): carregados sob demanda, LRU limitado por memória.
+    # MODEL_SELECTION_METRIC ("mae", "mse", "rmse" ou "dac") escolhe o melhor disponível
+    # quando a requisição não informa model_id; None mantém o modelo padrão (DEFAULT_MODEL_ID).
+    DEFAULT_MODEL_ID: int = 39
+    MODEL_REGISTRY_CSV: Path = CONFIG_DIR / "best_strategy_2.csv"
+    MODEL_REGISTRY_DIR: Path = BASE_DIR / "models"
+    MODEL_REGISTRY_MAX_BYTES: int = 256 * 1024 * 1024
+    MODEL_SELECTION_METRIC: Optional[str] = None
+
+    # Gate de acurácia do int8: aumento relativo máximo de MAE/RMSE e queda absoluta máxima de DAC
+    QUANTIZATION_MAX_MAE_INCREASE: float = 0.02
+    QUANTIZATION_MAX_RMSE_INCREASE: float = 0.02
+    QUANTIZATION_MAX_DAC_DROP: float = 0.01
+
+    # Provedor de dados de mercado: "yahoo" (HTTP com pool keep-alive e retries),
+    # "local" (um CSV/Parquet por ticker em MARKET_DATA_LOCAL_DIR) ou "synthetic"
+    # (séries determinísticas, para testes e execução offline)
+    MARKET_DATA_PROVIDER: str = "yahoo"
+    MARKET_DATA_LOCAL_DIR: Path = BASE_DIR.parent / "data" / "market"
+    MARKET_DATA_BATCH_CONCURRENCY: int = 8
+
+    # Store local de preços (histórico diário por ticker, atualizado só na cauda)
+    PRICE_STORE_ENABLED: bool = True
+    PRICE_STORE_DIR: Path = BASE_DIR.parent / "data" / "prices"
+    PRICE_STORE_HISTORY_START: str = "2000-01-01"
+    PRICE_STORE_REFRESH_SECONDS: int = 300
+
+    # Registro de tickers existentes (TTL positivo/negativo + snapshot em disco)
+    TICKER_REGISTRY_MAX_SIZE: int = 1024
+    TICKER_REGISTRY_POSITIVE_TTL_SECONDS: int = 24 * 3600
+    TICKER_REGISTRY_NEGATIVE_TTL_SECONDS: int = 15 * 60
+    TICKER_REGISTRY_SNAPSHOT_PATH: Path = BASE_DIR.parent / "data" / "ticker_registry.json"
+    # Além do shutdown, grava o snapshot a cada N entradas novas ou T segundos (sobrevive a kill/OOM)
+    TICKER_REGISTRY_SNAPSHOT_EVERY_PUTS: int = 50
+    TICKER_REGISTRY_SNAPSHOT_INTERVAL_SECONDS: int = 60
+
 # Padrão Singleton via lru_cache:
 # Garante que as configurações sejam lidas/instanciadas apenas uma vez
 @lru_cache()
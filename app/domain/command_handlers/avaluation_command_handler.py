@@ -1,31 +1,45 @@
 '''
-Este módulo orquestra a preparação de dados, execução da inferência e montagem da resposta final para duas operações: 
-previsão entre datas (process_ticker) e previsão para um dia específico (process_ticker_single_day). 
+Este módulo orquestra a preparação de dados, execução da inferência e montagem da resposta final para três operações: 
+previsão entre datas (process_ticker, ou stream_ticker no modo streaming), previsão para um dia específico
+(process_ticker_single_day) e previsão de um dia para vários tickers de uma vez (process_ticker_batch). 
 Delega a lógica pesada (download/transformação de dados, inferência, geração recursiva) para funções na camada de serviços e 
 usa PredictionResponseBuilder para montar o dicionário de resposta final.
 '''
 
-from app.domain.services.avaluation_model_service import run_forecast, generate_recursive_forecast, obtemX_para_um_dia, getX_testY_test_Sliding_Window
-from app.schemas.ticker_request import TickerRequestBetweenDates, TickerRequest
-from app.domain.results.prediction_response_builder import PredictionResponseBuilder
+import json
+from typing import Iterator
+
+import torch
+
+from app.domain.services.avaluation_model_service import (
+    run_forecast, generate_recursive_forecast, obtemX_para_um_dia, getX_testY_test_Sliding_Window,
+    obtemSerieJanelaDeslizante, normalized_window_chunks,
+)
+
+from app.schemas.ticker_request import TickerRequestBetweenDates, TickerRequest, TickerBatchRequest
+from app.domain.results.prediction_response_builder import PredictionResponseBuilder, format_prediction_points
+from app.domain.services.market_data_context import MarketDataContext
+from app.domain.services.price_store import empty_price_frame
+from app.domain.services.ml_handler.backends import model_seq_length, model_version
+from app.domain.validators.ticker_service_validator import validar_item_lote
 from app.config.settings import get_settings
 
 settings = get_settings()
 
-def process_ticker(command: TickerRequestBetweenDates, model) -> dict:
+def process_ticker(command: TickerRequestBetweenDates, model, context=None) -> dict:
     
-    X_test, y_test, scaler, hist_dates = getX_testY_test_Sliding_Window(command)
+    X_test, y_test, scaler, hist_dates = getX_testY_test_Sliding_Window(command, context, model_seq_length(model))
 
     test_preds_norm, error = run_forecast(model, X_test)
 
     if error: return error
     
-    hist_preds = scaler.inverse_transform(test_preds_norm).flatten().tolist()
+    hist_preds = scaler.inverse_transform(test_preds_norm).reshape(-1)
     
     hist_actuals = []
 
     if y_test is not None and len(y_test) > 0:
-        hist_actuals = scaler.inverse_transform(y_test.view(-1, 1).cpu().numpy()).flatten().tolist()
+        hist_actuals = scaler.inverse_transform(y_test.view(-1, 1).cpu().numpy()).reshape(-1)
 
     last_val_norm = test_preds_norm[-1].item()
 
@@ -40,15 +54,75 @@ def process_ticker(command: TickerRequestBetweenDates, model) -> dict:
 
     return (PredictionResponseBuilder()
             .set_ticker(command.ticker)
-            .set_metadata(model_version=settings.MODEL_VERSION, period_type="janela_deslizante")
+            .set_metadata(model_version=model_version(model), period_type="janela_deslizante")
             .add_batch_predictions(hist_dates, hist_preds, hist_actuals)
-            .add_batch_predictions(fut_dates, fut_preds, []) 
-            .build())
-
-
-def process_ticker_single_day(command: TickerRequest, model) -> dict:
-
-    X_test, scaler, actual_price, error = obtemX_para_um_dia(command)
+            .add_batch_predictions(fut_dates, fut_preds)
+            .build(layout=command.layout))
+
+
+def stream_ticker(command: TickerRequestBetweenDates, model, context=None) -> Iterator[str]:
+    """
+    Modo streaming de process_ticker: NDJSON com uma linha de cabeçalho
+    ({"ticker", "metadata"}), uma linha por ponto (mesmo formato de "data"), os
+    pontos da previsão recursiva e uma linha final {"summary": {...}}.
+
+    A série é preparada aqui (erros de dados sobem antes do primeiro byte); as
+    janelas são inferidas em blocos de STREAM_CHUNK_SIZE e cada bloco é emitido
+    assim que fica pronto, então o pico de memória não cresce com o intervalo.
+    """
+    seq_length = model_seq_length(model)
+    data_np, todas_datas = obtemSerieJanelaDeslizante(command, context, seq_length)
+    scaler, blocos = normalized_window_chunks(data_np, seq_length, settings.STREAM_CHUNK_SIZE)
+    return _emitir_ndjson(command, model, scaler, blocos, todas_datas[seq_length:])
+
+
+def _emitir_ndjson(command, model, scaler, blocos, datas) -> Iterator[str]:
+    yield json.dumps({
+        "ticker": command.ticker,
+        "metadata": {"model_version": model_version(model), "period": "janela_deslizante", "format": "ndjson"},
+    }) + "\n"
+
+    count = 0
+    has_actual = False
+    last_window = last_val_norm = last_date = None
+
+    for X_chunk, y_chunk in blocos:
+        preds_norm, error = run_forecast(model, X_chunk)
+        if error:
+            yield json.dumps({"error": error}) + "\n"
+            return
+
+        hist_preds = scaler.inverse_transform(preds_norm).reshape(-1)
+        hist_actuals = scaler.inverse_transform(y_chunk.view(-1, 1).cpu().numpy()).reshape(-1)
+        datas_chunk = datas[count:count + len(hist_preds)]
+
+        yield "".join(
+            json.dumps(ponto) + "\n" for ponto in format_prediction_points(datas_chunk, hist_preds, hist_actuals)
+        )
+
+        count += len(hist_preds)
+        has_actual = has_actual or len(hist_actuals) > 0
+        last_window, last_val_norm, last_date = X_chunk[-1], preds_norm[-1].item(), datas_chunk[-1]
+
+    if last_window is not None:
+        fut_dates, fut_preds = generate_recursive_forecast(
+            model=model,
+            scaler=scaler,
+            last_window_tensor=last_window,
+            last_val_norm=last_val_norm,
+            last_date=last_date,
+            target_end_date=command.end_date
+        )
+        if fut_dates:
+            yield "".join(json.dumps(ponto) + "\n" for ponto in format_prediction_points(fut_dates, fut_preds))
+        count += len(fut_dates)
+
+    yield json.dumps({"summary": {"type": "backtest" if has_actual else "forecast", "count": count}}) + "\n"
+
+
+def process_ticker_single_day(command: TickerRequest, model, context=None) -> dict:
+
+    X_test, scaler, actual_price, error = obtemX_para_um_dia(command, context, model_seq_length(model))
 
     if error: return error
 
@@ -62,6 +136,61 @@ def process_ticker_single_day(command: TickerRequest, model) -> dict:
 
     return (PredictionResponseBuilder()
             .set_ticker(command.ticker)
-            .set_metadata(model_version=settings.MODEL_VERSION, period_type="single_day")
+            .set_metadata(model_version=model_version(model), period_type="single_day")
             .add_prediction(date=command.target_date, prediction=predicted_val, actual=actual_price)
-            .build())
\ No newline at end of file
+            .build())
+
+
+def process_ticker_batch(command: TickerBatchRequest, model, frames: dict) -> dict:
+    """
+    Previsão para `command.target_date` de todos os tickers do lote, a partir dos
+    históricos já baixados em lote (`frames`: ticker -> DataFrame).
+    As janelas válidas são empilhadas e passam por um único forward; tickers
+    inválidos viram um item de erro, sem derrubar o lote. Os resultados seguem
+    a ordem de `command.tickers`.
+    """
+    seq_length = model_seq_length(model)
+    results = [None] * len(command.tickers)
+    pendentes = []  # (posição, request do item, scaler, preço real)
+    janelas = []
+
+    for pos, ticker in enumerate(command.tickers):
+        item = TickerRequest(ticker=ticker, target_date=command.target_date)
+        context = MarketDataContext.preloaded(item, frames.get(ticker, empty_price_frame()), seq_length)
+
+        error = validar_item_lote(item, context)
+        if error is None:
+            X_test, scaler, actual_price, error = obtemX_para_um_dia(item, context, seq_length)
+        if error is not None:
+            results[pos] = {"ticker": ticker, "error": error}
+            continue
+
+        pendentes.append((pos, item, scaler, actual_price))
+        janelas.append(X_test)
+
+    if janelas:
+        test_predictions_norm, error_inf = run_forecast(model, torch.cat(janelas, dim=0))
+
+        for j, (pos, item, scaler, actual_price) in enumerate(pendentes):
+            if error_inf:
+                results[pos] = {"ticker": item.ticker, "error": error_inf}
+                continue
+
+            pred = scaler.inverse_transform(test_predictions_norm[j:j + 1])
+            results[pos] = (PredictionResponseBuilder()
+                            .set_ticker(item.ticker)
+                            .set_metadata(model_version=model_version(model), period_type="single_day")
+                            .add_prediction(date=command.target_date, prediction=float(pred.reshape(-1)[0]), actual=actual_price)
+                            .build())
+
+    erros = sum(1 for r in results if "error" in r)
+    return {
+        "metadata": {
+            "model_version": model_version(model),
+            "period": "single_day",
+            "target_date": command.target_date.isoformat(),
+            "count": len(results),
+            "errors": erros,
+        },
+        "results": results,
+    }
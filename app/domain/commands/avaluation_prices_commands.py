@@ -1,19 +1,99 @@
-from app.schemas.ticker_request import TickerRequestBetweenDates, TickerRequest
-from app.domain.command_handlers.avaluation_command_handler import process_ticker, process_ticker_single_day
-from app.domain.validators.ticker_service_validator import validate_ticker_exists, validate_date_rangefunc, validate_has_date
+import asyncio
+
+from app.schemas.ticker_request import TickerRequestBetweenDates, TickerRequest, TickerBatchRequest
+from app.domain.command_handlers.avaluation_command_handler import process_ticker, process_ticker_single_day, process_ticker_batch, stream_ticker
+from app.domain.validators.ticker_service_validator import (
+    validate_ticker_exists, validate_date_rangefunc, validate_has_date,
+    validate_ticker_exists_async, validate_date_range_async, validate_has_date_async,
+    validate_batch_request,
+)
+from app.domain.services.market_data_context import with_market_data_context, with_market_data_context_async, janela_da_requisicao
+from app.domain.services.avaluation_model_service import obtemDadosHistoricosLote
+from app.domain.services.inference_executor import run_in_inference_executor, iterate_in_inference_executor
+from app.domain.services.ml_handler.backends import model_seq_length
+from app.domain.services.ml_handler.model_registry import with_resolved_model, with_resolved_model_async
+from app.domain.services.response_cache import with_response_cache, with_response_cache_async
+from app.domain.services.forecast_precompute import with_precomputed_forecast, with_precomputed_forecast_async
+from app.domain.services.single_flight import with_single_flight, with_single_flight_async
 
 """
 Camada de serviço/command handler que orquestra a chamada ao domínio.
 Mantemos-a simples: possível local para validações adicionais antes
 de delegar à lógica de negócio.
+
+O contexto de dados de mercado é criado no decorator mais externo e
+compartilhado por validadores e serviços: no máximo um download por requisição.
+
+As versões *_async fazem o download sem bloquear o event loop e mandam só o
+trabalho de CPU (janelas, inferência, resposta) para o executor de inferência.
+
+O modelo da requisição (model_id ou o melhor por métrica, ver model_registry)
+é resolvido no decorator mais externo, antes do contexto, que depende do seu seq_length.
+
+Respostas completas (não streaming) passam pelo cache de respostas, abaixo dos
+validadores: o marcador de pregão vem do histórico já carregado no contexto.
+A previsão de dia alvo consulta antes o pré-cálculo da watchlist (forecast_precompute).
+Abaixo do cache, requisições idênticas simultâneas compartilham um único cálculo
+(single_flight), assim como os downloads da mesma janela de histórico.
+
+No lote, todos os tickers compartilham a mesma data alvo e portanto a mesma
+janela de histórico: um único download multi-ticker cobre o lote inteiro.
 """
 
+@with_resolved_model
+@with_market_data_context
 @validate_ticker_exists
 @validate_date_rangefunc
-def handle_ticker_info_between_dates(req: TickerRequestBetweenDates, model):
-    return process_ticker(req, model)
+@with_response_cache
+@with_single_flight
+def handle_ticker_info_between_dates(req: TickerRequestBetweenDates, model, context=None):
+    return process_ticker(req, model, context)
 
+@with_resolved_model
+@with_market_data_context
 @validate_ticker_exists
 @validate_has_date
-def handle_ticker_info_specific_date(req: TickerRequest, model):
-    return process_ticker_single_day(req, model)
+@with_precomputed_forecast
+@with_response_cache
+@with_single_flight
+def handle_ticker_info_specific_date(req: TickerRequest, model, context=None):
+    return process_ticker_single_day(req, model, context)
+
+
+@with_resolved_model_async
+@with_market_data_context_async
+@validate_ticker_exists_async
+@validate_date_range_async
+@with_response_cache_async
+@with_single_flight_async
+async def handle_ticker_info_between_dates_async(req: TickerRequestBetweenDates, model, context=None):
+    return await run_in_inference_executor(process_ticker, req, model, context)
+
+@with_resolved_model_async
+@with_market_data_context_async
+@validate_ticker_exists_async
+@validate_date_range_async
+async def handle_ticker_info_between_dates_stream_async(req: TickerRequestBetweenDates, model, context=None):
+    # Validação e preparo da série acontecem antes do primeiro byte; depois, cada
+    # bloco de linhas NDJSON é produzido no executor de inferência
+    linhas = await run_in_inference_executor(stream_ticker, req, model, context)
+    return iterate_in_inference_executor(linhas)
+
+@with_resolved_model_async
+@with_market_data_context_async
+@validate_ticker_exists_async
+@validate_has_date_async
+@with_precomputed_forecast_async
+@with_response_cache_async
+@with_single_flight_async
+async def handle_ticker_info_specific_date_async(req: TickerRequest, model, context=None):
+    return await run_in_inference_executor(process_ticker_single_day, req, model, context)
+
+@with_resolved_model_async
+@validate_batch_request
+async def handle_ticker_batch_async(req: TickerBatchRequest, model):
+    inicio, fim = janela_da_requisicao(req, model_seq_length(model))
+    frames = await asyncio.to_thread(
+        obtemDadosHistoricosLote, req.tickers, inicio.date().isoformat(), fim.date().isoformat()
+    )
+    return await run_in_inference_executor(process_ticker_batch, req, model, frames)
@@ -1,12 +1,121 @@
-from typing import List, Optional, Dict, Any
+'''
+Montagem da resposta de previsão ({"ticker", "metadata", "data"}).
+
+O builder é colunar: cada add_* guarda arrays de datas já formatadas, previsões,
+valores reais e diffs arredondados, calculados de uma vez com NumPy. As linhas
+({"date", "prediction", "actual", "diff"}) só são montadas no build, e o build
+pode devolver o payload orientado a colunas ("dates", "predictions", "actuals",
+"diffs"), bem mais barato de serializar para intervalos longos.
+
+O arredondamento vetorizado (rint(x * 100) / 100) coincide com round(x, 2) do
+Python sempre que x * 100 não está a um fio de um ,5; esses poucos quase empates
+são refeitos com round, então o JSON sai idêntico ao da formatação ponto a ponto.
+'''
+
+from typing import List, Optional, Dict, Any, Sequence
+import numpy as np
 import pandas as pd
-from itertools import zip_longest
+
+LAYOUTS = ("rows", "columns")
+
+
+def format_prediction_point(date: Any, prediction: float, actual: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Formata um ponto de previsão (data ISO, valores com 2 casas e diff).
+    Para vários pontos, prefira format_prediction_points.
+    """
+    p_val = round(float(prediction), 2)
+
+    item = {
+        "date": pd.to_datetime(date).strftime('%Y-%m-%d'),
+        "prediction": p_val,
+        "actual": None,
+        "diff": None
+    }
+
+    if actual is not None:
+        a_val = round(float(actual), 2)
+        item["actual"] = a_val
+        item["diff"] = round(p_val - a_val, 2)
+
+    return item
+
+
+def round2(valores: np.ndarray) -> np.ndarray:
+    """round(x, 2) do Python aplicado ao array inteiro (NaN continua NaN)."""
+    valores = np.asarray(valores, dtype=np.float64)
+    escalado = valores * 100.0
+    resultado = np.rint(escalado) / 100.0
+
+    # Quase empates: o erro de x * 100 pode decidir o lado; refaz com o arredondamento decimal exato
+    distancia = np.abs(escalado - np.floor(escalado) - 0.5)
+    tolerancia = np.maximum(1e-6, np.abs(escalado) * 1e-12)
+    for i in np.flatnonzero(distancia < tolerancia):
+        resultado[i] = round(float(valores[i]), 2)
+    return resultado
+
+
+def format_dates(dates) -> np.ndarray:
+    """Datas 'YYYY-MM-DD' em uma passada (mesmo resultado de pd.to_datetime(d).strftime por ponto)."""
+    try:
+        idx = pd.DatetimeIndex(pd.to_datetime(dates))
+    except (TypeError, ValueError):
+        # Mistura de fusos não forma um índice único
+        return np.array([pd.to_datetime(d).strftime('%Y-%m-%d') for d in dates])
+    if idx.tz is not None:
+        idx = idx.tz_localize(None)
+    return np.datetime_as_string(idx.values.astype("datetime64[D]"), unit="D")
+
+
+class _Colunas:
+    """Bloco de pontos já formatados; actual/diff NaN = ausente."""
+
+    __slots__ = ("dates", "predictions", "actuals", "diffs")
+
+    def __init__(self, dates: Sequence, predictions: Sequence, actuals: Optional[Sequence] = None):
+        if not isinstance(dates, (pd.Index, np.ndarray)) and any(d is None for d in dates):
+            # Mesmo contrato do zip_longest: posições sem data são ignoradas
+            manter = [i for i, d in enumerate(dates) if d is not None]
+            dates = [dates[i] for i in manter]
+            predictions = [predictions[i] for i in manter if i < len(predictions)]
+            actuals = [actuals[i] if i < len(actuals) else None for i in manter] if actuals is not None else None
+
+        n = len(dates)
+        if len(predictions) < n:
+            raise ValueError(f"Faltam previsões: {len(predictions)} para {n} datas.")
+
+        reais = np.full(n, np.nan)
+        if actuals is not None and len(actuals):
+            m = min(len(actuals), n)
+            reais[:m] = np.asarray(actuals[:m], dtype=np.float64).reshape(-1)
+
+        self.dates = format_dates(dates) if n else np.empty(0, dtype="<U10")
+        self.predictions = round2(np.asarray(predictions[:n], dtype=np.float64).reshape(-1))
+        self.actuals = round2(reais)
+        self.diffs = round2(self.predictions - self.actuals)
+
+    def __len__(self) -> int:
+        return len(self.dates)
+
+    def rows(self) -> List[Dict[str, Any]]:
+        reais = [None if a != a else a for a in self.actuals.tolist()]
+        diffs = [None if d != d else d for d in self.diffs.tolist()]
+        return [
+            {"date": d, "prediction": p, "actual": a, "diff": df}
+            for d, p, a, df in zip(self.dates.tolist(), self.predictions.tolist(), reais, diffs)
+        ]
+
+
+def format_prediction_points(dates: Sequence, predictions: Sequence, actuals: Optional[Sequence] = None) -> List[Dict[str, Any]]:
+    """Vários pontos no formato de format_prediction_point, formatados de uma vez."""
+    return _Colunas(dates, predictions, actuals).rows()
+
 
 class PredictionResponseBuilder:
     def __init__(self):
         self._ticker: str = ""
         self._metadata: Dict[str, Any] = {}
-        self._data: List[Dict[str, Any]] = []
+        self._blocos: List[_Colunas] = []
 
     def set_ticker(self, ticker: str) -> 'PredictionResponseBuilder':
         self._ticker = ticker
@@ -27,51 +136,55 @@ class PredictionResponseBuilder:
         """
         Adiciona um ponto de dado. Calcula automaticamente o diff e formata a data.
         """
-        p_val = round(float(prediction), 2)
-        
-        item = {
-            "date": pd.to_datetime(date).strftime('%Y-%m-%d'),
-            "prediction": p_val,
-            "actual": None,
-            "diff": None
-        }
+        return self.add_batch_predictions([date], [prediction], [actual])
 
-        if actual is not None:
-            a_val = round(float(actual), 2)
-            item["actual"] = a_val
-            item["diff"] = round(p_val - a_val, 2)
-
-        self._data.append(item)
-        return self
-
-    def add_batch_predictions(self, dates: list, predictions: list, actuals: list) -> 'PredictionResponseBuilder':
+    def add_batch_predictions(self, dates: Sequence, predictions: Sequence, actuals: Optional[Sequence] = None) -> 'PredictionResponseBuilder':
         """
-        Utilitário para adicionar múltiplos dados de uma vez (ideal para o loop).
+        Adiciona vários pontos de uma vez (listas, arrays ou DatetimeIndex).
+        `actuals` pode ser menor que `dates` (o resto fica sem valor real).
         """
-        for date_val, pred_val, actual_val in zip_longest(dates, predictions, actuals, fillvalue=None):
-            
-            if date_val is None: continue 
-            
-            self.add_prediction(date_val, pred_val, actual_val)
-            
+        bloco = _Colunas(dates, predictions, actuals)
+        if len(bloco):
+            self._blocos.append(bloco)
         return self
 
-    def build(self) -> Dict[str, Any]:
+    def _concatenar(self, campo: str) -> np.ndarray:
+        return np.concatenate([getattr(b, campo) for b in self._blocos]) if self._blocos else np.empty(0)
+
+    def build(self, layout: str = "rows") -> Dict[str, Any]:
         """
         Finaliza a construção e retorna o dicionário formatado.
         Atuaiza metadados dependentes dos dados (como count ou type).
+
+        layout="columns" devolve "data" como {"dates", "predictions", "actuals", "diffs"}
+        (listas paralelas; ausentes como null) em vez de uma lista de pontos.
         """
+        if layout not in LAYOUTS:
+            raise ValueError(f"Layout inválido: {layout}. Use um de {LAYOUTS}.")
+
         # Regra dinâmica: Se temos 'actual', é backtest, senão é forecast (para single day)
         if "type" not in self._metadata:
-            has_actual = any(d["actual"] is not None for d in self._data)
+            has_actual = any(not np.isnan(b.actuals).all() for b in self._blocos)
             self._metadata["type"] = "backtest" if has_actual else "forecast"
 
         # Atualiza count se não tiver sido passado
         if "count" not in self._metadata:
-            self._metadata["count"] = len(self._data)
+            self._metadata["count"] = sum(len(b) for b in self._blocos)
+
+        if layout == "columns":
+            self._metadata["layout"] = "columns"
+            reais, diffs = self._concatenar("actuals"), self._concatenar("diffs")
+            data = {
+                "dates": self._concatenar("dates").tolist(),
+                "predictions": self._concatenar("predictions").tolist(),
+                "actuals": [None if a != a else a for a in reais.tolist()],
+                "diffs": [None if d != d else d for d in diffs.tolist()],
+            }
+        else:
+            data = [linha for b in self._blocos for linha in b.rows()]
 
         return {
             "ticker": self._ticker,
             "metadata": self._metadata,
-            "data": self._data
-        }
\ No newline at end of file
+            "data": data
+        }
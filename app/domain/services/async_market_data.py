@@ -0,0 +1,148 @@
+'''
+Cliente HTTP (httpx) para o histórico diário do Yahoo Finance.
+
+O caminho assíncrono da API não pode usar yf.download, que é bloqueante e
+ocuparia uma thread durante todo o round trip. Aqui consultamos diretamente o
+endpoint de chart do Yahoo com um httpx.AsyncClient compartilhado (keep-alive)
+e devolvemos um DataFrame no formato do price store (Close/High/Low/Open/Volume
+ajustados, índice "Date" sem fuso).
+
+Falhas transitórias (erros de conexão/timeout, HTTP 429 e 5xx) são repetidas
+até YAHOO_HTTP_RETRIES vezes com backoff exponencial. O YahooProvider
+(market_data_provider) usa os mesmos parâmetros, parser e regras de retry no
+seu cliente síncrono.
+'''
+
+import asyncio
+import logging
+from typing import Optional
+
+import httpx
+import numpy as np
+import pandas as pd
+
+from app.config.settings import get_settings
+from app.domain.services.price_store import COLUNAS_PRECO, empty_price_frame
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+HEADERS = {"User-Agent": "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko)"}
+
+# Respostas que valem nova tentativa (limite de taxa e erros do upstream)
+STATUS_RETENTAVEIS = frozenset({429, 500, 502, 503, 504})
+
+_client: Optional[httpx.AsyncClient] = None
+
+
+def http_timeout() -> httpx.Timeout:
+    """Timeout das chamadas ao Yahoo, com limite próprio para abrir a conexão."""
+    return httpx.Timeout(settings.YAHOO_HTTP_TIMEOUT_SECONDS, connect=settings.YAHOO_HTTP_CONNECT_TIMEOUT_SECONDS)
+
+
+def http_limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=settings.YAHOO_HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.YAHOO_HTTP_MAX_CONNECTIONS,
+    )
+
+
+def get_async_http_client() -> httpx.AsyncClient:
+    """AsyncClient único do processo, com pool de conexões keep-alive."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(headers=HEADERS, timeout=http_timeout(), limits=http_limits())
+    return _client
+
+
+async def close_async_http_client() -> None:
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def retry_delay(tentativa: int) -> float:
+    """Espera (s) antes da nova tentativa número `tentativa` (1, 2, ...)."""
+    return settings.YAHOO_HTTP_RETRY_BACKOFF_SECONDS * (2 ** (tentativa - 1))
+
+
+def chart_params(data_inicial=None, data_final=None, periodo: str = None) -> dict:
+    """Parâmetros do endpoint de chart: intervalo [data_inicial, data_final) ou `periodo` (ex.: "1d")."""
+    params = {"interval": "1d", "includeAdjustedClose": "true", "events": "div,splits"}
+    if periodo is not None:
+        params["range"] = periodo
+    else:
+        params["period1"] = int(pd.Timestamp(data_inicial).tz_localize("UTC").timestamp())
+        params["period2"] = int(pd.Timestamp(data_final).tz_localize("UTC").timestamp())
+    return params
+
+
+def chart_frame(resposta: httpx.Response) -> pd.DataFrame:
+    """DataFrame da resposta final do endpoint de chart (404 = ticker sem dados)."""
+    if resposta.status_code == 404:
+        return empty_price_frame()
+    resposta.raise_for_status()
+    return parse_chart_response(resposta.json())
+
+
+def parse_chart_response(payload: dict) -> pd.DataFrame:
+    """
+    Converte a resposta JSON do endpoint de chart em DataFrame diário.
+    Preços são ajustados por proventos (equivalente a auto_adjust=True do yfinance).
+    """
+    result = (payload.get("chart") or {}).get("result") or []
+    if not result or not result[0].get("timestamp"):
+        return empty_price_frame()
+
+    result = result[0]
+    quote = result["indicators"]["quote"][0]
+    frame = pd.DataFrame(
+        {
+            "Close": quote.get("close"),
+            "High": quote.get("high"),
+            "Low": quote.get("low"),
+            "Open": quote.get("open"),
+            "Volume": quote.get("volume"),
+        },
+        dtype=np.float64,
+    )
+
+    adjclose = (result["indicators"].get("adjclose") or [{}])[0].get("adjclose")
+    if adjclose is not None:
+        fator = np.asarray(adjclose, dtype=np.float64) / frame["Close"].to_numpy()
+        for col in ("Open", "High", "Low"):
+            frame[col] = frame[col] * fator
+        frame["Close"] = np.asarray(adjclose, dtype=np.float64)
+
+    fuso = (result.get("meta") or {}).get("exchangeTimezoneName") or "UTC"
+    datas = pd.to_datetime(result["timestamp"], unit="s", utc=True).tz_convert(fuso).tz_localize(None).normalize()
+    frame.index = pd.DatetimeIndex(datas, name="Date")
+
+    frame = frame[frame["Close"].notna()]
+    frame = frame[~frame.index.duplicated(keep="last")]
+    return frame[list(COLUNAS_PRECO)]
+
+
+async def baixar_historico_yahoo_async(ticker, data_inicial=None, data_final=None, periodo: str = None) -> pd.DataFrame:
+    """
+    Histórico diário de [data_inicial, data_final), sem bloquear o event loop.
+    Com `periodo` (ex.: "1d", "5d") o intervalo de datas é ignorado.
+    """
+    client = get_async_http_client()
+    url = settings.YAHOO_CHART_URL.format(symbol=ticker)
+    params = chart_params(data_inicial, data_final, periodo)
+
+    for tentativa in range(settings.YAHOO_HTTP_RETRIES + 1):
+        ultima = tentativa == settings.YAHOO_HTTP_RETRIES
+        try:
+            resposta = await client.get(url, params=params)
+        except httpx.TransportError as e:
+            if ultima:
+                raise
+            logger.warning("Falha de conexão com o Yahoo (%s), tentativa %d: %s", ticker, tentativa + 1, e)
+        else:
+            if resposta.status_code not in STATUS_RETENTAVEIS or ultima:
+                return chart_frame(resposta)
+            logger.warning("Yahoo respondeu %d para %s, tentativa %d.", resposta.status_code, ticker, tentativa + 1)
+        await asyncio.sleep(retry_delay(tentativa + 1))
@@ -4,8 +4,7 @@ import torch.nn as nn
 import io
 import pandas as pd
 import numpy as np
-from sklearn.preprocessing import MinMaxScaler
-import yfinance as yf
+from numpy.lib.stride_tricks import sliding_window_view
 import traceback
 import logging
 
@@ -13,6 +12,14 @@ logger = logging.getLogger(__name__)
 from app.schemas.ticker_request import TickerRequestBetweenDates, TickerRequest
 from typing import Tuple, List
 from app.config.settings import get_settings
+from app.domain.services.price_store import get_price_store
+from app.domain.services.market_data_provider import get_market_data_provider
+from app.domain.services.single_flight import get_single_flight
+from app.domain.services.normalizer import MinMaxNormalizer
+from app.domain.services.forecast_engine import RecursiveForecastEngine, future_business_days
+from app.domain.services.inference_batcher import get_inference_scheduler
+from app.domain.services.inference_process_pool import get_inference_process_pool
+from app.domain.services.ml_handler.backends import as_backend
 
 settings = get_settings()
 
@@ -61,19 +68,83 @@ class CpuUnpickler(pickle.Unpickler):
         
 # Construindo a janela deslizante
 def create_sequences_multivariate(data, seq_length):
-    X, y = [], []
-    for i in range(len(data) - seq_length):
-        X.append(data[i:i + seq_length, :])
-        y.append(data[i + seq_length, 0])
-    return np.array(X), np.array(y)
+    """
+    Janelas deslizantes via stride tricks: X e y são views de `data` (somente leitura),
+    sem copiar cada janela.
+    X tem shape (len(data) - seq_length, seq_length, n_features) e y shape (len(data) - seq_length,).
+    """
+    data = np.asarray(data)
+    n_janelas = len(data) - seq_length
+    if n_janelas <= 0:
+        return np.empty((0, seq_length) + data.shape[1:], dtype=data.dtype), np.empty(0, dtype=data.dtype)
+
+    # A última linha só aparece como alvo, nunca dentro de uma janela
+    X = np.moveaxis(sliding_window_view(data[:-1], seq_length, axis=0), -1, 1)
+    y = data[seq_length:, 0]
+    return X, y
+
+
+def build_normalized_windows(data_np, seq_length):
+    """
+    Normaliza a série uma única vez e monta as janelas já em float32.
+
+    As janelas cobrem exatamente data_np[:-1], então ajustar o scaler sobre a série
+    dá o mesmo min/max que ajustar sobre todas as janelas empilhadas. A única cópia
+    com tamanho proporcional a n_janelas * seq_length é a materialização final do tensor.
+    """
+    serie = data_np.reshape(-1, 1)
+
+    scaler = MinMaxNormalizer(feature_range=(-1, 1))
+    scaler.fit(serie[:-1])
+
+    serie_norm = scaler.transform(serie).astype(np.float32).reshape(data_np.shape)
+    X_norm, y_norm = create_sequences_multivariate(serie_norm, seq_length)
+
+    X_test = torch.from_numpy(np.ascontiguousarray(X_norm)).to(settings.DEVICE).unsqueeze(-1)
+    y_test = torch.from_numpy(y_norm.reshape(-1, 1).copy()).to(settings.DEVICE).unsqueeze(1)
+    return X_test, y_test, scaler
+
+def _chave_historico(ticker, data_inicial, data_final) -> tuple:
+    return ticker.upper(), pd.Timestamp(data_inicial).strftime('%Y-%m-%d'), pd.Timestamp(data_final).strftime('%Y-%m-%d')
+
+def _baixar_historico(ticker, data_inicial, data_final):
+    # Com o store habilitado, só a cauda que falta é baixada do provedor
+    if settings.PRICE_STORE_ENABLED:
+        return get_price_store().get_range(ticker, data_inicial, data_final)
+    return get_market_data_provider().fetch_history(ticker, data_inicial, data_final)
 
 def obtemDadosHistoricos(ticker, data_inicial, data_final):
-    dados= yf.download(ticker, start=data_inicial, end=data_final)
-    colunas= []
-    for col in dados.columns:
-        colunas.append(col[0])
-    dados.columns= colunas
-    return dados
+    # Downloads simultâneos da mesma janela compartilham uma única ida ao upstream
+    if not settings.SINGLE_FLIGHT_ENABLED:
+        return _baixar_historico(ticker, data_inicial, data_final)
+    dados, compartilhado = get_single_flight("market_data").do(
+        _chave_historico(ticker, data_inicial, data_final),
+        lambda: _baixar_historico(ticker, data_inicial, data_final),
+    )
+    # Quem aguardou recebe uma cópia: o DataFrame da líder segue só com ela
+    return dados.copy() if compartilhado else dados
+
+def obtemDadosHistoricosLote(tickers, data_inicial, data_final):
+    # Vários tickers com uma única ida ao upstream (ou nenhuma, se o store já cobre o intervalo)
+    if settings.PRICE_STORE_ENABLED:
+        return get_price_store().get_ranges(tickers, data_inicial, data_final)
+    return get_market_data_provider().fetch_many(tickers, data_inicial, data_final)
+
+async def _baixar_historico_async(ticker, data_inicial, data_final):
+    provider = get_market_data_provider()
+    if settings.PRICE_STORE_ENABLED:
+        return await get_price_store().aget_range(ticker, data_inicial, data_final, provider.afetch_history)
+    return await provider.afetch_history(ticker, data_inicial, data_final)
+
+async def obtemDadosHistoricosAsync(ticker, data_inicial, data_final):
+    # Mesmo contrato de obtemDadosHistoricos, sem bloquear o event loop
+    if not settings.SINGLE_FLIGHT_ENABLED:
+        return await _baixar_historico_async(ticker, data_inicial, data_final)
+    dados, compartilhado = await get_single_flight("market_data").ado(
+        _chave_historico(ticker, data_inicial, data_final),
+        lambda: _baixar_historico_async(ticker, data_inicial, data_final),
+    )
+    return dados.copy() if compartilhado else dados
 
 # Estratégia 2: Preço de abertura, máxima, mínima, fechamento e volume
 def build_features_estrategia2(data):
@@ -81,24 +152,30 @@ def build_features_estrategia2(data):
     return data[columns]
 
 
-def getX_testY_test_Sliding_Window(command: TickerRequestBetweenDates):
+def obtemSerieJanelaDeslizante(command: TickerRequestBetweenDates, context=None, seq_length: int = None):
+    """Série de features (e datas) a partir de seq_length pregões antes de init_date até end_date."""
+    seq_length = seq_length or settings.SEQ_LENGTH
     # 1. Converter string para data real
     dt_inicial = pd.to_datetime(command.init_date)
     
     # 2. Calcular o "Buffer" de segurança.
     # Precisamos de 30 dias ÚTEIS para trás. 
     # Como existem fins de semana, pegamos 60 dias corridos para garantir que sobe.
-    buffer_dias = settings.SEQ_LENGTH * 2 
+    buffer_dias = seq_length * 2 
     dt_fetch_start = dt_inicial - pd.Timedelta(days=buffer_dias)
     
     # 3. Baixar dados com margem extra
     end_date_adjusted = pd.to_datetime(command.end_date) + pd.Timedelta(days=1)
         
-    dados_brutos = obtemDadosHistoricos(
-        command.ticker, 
-        dt_fetch_start, 
-        end_date_adjusted.strftime('%Y-%m-%d')
-    )
+    # Com contexto da requisição, apenas recortamos o que já foi baixado
+    if context is not None:
+        dados_brutos = context.slice(dt_fetch_start, end_date_adjusted)
+    else:
+        dados_brutos = obtemDadosHistoricos(
+            command.ticker, 
+            dt_fetch_start, 
+            end_date_adjusted.strftime('%Y-%m-%d')
+        )
     
     # Resetar index para facilitar manipulação se o indice for data
     if isinstance(dados_brutos.index, pd.DatetimeIndex):
@@ -112,8 +189,8 @@ def getX_testY_test_Sliding_Window(command: TickerRequestBetweenDates):
          
     idx_start_user = mask_start.idxmax()
     
-    # O corte deve começar SEQ_LENGTH posições antes desse índice
-    idx_corte = idx_start_user - settings.SEQ_LENGTH
+    # O corte deve começar seq_length posições antes desse índice
+    idx_corte = idx_start_user - seq_length
     
     if idx_corte < 0:
         logger.warning("Histórico insuficiente para cobrir a janela completa antes da data inicial. Ajustando corte para 0.")
@@ -135,41 +212,64 @@ def getX_testY_test_Sliding_Window(command: TickerRequestBetweenDates):
     data_np = data.to_numpy()
     
     # Verificação de segurança
-    if len(data_np) <= settings.SEQ_LENGTH:
-         raise ValueError(f"Dados insuficientes ({len(data_np)}) para janela de {settings.SEQ_LENGTH}.")
+    if len(data_np) <= seq_length:
+         raise ValueError(f"Dados insuficientes ({len(data_np)}) para janela de {seq_length}.")
 
-    X, y = create_sequences_multivariate(data_np, settings.SEQ_LENGTH)
+    return data_np, todas_datas
 
-    datas_y = todas_datas[settings.SEQ_LENGTH : settings.SEQ_LENGTH + len(y)]
 
-    X_test_reshaped = X.reshape(-1, 1)
-    
-    scaler = MinMaxScaler(feature_range=(-1, 1))
-    scaler.fit(X_test_reshaped)
+def getX_testY_test_Sliding_Window(command: TickerRequestBetweenDates, context=None, seq_length: int = None):
+    seq_length = seq_length or settings.SEQ_LENGTH
+    data_np, todas_datas = obtemSerieJanelaDeslizante(command, context, seq_length)
 
-    X_test_norm = scaler.transform(X_test_reshaped).reshape(X.shape)
-    y_test_norm = scaler.transform(y.reshape(-1, 1))
+    X_test, y_test, scaler = build_normalized_windows(data_np, seq_length)
 
-    # Convertendo para tensores
-    X_test = torch.from_numpy(X_test_norm).float().to(settings.DEVICE).unsqueeze(-1)
-    y_test = torch.from_numpy(y_test_norm).float().to(settings.DEVICE).unsqueeze(1)
+    datas_y = todas_datas[seq_length : seq_length + len(y_test)]
     
     return (X_test, y_test, scaler, datas_y)
 
 
+def normalized_window_chunks(data_np, seq_length, chunk_size):
+    """
+    Versão em blocos de build_normalized_windows, para o modo streaming.
 
-def obtemX_para_um_dia(command: TickerRequest):
+    O scaler é ajustado uma vez sobre a série inteira (mesmo min/max do caminho
+    completo) e só a série normalizada fica em memória; as janelas são materializadas
+    bloco a bloco. Retorna (scaler, gerador de (X_chunk, y_chunk)).
+    """
+    serie = data_np.reshape(-1, 1)
+
+    scaler = MinMaxNormalizer(feature_range=(-1, 1))
+    scaler.fit(serie[:-1])
+
+    serie_norm = scaler.transform(serie).astype(np.float32).reshape(data_np.shape)
+    X_norm, y_norm = create_sequences_multivariate(serie_norm, seq_length)
+
+    def blocos():
+        for inicio in range(0, len(y_norm), chunk_size):
+            X_chunk = torch.from_numpy(np.ascontiguousarray(X_norm[inicio:inicio + chunk_size])).to(settings.DEVICE).unsqueeze(-1)
+            y_chunk = torch.from_numpy(y_norm[inicio:inicio + chunk_size].reshape(-1, 1).copy()).to(settings.DEVICE).unsqueeze(1)
+            yield X_chunk, y_chunk
+
+    return scaler, blocos()
+
+
+def obtemX_para_um_dia(command: TickerRequest, context=None, seq_length: int = None):
     """
     Versão corrigida usando comparação de strings para garantir match da data.
     """
+    seq_length = seq_length or settings.SEQ_LENGTH
     target_dt = pd.to_datetime(command.target_date).normalize()
     target_str = target_dt.strftime('%Y-%m-%d')
     
     # Busca com margem maior (5 dias) para garantir fins de semana/feriados
     end_fetch = target_dt + pd.Timedelta(days=5) 
-    start_fetch = target_dt - pd.Timedelta(days=settings.SEQ_LENGTH * 2 + 10) 
+    start_fetch = target_dt - pd.Timedelta(days=seq_length * 2 + 10) 
 
-    dados = obtemDadosHistoricos(command.ticker, start_fetch.date().isoformat(), end_fetch.date().isoformat())
+    if context is not None:
+        dados = context.slice(start_fetch, end_fetch)
+    else:
+        dados = obtemDadosHistoricos(command.ticker, start_fetch.date().isoformat(), end_fetch.date().isoformat())
     
     if dados.empty:
          return None, None, None, {"error": f"Nenhum dado encontrado para {command.ticker}"}
@@ -191,24 +291,24 @@ def obtemX_para_um_dia(command: TickerRequest):
         actual_price = float(data_processed.iloc[idx_target, 0])
         
         # Pega a sequência dos 30 dias ANTERIORES a esse índice
-        seq = data_processed.iloc[idx_target - settings.SEQ_LENGTH : idx_target].to_numpy()
+        seq = data_processed.iloc[idx_target - seq_length : idx_target].to_numpy()
         
     else:
         # CENÁRIO B: Data futura ou dia sem pregão
         # Pegamos os últimos 30 dias disponíveis do dataframe
         actual_price = None
-        seq = data_processed.iloc[-settings.SEQ_LENGTH:].to_numpy()
+        seq = data_processed.iloc[-seq_length:].to_numpy()
 
-    if len(seq) < settings.SEQ_LENGTH:
+    if len(seq) < seq_length:
         return None, None, None, {
-            "error": f"Histórico insuficiente. Temos {len(seq)}, precisamos de {settings.SEQ_LENGTH}."
+            "error": f"Histórico insuficiente. Temos {len(seq)}, precisamos de {seq_length}."
         }
 
     # Montagem do Tensor
-    X = seq.reshape(1, settings.SEQ_LENGTH, seq.shape[1])
+    X = seq.reshape(1, seq_length, seq.shape[1])
     
     X_reshaped = X.reshape(-1, 1)
-    scaler = MinMaxScaler(feature_range=(-1, 1))
+    scaler = MinMaxNormalizer(feature_range=(-1, 1))
     scaler.fit(X_reshaped)
     X_norm = scaler.transform(X_reshaped).reshape(X.shape)
 
@@ -216,15 +316,27 @@ def obtemX_para_um_dia(command: TickerRequest):
 
     return X_test, scaler, actual_price, None
 
+def _e_o_modelo(model, alvo) -> bool:
+    """True se `model` é `alvo` ou o envolve (RegisteredModel, inclusive o padrão pedido por model_id)."""
+    return model is alvo or getattr(model, "module", None) is alvo
+
 def run_forecast(model, dados_tensor):
     """
     Retorna uma tupla (resultado, erro).
     Se houver erro, 'resultado' é None e 'erro' contém o dict pronto para retorno.
     """
     try:
-        with torch.no_grad():
-            prediction = model(dados_tensor.squeeze(3)).cpu().numpy()
-            return prediction, None
+        # Com o micro-batching ativo, o forward é agrupado com o de outras requisições
+        scheduler = get_inference_scheduler()
+        if scheduler is not None and _e_o_modelo(model, scheduler.model):
+            return scheduler.predict(dados_tensor.squeeze(3)), None
+
+        # Com o pool de processos ativo, o forward do modelo padrão roda fora do GIL da API
+        pool = get_inference_process_pool()
+        if pool is not None and _e_o_modelo(model, pool.model):
+            return pool.predict(dados_tensor.squeeze(3)), None
+
+        return as_backend(model).predict(dados_tensor.squeeze(3)), None
             
     except Exception as e:
         tb = traceback.format_exc()
@@ -245,7 +357,8 @@ def generate_recursive_forecast(
     last_window_tensor: torch.Tensor, 
     last_val_norm: float,
     last_date: any, 
-    target_end_date: str
+    target_end_date: str,
+    mode: str = None
 ) -> Tuple[List[any], List[float]]:
     
     # 1. Normalização de datas para evitar erro de Timezone/Horas
@@ -256,41 +369,12 @@ def generate_recursive_forecast(
         logger.warning("Data alvo (%s) é anterior ou igual à última data (%s). Retornando vazio.", dt_target, dt_last)
         return [], []
 
-    # 2. Preparação da Janela Inicial
-    # Pega o tensor [30, 1] ou [30, 1, 1]
-    current_window = last_window_tensor.unsqueeze(0)
-    
-    if current_window.dim() == 4:
-        current_window = current_window.squeeze(-1)
-
-    new_point = torch.tensor([[[last_val_norm]]], device=current_window.device, dtype=torch.float32)
-
-    # Remove o dia mais velho (index 0) e insere o último valor conhecido no final
-    current_window = torch.cat((current_window[:, 1:, :], new_point), dim=1)
-
-    # 3. Geração de Datas Futuras (Dias Úteis)
-    dates_range = pd.date_range(start=dt_last + pd.Timedelta(days=1), end=dt_target, freq='B')
-
-    future_dates = []
-    future_preds = []
+    # 2. Geração de Datas Futuras (Dias Úteis)
+    dates_range = future_business_days(dt_last, dt_target)
 
-    model.eval()
-    
-    for future_date in dates_range:
-        with torch.no_grad():
-            # Inferência
-            pred_norm_tensor = model(current_window)
-            pred_norm = pred_norm_tensor.item()
-            
-            # Desnormalização para salvar
-            # scaler.inverse_transform espera array 2D
-            pred_real = scaler.inverse_transform([[pred_norm]])[0][0]
-            
-            future_dates.append(future_date)
-            future_preds.append(pred_real)
-            
-            # Atualiza Janela para o próximo dia
-            new_point_loop = torch.tensor([[[pred_norm]]], device=current_window.device, dtype=torch.float32)
-            current_window = torch.cat((current_window[:, 1:, :], new_point_loop), dim=1)
+    # 3. Previsão recursiva: a janela inicial é a última conhecida sem o dia mais velho
+    # e com o último valor previsto no final (ver RecursiveForecastEngine)
+    engine = RecursiveForecastEngine(model, mode or settings.FORECAST_ENGINE_MODE)
+    future_preds = engine.forecast(scaler, last_window_tensor, last_val_norm, len(dates_range))
 
-    return future_dates, future_preds
\ No newline at end of file
+    return list(dates_range), future_preds.tolist()
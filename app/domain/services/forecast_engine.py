@@ -0,0 +1,177 @@
+'''
+Motor de previsão recursiva (horizonte de N dias úteis).
+
+Substitui o laço de generate_recursive_forecast que, a cada passo, fazia
+torch.cat para montar a nova janela e chamava scaler.inverse_transform ponto a ponto.
+
+- Buffer único pré-alocado de tamanho (seq_length + passos): a janela do passo i
+  é apenas a view buffer[:, i:i + seq_length], e a previsão é escrita no fim.
+- Tudo roda em torch.inference_mode().
+- A desnormalização é feita uma vez, vetorizada, sobre todos os passos.
+
+Modos:
+- "exact": roda o modelo sobre a janela completa a cada passo. Saída idêntica
+  (bit a bit) à implementação anterior.
+- "fast": roda a janela inicial uma vez e depois avança o nn.LSTM um ponto por
+  vez, carregando o estado (h, c) (ModelBackend.step; só backends com supports_step). O primeiro passo é idêntico ao exato; nos
+  seguintes o estado "lembra" pontos que já teriam saído da janela de 30 dias,
+  então o resultado é uma aproximação. Com o modelo lstm_39 em 20 séries sintéticas
+  (passeio aleatório em torno de R$ 30) o maior desvio relativo medido em 60 passos
+  foi 0.03%; a tolerância documentada é FAST_MODE_TOLERANCIA_RELATIVA (0.1%).
+
+Em lote (forecast_batch), N séries avançam juntas como um único batch (N, seq, 1)
+por passo. As séries são ordenadas por horizonte decrescente, de modo que as que
+já chegaram na data alvo saem do batch simplesmente encolhendo o prefixo ativo.
+Com N > 1 o resultado pode diferir do caso individual apenas no arredondamento
+float32 das operações em lote do LSTM.
+'''
+
+import logging
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+import torch
+
+from app.domain.services.ml_handler.backends import as_backend
+
+logger = logging.getLogger(__name__)
+
+MODOS = ("exact", "fast")
+
+# Desvio relativo máximo documentado do modo "fast" frente ao "exact" (60 passos)
+FAST_MODE_TOLERANCIA_RELATIVA = 1e-3
+
+
+def supports_fast_mode(model) -> bool:
+    """O modo fast precisa de um backend que avance o LSTM com estado (nn.LSTM acessível)."""
+    return as_backend(model).supports_step
+
+
+def _janela_inicial(last_window_tensor: torch.Tensor) -> torch.Tensor:
+    """Aceita janelas [seq], [seq, 1] ou [seq, 1, 1] e devolve [seq]."""
+    janela = last_window_tensor.detach()
+    while janela.dim() > 1:
+        janela = janela.squeeze(-1)
+    return janela.to(torch.float32)
+
+
+def future_business_days(last_date, target_end_date) -> pd.DatetimeIndex:
+    """Dias úteis após `last_date` até `target_end_date` (inclusive), sem fuso/horas."""
+    dt_last = pd.to_datetime(last_date).normalize()
+    dt_target = pd.to_datetime(target_end_date).normalize()
+    if dt_last.tzinfo is not None:
+        dt_last = dt_last.tz_localize(None)
+    if dt_target.tzinfo is not None:
+        dt_target = dt_target.tz_localize(None)
+    if dt_target <= dt_last:
+        return pd.DatetimeIndex([])
+    return pd.date_range(start=dt_last + pd.Timedelta(days=1), end=dt_target, freq='B')
+
+
+class RecursiveForecastEngine:
+    def __init__(self, model, mode: str = "exact"):
+        if mode not in MODOS:
+            raise ValueError(f"Modo de previsão inválido: {mode}. Use um de {MODOS}.")
+        if mode == "fast" and not supports_fast_mode(model):
+            logger.warning("Modelo sem nn.LSTM acessível; usando modo 'exact' na previsão recursiva.")
+            mode = "exact"
+        self.model = model
+        self.backend = as_backend(model)
+        self.mode = mode
+
+    def forecast_norm(self, last_window_tensor: torch.Tensor, last_val_norm: float, steps: int) -> np.ndarray:
+        """
+        Gera `steps` previsões normalizadas. A primeira janela é a última janela
+        conhecida deslocada de um dia, com `last_val_norm` no final.
+        """
+        return self.forecast_norm_batch([last_window_tensor], [last_val_norm], [steps])[0]
+
+    def forecast_norm_batch(
+        self,
+        windows: Sequence[torch.Tensor],
+        last_vals: Optional[Sequence[Optional[float]]],
+        steps: Sequence[int],
+    ) -> List[np.ndarray]:
+        """
+        Versão em lote de forecast_norm. Todas as janelas precisam ter o mesmo
+        seq_length. Com `last_vals` None (ou None em uma posição) a janela é usada
+        como está, sem deslocamento.
+        """
+        n = len(windows)
+        steps = np.asarray(steps, dtype=np.int64).clip(min=0)
+        max_steps = int(steps.max()) if n else 0
+        if max_steps == 0:
+            return [np.empty(0, dtype=np.float32) for _ in range(n)]
+
+        janelas = [_janela_inicial(w) for w in windows]
+        seq_length = janelas[0].shape[0]
+        if any(j.shape[0] != seq_length for j in janelas):
+            raise ValueError("Todas as janelas do lote precisam ter o mesmo seq_length.")
+
+        # Horizonte decrescente: as séries ativas no passo k são sempre um prefixo
+        ordem = np.argsort(-steps, kind="stable")
+        ativos = [int((steps > k).sum()) for k in range(max_steps)]
+
+        buffer = torch.empty((n, seq_length + max_steps, 1), dtype=torch.float32, device=janelas[0].device)
+        for pos, i in enumerate(ordem):
+            last_val = None if last_vals is None else last_vals[i]
+            if last_val is None:
+                buffer[pos, :seq_length, 0] = janelas[i]
+            else:
+                buffer[pos, :seq_length - 1, 0] = janelas[i][1:]
+                buffer[pos, seq_length - 1, 0] = last_val
+
+        with torch.inference_mode():
+            if self.mode == "fast":
+                self._run_fast(buffer, seq_length, ativos)
+            else:
+                self._run_exact(buffer, seq_length, ativos)
+
+        resultado = [None] * n
+        for pos, i in enumerate(ordem):
+            resultado[i] = buffer[pos, seq_length:seq_length + steps[i], 0].cpu().numpy().copy()
+        return resultado
+
+    def _run_exact(self, buffer: torch.Tensor, seq_length: int, ativos: List[int]) -> None:
+        for k, n_ativos in enumerate(ativos):
+            pred = self.backend(buffer[:n_ativos, k:k + seq_length, :])
+            buffer[:n_ativos, seq_length + k, 0] = pred.reshape(-1)
+
+    def _run_fast(self, buffer: torch.Tensor, seq_length: int, ativos: List[int]) -> None:
+        pred, (h, c) = self.backend.step(buffer[:, :seq_length, :])
+        for k, n_ativos in enumerate(ativos):
+            if k > 0:
+                state = (h[:, :n_ativos].contiguous(), c[:, :n_ativos].contiguous())
+                pred, (h, c) = self.backend.step(buffer[:n_ativos, seq_length + k - 1:seq_length + k, :], state)
+            buffer[:n_ativos, seq_length + k, 0] = pred[:n_ativos].reshape(-1)
+
+    def forecast(self, scaler, last_window_tensor: torch.Tensor, last_val_norm: float, steps: int) -> np.ndarray:
+        """Previsões já desnormalizadas (um único inverse_transform para o horizonte todo)."""
+        preds_norm = self.forecast_norm(last_window_tensor, last_val_norm, steps)
+        return _desnormalizar(scaler, preds_norm)
+
+    def forecast_batch(
+        self,
+        scalers: Sequence,
+        windows: Sequence[torch.Tensor],
+        last_vals: Optional[Sequence[Optional[float]]],
+        last_dates: Sequence,
+        target_end_dates: Sequence,
+    ) -> List[Tuple[List[pd.Timestamp], np.ndarray]]:
+        """
+        Previsão recursiva de N séries em lockstep, cada uma com seu scaler,
+        sua última data conhecida e sua data alvo. Retorna (datas, previsões) por série.
+        """
+        datas = [future_business_days(d, t) for d, t in zip(last_dates, target_end_dates)]
+        preds_norm = self.forecast_norm_batch(windows, last_vals, [len(d) for d in datas])
+        return [
+            (list(d), _desnormalizar(scaler, p))
+            for d, scaler, p in zip(datas, scalers, preds_norm)
+        ]
+
+
+def _desnormalizar(scaler, preds_norm: np.ndarray) -> np.ndarray:
+    if len(preds_norm) == 0:
+        return np.empty(0, dtype=np.float64)
+    return np.asarray(scaler.inverse_transform(preds_norm.astype(np.float64).reshape(-1, 1))).reshape(-1)
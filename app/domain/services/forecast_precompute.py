@@ -0,0 +1,375 @@
+'''
+Pré-cálculo das previsões da watchlist após o fechamento do pregão.
+
+O tráfego se concentra na abertura, e cada requisição fazia download, janela e
+inferência a frio. Um agendador em background (thread iniciada no lifespan)
+roda todo dia útil em PRECOMPUTE_RUN_AT (fuso PRECOMPUTE_TIMEZONE):
+
+1. força a atualização da cauda dos tickers da watchlist no price store;
+2. monta a janela do último pregão de cada ticker (mesma normalização de
+   obtemX_para_um_dia) e faz a previsão recursiva dos próximos
+   PRECOMPUTE_HORIZON_DAYS dias úteis de todos eles em um único lote
+   (RecursiveForecastEngine.forecast_batch);
+3. guarda o resultado no PrecomputedForecastStore.
+
+O passo 1 do horizonte é exatamente o que /v1/previsao-dia calcula para uma data
+futura (janela dos últimos seq_length pregões, um forward), então o handler de
+dia alvo é atendido pelo estado pré-calculado quando a data alvo cai dentro do
+horizonte, o modelo é o mesmo (versão) e o último pregão do histórico da
+requisição ainda é o do pré-cálculo (mesmo marcador do cache de respostas). Do
+contrário, cai no cálculo normal. A previsão entre datas não é atendida daqui:
+o scaler dela depende de init_date.
+
+O horizonte completo de cada ticker fica disponível em
+/v1/precompute/forecasts/{ticker}; o status das execuções em /v1/precompute/status.
+'''
+
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from functools import wraps
+from typing import Callable, Dict, Iterable, List, Optional
+from zoneinfo import ZoneInfo
+
+import pandas as pd
+
+from app.config.settings import get_settings
+from app.config.datadog_metrics import increment_counter, record_timing
+from app.domain.results.prediction_response_builder import PredictionResponseBuilder, format_prediction_points
+from app.domain.services.avaluation_model_service import obtemDadosHistoricosLote, obtemX_para_um_dia
+from app.domain.services.forecast_engine import RecursiveForecastEngine
+from app.domain.services.market_data_context import MarketDataContext, janela_da_requisicao
+from app.domain.services.ml_handler.backends import model_seq_length, model_version
+from app.domain.services.price_store import empty_price_frame, get_price_store
+from app.domain.services.response_cache import bar_marker
+from app.domain.validators.ticker_service_validator import validar_item_lote
+from app.schemas.ticker_request import TickerRequest
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+
+class PrecomputedForecast:
+    """Horizonte pré-calculado de um ticker, válido enquanto o último pregão for `marker`."""
+
+    def __init__(self, ticker: str, model_version: str, marker: tuple, dates: List[pd.Timestamp],
+                 predictions: List[float], computed_at: float):
+        self.ticker = ticker
+        self.model_version = model_version
+        self.marker = marker
+        self.dates = [pd.Timestamp(d).strftime("%Y-%m-%d") for d in dates]
+        self.predictions = [float(p) for p in predictions]
+        self.computed_at = computed_at
+
+    def covers(self, target_date) -> bool:
+        """Data alvo depois do último pregão e até o fim do horizonte."""
+        alvo = pd.Timestamp(target_date).strftime("%Y-%m-%d")
+        return bool(self.dates) and self.marker[0] < alvo <= self.dates[-1]
+
+    def to_dict(self) -> dict:
+        return {
+            "ticker": self.ticker,
+            "metadata": {
+                "model_version": self.model_version,
+                "period": "horizonte_pre_calculado",
+                "last_bar": self.marker[0],
+                "computed_at": datetime.fromtimestamp(self.computed_at).isoformat(timespec="seconds"),
+            },
+            "data": format_prediction_points(self.dates, self.predictions),
+        }
+
+
+class PrecomputedForecastStore:
+    def __init__(self):
+        self._entries: Dict[tuple, PrecomputedForecast] = {}
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def put(self, entry: PrecomputedForecast) -> None:
+        with self._lock:
+            self._entries[(entry.ticker, entry.model_version)] = entry
+
+    def get(self, ticker: str, model_version: str) -> Optional[PrecomputedForecast]:
+        with self._lock:
+            return self._entries.get((ticker.upper().strip(), model_version))
+
+    def lookup(self, ticker: str, model_version: str, target_date, marker) -> Optional[float]:
+        """
+        Previsão de /v1/previsao-dia para `target_date` (passo 1 do horizonte),
+        se houver pré-cálculo válido para o ticker, o modelo e o último pregão atual.
+        """
+        entry = self.get(ticker, model_version)
+        valido = entry is not None and entry.marker == marker and entry.covers(target_date)
+        with self._lock:
+            if valido:
+                self._hits += 1
+            else:
+                self._misses += 1
+        increment_counter("precompute.lookup", tags=[f"result:{'hit' if valido else 'miss'}"])
+        return entry.predictions[0] if valido else None
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "tickers": sorted({ticker for ticker, _ in self._entries}),
+                "hits": self._hits,
+                "misses": self._misses,
+            }
+
+
+_store: Optional[PrecomputedForecastStore] = None
+_store_guard = threading.Lock()
+
+
+def get_precomputed_forecasts() -> PrecomputedForecastStore:
+    global _store
+    if _store is None:
+        with _store_guard:
+            if _store is None:
+                _store = PrecomputedForecastStore()
+    return _store
+
+
+def _baixar_watchlist(tickers: List[str], inicio, fim) -> Dict[str, pd.DataFrame]:
+    # Depois do fechamento a cauda é atualizada sempre, sem esperar o intervalo mínimo do store
+    if settings.PRICE_STORE_ENABLED:
+        get_price_store().refresh_many(tickers, force=True)
+    return obtemDadosHistoricosLote(tickers, inicio, fim)
+
+
+def precompute_watchlist(
+    model,
+    tickers: Iterable[str],
+    horizon_days: int = None,
+    fetcher: Callable[..., Dict[str, pd.DataFrame]] = None,
+    store: PrecomputedForecastStore = None,
+    as_of=None,
+) -> dict:
+    """
+    Atualiza o histórico e pré-calcula os próximos `horizon_days` dias úteis de
+    cada ticker, com uma única previsão recursiva em lote. Retorna o resumo da
+    execução (sucessos e falhas por ticker).
+    """
+    horizon_days = horizon_days or settings.PRECOMPUTE_HORIZON_DAYS
+    fetcher = fetcher or _baixar_watchlist
+    store = store or get_precomputed_forecasts()
+    tickers = list(dict.fromkeys(t.upper().strip() for t in tickers))
+    seq_length = model_seq_length(model)
+
+    # Uma data alvo futura qualquer: a janela usada é a dos últimos seq_length pregões
+    hoje = pd.Timestamp(as_of or pd.Timestamp.today()).normalize()
+    alvo = (hoje + pd.offsets.BDay(1)).date()
+    inicio, fim = janela_da_requisicao(TickerRequest(ticker="-", target_date=alvo), seq_length)
+    frames = fetcher(tickers, inicio.date().isoformat(), fim.date().isoformat())
+
+    falhas: Dict[str, str] = {}
+    pendentes = []  # (ticker, scaler, janela, último pregão, marcador)
+    for ticker in tickers:
+        item = TickerRequest(ticker=ticker, target_date=alvo)
+        frame = frames.get(ticker, empty_price_frame())
+        context = MarketDataContext.preloaded(item, frame, seq_length)
+
+        error = validar_item_lote(item, context)
+        if error is None:
+            X_test, scaler, _, error = obtemX_para_um_dia(item, context, seq_length)
+        if error is not None:
+            falhas[ticker] = str(error.get("detail") or error.get("error"))
+            continue
+        pendentes.append((ticker, scaler, X_test[0], frame.index[-1], bar_marker(frame)))
+
+    if pendentes:
+        engine = RecursiveForecastEngine(model, settings.FORECAST_ENGINE_MODE)
+        ultimos = [p[3] for p in pendentes]
+        resultados = engine.forecast_batch(
+            scalers=[p[1] for p in pendentes],
+            windows=[p[2] for p in pendentes],
+            last_vals=None,
+            last_dates=ultimos,
+            target_end_dates=[pd.Timestamp(d) + pd.offsets.BDay(horizon_days) for d in ultimos],
+        )
+        agora = time.time()
+        versao = model_version(model)
+        for (ticker, _, _, _, marker), (datas, preds) in zip(pendentes, resultados):
+            store.put(PrecomputedForecast(ticker, versao, marker, datas, preds, agora))
+
+    return {
+        "tickers": len(tickers),
+        "succeeded": len(pendentes),
+        "failures": falhas,
+        "horizon_days": horizon_days,
+    }
+
+
+class ForecastPrecomputeScheduler:
+    """Thread que roda precompute_watchlist após o fechamento, em dias úteis."""
+
+    def __init__(self, model, watchlist: Iterable[str], horizon_days: int = 5, run_at: str = "18:30",
+                 timezone: str = "America/Sao_Paulo", run_on_startup: bool = True):
+        self.model = model
+        self.watchlist = list(watchlist)
+        self.horizon_days = horizon_days
+        hora, minuto = (int(p) for p in run_at.split(":"))
+        self._hora, self._minuto = hora, minuto
+        self._tz = ZoneInfo(timezone)
+        self._run_on_startup = run_on_startup
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        self._status_lock = threading.Lock()
+        self._running = False
+        self._runs = 0
+        self._last_run: Optional[dict] = None
+        self._next_run: Optional[datetime] = None
+
+    # ------------------------------------------------------------- ciclo de vida
+    def start(self) -> "ForecastPrecomputeScheduler":
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, name="forecast-precompute", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout: float = 5.0) -> None:
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join(timeout)
+            self._thread = None
+
+    def next_run_after(self, agora: datetime) -> datetime:
+        """Próximo horário de execução (dia útil, em run_at) estritamente depois de `agora`."""
+        agora = agora.astimezone(self._tz)
+        candidato = agora.replace(hour=self._hora, minute=self._minuto, second=0, microsecond=0)
+        if candidato <= agora:
+            candidato += timedelta(days=1)
+        while candidato.weekday() >= 5:
+            candidato += timedelta(days=1)
+        return candidato
+
+    def _loop(self) -> None:
+        if self._run_on_startup:
+            self.run_now()
+        while True:
+            proxima = self.next_run_after(datetime.now(self._tz))
+            with self._status_lock:
+                self._next_run = proxima
+            if self._stop.wait((proxima - datetime.now(self._tz)).total_seconds()):
+                return
+            self.run_now()
+
+    # ------------------------------------------------------------------- execução
+    def run_now(self) -> dict:
+        """Executa o pré-cálculo na thread atual e registra o resultado no status."""
+        with self._status_lock:
+            self._running = True
+        inicio = time.time()
+        try:
+            resumo = precompute_watchlist(self.model, self.watchlist, self.horizon_days)
+            resumo["error"] = None
+        except Exception as e:
+            logger.exception("Falha no pré-cálculo da watchlist: %s", e)
+            resumo = {"tickers": len(self.watchlist), "succeeded": 0, "failures": {}, "error": str(e)}
+        fim = time.time()
+
+        resumo.update({
+            "started_at": datetime.fromtimestamp(inicio, self._tz).isoformat(timespec="seconds"),
+            "finished_at": datetime.fromtimestamp(fim, self._tz).isoformat(timespec="seconds"),
+            "duration_seconds": round(fim - inicio, 3),
+        })
+        with self._status_lock:
+            self._running = False
+            self._runs += 1
+            self._last_run = resumo
+
+        record_timing("precompute.duration", (fim - inicio) * 1000)
+        increment_counter("precompute.runs", tags=[f"status:{'error' if resumo['error'] or resumo['failures'] else 'success'}"])
+        logger.info("Pré-cálculo da watchlist: %d/%d tickers em %.1f s.",
+                    resumo["succeeded"], resumo["tickers"], fim - inicio)
+        return resumo
+
+    def status(self) -> dict:
+        with self._status_lock:
+            return {
+                "running": self._running,
+                "runs": self._runs,
+                "watchlist": self.watchlist,
+                "horizon_days": self.horizon_days,
+                "next_run_at": self._next_run.isoformat(timespec="seconds") if self._next_run else None,
+                "last_run": self._last_run,
+            }
+
+
+_scheduler: Optional[ForecastPrecomputeScheduler] = None
+
+
+def start_forecast_precompute(model) -> ForecastPrecomputeScheduler:
+    """Cria e inicia o agendador global de pré-cálculo (chamado no startup da aplicação)."""
+    global _scheduler
+    stop_forecast_precompute()
+    _scheduler = ForecastPrecomputeScheduler(
+        model,
+        watchlist=settings.PRECOMPUTE_WATCHLIST,
+        horizon_days=settings.PRECOMPUTE_HORIZON_DAYS,
+        run_at=settings.PRECOMPUTE_RUN_AT,
+        timezone=settings.PRECOMPUTE_TIMEZONE,
+        run_on_startup=settings.PRECOMPUTE_ON_STARTUP,
+    ).start()
+    return _scheduler
+
+
+def stop_forecast_precompute() -> None:
+    global _scheduler
+    if _scheduler is not None:
+        _scheduler.stop()
+        _scheduler = None
+
+
+def get_forecast_precompute_scheduler() -> Optional[ForecastPrecomputeScheduler]:
+    return _scheduler
+
+
+def _resposta_pre_calculada(req, model, context) -> Optional[dict]:
+    if context is None:
+        return None
+    marker = bar_marker(context.frame)
+    if marker is None:
+        return None
+    prediction = get_precomputed_forecasts().lookup(context.ticker, model_version(model), req.target_date, marker)
+    if prediction is None:
+        return None
+    return (PredictionResponseBuilder()
+            .set_ticker(req.ticker)
+            .set_metadata(model_version=model_version(model), period_type="single_day")
+            .add_prediction(date=req.target_date, prediction=prediction, actual=None)
+            .build())
+
+
+def with_precomputed_forecast(func):
+    """
+    Atende a previsão de dia alvo pelo pré-cálculo da watchlist, quando válido.
+    Deve ficar abaixo do contexto de dados de mercado e dos validadores.
+    """
+    @wraps(func)
+    def wrapper(req, model, *args, **kwargs):
+        resposta = _resposta_pre_calculada(req, model, kwargs.get("context"))
+        if resposta is not None:
+            return resposta
+        return func(req, model, *args, **kwargs)
+    return wrapper
+
+
+def with_precomputed_forecast_async(func):
+    """Equivalente assíncrono de with_precomputed_forecast: um hit não ocupa o executor de inferência."""
+    @wraps(func)
+    async def wrapper(req, model, *args, **kwargs):
+        resposta = _resposta_pre_calculada(req, model, kwargs.get("context"))
+        if resposta is not None:
+            return resposta
+        return await func(req, model, *args, **kwargs)
+    return wrapper
@@ -0,0 +1,230 @@
+'''
+Agendador de micro-batching para a inferência do modelo.
+
+Sob carga concorrente, cada requisição fazia o seu próprio forward com batch
+pequeno, e os forwards disputavam as threads intra-op do torch. O agendador
+recebe os jobs (tensores de janelas), espera até `max_wait_ms` ou até juntar
+`max_batch_size` janelas, agrupa por shape da janela (seq_length, features),
+roda um único forward por grupo e devolve a fatia de cada chamador no seu Future.
+
+Só o forward "one-shot" de run_forecast passa por aqui: a previsão recursiva
+depende do passo anterior e pagaria a espera a cada dia do horizonte.
+'''
+
+import queue
+import threading
+import time
+import logging
+from collections import Counter, deque
+from concurrent.futures import Future
+from typing import Dict, List, Optional
+
+import numpy as np
+import torch
+
+from app.config.settings import get_settings
+from app.config.datadog_metrics import metric, record_timing
+from app.domain.services.ml_handler.backends import as_backend
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+
+class _Job:
+    __slots__ = ("windows", "future", "enqueued_at")
+
+    def __init__(self, windows: torch.Tensor):
+        self.windows = windows
+        self.future: Future = Future()
+        self.enqueued_at = time.perf_counter()
+
+
+class MicroBatchScheduler:
+    def __init__(self, model, max_wait_ms: float = 2.0, max_batch_size: int = 64, backend=None):
+        self.model = model
+        # `backend` permite rodar os lotes em outro executor do mesmo modelo (ex.: pool de processos)
+        self._backend = backend if backend is not None else as_backend(model)
+        self._max_wait = max_wait_ms / 1000.0
+        self._max_batch_size = max_batch_size
+        self._queue: "queue.Queue[Optional[_Job]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        # Protege a transição parado/rodando contra submit concorrente
+        self._estado_lock = threading.Lock()
+
+        self._stats_lock = threading.Lock()
+        self._batch_sizes: Counter = Counter()
+        self._jobs_per_batch: Counter = Counter()
+        self._waits_ms: deque = deque(maxlen=4096)
+        self._max_wait_seen_ms = 0.0
+
+    # ------------------------------------------------------------- ciclo de vida
+    def start(self) -> "MicroBatchScheduler":
+        with self._estado_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name="inference-batcher", daemon=True)
+                self._thread.start()
+        return self
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Para o laço e falha os jobs que ainda estavam na fila (ninguém fica esperando para sempre)."""
+        with self._estado_lock:
+            thread, self._thread = self._thread, None
+            if thread is None:
+                return
+            self._queue.put(None)
+        thread.join(timeout)
+
+        erro = RuntimeError("Agendador de inferência parado.")
+        sentinela = False
+        while True:
+            try:
+                job = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if job is None:
+                sentinela = True
+            elif not job.future.done():
+                job.future.set_exception(erro)
+        if sentinela:
+            # O laço ainda não chegou ao sinal de parada (join estourou o timeout)
+            self._queue.put(None)
+
+    # ------------------------------------------------------------------- API
+    def submit(self, windows: torch.Tensor) -> Future:
+        """
+        Enfileira um tensor (batch, seq_len, features); o Future recebe um ndarray (batch, output).
+        Levanta RuntimeError se o agendador não estiver rodando.
+        """
+        job = _Job(windows)
+        with self._estado_lock:
+            if self._thread is None:
+                raise RuntimeError("Agendador de inferência não está rodando.")
+            self._queue.put(job)
+        return job.future
+
+    def predict(self, windows: torch.Tensor, timeout: Optional[float] = None) -> np.ndarray:
+        """Forward agrupado; TimeoutError se o resultado não vier em `timeout` s (padrão em Settings)."""
+        if timeout is None:
+            timeout = settings.INFERENCE_BATCH_RESULT_TIMEOUT_SECONDS
+        return self.submit(windows).result(timeout=timeout)
+
+    # ------------------------------------------------------------------ laço
+    def _loop(self) -> None:
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+
+            pendentes = [job]
+            total = job.windows.shape[0]
+            prazo = job.enqueued_at + self._max_wait
+            parar = False
+
+            while total < self._max_batch_size:
+                restante = prazo - time.perf_counter()
+                if restante <= 0:
+                    break
+                try:
+                    proximo = self._queue.get(timeout=restante)
+                except queue.Empty:
+                    break
+                if proximo is None:
+                    parar = True
+                    break
+                pendentes.append(proximo)
+                total += proximo.windows.shape[0]
+
+            self._executar(pendentes)
+            if parar:
+                return
+
+    def _executar(self, jobs: List[_Job]) -> None:
+        try:
+            self._executar_grupos(jobs)
+        except Exception as e:
+            # Falha fora do forward (métricas, fatiamento): nenhum chamador pode ficar sem resposta
+            logger.exception("Erro no agendador de inferência: %s", e)
+            for job in jobs:
+                if not job.future.done():
+                    job.future.set_exception(e)
+
+    def _executar_grupos(self, jobs: List[_Job]) -> None:
+        inicio = time.perf_counter()
+        grupos: Dict[tuple, List[_Job]] = {}
+        for job in jobs:
+            grupos.setdefault(tuple(job.windows.shape[1:]), []).append(job)
+
+        for grupo in grupos.values():
+            try:
+                x = grupo[0].windows if len(grupo) == 1 else torch.cat([j.windows for j in grupo], dim=0)
+                saida = self._backend.predict(x)
+            except Exception as e:
+                for job in grupo:
+                    job.future.set_exception(e)
+                continue
+
+            self._registrar(grupo, x.shape[0], inicio)
+            offset = 0
+            for job in grupo:
+                n = job.windows.shape[0]
+                job.future.set_result(saida[offset:offset + n])
+                offset += n
+
+    # --------------------------------------------------------------- métricas
+    def _registrar(self, grupo: List[_Job], batch_size: int, inicio: float) -> None:
+        esperas = [(inicio - j.enqueued_at) * 1000 for j in grupo]
+        with self._stats_lock:
+            self._batch_sizes[batch_size] += 1
+            self._jobs_per_batch[len(grupo)] += 1
+            self._waits_ms.extend(esperas)
+            self._max_wait_seen_ms = max(self._max_wait_seen_ms, max(esperas))
+
+        metric("inference_batcher.batch_size", batch_size)
+        for espera in esperas:
+            record_timing("inference_batcher.queue_wait", espera)
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            waits = np.asarray(self._waits_ms, dtype=np.float64)
+            batches = sum(self._batch_sizes.values())
+            return {
+                "batches": batches,
+                "jobs": sum(k * v for k, v in self._jobs_per_batch.items()),
+                "windows": sum(k * v for k, v in self._batch_sizes.items()),
+                "batch_size_histogram": dict(sorted(self._batch_sizes.items())),
+                "jobs_per_batch_histogram": dict(sorted(self._jobs_per_batch.items())),
+                "queue_wait_ms": {
+                    "p50": float(np.percentile(waits, 50)) if len(waits) else 0.0,
+                    "p95": float(np.percentile(waits, 95)) if len(waits) else 0.0,
+                    "max": self._max_wait_seen_ms,
+                },
+                "max_wait_ms": self._max_wait * 1000,
+                "max_batch_size": self._max_batch_size,
+            }
+
+
+_scheduler: Optional[MicroBatchScheduler] = None
+
+
+def start_inference_scheduler(model, backend=None) -> MicroBatchScheduler:
+    """Cria e inicia o agendador global (chamado no startup da aplicação)."""
+    global _scheduler
+    stop_inference_scheduler()
+    _scheduler = MicroBatchScheduler(
+        model,
+        max_wait_ms=settings.INFERENCE_BATCH_MAX_WAIT_MS,
+        max_batch_size=settings.INFERENCE_BATCH_MAX_SIZE,
+        backend=backend,
+    ).start()
+    return _scheduler
+
+
+def stop_inference_scheduler() -> None:
+    global _scheduler
+    if _scheduler is not None:
+        _scheduler.stop()
+        _scheduler = None
+
+
+def get_inference_scheduler() -> Optional[MicroBatchScheduler]:
+    return _scheduler
@@ -0,0 +1,72 @@
+'''
+Executor dedicado e limitado para o trabalho de CPU das requisições assíncronas
+(montagem das janelas, forward do LSTM, previsão recursiva e montagem da resposta).
+
+As rotas async esperam o I/O no event loop e só ocupam uma thread deste pool
+quando há CPU para gastar, em vez de segurar um slot do threadpool do Starlette
+durante o download inteiro.
+
+Com o micro-batching ativo, cada thread fica parada no forward esperando o lote
+fechar: com só INFERENCE_EXECUTOR_WORKERS threads o agendador nunca veria mais
+jobs do que isso. O executor então tem pelo menos INFERENCE_BATCH_MAX_SIZE
+threads; as que esperam o lote não disputam CPU.
+'''
+
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from app.config.settings import get_settings
+
+settings = get_settings()
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_guard = threading.Lock()
+
+
+def _num_workers() -> int:
+    if settings.INFERENCE_BATCHING_ENABLED:
+        return max(settings.INFERENCE_EXECUTOR_WORKERS, settings.INFERENCE_BATCH_MAX_SIZE)
+    return settings.INFERENCE_EXECUTOR_WORKERS
+
+
+def get_inference_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_guard:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=_num_workers(),
+                    thread_name_prefix="inference",
+                )
+    return _executor
+
+
+async def run_in_inference_executor(func, *args, **kwargs):
+    """Executa `func(*args, **kwargs)` no executor de inferência e aguarda o resultado."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_inference_executor(), functools.partial(func, *args, **kwargs))
+
+
+_FIM = object()
+
+
+async def iterate_in_inference_executor(iterator):
+    """
+    Consome um iterador síncrono (ex.: o gerador do modo streaming) no executor de
+    inferência, um item por vez, repassando cada item ao event loop assim que fica pronto.
+    """
+    while True:
+        item = await run_in_inference_executor(next, iterator, _FIM)
+        if item is _FIM:
+            return
+        yield item
+
+
+def shutdown_inference_executor() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True)
+        _executor = None
@@ -0,0 +1,352 @@
+'''
+Tier opcional de inferência em processos (sem disputar o GIL da API).
+
+Por padrão todo forward roda em threads do processo do uvicorn: o forward do
+torch, a preparação das séries em pandas e o event loop disputam o mesmo GIL e o
+mesmo conjunto de threads intra-op. Com INFERENCE_PROCESS_POOL_ENABLED, o
+startup sobe N processos worker, cada um com o seu modelo carregado do artefato
+(mesmo backend de Settings.MODEL_BACKEND), seu torch.set_num_threads e,
+opcionalmente (INFERENCE_PROCESS_POOL_PIN_CPUS), fixado em um conjunto próprio
+de CPUs.
+
+Troca de dados sem pickle de arrays: cada worker tem dois segmentos de memória
+compartilhada (entrada e saída). O processo da API escreve as janelas float32
+direto no segmento de entrada do worker, manda só o shape pelo Pipe, e lê a
+previsão do segmento de saída. Lotes maiores que o segmento são fatiados.
+
+O pool atende os forwards "one-shot" (run_forecast: backtest, dia alvo, lote,
+também via micro-batching) do modelo padrão. A previsão recursiva continua no
+processo da API: cada passo depende do anterior e pagaria uma ida e volta ao
+worker por dia do horizonte. Um worker que morre ou não responde em
+INFERENCE_PROCESS_POOL_CALL_TIMEOUT_SECONDS é recriado, e a chamada em andamento
+falha com RuntimeError (run_forecast a transforma em erro). Se a recriação
+falhar, o worker sai de rotação; sem workers ativos as chamadas falham na hora.
+'''
+
+import logging
+import multiprocessing
+import os
+import queue
+import time
+from multiprocessing import shared_memory
+from typing import List, Optional
+
+import numpy as np
+
+from app.config.settings import get_settings
+from app.domain.services.ml_handler.backends import ModelBackend
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+_FLOAT_BYTES = np.dtype(np.float32).itemsize
+
+
+def _cpus_do_worker(indice: int, threads: int) -> Optional[List[int]]:
+    """CPUs do worker `indice`: blocos consecutivos de `threads` CPUs, em rodízio."""
+    if not hasattr(os, "sched_getaffinity"):
+        return None
+    disponiveis = sorted(os.sched_getaffinity(0))
+    inicio = (indice * threads) % len(disponiveis)
+    return [disponiveis[(inicio + k) % len(disponiveis)] for k in range(min(threads, len(disponiveis)))]
+
+
+def _worker_main(indice, model_path, backend, conn, nome_entrada, nome_saida, threads, cpus) -> None:
+    """Laço do processo worker: recebe (n, seq, features), roda o forward e responde com o shape da saída."""
+    import torch
+
+    if cpus and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cpus)
+    torch.set_num_threads(threads)
+
+    from app.domain.services.ml_handler.backends import as_backend
+    from app.domain.services.ml_handler.ml_handler import carregar_modelo_eager
+    from app.domain.services.ml_handler.model_export import prepare_backend
+
+    shm_entrada = shared_memory.SharedMemory(name=nome_entrada)
+    shm_saida = shared_memory.SharedMemory(name=nome_saida)
+    entrada = np.ndarray((shm_entrada.size // _FLOAT_BYTES,), dtype=np.float32, buffer=shm_entrada.buf)
+    saida = np.ndarray((shm_saida.size // _FLOAT_BYTES,), dtype=np.float32, buffer=shm_saida.buf)
+
+    try:
+        modelo = as_backend(prepare_backend(carregar_modelo_eager(model_path), backend))
+        conn.send(("pronto", {"pid": os.getpid(), "threads": torch.get_num_threads(), "cpus": cpus}))
+    except Exception as e:
+        conn.send(("erro", f"Falha ao carregar o modelo no worker {indice}: {e!r}"))
+        return
+
+    try:
+        while True:
+            mensagem = conn.recv()
+            if mensagem is None:
+                break
+            n, seq, features = mensagem
+            try:
+                janelas = torch.from_numpy(entrada[:n * seq * features].reshape(n, seq, features))
+                with torch.inference_mode():
+                    pred = np.asarray(modelo.predict(janelas), dtype=np.float32)
+                if pred.size > saida.size:
+                    raise ValueError(f"Saída com {pred.size} valores não cabe no segmento ({saida.size}).")
+                saida[:pred.size] = pred.reshape(-1)
+                conn.send(("ok", pred.shape))
+            except Exception as e:
+                conn.send(("erro", repr(e)))
+    except (EOFError, KeyboardInterrupt):
+        pass
+    finally:
+        # Sem views abertas os segmentos podem ser fechados (o unlink é do processo da API)
+        janelas = entrada = saida = None
+        shm_entrada.close()
+        shm_saida.close()
+
+
+class _Worker:
+    """Lado da API de um processo worker: processo, Pipe e os dois segmentos compartilhados."""
+
+    def __init__(self, pool: "InferenceProcessPool", indice: int):
+        self.indice = indice
+        self.requests = 0
+        self.windows = 0
+        self.busy_seconds = 0.0
+        self.restarts = -1
+        self.ativo = True
+        self._pool = pool
+        self._iniciar()
+
+    def _iniciar(self) -> None:
+        pool = self._pool
+        self.restarts += 1
+        self.shm_entrada = shared_memory.SharedMemory(create=True, size=pool.slot_floats * _FLOAT_BYTES)
+        self.shm_saida = shared_memory.SharedMemory(create=True, size=pool.output_floats * _FLOAT_BYTES)
+        self.entrada = np.ndarray((pool.slot_floats,), dtype=np.float32, buffer=self.shm_entrada.buf)
+        self.saida = np.ndarray((pool.output_floats,), dtype=np.float32, buffer=self.shm_saida.buf)
+
+        self.conn, conn_filho = pool.context.Pipe()
+        self.cpus = _cpus_do_worker(self.indice, pool.threads_per_worker) if pool.pin_cpus else None
+        self.process = pool.context.Process(
+            target=_worker_main,
+            args=(self.indice, str(pool.model_path), pool.backend, conn_filho,
+                  self.shm_entrada.name, self.shm_saida.name, pool.threads_per_worker, self.cpus),
+            name=f"inference-worker-{self.indice}",
+            daemon=True,
+        )
+        self.process.start()
+        conn_filho.close()
+
+    def wait_ready(self, timeout: float) -> dict:
+        if not self.conn.poll(timeout):
+            raise RuntimeError(f"Worker de inferência {self.indice} não ficou pronto em {timeout:.0f} s.")
+        status, info = self.conn.recv()
+        if status != "pronto":
+            raise RuntimeError(info)
+        self.pid = info["pid"]
+        return info
+
+    def run(self, lote: np.ndarray) -> np.ndarray:
+        n, seq, features = lote.shape
+        inicio = time.perf_counter()
+        self.entrada[:lote.size] = lote.reshape(-1)
+        try:
+            self.conn.send((n, seq, features))
+            if not self.conn.poll(self._pool.call_timeout):
+                raise TimeoutError(f"sem resposta em {self._pool.call_timeout:g} s")
+            status, info = self.conn.recv()
+        except (EOFError, OSError) as e:
+            logger.error("Worker de inferência %d falhou (%s); recriando.", self.indice, e)
+            self.restart()
+            raise RuntimeError(f"Worker de inferência {self.indice} falhou durante o forward: {e}") from e
+        if status != "ok":
+            raise RuntimeError(f"Erro no worker de inferência {self.indice}: {info}")
+
+        self.requests += 1
+        self.windows += n
+        self.busy_seconds += time.perf_counter() - inicio
+        return self.saida[:int(np.prod(info))].reshape(info).copy()
+
+    def restart(self) -> None:
+        """Recria o processo; se ele não subir, o worker sai de rotação (ativo=False)."""
+        self.close(timeout=1.0)
+        try:
+            self._iniciar()
+            self.wait_ready(self._pool.startup_timeout)
+        except Exception:
+            self.ativo = False
+            logger.exception("Worker de inferência %d não pôde ser recriado; fora de rotação.", self.indice)
+            self.close(timeout=1.0)
+            raise
+
+    def close(self, timeout: float = 5.0) -> None:
+        try:
+            self.conn.send(None)
+        except (OSError, ValueError):
+            pass
+        self.process.join(timeout)
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join(timeout)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join(timeout)
+        self.conn.close()
+        # As views NumPy precisam sair antes de fechar os segmentos
+        self.entrada = self.saida = None
+        for shm in (self.shm_entrada, self.shm_saida):
+            shm.close()
+            try:
+                shm.unlink()
+            except FileNotFoundError:
+                pass
+
+
+class InferenceProcessPool:
+    def __init__(
+        self,
+        model,
+        model_path,
+        workers: int = 4,
+        threads_per_worker: int = 1,
+        slot_windows: int = 4096,
+        max_seq_length: int = 128,
+        pin_cpus: bool = False,
+        start_method: str = "spawn",
+        backend: str = None,
+        startup_timeout: float = 120.0,
+        call_timeout: float = 30.0,
+    ):
+        self.model = model
+        self.model_path = model_path
+        self.workers = workers
+        self.threads_per_worker = threads_per_worker
+        self.pin_cpus = pin_cpus
+        self.backend = backend or settings.MODEL_BACKEND
+        self.startup_timeout = startup_timeout
+        self.call_timeout = call_timeout
+        self.context = multiprocessing.get_context(start_method)
+
+        fc = getattr(model, "fc", None)
+        self.features = getattr(getattr(model, "lstm", None), "input_size", 1)
+        self.output_size = getattr(fc, "out_features", 1)
+        self.slot_floats = slot_windows * max_seq_length * self.features
+        self.output_floats = slot_windows * self.output_size
+
+        self._workers: List[_Worker] = []
+        self._livres: "queue.Queue[_Worker]" = queue.Queue()
+
+    def start(self) -> "InferenceProcessPool":
+        inicio = time.perf_counter()
+        self._workers = [_Worker(self, i) for i in range(self.workers)]
+        try:
+            infos = [w.wait_ready(self.startup_timeout) for w in self._workers]
+        except Exception:
+            self.stop()
+            raise
+        for w in self._workers:
+            self._livres.put(w)
+        logger.info("Pool de inferência: %d processos prontos em %.1f s (%s).",
+                    self.workers, time.perf_counter() - inicio,
+                    ", ".join(f"pid {i['pid']}: {i['threads']} thread(s), CPUs {i['cpus']}" for i in infos))
+        return self
+
+    def stop(self) -> None:
+        for w in self._workers:
+            w.close()
+        self._workers = []
+        self._livres = queue.Queue()
+
+    def predict(self, windows) -> np.ndarray:
+        """Forward de (batch, seq_len, features) em um worker livre; retorna ndarray (batch, output)."""
+        if not isinstance(windows, np.ndarray):
+            windows = windows.detach().cpu().numpy()
+        janelas = np.ascontiguousarray(windows, dtype=np.float32)
+        if janelas.ndim == 2:
+            janelas = janelas[..., None]
+        n, seq, features = janelas.shape
+
+        por_fatia = min(self.slot_floats // (seq * features), self.output_floats // self.output_size)
+        if por_fatia == 0:
+            raise ValueError(f"Janela de {seq}x{features} não cabe no segmento compartilhado do pool.")
+
+        saidas = [self._executar(janelas[i:i + por_fatia]) for i in range(0, n, por_fatia)]
+        return saidas[0] if len(saidas) == 1 else np.concatenate(saidas)
+
+    def _executar(self, lote: np.ndarray) -> np.ndarray:
+        worker = self._proximo_livre()
+        try:
+            return worker.run(lote)
+        finally:
+            # Worker que não pôde ser recriado não volta para a fila
+            if worker.ativo:
+                self._livres.put(worker)
+
+    def _proximo_livre(self) -> _Worker:
+        while True:
+            if not any(w.ativo for w in self._workers):
+                raise RuntimeError("Nenhum worker de inferência ativo no pool.")
+            try:
+                return self._livres.get(timeout=1.0)
+            except queue.Empty:
+                continue
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "threads_per_worker": self.threads_per_worker,
+            "active": sum(w.ativo for w in self._workers),
+            "idle": self._livres.qsize(),
+            "per_worker": [
+                {
+                    "pid": getattr(w, "pid", None),
+                    "active": w.ativo,
+                    "cpus": w.cpus,
+                    "requests": w.requests,
+                    "windows": w.windows,
+                    "busy_seconds": round(w.busy_seconds, 3),
+                    "restarts": w.restarts,
+                }
+                for w in self._workers
+            ],
+        }
+
+
+class ProcessPoolBackend(ModelBackend):
+    """ModelBackend que delega o forward ao pool de processos."""
+
+    name = "process_pool"
+
+    def __init__(self, pool: InferenceProcessPool):
+        self.pool = pool
+
+    def predict(self, windows) -> np.ndarray:
+        return self.pool.predict(windows)
+
+
+_pool: Optional[InferenceProcessPool] = None
+
+
+def start_inference_process_pool(model, model_path=None) -> InferenceProcessPool:
+    """Cria e inicia o pool global para `model` (chamado no startup da aplicação)."""
+    global _pool
+    stop_inference_process_pool()
+    _pool = InferenceProcessPool(
+        model,
+        model_path or settings.MODEL_PATH,
+        workers=settings.INFERENCE_PROCESS_POOL_WORKERS,
+        threads_per_worker=settings.INFERENCE_PROCESS_POOL_TORCH_THREADS,
+        slot_windows=settings.INFERENCE_PROCESS_POOL_SLOT_WINDOWS,
+        max_seq_length=settings.INFERENCE_PROCESS_POOL_MAX_SEQ_LENGTH,
+        pin_cpus=settings.INFERENCE_PROCESS_POOL_PIN_CPUS,
+        start_method=settings.INFERENCE_PROCESS_POOL_START_METHOD,
+        call_timeout=settings.INFERENCE_PROCESS_POOL_CALL_TIMEOUT_SECONDS,
+    ).start()
+    return _pool
+
+
+def stop_inference_process_pool() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.stop()
+        _pool = None
+
+
+def get_inference_process_pool() -> Optional[InferenceProcessPool]:
+    return _pool
@@ -0,0 +1,146 @@
+'''
+Contexto de dados de mercado com escopo de requisição.
+
+Uma requisição de previsão precisa de histórico em três lugares: checagem de
+existência do ticker, validação de histórico mínimo e montagem das janelas do
+modelo. O contexto cobre a união dessas janelas e faz o download uma única vez;
+validadores e serviços recebem o mesmo objeto e apenas recortam o DataFrame.
+'''
+
+import threading
+from functools import wraps
+from typing import Awaitable, Callable, Optional
+
+import pandas as pd
+
+from app.config.settings import get_settings
+from app.domain.services.avaluation_model_service import obtemDadosHistoricos, obtemDadosHistoricosAsync
+from app.domain.services.ml_handler.backends import model_seq_length
+
+settings = get_settings()
+
+# Janelas de lookback usadas pelos validadores (dias corridos)
+LOOKBACK_VALIDACAO_ENTRE_DATAS = 90
+LOOKBACK_VALIDACAO_DIA = 60
+
+
+def janela_da_requisicao(req, seq_length: int = None):
+    """
+    (inicio, fim) da união das janelas usadas por validadores e serviços para
+    uma requisição entre datas (init_date/end_date) ou de dia alvo (target_date),
+    com o seq_length do modelo que vai atendê-la.
+    """
+    seq_length = seq_length or settings.SEQ_LENGTH
+    if getattr(req, "init_date", None) is not None:
+        inicio_req = pd.Timestamp(req.init_date)
+        inicio = inicio_req - pd.Timedelta(days=max(LOOKBACK_VALIDACAO_ENTRE_DATAS, seq_length * 2))
+        fim = pd.Timestamp(req.end_date) + pd.Timedelta(days=1)
+    else:
+        alvo = pd.Timestamp(getattr(req, "date", getattr(req, "target_date", None)))
+        inicio = alvo - pd.Timedelta(days=max(LOOKBACK_VALIDACAO_DIA, seq_length * 2 + 10))
+        fim = alvo + pd.Timedelta(days=5)
+    return inicio, fim
+
+
+class MarketDataContext:
+    def __init__(
+        self,
+        ticker: str,
+        inicio,
+        fim,
+        fetcher: Optional[Callable[..., pd.DataFrame]] = None,
+        afetcher: Optional[Callable[..., Awaitable[pd.DataFrame]]] = None,
+    ):
+        self.ticker = ticker.upper().strip()
+        self.inicio = pd.Timestamp(inicio).normalize()
+        self.fim = pd.Timestamp(fim).normalize()
+        self._fetcher = fetcher
+        self._afetcher = afetcher
+        self._frame: Optional[pd.DataFrame] = None
+        self._lock = threading.Lock()
+        self.fetch_count = 0
+
+    @classmethod
+    def for_request(cls, req, fetcher=None, afetcher=None, seq_length: int = None) -> "MarketDataContext":
+        """
+        Contexto cobrindo a união das janelas que validadores e serviços vão
+        consultar para o tipo de requisição recebido.
+        """
+        inicio, fim = janela_da_requisicao(req, seq_length)
+        return cls(req.ticker, inicio, fim, fetcher=fetcher, afetcher=afetcher)
+
+    @classmethod
+    def preloaded(cls, req, frame: pd.DataFrame, seq_length: int = None) -> "MarketDataContext":
+        """Contexto sobre um histórico já baixado (ex.: parte de um download em lote)."""
+        inicio, fim = janela_da_requisicao(req, seq_length)
+        context = cls(req.ticker, inicio, fim)
+        context._frame = frame
+        return context
+
+    @property
+    def frame(self) -> pd.DataFrame:
+        """Histórico completo da janela do contexto (baixado na primeira leitura)."""
+        if self._frame is None:
+            with self._lock:
+                if self._frame is None:
+                    fetcher = self._fetcher or obtemDadosHistoricos
+                    self._frame = fetcher(self.ticker, self.inicio, self.fim.strftime('%Y-%m-%d'))
+                    self.fetch_count += 1
+        return self._frame
+
+    async def aload(self) -> pd.DataFrame:
+        """
+        Carrega o histórico sem bloquear o event loop. Depois disso `frame` e
+        `slice` não fazem mais I/O e podem rodar em qualquer thread.
+        """
+        if self._frame is None:
+            afetcher = self._afetcher or obtemDadosHistoricosAsync
+            frame = await afetcher(self.ticker, self.inicio, self.fim.strftime('%Y-%m-%d'))
+            if self._frame is None:
+                self._frame = frame
+                self.fetch_count += 1
+        return self._frame
+
+    def slice(self, inicio, fim) -> pd.DataFrame:
+        """Recorte [inicio, fim) do histórico, sem novo download."""
+        frame = self.frame
+        if frame.empty:
+            return frame
+        idx = frame.index
+        inicio = pd.Timestamp(inicio)
+        fim = pd.Timestamp(fim)
+        if idx.tz is not None:
+            inicio, fim = inicio.tz_localize(idx.tz), fim.tz_localize(idx.tz)
+        return frame[(idx >= inicio) & (idx < fim)]
+
+
+def _seq_length_da_chamada(args, kwargs) -> int:
+    # Handlers recebem (req, model, ...): a janela depende do seq_length do modelo
+    return model_seq_length(args[0] if args else kwargs.get("model"))
+
+
+def with_market_data_context(func):
+    """
+    Cria o contexto da requisição (se ainda não houver) e o injeta como
+    kwarg `context` para os validadores e o handler abaixo dele.
+    """
+    @wraps(func)
+    def wrapper(req, *args, **kwargs):
+        if kwargs.get("context") is None:
+            kwargs["context"] = MarketDataContext.for_request(req, seq_length=_seq_length_da_chamada(args, kwargs))
+        return func(req, *args, **kwargs)
+    return wrapper
+
+
+def with_market_data_context_async(func):
+    """
+    Equivalente assíncrono de with_market_data_context: além de criar o contexto,
+    já faz o download (não bloqueante) antes de chamar validadores e handler.
+    """
+    @wraps(func)
+    async def wrapper(req, *args, **kwargs):
+        if kwargs.get("context") is None:
+            kwargs["context"] = MarketDataContext.for_request(req, seq_length=_seq_length_da_chamada(args, kwargs))
+        await kwargs["context"].aload()
+        return await func(req, *args, **kwargs)
+    return wrapper
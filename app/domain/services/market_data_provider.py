@@ -0,0 +1,310 @@
+'''
+Camada de provedores de dados de mercado (histórico diário OHLCV).
+
+Todo acesso a dados de mercado (serviço de previsão, price store e validadores)
+passa por um MarketDataProvider, escolhido em Settings.MARKET_DATA_PROVIDER:
+
+- "yahoo" (YahooProvider): endpoint de chart do Yahoo com clientes httpx
+  compartilhados e keep-alive (síncrono e assíncrono), timeouts de conexão e
+  leitura separados e retries com backoff em falhas transitórias. Substitui o
+  yf.download/yf.Ticker, que abriam uma sessão implícita por chamada.
+- "local" (LocalFileProvider): um arquivo por ticker em MARKET_DATA_LOCAL_DIR
+  (PETR4.SA.csv ou PETR4.SA.parquet), com coluna Date e as colunas de preço.
+- "synthetic" (SyntheticProvider): séries determinísticas (dependem só do
+  ticker e da data), para testes e execução totalmente offline.
+
+Contrato: intervalos são [data_inicial, data_final) e os DataFrames saem no
+formato do price store (Close/High/Low/Open/Volume, índice "Date" sem fuso).
+Ticker sem dados devolve DataFrame vazio; falhas de upstream sobem como exceção.
+'''
+
+import asyncio
+import logging
+import re
+import threading
+import time
+import zlib
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+
+import httpx
+import numpy as np
+import pandas as pd
+
+from app.config.settings import get_settings
+from app.domain.services.async_market_data import (
+    HEADERS, STATUS_RETENTAVEIS, baixar_historico_yahoo_async, chart_frame, chart_params,
+    http_limits, http_timeout, retry_delay,
+)
+from app.domain.services.price_store import COLUNAS_PRECO, empty_price_frame
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+MARKET_DATA_PROVIDERS = ("yahoo", "local", "synthetic")
+
+
+class MarketDataProvider(ABC):
+    name = "base"
+
+    @abstractmethod
+    def fetch_history(self, ticker: str, data_inicial, data_final) -> pd.DataFrame:
+        """Histórico diário de `ticker` em [data_inicial, data_final)."""
+
+    def fetch_many(self, tickers: Iterable[str], data_inicial, data_final) -> Dict[str, pd.DataFrame]:
+        """fetch_history para vários tickers (ticker -> DataFrame; vazio se não houver dados)."""
+        return {ticker: self.fetch_history(ticker, data_inicial, data_final) for ticker in tickers}
+
+    async def afetch_history(self, ticker: str, data_inicial, data_final) -> pd.DataFrame:
+        """Versão assíncrona de fetch_history (por padrão, em uma thread)."""
+        return await asyncio.to_thread(self.fetch_history, ticker, data_inicial, data_final)
+
+    def ticker_exists(self, ticker: str) -> bool:
+        """True se o ticker tem pregões recentes. Falhas do upstream sobem como exceção."""
+        hoje = pd.Timestamp.today().normalize()
+        return not self.fetch_history(ticker, hoje - pd.Timedelta(days=7), hoje + pd.Timedelta(days=1)).empty
+
+    async def aticker_exists(self, ticker: str) -> bool:
+        return await asyncio.to_thread(self.ticker_exists, ticker)
+
+    def close(self) -> None:
+        """Libera conexões/recursos do provedor."""
+
+
+def _somente_colunas_preco(frame: pd.DataFrame) -> pd.DataFrame:
+    frame = frame[[col for col in COLUNAS_PRECO if col in frame.columns]].astype(np.float64)
+    frame.index = pd.DatetimeIndex(frame.index, name="Date")
+    return frame
+
+
+def _recorte(frame: pd.DataFrame, data_inicial, data_final) -> pd.DataFrame:
+    idx = frame.index
+    return frame[(idx >= pd.Timestamp(data_inicial)) & (idx < pd.Timestamp(data_final))]
+
+
+class YahooProvider(MarketDataProvider):
+    """
+    Endpoint de chart do Yahoo. O cliente síncrono (httpx.Client, thread-safe)
+    e o assíncrono (get_async_http_client) são únicos no processo e mantêm as
+    conexões abertas entre chamadas.
+    """
+
+    name = "yahoo"
+
+    def __init__(self):
+        self._client: Optional[httpx.Client] = None
+        self._client_lock = threading.Lock()
+        self._batch_executor: Optional[ThreadPoolExecutor] = None
+
+    def _cliente(self) -> httpx.Client:
+        if self._client is None or self._client.is_closed:
+            with self._client_lock:
+                if self._client is None or self._client.is_closed:
+                    self._client = httpx.Client(headers=HEADERS, timeout=http_timeout(), limits=http_limits())
+        return self._client
+
+    def _get(self, ticker: str, params: dict) -> pd.DataFrame:
+        url = settings.YAHOO_CHART_URL.format(symbol=ticker)
+        for tentativa in range(settings.YAHOO_HTTP_RETRIES + 1):
+            ultima = tentativa == settings.YAHOO_HTTP_RETRIES
+            try:
+                resposta = self._cliente().get(url, params=params)
+            except httpx.TransportError as e:
+                if ultima:
+                    raise
+                logger.warning("Falha de conexão com o Yahoo (%s), tentativa %d: %s", ticker, tentativa + 1, e)
+            else:
+                if resposta.status_code not in STATUS_RETENTAVEIS or ultima:
+                    return chart_frame(resposta)
+                logger.warning("Yahoo respondeu %d para %s, tentativa %d.", resposta.status_code, ticker, tentativa + 1)
+            time.sleep(retry_delay(tentativa + 1))
+
+    def fetch_history(self, ticker: str, data_inicial, data_final) -> pd.DataFrame:
+        return self._get(ticker, chart_params(data_inicial, data_final))
+
+    def fetch_many(self, tickers: Iterable[str], data_inicial, data_final) -> Dict[str, pd.DataFrame]:
+        # O endpoint de chart é por ticker: as chamadas saem em paralelo pelo mesmo pool de conexões
+        tickers = list(tickers)
+        if self._batch_executor is None:
+            with self._client_lock:
+                if self._batch_executor is None:
+                    self._batch_executor = ThreadPoolExecutor(
+                        max_workers=settings.MARKET_DATA_BATCH_CONCURRENCY, thread_name_prefix="market-data"
+                    )
+        frames = self._batch_executor.map(lambda t: self.fetch_history(t, data_inicial, data_final), tickers)
+        return dict(zip(tickers, frames))
+
+    async def afetch_history(self, ticker: str, data_inicial, data_final) -> pd.DataFrame:
+        return await baixar_historico_yahoo_async(ticker, data_inicial, data_final)
+
+    def ticker_exists(self, ticker: str) -> bool:
+        # period="1d" é a consulta mais leve que confirma existência
+        return not self._get(ticker, chart_params(periodo="1d")).empty
+
+    async def aticker_exists(self, ticker: str) -> bool:
+        return not (await baixar_historico_yahoo_async(ticker, periodo="1d")).empty
+
+    def close(self) -> None:
+        if self._client is not None:
+            self._client.close()
+            self._client = None
+        if self._batch_executor is not None:
+            self._batch_executor.shutdown(wait=False)
+            self._batch_executor = None
+
+
+class LocalFileProvider(MarketDataProvider):
+    """
+    Um arquivo por ticker no diretório: {TICKER}.parquet ou {TICKER}.csv, com a
+    coluna Date e as colunas de preço (Close obrigatória). Arquivos são lidos uma
+    vez e relidos quando o mtime muda. Parquet precisa de pyarrow ou fastparquet.
+    """
+
+    name = "local"
+
+    def __init__(self, root_dir=None):
+        self._root = Path(root_dir or settings.MARKET_DATA_LOCAL_DIR)
+        self._cache: Dict[Path, tuple] = {}
+        self._lock = threading.Lock()
+
+    def _arquivo(self, ticker: str) -> Optional[Path]:
+        nome = re.sub(r"[^A-Za-z0-9._^=-]", "_", ticker.upper().strip())
+        for extensao in (".parquet", ".csv"):
+            for candidato in (self._root / f"{nome}{extensao}", self._root / f"{nome.lower()}{extensao}"):
+                if candidato.exists():
+                    return candidato
+        return None
+
+    def _ler(self, path: Path) -> pd.DataFrame:
+        mtime = path.stat().st_mtime
+        with self._lock:
+            cacheado = self._cache.get(path)
+            if cacheado is not None and cacheado[0] == mtime:
+                return cacheado[1]
+
+        if path.suffix == ".parquet":
+            frame = pd.read_parquet(path)
+        else:
+            frame = pd.read_csv(path)
+        if "Date" in frame.columns:
+            frame = frame.set_index("Date")
+        idx = pd.DatetimeIndex(pd.to_datetime(frame.index))
+        frame.index = idx.tz_localize(None) if idx.tz is not None else idx
+        frame = _somente_colunas_preco(frame.sort_index())
+
+        with self._lock:
+            self._cache[path] = (mtime, frame)
+        return frame
+
+    def fetch_history(self, ticker: str, data_inicial, data_final) -> pd.DataFrame:
+        path = self._arquivo(ticker)
+        if path is None:
+            return empty_price_frame()
+        return _recorte(self._ler(path), data_inicial, data_final)
+
+    def ticker_exists(self, ticker: str) -> bool:
+        path = self._arquivo(ticker)
+        return path is not None and not self._ler(path).empty
+
+
+# Tickers com este prefixo não existem no provedor sintético (para testar 404)
+PREFIXO_INEXISTENTE = "INVALID"
+INICIO_SERIES = pd.Timestamp("2000-01-03")
+
+
+def serie_deterministica(ticker: str, data_inicial, data_final) -> pd.DataFrame:
+    """Pregões (dias úteis) em [data_inicial, data_final) com OHLCV que dependem só do ticker e da data."""
+    inicio = max(pd.Timestamp(data_inicial).normalize(), INICIO_SERIES)
+    fim = pd.Timestamp(data_final).normalize()
+    idx = pd.bdate_range(inicio, fim - pd.Timedelta(days=1), name="Date")
+    if len(idx) == 0:
+        return empty_price_frame()
+
+    semente = zlib.crc32(ticker.upper().encode())
+    base = 10.0 + semente % 90
+    dias = (idx - INICIO_SERIES).days.to_numpy(dtype=np.float64)
+    fase = (semente % 997) / 997.0 * 2 * np.pi
+    close = base * (1.0 + 0.15 * np.sin(dias / 37.0 + fase) + 0.05 * np.sin(dias / 5.3 + 2 * fase))
+    amplitude = 0.01 * close
+    return pd.DataFrame(
+        {
+            "Close": close,
+            "High": close + amplitude,
+            "Low": close - amplitude,
+            "Open": close - 0.3 * amplitude,
+            "Volume": 1e6 + (semente % 1000) * 1e3,
+        },
+        index=idx,
+    )
+
+
+class SyntheticProvider(MarketDataProvider):
+    """Séries determinísticas até `today` (padrão: hoje); tickers INVALID* não existem."""
+
+    name = "synthetic"
+
+    def __init__(self, today=None):
+        self._today = today
+
+    def _fim(self, data_final) -> pd.Timestamp:
+        hoje = pd.Timestamp(self._today or pd.Timestamp.today()).normalize()
+        return min(pd.Timestamp(data_final), hoje + pd.Timedelta(days=1))
+
+    def fetch_history(self, ticker: str, data_inicial, data_final) -> pd.DataFrame:
+        if ticker.upper().startswith(PREFIXO_INEXISTENTE):
+            return empty_price_frame()
+        return serie_deterministica(ticker, data_inicial, self._fim(data_final))
+
+    async def afetch_history(self, ticker: str, data_inicial, data_final) -> pd.DataFrame:
+        return self.fetch_history(ticker, data_inicial, data_final)
+
+    def ticker_exists(self, ticker: str) -> bool:
+        return not ticker.upper().startswith(PREFIXO_INEXISTENTE)
+
+    async def aticker_exists(self, ticker: str) -> bool:
+        return self.ticker_exists(ticker)
+
+
+def create_market_data_provider(nome: str = None) -> MarketDataProvider:
+    nome = nome or settings.MARKET_DATA_PROVIDER
+    if nome == "yahoo":
+        return YahooProvider()
+    if nome == "local":
+        return LocalFileProvider()
+    if nome == "synthetic":
+        return SyntheticProvider()
+    raise ValueError(f"Provedor de dados de mercado inválido: {nome}. Use um de {MARKET_DATA_PROVIDERS}.")
+
+
+_provider: Optional[MarketDataProvider] = None
+_provider_guard = threading.Lock()
+
+
+def get_market_data_provider() -> MarketDataProvider:
+    """Provedor único do processo, escolhido em Settings.MARKET_DATA_PROVIDER."""
+    global _provider
+    if _provider is None:
+        with _provider_guard:
+            if _provider is None:
+                _provider = create_market_data_provider()
+                logger.info("Provedor de dados de mercado: %s", _provider.name)
+    return _provider
+
+
+def set_market_data_provider(provider: Optional[MarketDataProvider]) -> None:
+    """Troca o provedor do processo (ex.: harness de carga, testes); None volta ao de Settings."""
+    global _provider
+    with _provider_guard:
+        if _provider is not None and _provider is not provider:
+            _provider.close()
+        _provider = provider
+
+
+def close_market_data_provider() -> None:
+    global _provider
+    with _provider_guard:
+        if _provider is not None:
+            _provider.close()
+            _provider = None
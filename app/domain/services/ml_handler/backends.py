@@ -0,0 +1,175 @@
+'''
+Interface de backend do modelo: quem faz o forward das janelas.
+
+run_forecast, o agendador de micro-batching e o motor de previsão recursiva
+falam com um ModelBackend em vez de chamar o nn.Module direto, então dá para
+trocar o runtime de inferência sem mexer nos serviços.
+
+- predict(windows): (batch, seq_len, features) -> ndarray (batch, output).
+  Aceita ndarray ou tensor.
+- __call__(windows): mesmo forward, devolvendo tensor quando recebe tensor
+  (é o que o motor recursivo usa para escrever direto no buffer).
+- step(x, state): opcional (supports_step). Avança o LSTM com estado carregado,
+  usado pelo modo "fast" da previsão recursiva.
+
+Backends:
+- TorchBackend: envolve o nn.Module (eager, TorchScript, torch.compile ou int8).
+  É criado uma vez por módulo (attach_backend, no carregamento) e guardado no
+  próprio módulo: as_backend no caminho quente só o reaproveita.
+- OnnxRuntimeBackend: sessão do ONNX Runtime sobre o SimpleLSTM exportado com
+  export_onnx. onnxruntime é opcional (pip install onnxruntime onnx) e só é
+  importado quando o backend é criado; o forward em si não passa pelo torch.
+'''
+
+import logging
+from abc import ABC, abstractmethod
+from pathlib import Path
+
+import numpy as np
+
+from app.config.settings import get_settings
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+ONNX_INPUT_NAME = "windows"
+ONNX_OUTPUT_NAME = "prediction"
+# Atributo do módulo que guarda o seu TorchBackend
+_ATRIBUTO_BACKEND = "_inference_backend"
+
+
+class ModelBackend(ABC):
+    name = "base"
+    supports_step = False
+
+    @abstractmethod
+    def predict(self, windows) -> np.ndarray:
+        """Forward de um lote de janelas (batch, seq_len, features); retorna (batch, output)."""
+
+    def step(self, x, state=None):
+        """Avança o estado do LSTM com `x` e retorna (previsão, novo estado)."""
+        raise NotImplementedError(f"O backend '{self.name}' não suporta avanço com estado.")
+
+    def __call__(self, windows):
+        saida = self.predict(windows)
+        if isinstance(windows, np.ndarray):
+            return saida
+
+        import torch
+        return torch.from_numpy(saida).to(windows.device)
+
+
+class TorchBackend(ModelBackend):
+    name = "torch"
+
+    def __init__(self, module):
+        import torch.nn as nn
+
+        self.module = module
+        self.supports_step = (
+            isinstance(getattr(module, "lstm", None), nn.LSTM) and isinstance(getattr(module, "fc", None), nn.Module)
+        )
+        if hasattr(module, "eval"):
+            module.eval()
+
+    def predict(self, windows) -> np.ndarray:
+        import torch
+
+        if isinstance(windows, np.ndarray):
+            windows = torch.from_numpy(windows)
+        with torch.inference_mode():
+            return self.module(windows).cpu().numpy()
+
+    def __call__(self, windows):
+        if isinstance(windows, np.ndarray):
+            return self.predict(windows)
+        return self.module(windows)
+
+    def step(self, x, state=None):
+        out, state = self.module.lstm(x, state)
+        # Dropout é identidade em eval: aplicamos direto a camada linear
+        return self.module.fc(out[:, -1, :]), state
+
+
+class OnnxRuntimeBackend(ModelBackend):
+    name = "onnxruntime"
+
+    def __init__(self, path, intra_op_threads: int = None, inter_op_threads: int = None):
+        try:
+            import onnxruntime as ort
+        except ImportError as e:
+            raise ImportError("O backend ONNX Runtime precisa do pacote onnxruntime (pip install onnxruntime).") from e
+
+        opcoes = ort.SessionOptions()
+        opcoes.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        opcoes.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        # O paralelismo entre requisições vem do executor de inferência: poucas
+        # threads por sessão evitam oversubscription da CPU
+        opcoes.intra_op_num_threads = settings.ONNX_INTRA_OP_THREADS if intra_op_threads is None else intra_op_threads
+        opcoes.inter_op_num_threads = settings.ONNX_INTER_OP_THREADS if inter_op_threads is None else inter_op_threads
+
+        self.path = Path(path)
+        self.session = ort.InferenceSession(str(self.path), opcoes, providers=["CPUExecutionProvider"])
+
+    def predict(self, windows) -> np.ndarray:
+        if not isinstance(windows, np.ndarray):
+            windows = windows.detach().cpu().numpy()
+        entrada = np.ascontiguousarray(windows, dtype=np.float32)
+        return self.session.run([ONNX_OUTPUT_NAME], {ONNX_INPUT_NAME: entrada})[0]
+
+
+def model_seq_length(model) -> int:
+    """Tamanho de janela do modelo (modelos do registro carregam o seu; o padrão vem de Settings)."""
+    return getattr(model, "seq_length", None) or settings.SEQ_LENGTH
+
+
+def model_version(model) -> str:
+    """Versão reportada nos metadados da resposta para `model`."""
+    return getattr(model, "version", None) or settings.MODEL_VERSION
+
+
+def as_backend(model) -> ModelBackend:
+    """Backend de `model`: o próprio, se já for um ModelBackend, ou o TorchBackend do módulo."""
+    return attach_backend(model)
+
+
+def attach_backend(model) -> ModelBackend:
+    """
+    TorchBackend de `model`, criado (sondas de tipo e eval()) só na primeira chamada
+    e guardado no módulo: as chamadas seguintes de as_backend não mexem no módulo
+    compartilhado entre as threads de inferência. Chamado no carregamento do modelo.
+    """
+    if isinstance(model, ModelBackend):
+        return model
+    backend = getattr(model, _ATRIBUTO_BACKEND, None)
+    if backend is not None:
+        return backend
+    backend = TorchBackend(model)
+    try:
+        object.__setattr__(model, _ATRIBUTO_BACKEND, backend)
+    except (AttributeError, TypeError):
+        pass  # objeto sem __dict__: o backend é recriado a cada chamada
+    return backend
+
+
+def export_onnx(model, output_path, seq_length: int = None) -> Path:
+    """Exporta o SimpleLSTM para ONNX com eixo de batch dinâmico."""
+    import torch
+
+    seq_length = seq_length or settings.SEQ_LENGTH
+    output_path = Path(output_path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+
+    model.eval()
+    exemplo = torch.zeros((1, seq_length, 1), dtype=torch.float32)
+    torch.onnx.export(
+        model,
+        (exemplo,),
+        str(output_path),
+        input_names=[ONNX_INPUT_NAME],
+        output_names=[ONNX_OUTPUT_NAME],
+        dynamic_axes={ONNX_INPUT_NAME: {0: "batch"}, ONNX_OUTPUT_NAME: {0: "batch"}},
+        dynamo=False,
+    )
+    logger.info("Modelo ONNX gravado em %s", output_path)
+    return output_path
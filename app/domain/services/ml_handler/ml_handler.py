@@ -1,10 +1,19 @@
+import gc
 import io
 import pickle
 import torch
 import logging
+from pathlib import Path
+from app.config.settings import get_settings
 from app.domain.services.avaluation_model_service import SimpleLSTM
+from app.domain.services.ml_handler.backends import attach_backend
+from app.domain.services.ml_handler.model_export import prepare_backend
+from app.domain.services.ml_handler.mmap_weights import export_mmap_weights, is_stale, load_mmap_weights, weights_path_for
 
 logger = logging.getLogger(__name__)
+settings = get_settings()
+
+WEIGHTS_FORMATS = ("mmap", "pickle")
 
 # Sua classe customizada para converter de GPU para CPU
 class CpuUnpickler(pickle.Unpickler):
@@ -20,23 +29,85 @@ class CpuUnpickler(pickle.Unpickler):
 
 # Variável global que guardará o modelo
 _modelo_carregado = None
+# (caminho, modelo eager) carregado antes do fork dos workers (preload_model)
+_modelo_preload = None
+
+def carregar_modelo_pickle(model_path):
+    """Lê o .pkl do modelo (sempre na CPU) e o deixa em modo eval."""
+    with open(model_path, 'rb') as f:
+        modelo = CpuUnpickler(f).load()
+
+    if hasattr(modelo, 'eval'):
+        modelo.eval()
+    return modelo
+
+def carregar_modelo_mmap(model_path):
+    """
+    Carrega os pesos mapeados em memória do artefato .weights.pt ao lado do .pkl,
+    gerando-o a partir do .pkl quando não existe ou está desatualizado.
+    """
+    caminho_pesos = weights_path_for(model_path)
+    if is_stale(model_path, caminho_pesos):
+        export_mmap_weights(carregar_modelo_pickle(model_path), caminho_pesos)
+    return load_mmap_weights(caminho_pesos)
+
+def carregar_modelo_eager(model_path, weights_format: str = None):
+    """
+    Modelo eager em modo eval, no formato de pesos de Settings.MODEL_WEIGHTS_FORMAT.
+    Se o formato mmap falhar (modelo que não é SimpleLSTM, diretório sem escrita),
+    cai para o .pkl com aviso.
+    """
+    weights_format = weights_format or settings.MODEL_WEIGHTS_FORMAT
+    if weights_format not in WEIGHTS_FORMATS:
+        raise ValueError(f"Formato de pesos inválido: {weights_format}. Use um de {WEIGHTS_FORMATS}.")
+
+    if weights_format == "mmap":
+        try:
+            return carregar_modelo_mmap(model_path)
+        except Exception as e:
+            logger.warning("Pesos mapeados indisponíveis para %s (%s); carregando o .pkl.", model_path, e)
+    return carregar_modelo_pickle(model_path)
+
+def preload_model(model_path=None):
+    """
+    Carrega o modelo padrão no processo pai, antes do fork dos workers (gunicorn
+    --preload). Nenhum forward roda aqui: o pool de threads OpenMP do torch não
+    é criado antes do fork. O gc.freeze() tira os objetos já criados das gerações
+    do coletor, que de outro modo escreveria nos cabeçalhos e copiaria as páginas
+    compartilhadas em cada worker.
+    """
+    global _modelo_preload
+    model_path = Path(model_path or settings.MODEL_PATH)
+    logger.info("Pré-carregando modelo %s antes do fork dos workers...", model_path)
+    _modelo_preload = (model_path, carregar_modelo_eager(model_path))
+    gc.freeze()
+    return _modelo_preload[1]
+
+def is_preloaded(model_path) -> bool:
+    """True se `model_path` foi carregado por preload_model antes do fork."""
+    return _modelo_preload is not None and _modelo_preload[0] == Path(model_path)
 
 def carregar_modelo_global(model_path: str = None):
     """
-    Carrega o modelo do disco para a memória global.
+    Carrega o modelo do disco para a memória global, já no backend de inferência
+    configurado em Settings.MODEL_BACKEND (eager, torchscript ou compile).
     Deve ser chamado apenas UMA VEZ ao iniciar o app.
     """
     global _modelo_carregado
     arquivo_modelo = model_path
 
     try:
-        logger.info("Carregando modelo %s para a memória...", arquivo_modelo)
-        with open(arquivo_modelo, 'rb') as f:
-            _modelo_carregado = CpuUnpickler(f).load()
+        if is_preloaded(arquivo_modelo):
+            # Mesmo objeto carregado antes do fork: páginas compartilhadas com os outros workers
+            logger.info("Usando modelo %s pré-carregado antes do fork.", arquivo_modelo)
+            modelo = _modelo_preload[1]
+        else:
+            logger.info("Carregando modelo %s para a memória...", arquivo_modelo)
+            modelo = carregar_modelo_eager(arquivo_modelo)
+        _modelo_carregado = prepare_backend(modelo)
+        # Backend criado uma vez aqui, não a cada forward
+        attach_backend(_modelo_carregado)
 
-        if hasattr(_modelo_carregado, 'eval'):
-            _modelo_carregado.eval()
-            
         logger.info("Modelo carregado com sucesso!")
         return _modelo_carregado
 
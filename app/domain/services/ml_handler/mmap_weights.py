@@ -0,0 +1,137 @@
+'''
+Pesos do modelo em formato mapeável em memória (compartilhados entre workers).
+
+O .pkl é desserializado por inteiro em cada worker do uvicorn: cada processo
+tem a sua cópia privada dos tensores. O artefato .weights.pt guarda só a
+configuração do SimpleLSTM e o state_dict (torch.save, formato zip com os
+storages alinhados). torch.load(mmap=True) mapeia o arquivo em vez de lê-lo, e
+load_state_dict(assign=True) em um modelo criado no device "meta" usa esses
+tensores mapeados direto, sem alocar nem copiar pesos. As páginas ficam no
+page cache e são as mesmas para todos os processos que carregam o arquivo
+(MAP_PRIVATE: como a inferência nunca escreve nos pesos, nada é copiado).
+
+O artefato deve ser gerado no build/deploy pela linha de comando abaixo. Se
+faltar (ou o .pkl for mais novo), a primeira carga o grava de forma atômica,
+então vários workers subindo juntos não leem um arquivo pela metade. Os
+resultados são idênticos bit a bit aos do .pkl.
+
+Uso (gera o artefato sem subir a API):
+
+    python -m app.domain.services.ml_handler.mmap_weights --model app/models/modelo_lstm_39.pkl
+'''
+
+import argparse
+import logging
+import os
+import tempfile
+from pathlib import Path
+
+import torch
+
+from app.config.settings import get_settings
+from app.domain.services.avaluation_model_service import SimpleLSTM
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+WEIGHTS_SUFFIX = ".weights.pt"
+FORMATO_VERSAO = 1
+
+
+def _umask() -> int:
+    """umask do processo: /proc/self/status no Linux; fora dele, troca e restaura com os.umask."""
+    try:
+        with open("/proc/self/status") as f:
+            for linha in f:
+                if linha.startswith("Umask:"):
+                    return int(linha.split()[1], 8)
+    except OSError:
+        pass
+    umask = os.umask(0)
+    os.umask(umask)
+    return umask
+
+
+# mkstemp cria o temporário com 0600; o artefato fica com o modo de um arquivo comum
+_MODO_ARTEFATO = 0o644 & ~_umask()
+
+
+def weights_path_for(model_path) -> Path:
+    """modelo_lstm_39.pkl -> modelo_lstm_39.weights.pt (mesmo diretório)."""
+    model_path = Path(model_path)
+    return model_path.with_name(model_path.stem + WEIGHTS_SUFFIX)
+
+
+def is_stale(model_path, weights_path) -> bool:
+    """True se o artefato não existe ou é mais antigo que o .pkl de origem."""
+    weights_path = Path(weights_path)
+    if not weights_path.exists():
+        return True
+    model_path = Path(model_path)
+    return model_path.exists() and model_path.stat().st_mtime > weights_path.stat().st_mtime
+
+
+def _configuracao(model) -> dict:
+    if not isinstance(model, SimpleLSTM):
+        raise ValueError(f"Formato mmap só suporta SimpleLSTM (recebido {type(model).__name__}).")
+    return {
+        "input_size": model.lstm.input_size,
+        "hidden_size": model.hidden_size,
+        "num_layers": model.num_layers,
+        "output_size": model.fc.out_features,
+        "dropout_prob": float(model.dropout.p),
+    }
+
+
+def export_mmap_weights(model, output_path) -> Path:
+    """Grava configuração + state_dict do modelo em `output_path` (escrita atômica)."""
+    output_path = Path(output_path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    artefato = {
+        "format": FORMATO_VERSAO,
+        "config": _configuracao(model),
+        "state_dict": {nome: t.detach().cpu().contiguous() for nome, t in model.state_dict().items()},
+    }
+
+    fd, temporario = tempfile.mkstemp(dir=output_path.parent, prefix=output_path.name, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            torch.save(artefato, f)
+        os.chmod(temporario, _MODO_ARTEFATO)
+        os.replace(temporario, output_path)
+    except BaseException:
+        Path(temporario).unlink(missing_ok=True)
+        raise
+    logger.info("Pesos mapeáveis gravados em %s", output_path)
+    return output_path
+
+
+def load_mmap_weights(weights_path) -> SimpleLSTM:
+    """SimpleLSTM em modo eval com os pesos mapeados do arquivo (sem cópia)."""
+    artefato = torch.load(str(weights_path), mmap=True, weights_only=True, map_location="cpu")
+    if artefato.get("format") != FORMATO_VERSAO:
+        raise ValueError(f"Versão de formato desconhecida em {weights_path}: {artefato.get('format')}.")
+
+    # No device "meta" a construção não aloca pesos; assign=True adota os tensores mapeados
+    with torch.device("meta"):
+        modelo = SimpleLSTM(**artefato["config"])
+    modelo.load_state_dict(artefato["state_dict"], assign=True)
+    modelo.requires_grad_(False)
+    return modelo.eval()
+
+
+def main(argv=None) -> int:
+    from app.domain.services.ml_handler.ml_handler import carregar_modelo_pickle
+
+    parser = argparse.ArgumentParser(description="Gera o artefato de pesos mapeáveis (.weights.pt) de um modelo .pkl.")
+    parser.add_argument("--model", default=str(settings.MODEL_PATH), help="Modelo .pkl de origem")
+    parser.add_argument("--output", default=None, help="Artefato de saída (padrão: ao lado do .pkl)")
+    args = parser.parse_args(argv)
+
+    saida = export_mmap_weights(carregar_modelo_pickle(args.model), args.output or weights_path_for(args.model))
+    print(saida)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,209 @@
+'''
+Artefatos compilados do modelo (TorchScript / torch.compile) como backend de inferência.
+
+O .pkl só carrega via CpuUnpickler, que precisa resolver __main__.SimpleLSTM, e
+roda em PyTorch eager a cada chamada. Este módulo:
+
+- exporta o SimpleLSTM para TorchScript (script + freeze), um artefato que
+  carrega com torch.jit.load sem depender da classe Python;
+- prepara o backend escolhido em Settings.MODEL_BACKEND no startup
+  ("eager", "torchscript", "compile", "quantized" (ver quantization.py) ou
+  "onnxruntime" (ver backends.py));
+- confere que a saída do artefato bate com a do modelo eager e mede a latência
+  por chamada com batch 1, 8 e 64.
+
+Uso (gera o artefato e imprime o relatório):
+
+    python -m app.domain.services.ml_handler.model_export
+
+O modo "fast" da previsão recursiva precisa do nn.LSTM do modelo; com o backend
+TorchScript o motor volta sozinho para o modo "exact".
+'''
+
+import argparse
+import json
+import logging
+import time
+import warnings
+from pathlib import Path
+from typing import Dict, Iterable
+
+import torch
+
+from app.config.settings import get_settings
+from app.domain.services.ml_handler.backends import OnnxRuntimeBackend, export_onnx
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+MODEL_BACKENDS = ("eager", "torchscript", "compile", "quantized", "onnxruntime")
+BATCH_SIZES_RELATORIO = (1, 8, 64)
+
+# Diferença máxima aceita entre o artefato e o modelo eager (float32)
+TOLERANCIA_EXPORT = 1e-5
+
+
+def _exemplo(batch_size: int, seq_length: int) -> torch.Tensor:
+    gerador = torch.Generator().manual_seed(batch_size)
+    return torch.rand((batch_size, seq_length, 1), generator=gerador) * 2 - 1
+
+
+def export_torchscript(model, output_path=None):
+    """
+    Converte o modelo eager para TorchScript congelado (pesos viram constantes).
+    Com `output_path`, grava o artefato com torch.jit.save.
+    """
+    model.eval()
+    with warnings.catch_warnings():
+        # torch.jit está marcado como deprecated, mas continua sendo o formato
+        # serializado que carrega sem a classe Python do modelo
+        warnings.simplefilter("ignore", FutureWarning)
+        scripted = torch.jit.freeze(torch.jit.script(model))
+
+        if output_path is not None:
+            output_path = Path(output_path)
+            output_path.parent.mkdir(parents=True, exist_ok=True)
+            torch.jit.save(scripted, str(output_path))
+            logger.info("Artefato TorchScript gravado em %s", output_path)
+    return scripted
+
+
+def load_torchscript(path):
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", FutureWarning)
+        return torch.jit.load(str(path), map_location=settings.DEVICE).eval()
+
+
+def compile_model(model, seq_length: int = None, batch_sizes: Iterable[int] = BATCH_SIZES_RELATORIO):
+    """
+    torch.compile com aquecimento: os shapes usuais são compilados no startup, e
+    não na primeira requisição.
+    """
+    seq_length = seq_length or settings.SEQ_LENGTH
+    compilado = torch.compile(model.eval(), dynamic=True)
+    with torch.inference_mode():
+        for batch_size in batch_sizes:
+            compilado(_exemplo(batch_size, seq_length))
+    return compilado
+
+
+def verify_against_eager(eager, candidate, seq_length: int = None,
+                         batch_sizes: Iterable[int] = BATCH_SIZES_RELATORIO,
+                         tolerancia: float = TOLERANCIA_EXPORT) -> float:
+    """
+    Compara as saídas nos batch sizes do relatório. Retorna a maior diferença
+    absoluta e lança ValueError se passar da tolerância.
+    """
+    seq_length = seq_length or settings.SEQ_LENGTH
+    maior = 0.0
+    with torch.inference_mode():
+        for batch_size in batch_sizes:
+            x = _exemplo(batch_size, seq_length)
+            maior = max(maior, float((eager(x) - candidate(x)).abs().max()))
+
+    if maior > tolerancia:
+        raise ValueError(f"Saída do artefato diverge do modelo eager: diferença máxima {maior:.3g} > {tolerancia:.3g}.")
+    return maior
+
+
+def benchmark_latency(model, seq_length: int = None, batch_sizes: Iterable[int] = BATCH_SIZES_RELATORIO,
+                      repeticoes: int = 200, aquecimento: int = 20) -> Dict[int, float]:
+    """Latência mediana por chamada (ms) para cada batch size."""
+    seq_length = seq_length or settings.SEQ_LENGTH
+    resultado = {}
+    with torch.inference_mode():
+        for batch_size in batch_sizes:
+            x = _exemplo(batch_size, seq_length)
+            for _ in range(aquecimento):
+                model(x)
+            tempos = []
+            for _ in range(repeticoes):
+                inicio = time.perf_counter()
+                model(x)
+                tempos.append((time.perf_counter() - inicio) * 1000)
+            tempos.sort()
+            resultado[batch_size] = tempos[len(tempos) // 2]
+    return resultado
+
+
+def prepare_backend(model, backend: str = None, artifact_path=None, seq_length: int = None):
+    """
+    Devolve o modelo pronto para o backend pedido. Falhas na compilação caem para
+    o modelo eager com aviso, para não derrubar o startup.
+    """
+    backend = backend or settings.MODEL_BACKEND
+    seq_length = seq_length or settings.SEQ_LENGTH
+    if backend not in MODEL_BACKENDS:
+        raise ValueError(f"Backend de modelo inválido: {backend}. Use um de {MODEL_BACKENDS}.")
+    if backend == "eager":
+        return model
+
+    try:
+        if backend == "quantized":
+            # A variante int8 não é idêntica ao fp32: quem decide é o gate de acurácia
+            from app.domain.services.ml_handler.quantization import prepare_quantized
+            return prepare_quantized(model, artifact_path, seq_length)
+        if backend == "torchscript":
+            artifact_path = Path(artifact_path or settings.MODEL_TORCHSCRIPT_PATH)
+            candidato = load_torchscript(artifact_path) if artifact_path.exists() else export_torchscript(model)
+        elif backend == "onnxruntime":
+            artifact_path = Path(artifact_path or settings.MODEL_ONNX_PATH)
+            if not artifact_path.exists():
+                export_onnx(model, artifact_path, seq_length)
+            candidato = OnnxRuntimeBackend(artifact_path)
+        else:
+            candidato = compile_model(model, seq_length)
+        verify_against_eager(model, candidato, seq_length)
+    except Exception as e:
+        logger.warning("Backend '%s' indisponível (%s); usando o modelo eager.", backend, e)
+        return model
+
+    logger.info("Backend de inferência: %s", backend)
+    return candidato
+
+
+def build_report(model, seq_length: int = None, incluir_compile: bool = True, onnx_path=None) -> dict:
+    """Diferença máxima e latência (ms) de cada backend frente ao eager."""
+    seq_length = seq_length or settings.SEQ_LENGTH
+    backends = {"eager": model, "torchscript": export_torchscript(model)}
+    if incluir_compile:
+        try:
+            backends["compile"] = compile_model(model, seq_length)
+        except Exception as e:
+            logger.warning("torch.compile indisponível: %s", e)
+    if onnx_path is not None:
+        try:
+            backends["onnxruntime"] = OnnxRuntimeBackend(export_onnx(model, onnx_path, seq_length))
+        except ImportError as e:
+            logger.warning("ONNX Runtime indisponível: %s", e)
+
+    relatorio = {}
+    for nome, candidato in backends.items():
+        relatorio[nome] = {
+            "max_abs_diff": verify_against_eager(model, candidato, seq_length),
+            "latency_ms": benchmark_latency(candidato, seq_length),
+        }
+    return relatorio
+
+
+def main(argv=None) -> int:
+    from app.domain.services.ml_handler.ml_handler import carregar_modelo_eager
+
+    parser = argparse.ArgumentParser(description="Exporta o modelo para TorchScript/ONNX e compara com o eager.")
+    parser.add_argument("--model", default=str(settings.MODEL_PATH), help="Modelo .pkl de origem")
+    parser.add_argument("--output", default=str(settings.MODEL_TORCHSCRIPT_PATH), help="Artefato TorchScript de saída")
+    parser.add_argument("--onnx-output", default=str(settings.MODEL_ONNX_PATH), help="Modelo ONNX de saída")
+    parser.add_argument("--no-compile", action="store_true", help="Não mede o backend torch.compile")
+    args = parser.parse_args(argv)
+
+    model = carregar_modelo_eager(args.model)
+    export_torchscript(model, args.output)
+    verify_against_eager(model, load_torchscript(args.output))
+
+    relatorio = build_report(model, incluir_compile=not args.no_compile, onnx_path=args.onnx_output)
+    print(json.dumps(relatorio, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,309 @@
+'''
+Registro de modelos a partir de app/config/best_strategy_2.csv.
+
+Cada linha do CSV é uma configuração treinada (nr_model, seq_length, hidden_size,
+num_layers, métricas). O artefato de cada uma é models/modelo_lstm_{nr_model}.pkl;
+só as linhas com artefato presente ficam disponíveis.
+
+- Carregamento preguiçoso: o modelo é lido do disco no primeiro uso.
+- LRU limitado por memória: a soma dos parâmetros residentes não passa de
+  MODEL_REGISTRY_MAX_BYTES; o menos usado recentemente é descarregado.
+- Modelos "adotados" (o padrão, já carregado no startup) ficam fixos e não são despejados.
+
+O modelo devolvido é um RegisteredModel: um ModelBackend que carrega o próprio
+seq_length e a versão, usados pelos serviços na montagem das janelas e nos metadados.
+'''
+
+import logging
+import threading
+from collections import OrderedDict
+from functools import wraps
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+from fastapi import HTTPException
+
+from app.config.settings import get_settings
+from app.domain.services.ml_handler.backends import ModelBackend, as_backend
+from app.domain.services.inference_executor import run_in_inference_executor
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# Métricas do CSV aceitas para escolher o melhor modelo (e se maior é melhor)
+METRICAS_SELECAO = {"mae": False, "mse": False, "rmse": False, "dac": True}
+
+_EXTENSOES_BACKEND = {
+    "torchscript": ".torchscript.pt",
+    "quantized": ".int8.torchscript.pt",
+    "onnxruntime": ".onnx",
+}
+
+
+class ModelSpec:
+    """Uma linha do best_strategy_2.csv."""
+
+    def __init__(self, nr_model: int, seq_length: int, hidden_size: int, num_layers: int,
+                 dropout_prob: float, metrics: Dict[str, float], artifact_path: Path):
+        self.nr_model = nr_model
+        self.seq_length = seq_length
+        self.hidden_size = hidden_size
+        self.num_layers = num_layers
+        self.dropout_prob = dropout_prob
+        self.metrics = metrics
+        self.artifact_path = artifact_path
+
+    @property
+    def version(self) -> str:
+        return f"lstm_{self.nr_model}"
+
+    def to_dict(self) -> dict:
+        return {
+            "model_id": self.nr_model,
+            "version": self.version,
+            "seq_length": self.seq_length,
+            "hidden_size": self.hidden_size,
+            "num_layers": self.num_layers,
+            "metrics": self.metrics,
+        }
+
+
+class RegisteredModel(ModelBackend):
+    """Modelo residente do registro, com o seq_length e a versão da sua configuração."""
+
+    def __init__(self, model, seq_length: int, version: str):
+        self.module = model
+        self.backend = as_backend(model)
+        self.supports_step = self.backend.supports_step
+        self.seq_length = seq_length
+        self.version = version
+        self.name = self.backend.name
+        self.nbytes = _tamanho_em_bytes(model)
+
+    def predict(self, windows) -> np.ndarray:
+        return self.backend.predict(windows)
+
+    def __call__(self, windows):
+        return self.backend(windows)
+
+    def step(self, x, state=None):
+        return self.backend.step(x, state)
+
+
+def _tamanho_em_bytes(model) -> int:
+    # Sessões ONNX não expõem parâmetros: usamos o tamanho do arquivo como estimativa
+    if isinstance(getattr(model, "path", None), Path) and model.path.exists():
+        return model.path.stat().st_size
+    tensores = []
+    for nome in ("parameters", "buffers"):
+        if hasattr(model, nome):
+            tensores.extend(getattr(model, nome)())
+    return int(sum(t.numel() * t.element_size() for t in tensores))
+
+
+def _artefato_backend(spec: ModelSpec, backend: str) -> Optional[Path]:
+    extensao = _EXTENSOES_BACKEND.get(backend)
+    if extensao is None:
+        return None
+    return spec.artifact_path.with_name(f"modelo_lstm_{spec.nr_model}{extensao}")
+
+
+def _carregar_spec(spec: ModelSpec):
+    from app.domain.services.ml_handler.ml_handler import carregar_modelo_eager
+    from app.domain.services.ml_handler.model_export import prepare_backend
+
+    modelo = carregar_modelo_eager(spec.artifact_path)
+    return prepare_backend(modelo, settings.MODEL_BACKEND, _artefato_backend(spec, settings.MODEL_BACKEND), spec.seq_length)
+
+
+def read_specs(csv_path, models_dir) -> Dict[int, ModelSpec]:
+    tabela = pd.read_csv(csv_path)
+    models_dir = Path(models_dir)
+    specs = {}
+    for linha in tabela.itertuples(index=False):
+        nr = int(linha.nr_model)
+        specs[nr] = ModelSpec(
+            nr_model=nr,
+            seq_length=int(linha.seq_length),
+            hidden_size=int(linha.hidden_size),
+            num_layers=int(linha.num_layers),
+            dropout_prob=float(linha.dropout_prob),
+            metrics={m: float(getattr(linha, m)) for m in METRICAS_SELECAO},
+            artifact_path=models_dir / f"modelo_lstm_{nr}.pkl",
+        )
+    return specs
+
+
+class ModelRegistry:
+    def __init__(
+        self,
+        csv_path=None,
+        models_dir=None,
+        max_resident_bytes: int = None,
+        loader: Callable[[ModelSpec], object] = None,
+    ):
+        self.specs = read_specs(csv_path or settings.MODEL_REGISTRY_CSV, models_dir or settings.MODEL_REGISTRY_DIR)
+        self._max_bytes = settings.MODEL_REGISTRY_MAX_BYTES if max_resident_bytes is None else max_resident_bytes
+        self._loader = loader or _carregar_spec
+        self._residentes: "OrderedDict[int, RegisteredModel]" = OrderedDict()
+        self._fixos: Dict[int, RegisteredModel] = {}
+        self._lock = threading.Lock()
+        self._locks_de_carga: Dict[int, threading.Lock] = {}
+        self._hits = self._loads = self._evictions = 0
+
+    def available_ids(self) -> List[int]:
+        return sorted(nr for nr, spec in self.specs.items() if nr in self._fixos or spec.artifact_path.exists())
+
+    def adopt(self, nr_model: int, model) -> RegisteredModel:
+        """Registra um modelo já carregado (ex.: o padrão do startup) como residente fixo."""
+        spec = self.specs.get(nr_model)
+        seq_length = spec.seq_length if spec is not None else settings.SEQ_LENGTH
+        registrado = RegisteredModel(model, seq_length, f"lstm_{nr_model}")
+        with self._lock:
+            self._fixos[nr_model] = registrado
+        return registrado
+
+    def get(self, nr_model: int) -> RegisteredModel:
+        """Modelo `nr_model`, carregando-o se não estiver residente. KeyError se não existir."""
+        registrado = self._residente(nr_model)
+        if registrado is not None:
+            return registrado
+
+        spec = self.specs.get(nr_model)
+        if spec is None or not spec.artifact_path.exists():
+            raise KeyError(f"Modelo {nr_model} não está disponível no registro.")
+
+        # Lock por modelo: evita dois loads do mesmo artefato sem travar os hits dos outros modelos
+        with self._lock_de_carga(nr_model):
+            registrado = self._residente(nr_model)
+            if registrado is not None:
+                return registrado
+
+            logger.info("Carregando modelo %s (seq_length=%d) no registro...", spec.version, spec.seq_length)
+            registrado = RegisteredModel(self._loader(spec), spec.seq_length, spec.version)
+            with self._lock:
+                self._loads += 1
+                self._residentes[nr_model] = registrado
+                self._despejar()
+            return registrado
+
+    def _residente(self, nr_model: int) -> Optional[RegisteredModel]:
+        with self._lock:
+            if nr_model in self._fixos:
+                registrado = self._fixos[nr_model]
+            elif nr_model in self._residentes:
+                registrado = self._residentes[nr_model]
+                self._residentes.move_to_end(nr_model)
+            else:
+                return None
+            self._hits += 1
+            return registrado
+
+    def _lock_de_carga(self, nr_model: int) -> threading.Lock:
+        with self._lock:
+            return self._locks_de_carga.setdefault(nr_model, threading.Lock())
+
+    def _despejar(self) -> None:
+        while len(self._residentes) > 1 and self._bytes_residentes() > self._max_bytes:
+            nr, modelo = self._residentes.popitem(last=False)
+            self._evictions += 1
+            logger.info("Modelo lstm_%s descarregado do registro (%d bytes).", nr, modelo.nbytes)
+
+    def _bytes_residentes(self) -> int:
+        return sum(m.nbytes for m in self._residentes.values())
+
+    def best(self, metric: str = "mae") -> Optional[int]:
+        """nr_model disponível com a melhor métrica (menor erro ou maior DAC)."""
+        if metric not in METRICAS_SELECAO:
+            raise ValueError(f"Métrica inválida: {metric}. Use uma de {tuple(METRICAS_SELECAO)}.")
+        disponiveis = self.available_ids()
+        if not disponiveis:
+            return None
+        maior_melhor = METRICAS_SELECAO[metric]
+        chave = lambda nr: self.specs[nr].metrics[metric] if nr in self.specs else np.inf
+        return max(disponiveis, key=chave) if maior_melhor else min(disponiveis, key=chave)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "configured": len(self.specs),
+                "available": len(self.available_ids()),
+                "resident": list(self._fixos) + list(self._residentes),
+                "resident_bytes": self._bytes_residentes() + sum(m.nbytes for m in self._fixos.values()),
+                "max_resident_bytes": self._max_bytes,
+                "hits": self._hits,
+                "loads": self._loads,
+                "evictions": self._evictions,
+            }
+
+
+_registry: Optional[ModelRegistry] = None
+_registry_guard = threading.Lock()
+
+
+def get_model_registry() -> ModelRegistry:
+    global _registry
+    if _registry is None:
+        with _registry_guard:
+            if _registry is None:
+                _registry = ModelRegistry()
+    return _registry
+
+
+def resolve_model(model_id: Optional[int], default_model):
+    """
+    Modelo de uma requisição: o `model_id` pedido, o melhor por
+    MODEL_SELECTION_METRIC (se configurada) ou o modelo padrão da aplicação.
+    """
+    if model_id is None and settings.MODEL_SELECTION_METRIC is None:
+        return default_model
+
+    registry = get_model_registry()
+    if model_id is None:
+        model_id = registry.best(settings.MODEL_SELECTION_METRIC)
+        if model_id is None:
+            return default_model
+    return registry.get(model_id)
+
+
+def _usa_modelo_padrao(req) -> bool:
+    return getattr(req, "model_id", None) is None and settings.MODEL_SELECTION_METRIC is None
+
+
+def _modelo_indisponivel(req) -> HTTPException:
+    return HTTPException(
+        status_code=404,
+        detail=f"O modelo '{getattr(req, 'model_id', None)}' não está disponível no registro de modelos."
+    )
+
+
+def with_resolved_model(func):
+    """
+    Troca o modelo padrão recebido pelo handler pelo modelo da requisição
+    (model_id ou melhor por métrica). Deve ficar acima dos decorators que
+    dependem do seq_length do modelo (contexto de dados de mercado).
+    """
+    @wraps(func)
+    def wrapper(req, model, *args, **kwargs):
+        if not _usa_modelo_padrao(req):
+            try:
+                model = resolve_model(getattr(req, "model_id", None), model)
+            except KeyError:
+                raise _modelo_indisponivel(req)
+        return func(req, model, *args, **kwargs)
+    return wrapper
+
+
+def with_resolved_model_async(func):
+    """Equivalente assíncrono de with_resolved_model: o carregamento do disco roda no executor."""
+    @wraps(func)
+    async def wrapper(req, model, *args, **kwargs):
+        if not _usa_modelo_padrao(req):
+            try:
+                model = await run_in_inference_executor(resolve_model, getattr(req, "model_id", None), model)
+            except KeyError:
+                raise _modelo_indisponivel(req)
+        return await func(req, model, *args, **kwargs)
+    return wrapper
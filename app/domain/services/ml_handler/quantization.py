@@ -0,0 +1,150 @@
+'''
+Variante quantizada (int8 dinâmico) do modelo para inferência em CPU, com gate de acurácia.
+
+quantize_dynamic converte os pesos de nn.LSTM e nn.Linear para int8; as ativações
+são quantizadas em tempo de execução. Antes de ativar a variante, o gate compara
+MAE, RMSE e DAC (acerto de direção) do modelo quantizado com os do fp32 em um
+dataset de replay fixo e recusa a variante se a degradação passar dos limites
+configurados em Settings (QUANTIZATION_MAX_*).
+
+O dataset de replay é sintético e determinístico (passeios aleatórios com semente
+fixa em torno de R$ 30), montado com as mesmas janelas normalizadas do serviço;
+assim o gate roda no startup sem depender do Yahoo.
+
+Uso offline (grava o artefato TorchScript só se o gate aprovar):
+
+    python -m app.domain.services.ml_handler.quantization
+
+Observação: com o lstm_39 (hidden 64) em CPU o int8 dinâmico não é mais rápido que
+o fp32 no nosso ambiente; o relatório da CLI mostra a latência dos dois para decidir.
+'''
+
+import argparse
+import copy
+import json
+import logging
+import warnings
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import numpy as np
+import torch
+import torch.nn as nn
+
+from app.config.settings import get_settings
+from app.domain.services.avaluation_model_service import build_normalized_windows
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+REPLAY_SEED = 20251120
+REPLAY_SERIES = 16
+REPLAY_LENGTH = 260
+
+
+def quantize_model(model):
+    """Cópia do modelo com nn.LSTM e nn.Linear quantizados para int8 (dinâmico)."""
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        return torch.ao.quantization.quantize_dynamic(
+            copy.deepcopy(model).eval(), {nn.LSTM, nn.Linear}, dtype=torch.qint8
+        )
+
+
+def replay_dataset(seed: int = REPLAY_SEED, n_series: int = REPLAY_SERIES,
+                   length: int = REPLAY_LENGTH, seq_length: int = None) -> List[Tuple]:
+    """
+    Séries de fechamento sintéticas e determinísticas, já em janelas normalizadas
+    (X_test, y_test, scaler), no mesmo formato de getX_testY_test_Sliding_Window.
+    """
+    seq_length = seq_length or settings.SEQ_LENGTH
+    gerador = np.random.default_rng(seed)
+    dataset = []
+    for _ in range(n_series):
+        retornos = gerador.normal(0.0, 0.015, size=length)
+        close = 30.0 * np.exp(np.cumsum(retornos))
+        dataset.append(build_normalized_windows(close.reshape(-1, 1), seq_length))
+    return dataset
+
+
+def evaluate_model(model, dataset) -> Dict[str, float]:
+    """MAE, RMSE e DAC (fração de acertos da direção do dia seguinte) em preço."""
+    erros, acertos = [], []
+    with torch.inference_mode():
+        for X_test, y_test, scaler in dataset:
+            preds = scaler.inverse_transform(model(X_test.squeeze(3)).cpu().numpy()).reshape(-1)
+            reais = scaler.inverse_transform(y_test.view(-1, 1).cpu().numpy()).reshape(-1)
+            erros.append(preds - reais)
+            acertos.append(np.sign(preds[1:] - reais[:-1]) == np.sign(reais[1:] - reais[:-1]))
+
+    erros = np.concatenate(erros)
+    return {
+        "mae": float(np.mean(np.abs(erros))),
+        "rmse": float(np.sqrt(np.mean(erros ** 2))),
+        "dac": float(np.mean(np.concatenate(acertos))),
+    }
+
+
+def accuracy_gate(reference, candidate, dataset=None) -> Tuple[bool, dict]:
+    """
+    Compara candidato e referência no dataset de replay. MAE e RMSE podem subir no
+    máximo a fração configurada (relativa); DAC pode cair no máximo o valor absoluto.
+    """
+    dataset = dataset if dataset is not None else replay_dataset()
+    ref = evaluate_model(reference, dataset)
+    cand = evaluate_model(candidate, dataset)
+
+    degradacao = {
+        "mae": cand["mae"] / ref["mae"] - 1.0,
+        "rmse": cand["rmse"] / ref["rmse"] - 1.0,
+        "dac": ref["dac"] - cand["dac"],
+    }
+    aprovado = (
+        degradacao["mae"] <= settings.QUANTIZATION_MAX_MAE_INCREASE
+        and degradacao["rmse"] <= settings.QUANTIZATION_MAX_RMSE_INCREASE
+        and degradacao["dac"] <= settings.QUANTIZATION_MAX_DAC_DROP
+    )
+    return aprovado, {"fp32": ref, "int8": cand, "degradation": degradacao, "approved": aprovado}
+
+
+def prepare_quantized(model, artifact_path=None, seq_length: int = None):
+    """
+    Variante int8 (do artefato offline, se existir, ou quantizada agora) se passar
+    no gate; caso contrário, o próprio modelo fp32.
+    """
+    from app.domain.services.ml_handler.model_export import load_torchscript
+
+    artifact_path = Path(artifact_path or settings.MODEL_QUANTIZED_PATH)
+    quantizado = load_torchscript(artifact_path) if artifact_path.exists() else quantize_model(model)
+
+    aprovado, relatorio = accuracy_gate(model, quantizado, replay_dataset(seq_length=seq_length))
+    if not aprovado:
+        logger.warning("Modelo int8 recusado pelo gate de acurácia: %s", relatorio["degradation"])
+        return model
+
+    logger.info("Modelo int8 aprovado pelo gate de acurácia: %s", relatorio["degradation"])
+    return quantizado
+
+
+def main(argv=None) -> int:
+    from app.domain.services.ml_handler.ml_handler import carregar_modelo_eager
+    from app.domain.services.ml_handler.model_export import benchmark_latency, export_torchscript
+
+    parser = argparse.ArgumentParser(description="Quantiza o modelo (int8 dinâmico) e aplica o gate de acurácia.")
+    parser.add_argument("--model", default=str(settings.MODEL_PATH), help="Modelo .pkl de origem")
+    parser.add_argument("--output", default=str(settings.MODEL_QUANTIZED_PATH), help="Artefato TorchScript int8 de saída")
+    args = parser.parse_args(argv)
+
+    model = carregar_modelo_eager(args.model)
+    quantizado = quantize_model(model)
+    aprovado, relatorio = accuracy_gate(model, quantizado)
+    relatorio["latency_ms"] = {"fp32": benchmark_latency(model), "int8": benchmark_latency(quantizado)}
+
+    if aprovado:
+        export_torchscript(quantizado, args.output)
+    print(json.dumps(relatorio, indent=2))
+    return 0 if aprovado else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,119 @@
+'''
+Normalizador min-max afim, substituto leve do MinMaxScaler do sklearn no caminho de previsão.
+
+Cada requisição ajusta um scaler novo e o laço recursivo desnormaliza as
+previsões; com o sklearn, toda chamada paga validação de entrada (check_array,
+conversões, checagem de features). Aqui o fit é um nanmin/nanmax e transform /
+inverse_transform são uma multiplicação e uma soma sobre o array inteiro.
+
+Os resultados são idênticos bit a bit aos do MinMaxScaler(feature_range=(-1, 1))
+com clip=False: mesmas fórmulas (scale_ = (b - a) / range, com ranges quase nulos
+trocados por 1; min_ = a - data_min_ * scale_) e a mesma ordem de operações
+(X * scale_ + min_ e (X - min_) / scale_), com os atributos de mesmo nome.
+
+Aceita arrays NumPy e tensores torch de qualquer formato cuja última dimensão
+seja a de features (1-D vale para uma feature). Tensores são calculados em
+float64 no próprio device e voltam no dtype de entrada, como no pipeline com o
+sklearn seguido de .astype(np.float32). O estado é só um punhado de floats:
+to_dict/from_dict (JSON) e pickle servem para guardá-lo por ticker e janela.
+'''
+
+from typing import Dict, Tuple
+
+import numpy as np
+import torch
+
+
+class MinMaxNormalizer:
+    def __init__(self, feature_range: Tuple[float, float] = (-1, 1)):
+        if feature_range[0] >= feature_range[1]:
+            raise ValueError(f"feature_range inválido: {feature_range}. O mínimo deve ser menor que o máximo.")
+        self.feature_range = (float(feature_range[0]), float(feature_range[1]))
+        self._torch_params: Dict[Tuple, Tuple[torch.Tensor, torch.Tensor]] = {}
+
+    def fit(self, X) -> "MinMaxNormalizer":
+        X = _como_numpy(X)
+        X = X.reshape(-1, 1) if X.ndim == 1 else X.reshape(-1, X.shape[-1])
+        data_min = np.nanmin(X, axis=0)
+        data_max = np.nanmax(X, axis=0)
+        self._ajustar(data_min, data_max)
+        return self
+
+    def _ajustar(self, data_min: np.ndarray, data_max: np.ndarray) -> None:
+        a, b = (np.asarray(v, dtype=data_min.dtype) for v in self.feature_range)
+        data_range = data_max - data_min
+        # Mesmo tratamento do sklearn (_handle_zeros_in_scale) para séries constantes
+        divisor = data_range.copy()
+        divisor[divisor < 10 * np.finfo(divisor.dtype).eps] = 1.0
+        self.data_min_ = data_min
+        self.data_max_ = data_max
+        self.data_range_ = data_range
+        self.scale_ = (b - a) / divisor
+        self.min_ = a - data_min * self.scale_
+        self.n_features_in_ = data_min.shape[0]
+        self._torch_params = {}
+
+    def fit_transform(self, X):
+        return self.fit(X).transform(X)
+
+    def transform(self, X):
+        """X * scale_ + min_ (NumPy ou torch, mesmo formato da entrada)."""
+        if isinstance(X, torch.Tensor):
+            scale, minimo = self._params_torch(X.device)
+            return (X.to(torch.float64) * scale + minimo).to(X.dtype)
+        X = _como_numpy(X, copy=True)
+        X *= self.scale_
+        X += self.min_
+        return X
+
+    def inverse_transform(self, X):
+        """(X - min_) / scale_ (NumPy ou torch, mesmo formato da entrada)."""
+        if isinstance(X, torch.Tensor):
+            scale, minimo = self._params_torch(X.device)
+            return ((X.to(torch.float64) - minimo) / scale).to(X.dtype)
+        X = _como_numpy(X, copy=True)
+        X -= self.min_
+        X /= self.scale_
+        return X
+
+    def _params_torch(self, device) -> Tuple[torch.Tensor, torch.Tensor]:
+        params = self._torch_params.get(device)
+        if params is None:
+            params = (
+                torch.as_tensor(self.scale_, dtype=torch.float64, device=device),
+                torch.as_tensor(self.min_, dtype=torch.float64, device=device),
+            )
+            self._torch_params[device] = params
+        return params
+
+    def to_dict(self) -> dict:
+        return {
+            "feature_range": list(self.feature_range),
+            "data_min": self.data_min_.tolist(),
+            "data_max": self.data_max_.tolist(),
+        }
+
+    @classmethod
+    def from_dict(cls, estado: dict) -> "MinMaxNormalizer":
+        normalizer = cls(tuple(estado["feature_range"]))
+        normalizer._ajustar(
+            np.asarray(estado["data_min"], dtype=np.float64),
+            np.asarray(estado["data_max"], dtype=np.float64),
+        )
+        return normalizer
+
+    def __getstate__(self):
+        estado = dict(self.__dict__)
+        estado["_torch_params"] = {}
+        return estado
+
+    def __repr__(self) -> str:
+        return f"MinMaxNormalizer(feature_range={self.feature_range})"
+
+
+def _como_numpy(X, copy: bool = False) -> np.ndarray:
+    # float32/float64 são preservados (como no sklearn); o resto vira float64
+    X = np.asarray(X)
+    if X.dtype not in (np.float32, np.float64):
+        return X.astype(np.float64)
+    return X.copy() if copy else X
@@ -0,0 +1,503 @@
+'''
+Armazenamento local colunar do histórico diário OHLCV por ticker.
+
+Cada ticker vive em um diretório próprio com um arquivo binário por coluna
+(Date em dias desde a época como int64; Close/High/Low/Open/Volume como float64).
+Os arquivos são append-only: só os pregões que faltam depois da última data
+gravada são baixados e anexados ao final. A leitura é feita com np.memmap, de
+modo que um recorte de datas é apenas uma busca binária + fatia sobre o page cache.
+
+Os preços são ajustados por proventos e desdobramentos, e um evento novo muda a
+base de ajuste de todo o histórico. Por isso cada atualização baixa de novo o
+último pregão gravado: se o Close ajustado dele mudou, o histórico do ticker é
+baixado inteiro e regravado em um subdiretório de versão novo, e o arquivo
+CURRENT passa a apontar para ele (troca atômica: leitores, inclusive de outros
+processos, nunca misturam colunas de bases diferentes). A versão anterior é
+mantida até a reescrita seguinte, para quem ainda a tem mapeada.
+
+O pregão do dia corrente (ainda aberto) nunca é gravado em disco: ele fica em uma
+"cauda volátil" em memória, atualizada junto com a cauda do histórico, para manter
+o mesmo comportamento de quando baixávamos tudo direto do Yahoo.
+'''
+
+import asyncio
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+import logging
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Optional
+
+import numpy as np
+import pandas as pd
+
+try:
+    import fcntl
+except ImportError:  # Windows: sem lock entre processos
+    fcntl = None
+
+from app.config.settings import get_settings
+from app.domain.services.single_flight import get_single_flight
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+COLUNAS_PRECO = ("Close", "High", "Low", "Open", "Volume")
+_COLUNA_DATA = "Date"
+_UM_DIA = np.timedelta64(1, "D")
+_ARQUIVO_VERSAO = "CURRENT"
+# Diferença relativa no Close do pregão sobreposto que indica nova base de ajuste
+_TOLERANCIA_AJUSTE = 1e-6
+
+
+def _fetcher_do_provedor(ticker, data_inicial, data_final) -> pd.DataFrame:
+    # Import local: market_data_provider importa este módulo
+    from app.domain.services.market_data_provider import get_market_data_provider
+    return get_market_data_provider().fetch_history(ticker, data_inicial, data_final)
+
+
+def _batch_fetcher_do_provedor(tickers, data_inicial, data_final) -> Dict[str, pd.DataFrame]:
+    from app.domain.services.market_data_provider import get_market_data_provider
+    return get_market_data_provider().fetch_many(tickers, data_inicial, data_final)
+
+
+def _para_dia(valor) -> np.datetime64:
+    ts = pd.Timestamp(valor)
+    if ts.tzinfo is not None:
+        ts = ts.tz_localize(None)
+    return np.datetime64(ts.normalize().date(), "D")
+
+
+def empty_price_frame() -> pd.DataFrame:
+    """DataFrame sem linhas com as colunas e o índice do formato de preços."""
+    return pd.DataFrame(
+        {col: np.empty(0, dtype=np.float64) for col in COLUNAS_PRECO},
+        index=pd.DatetimeIndex([], name=_COLUNA_DATA),
+    )
+
+
+class PriceStore:
+    """
+    Store local de preços diários com atualização incremental da cauda.
+
+    `fetcher(ticker, inicio, fim)` deve devolver um DataFrame indexado por data
+    (fim exclusivo), no formato de MarketDataProvider.fetch_history;
+    `batch_fetcher(tickers, inicio, fim)` devolve um dict ticker -> DataFrame.
+    Sem eles, usa o provedor de dados de mercado configurado.
+    """
+
+    def __init__(
+        self,
+        root_dir: Path,
+        fetcher: Optional[Callable[..., pd.DataFrame]] = None,
+        batch_fetcher: Optional[Callable[..., Dict[str, pd.DataFrame]]] = None,
+        history_start: str = "2000-01-01",
+        refresh_interval_seconds: float = 300,
+    ):
+        self._root = Path(root_dir)
+        self._fetcher = fetcher or _fetcher_do_provedor
+        self._batch_fetcher = batch_fetcher or _batch_fetcher_do_provedor
+        self._history_start = _para_dia(history_start)
+        self._refresh_interval = refresh_interval_seconds
+
+        self._locks: Dict[str, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+        self._async_locks: Dict[str, asyncio.Lock] = {}
+        self._ultima_atualizacao: Dict[str, float] = {}
+        self._cauda_volatil: Dict[str, pd.DataFrame] = {}
+        # ticker -> ((diretório da versão, tamanho em linhas), {coluna: memmap})
+        self._mmaps: Dict[str, tuple] = {}
+
+    # ------------------------------------------------------------------ paths
+    def _diretorio(self, ticker: str) -> Path:
+        nome = re.sub(r"[^A-Za-z0-9._^=-]", "_", ticker.upper())
+        return self._root / nome
+
+    def _diretorio_dados(self, ticker: str) -> Path:
+        """Diretório das colunas em uso: a versão indicada em CURRENT, ou o do ticker (antes da 1ª reescrita)."""
+        base = self._diretorio(ticker)
+        try:
+            return base / (base / _ARQUIVO_VERSAO).read_text().strip()
+        except FileNotFoundError:
+            return base
+
+    @staticmethod
+    def _arquivo(dados: Path, coluna: str) -> Path:
+        return dados / f"{coluna}.bin"
+
+    def _lock(self, ticker: str) -> threading.Lock:
+        with self._locks_guard:
+            return self._locks.setdefault(ticker, threading.Lock())
+
+    def _async_lock(self, ticker: str) -> asyncio.Lock:
+        with self._locks_guard:
+            return self._async_locks.setdefault(ticker, asyncio.Lock())
+
+    # ---------------------------------------------------------------- leitura
+    def _num_linhas(self, dados: Path) -> int:
+        # O tamanho válido é o da menor coluna: protege contra append interrompido.
+        tamanhos = []
+        for coluna in (_COLUNA_DATA,) + COLUNAS_PRECO:
+            try:
+                tamanhos.append(os.stat(self._arquivo(dados, coluna)).st_size // 8)
+            except FileNotFoundError:
+                return 0
+        return min(tamanhos)
+
+    def _colunas(self, ticker: str) -> Dict[str, np.ndarray]:
+        dados = self._diretorio_dados(ticker)
+        n = self._num_linhas(dados)
+        cache = self._mmaps.get(ticker)
+        if cache is not None and cache[0] == (dados, n):
+            return cache[1]
+
+        if n == 0:
+            colunas = {_COLUNA_DATA: np.empty(0, dtype="datetime64[D]")}
+            colunas.update({col: np.empty(0, dtype=np.float64) for col in COLUNAS_PRECO})
+        else:
+            colunas = {
+                _COLUNA_DATA: np.memmap(self._arquivo(dados, _COLUNA_DATA), dtype=np.int64, mode="r", shape=(n,)).view("datetime64[D]")
+            }
+            for col in COLUNAS_PRECO:
+                colunas[col] = np.memmap(self._arquivo(dados, col), dtype=np.float64, mode="r", shape=(n,))
+
+        self._mmaps[ticker] = ((dados, n), colunas)
+        return colunas
+
+    def last_date(self, ticker: str) -> Optional[np.datetime64]:
+        """Última data consolidada gravada em disco (ou None se o ticker não existe no store)."""
+        datas = self._colunas(ticker)[_COLUNA_DATA]
+        return datas[-1] if len(datas) else None
+
+    def get_range(self, ticker: str, data_inicial, data_final) -> pd.DataFrame:
+        """
+        Retorna os pregões em [data_inicial, data_final), no formato do yfinance.
+        Só vai ao upstream quando o intervalo pedido passa da última data gravada.
+        """
+        inicio, fim = _para_dia(data_inicial), _para_dia(data_final)
+        if self._precisa_atualizar(ticker, fim):
+            self.refresh(ticker)
+        return self._ler(ticker, inicio, fim)
+
+    async def aget_range(self, ticker: str, data_inicial, data_final, afetcher) -> pd.DataFrame:
+        """Versão assíncrona de get_range: a cauda é baixada com `afetcher` (corrotina)."""
+        inicio, fim = _para_dia(data_inicial), _para_dia(data_final)
+        if self._precisa_atualizar(ticker, fim):
+            await self.arefresh(ticker, afetcher)
+        return self._ler(ticker, inicio, fim)
+
+    def get_ranges(self, tickers: Iterable[str], data_inicial, data_final) -> Dict[str, pd.DataFrame]:
+        """
+        get_range para vários tickers: as caudas faltantes de todos eles são
+        baixadas juntas, em uma única chamada ao upstream.
+        """
+        tickers = list(tickers)
+        inicio, fim = _para_dia(data_inicial), _para_dia(data_final)
+        self.refresh_many([t for t in tickers if self._precisa_atualizar(t, fim)])
+        return {ticker: self._ler(ticker, inicio, fim) for ticker in tickers}
+
+    def _precisa_atualizar(self, ticker: str, fim: np.datetime64) -> bool:
+        ultima = self.last_date(ticker)
+        return ultima is None or fim > ultima + _UM_DIA
+
+    def _ler(self, ticker: str, inicio: np.datetime64, fim: np.datetime64) -> pd.DataFrame:
+        colunas = self._colunas(ticker)
+        datas = colunas[_COLUNA_DATA]
+        i0 = np.searchsorted(datas, inicio, side="left")
+        i1 = np.searchsorted(datas, fim, side="left")
+
+        frame = pd.DataFrame(
+            {col: np.asarray(colunas[col][i0:i1]) for col in COLUNAS_PRECO},
+            index=pd.DatetimeIndex(datas[i0:i1].astype("datetime64[ns]"), name=_COLUNA_DATA),
+        )
+
+        cauda = self._cauda_volatil.get(ticker)
+        if cauda is not None and not cauda.empty:
+            cauda = cauda[(cauda.index >= pd.Timestamp(inicio)) & (cauda.index < pd.Timestamp(fim))]
+            if not cauda.empty:
+                frame = pd.concat([frame, cauda]) if not frame.empty else cauda.copy()
+
+        return frame
+
+    # ------------------------------------------------------------ atualização
+    def refresh(self, ticker: str, force: bool = False) -> int:
+        """
+        Baixa a cauda a partir da última data gravada e anexa os pregões novos
+        (ou regrava o histórico, se a base de ajuste mudou). Respeita um
+        intervalo mínimo entre atualizações do mesmo ticker. Retorna o número
+        de pregões consolidados gravados.
+        """
+        plano = self._plano_atualizacao(ticker, force)
+        if plano is None:
+            return 0
+        inicio, fim, _, hoje = plano
+        # O download fica fora do lock: um refresh lento não segura quem só vai anexar.
+        # Chamadas concorrentes da mesma cauda (ex.: ticker frio pedido por vários
+        # endpoints com janelas diferentes) compartilham um único download.
+        try:
+            novos, _ = get_single_flight("price_store").do(
+                (ticker, inicio, fim), lambda: self._fetcher(ticker, inicio, fim)
+            )
+        except Exception as e:
+            logger.warning("Falha ao atualizar cauda de %s no price store: %s", ticker, e)
+            return 0
+        self._ultima_atualizacao[ticker] = time.time()
+        anexados = self._aplicar_sob_lock(ticker, novos, hoje)
+        if anexados is None:
+            anexados = self._rebaixar(ticker, fim, hoje)
+        return anexados
+
+    def refresh_many(self, tickers: Iterable[str], force: bool = False) -> int:
+        """
+        Atualiza a cauda de vários tickers com um download em lote por data de
+        início: um ticker novo (histórico completo) não faz os demais baixarem
+        o histórico inteiro junto. Tickers cuja cauda já está sendo baixada por
+        outra chamada aguardam esse download em vez de entrar no lote.
+        Retorna o total de pregões anexados.
+        """
+        grupos: Dict[tuple, Dict[str, tuple]] = {}
+        for ticker in tickers:
+            plano = self._plano_atualizacao(ticker, force)
+            if plano is not None:
+                grupos.setdefault(plano[:2], {})[ticker] = plano
+
+        anexados, rebaixar = 0, {}
+        for (inicio, fim), planos in grupos.items():
+            try:
+                por_chave = get_single_flight("price_store").do_many(
+                    [(ticker, inicio, fim) for ticker in planos],
+                    lambda chaves, inicio=inicio, fim=fim: self._baixar_lote(chaves, inicio, fim),
+                )
+            except Exception as e:
+                logger.warning("Falha ao atualizar caudas em lote no price store: %s", e)
+                continue
+            frames = {ticker: frame for (ticker, _, _), frame in por_chave.items()}
+
+            agora = time.time()
+            for ticker, (_, _, _, hoje) in planos.items():
+                self._ultima_atualizacao[ticker] = agora
+                aplicados = self._aplicar_sob_lock(ticker, frames.get(ticker), hoje)
+                if aplicados is None:
+                    rebaixar[ticker] = (fim, hoje)
+                else:
+                    anexados += aplicados
+
+        if rebaixar:
+            # Mesmo fim para todos (amanhã): um download em lote desde o início do histórico
+            fim, hoje = next(iter(rebaixar.values()))
+            logger.warning("Price store: base de ajuste mudou para %s; regravando o histórico.", ", ".join(rebaixar))
+            try:
+                frames = self._batch_fetcher(list(rebaixar), str(self._history_start), fim)
+            except Exception as e:
+                logger.warning("Falha ao regravar históricos em lote no price store: %s", e)
+                return anexados
+            for ticker in rebaixar:
+                anexados += self._reescrever_sob_lock(ticker, frames.get(ticker), hoje)
+        return anexados
+
+    async def arefresh(self, ticker: str, afetcher, force: bool = False) -> int:
+        """
+        Versão assíncrona de refresh. O lock por ticker e o append em disco rodam
+        em uma thread: um refresh síncrono concorrente não trava o event loop.
+        """
+        async with self._async_lock(ticker):
+            plano = self._plano_atualizacao(ticker, force)
+            if plano is None:
+                return 0
+            inicio, fim, _, hoje = plano
+            try:
+                novos = await afetcher(ticker, inicio, fim)
+            except Exception as e:
+                logger.warning("Falha ao atualizar cauda de %s no price store: %s", ticker, e)
+                return 0
+            self._ultima_atualizacao[ticker] = time.time()
+            anexados = await asyncio.to_thread(self._aplicar_sob_lock, ticker, novos, hoje)
+            if anexados is None:
+                logger.warning("Price store: base de ajuste mudou para %s; regravando o histórico.", ticker)
+                try:
+                    historico = await afetcher(ticker, str(self._history_start), fim)
+                except Exception as e:
+                    logger.warning("Falha ao regravar o histórico de %s no price store: %s", ticker, e)
+                    return 0
+                anexados = await asyncio.to_thread(self._reescrever_sob_lock, ticker, historico, hoje)
+            return anexados
+
+    def _baixar_lote(self, chaves, inicio: str, fim: str) -> Dict[tuple, pd.DataFrame]:
+        frames = self._batch_fetcher([ticker for ticker, _, _ in chaves], inicio, fim)
+        return {chave: frames.get(chave[0]) for chave in chaves}
+
+    def _aplicar_sob_lock(self, ticker: str, novos: pd.DataFrame, hoje) -> Optional[int]:
+        # A última data é relida sob o lock: outro refresh pode ter anexado durante o download
+        with self._lock(ticker):
+            return self._aplicar(ticker, novos, self.last_date(ticker), hoje)
+
+    def _reescrever_sob_lock(self, ticker: str, historico: pd.DataFrame, hoje) -> int:
+        with self._lock(ticker):
+            return self._reescrever(ticker, historico, hoje)
+
+    def _rebaixar(self, ticker: str, fim: str, hoje) -> int:
+        """Baixa o histórico inteiro de `ticker` e o regrava na base de ajuste atual."""
+        logger.warning("Price store: base de ajuste mudou para %s; regravando o histórico.", ticker)
+        try:
+            historico = self._fetcher(ticker, str(self._history_start), fim)
+        except Exception as e:
+            logger.warning("Falha ao regravar o histórico de %s no price store: %s", ticker, e)
+            return 0
+        return self._reescrever_sob_lock(ticker, historico, hoje)
+
+    def _plano_atualizacao(self, ticker: str, force: bool):
+        """
+        (inicio, fim, ultima, hoje) da cauda a baixar, ou None se atualizado há
+        pouco. A cauda começa no último pregão gravado, que serve de comparação
+        da base de ajuste.
+        """
+        if not force and time.time() - self._ultima_atualizacao.get(ticker, 0.0) < self._refresh_interval:
+            return None
+        ultima = self.last_date(ticker)
+        inicio = self._history_start if ultima is None else ultima
+        hoje = _para_dia(pd.Timestamp.today())
+        return str(inicio), str(hoje + _UM_DIA), ultima, hoje
+
+    @staticmethod
+    def _normalizar(novos: pd.DataFrame):
+        """(frame, dias): índice diário sem fuso nem duplicatas, só as colunas de preço em float64."""
+        novos = novos.copy()
+        idx = pd.DatetimeIndex(novos.index)
+        if idx.tz is not None:
+            idx = idx.tz_localize(None)
+        novos.index = idx.normalize().rename(_COLUNA_DATA)
+        novos = novos[~novos.index.duplicated(keep="last")].sort_index()
+        for col in COLUNAS_PRECO:
+            if col not in novos.columns:
+                novos[col] = np.nan
+        novos = novos[list(COLUNAS_PRECO)].astype(np.float64)
+        return novos, novos.index.to_numpy().astype("datetime64[D]")
+
+    def _base_de_ajuste_mudou(self, ticker: str, ultima, novos: pd.DataFrame, dias: np.ndarray) -> bool:
+        sobreposto = novos["Close"].to_numpy()[dias == ultima]
+        if not len(sobreposto) or np.isnan(sobreposto[0]):
+            return False
+        gravado = self._colunas(ticker)["Close"][-1]
+        return not np.isclose(sobreposto[0], gravado, rtol=_TOLERANCIA_AJUSTE, atol=0)
+
+    def _aplicar(self, ticker: str, novos: pd.DataFrame, ultima, hoje) -> Optional[int]:
+        """Anexa os pregões posteriores a `ultima`; None se a base de ajuste mudou (regravar o histórico)."""
+        if novos is None or novos.empty:
+            self._cauda_volatil.pop(ticker, None)
+            return 0
+
+        novos, dias = self._normalizar(novos)
+        if ultima is not None:
+            if self._base_de_ajuste_mudou(ticker, ultima, novos, dias):
+                return None
+            novos, dias = novos[dias > ultima], dias[dias > ultima]
+
+        # Pregão de hoje ainda pode mudar: fica só em memória.
+        consolidados = dias < hoje
+        self._cauda_volatil[ticker] = novos[~consolidados]
+        novos, dias = novos[consolidados], dias[consolidados]
+
+        if len(dias):
+            self._anexar(ticker, dias, novos)
+        return len(dias)
+
+    @contextmanager
+    def _lock_de_arquivo(self, ticker: str):
+        """Lock exclusivo entre processos sobre o diretório do ticker."""
+        diretorio = self._diretorio(ticker)
+        diretorio.mkdir(parents=True, exist_ok=True)
+        with open(diretorio / ".lock", "w") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield diretorio
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _anexar(self, ticker: str, dias: np.ndarray, novos: pd.DataFrame) -> None:
+        with self._lock_de_arquivo(ticker):
+            # Outro processo pode ter anexado (ou regravado) enquanto baixávamos.
+            dados = self._diretorio_dados(ticker)
+            n = self._num_linhas(dados)
+            if n:
+                ultima_disco = np.fromfile(self._arquivo(dados, _COLUNA_DATA), dtype=np.int64, count=1, offset=(n - 1) * 8)[0]
+                manter = dias.astype(np.int64) > ultima_disco
+                dias, novos = dias[manter], novos[manter]
+                if not len(dias):
+                    return
+
+            # Alinha todas as colunas ao mesmo tamanho antes de anexar.
+            for coluna in (_COLUNA_DATA,) + COLUNAS_PRECO:
+                caminho = self._arquivo(dados, coluna)
+                if caminho.exists() and caminho.stat().st_size != n * 8:
+                    os.truncate(caminho, n * 8)
+
+            # Date por último: leitores só enxergam linhas completas.
+            for col in COLUNAS_PRECO:
+                with open(self._arquivo(dados, col), "ab") as f:
+                    f.write(novos[col].to_numpy(dtype=np.float64).tobytes())
+            with open(self._arquivo(dados, _COLUNA_DATA), "ab") as f:
+                f.write(dias.astype(np.int64).tobytes())
+
+        logger.info("Price store: %d pregões anexados para %s.", len(dias), ticker)
+
+    def _reescrever(self, ticker: str, historico: pd.DataFrame, hoje) -> int:
+        """Grava `historico` inteiro em uma versão nova do ticker e troca o CURRENT para ela."""
+        if historico is None or historico.empty:
+            # Sem o histórico novo, a versão atual continua valendo até a próxima tentativa
+            return 0
+        novos, dias = self._normalizar(historico)
+        consolidados = dias < hoje
+        self._cauda_volatil[ticker] = novos[~consolidados]
+        novos, dias = novos[consolidados], dias[consolidados]
+
+        with self._lock_de_arquivo(ticker) as base:
+            anterior = self._diretorio_dados(ticker)
+            dados = base / f"v{time.time_ns()}"
+            dados.mkdir()
+            for col in COLUNAS_PRECO:
+                self._arquivo(dados, col).write_bytes(novos[col].to_numpy(dtype=np.float64).tobytes())
+            self._arquivo(dados, _COLUNA_DATA).write_bytes(dias.astype(np.int64).tobytes())
+
+            fd, temporario = tempfile.mkstemp(dir=base, prefix=_ARQUIVO_VERSAO, suffix=".tmp")
+            with os.fdopen(fd, "w") as f:
+                f.write(dados.name)
+            os.replace(temporario, base / _ARQUIVO_VERSAO)
+            self._remover_versoes(base, manter={anterior, dados})
+
+        self._mmaps.pop(ticker, None)
+        logger.info("Price store: histórico de %s regravado (%d pregões).", ticker, len(dias))
+        return len(dias)
+
+    def _remover_versoes(self, base: Path, manter) -> None:
+        # Versões mais antigas que a anterior já não têm leitores (a anterior fica para quem a mapeou)
+        for caminho in base.iterdir():
+            if caminho in manter:
+                continue
+            if caminho.is_dir() and re.fullmatch(r"v\d+", caminho.name):
+                shutil.rmtree(caminho, ignore_errors=True)
+            elif base not in manter and caminho.suffix == ".bin":
+                caminho.unlink(missing_ok=True)
+
+
+_price_store: Optional[PriceStore] = None
+_price_store_guard = threading.Lock()
+
+
+def get_price_store() -> PriceStore:
+    """Instância única do store, configurada a partir de Settings."""
+    global _price_store
+    if _price_store is None:
+        with _price_store_guard:
+            if _price_store is None:
+                _price_store = PriceStore(
+                    root_dir=settings.PRICE_STORE_DIR,
+                    history_start=settings.PRICE_STORE_HISTORY_START,
+                    refresh_interval_seconds=settings.PRICE_STORE_REFRESH_SECONDS,
+                )
+    return _price_store
@@ -0,0 +1,182 @@
+'''
+Cache em memória das respostas de previsão (previsao-dia e previsao-entre-datas).
+
+A chave é (operação, payload da requisição, versão do modelo). Em vez de TTL,
+cada entrada guarda o "marcador de pregão" do histórico usado no cálculo: data e
+fechamento do último pregão da janela da requisição. Na consulta, o marcador
+atual vem do contexto de dados de mercado (já carregado pelo price store, que
+controla a cadência de atualização); se um novo pregão entrou (ou o pregão em
+aberto foi revisado), a entrada é invalidada e recalculada. Trocar o modelo
+muda a chave, então respostas de outra versão nunca são servidas.
+
+O tamanho é limitado em bytes (tamanho do JSON da resposta) com despejo LRU.
+'''
+
+import json
+import logging
+import threading
+from collections import OrderedDict
+from functools import wraps
+from typing import Any, Dict, Optional, Tuple
+
+import pandas as pd
+
+from app.config.settings import get_settings
+from app.config.datadog_metrics import increment_counter, metric
+from app.domain.services.ml_handler.backends import model_version
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+
+class PredictionResponseCache:
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, max_entry_bytes: int = 4 * 1024 * 1024):
+        self._max_bytes = max_bytes
+        self._max_entry_bytes = max_entry_bytes
+        # chave -> (marcador, resposta, bytes); ordem = uso mais recente no fim
+        self._entries: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._invalidations = 0
+        self._evictions = 0
+
+    def get(self, key: tuple, marker: tuple) -> Optional[Any]:
+        """Resposta cacheada para `key`, se foi calculada com o mesmo marcador de pregão."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] != marker:
+                self._remover(key)
+                self._invalidations += 1
+                entry = None
+
+            if entry is None:
+                self._misses += 1
+            else:
+                self._entries.move_to_end(key)
+                self._hits += 1
+
+        increment_counter("response_cache.lookup", tags=[f"result:{'miss' if entry is None else 'hit'}"])
+        return None if entry is None else entry[1]
+
+    def put(self, key: tuple, marker: tuple, response: Any) -> bool:
+        """Guarda a resposta; respostas maiores que max_entry_bytes não são cacheadas."""
+        try:
+            tamanho = len(json.dumps(response, default=str))
+        except (TypeError, ValueError):
+            return False
+        if tamanho > self._max_entry_bytes:
+            return False
+
+        with self._lock:
+            if key in self._entries:
+                self._remover(key)
+            self._entries[key] = (marker, response, tamanho)
+            self._bytes += tamanho
+            while self._bytes > self._max_bytes and self._entries:
+                antiga, _ = next(iter(self._entries.items()))
+                self._remover(antiga)
+                self._evictions += 1
+            ocupado = self._bytes
+
+        metric("response_cache.bytes", ocupado)
+        return True
+
+    def _remover(self, key: tuple) -> None:
+        _, _, tamanho = self._entries.pop(key)
+        self._bytes -= tamanho
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            total = self._hits + self._misses
+            return {
+                "size": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self._max_bytes,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_ratio": (self._hits / total) if total else 0.0,
+                "invalidations": self._invalidations,
+                "evictions": self._evictions,
+            }
+
+
+def bar_marker(frame: pd.DataFrame) -> Optional[Tuple[str, float]]:
+    """(data, fechamento) do último pregão de `frame`, ou None se não houver dados."""
+    if frame is None or frame.empty:
+        return None
+    return pd.Timestamp(frame.index[-1]).strftime("%Y-%m-%d"), float(frame["Close"].iloc[-1])
+
+
+def response_cache_key(operacao: str, req, model) -> tuple:
+    campos = req.model_dump() if hasattr(req, "model_dump") else dict(vars(req))
+    return (operacao, model_version(model)) + tuple(sorted((k, str(v)) for k, v in campos.items()))
+
+
+_cache: Optional[PredictionResponseCache] = None
+_cache_guard = threading.Lock()
+
+
+def get_response_cache() -> PredictionResponseCache:
+    global _cache
+    if _cache is None:
+        with _cache_guard:
+            if _cache is None:
+                _cache = PredictionResponseCache(
+                    max_bytes=settings.RESPONSE_CACHE_MAX_BYTES,
+                    max_entry_bytes=settings.RESPONSE_CACHE_MAX_ENTRY_BYTES,
+                )
+    return _cache
+
+
+def _consultar(func, req, model, context):
+    """(chave, marcador, resposta cacheada ou None); chave None quando a requisição não é cacheável."""
+    if not settings.RESPONSE_CACHE_ENABLED or context is None:
+        return None, None, None
+    marker = bar_marker(context.frame)
+    if marker is None:
+        return None, None, None
+    # Versões sync e async do mesmo handler compartilham as entradas
+    key = response_cache_key(func.__name__.removesuffix("_async"), req, model)
+    return key, marker, get_response_cache().get(key, marker)
+
+
+def _guardar(key, marker, response) -> None:
+    # Respostas de erro ({"error": ...}) não são cacheadas
+    if key is not None and isinstance(response, dict) and "error" not in response:
+        get_response_cache().put(key, marker, response)
+
+
+def with_response_cache(func):
+    """
+    Cacheia a resposta do handler. Deve ficar abaixo do contexto de dados de
+    mercado e dos validadores: usa o histórico já carregado para o marcador.
+    """
+    @wraps(func)
+    def wrapper(req, model, *args, **kwargs):
+        key, marker, cached = _consultar(func, req, model, kwargs.get("context"))
+        if cached is not None:
+            return cached
+        response = func(req, model, *args, **kwargs)
+        _guardar(key, marker, response)
+        return response
+    return wrapper
+
+
+def with_response_cache_async(func):
+    """Equivalente assíncrono de with_response_cache: um hit não ocupa o executor de inferência."""
+    @wraps(func)
+    async def wrapper(req, model, *args, **kwargs):
+        key, marker, cached = _consultar(func, req, model, kwargs.get("context"))
+        if cached is not None:
+            return cached
+        response = await func(req, model, *args, **kwargs)
+        _guardar(key, marker, response)
+        return response
+    return wrapper
@@ -0,0 +1,225 @@
+'''
+Single-flight: chamadas idênticas simultâneas compartilham uma única execução.
+
+Quando um ticker popular não está em cache, cada requisição concorrente
+dispararia seu próprio download e sua própria inferência. Com o single-flight,
+a primeira chamada de uma chave executa (a "líder") e as que chegam enquanto
+ela está em andamento aguardam o mesmo resultado (ou a mesma exceção). Nada é
+guardado depois que a execução termina: isso é papel dos caches.
+
+Grupos em uso (get_single_flight):
+
+- "market_data": downloads de histórico, chave (ticker, início, fim);
+- "price_store": downloads de cauda do store de preços, chave (ticker, início,
+  fim), inclusive os em lote (do_many);
+- "prediction": previsões completas, chave do cache de respostas + marcador de
+  pregão (with_single_flight / with_single_flight_async, logo abaixo do cache).
+
+Cada grupo conta chamadas, execuções e chamadas coalescidas, expostos em
+/v1/cache/stats e como métrica single_flight.coalesced.
+'''
+
+import asyncio
+import logging
+import threading
+from concurrent.futures import Future
+from functools import wraps
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterable, List, Optional, Tuple
+
+from app.config.settings import get_settings
+from app.config.datadog_metrics import increment_counter
+from app.domain.services.response_cache import bar_marker, response_cache_key
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+
+class SingleFlight:
+    """
+    Grupo de deduplicação por chave. `do` atende threads; `ado`, corrotinas do
+    event loop. Os dois caminhos têm tabelas de chamadas em andamento separadas.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._em_andamento: Dict[Hashable, Future] = {}
+        self._em_andamento_async: Dict[Hashable, asyncio.Task] = {}
+        self._calls = 0
+        self._executions = 0
+        self._coalesced = 0
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """
+        Executa `fn()` uma vez por chave em andamento. Retorna (resultado, compartilhado):
+        compartilhado=True quando o resultado veio da execução de outra chamada.
+        """
+        with self._lock:
+            self._calls += 1
+            future = self._em_andamento.get(key)
+            lider = future is None
+            if lider:
+                future = Future()
+                self._em_andamento[key] = future
+                self._executions += 1
+            else:
+                self._coalesced += 1
+
+        if not lider:
+            self._contar_coalescida()
+            return future.result(), True
+
+        try:
+            resultado = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(resultado)
+            return resultado, False
+        finally:
+            with self._lock:
+                self._em_andamento.pop(key, None)
+
+    def do_many(self, keys: Iterable[Hashable], fn: Callable[[List[Hashable]], Dict[Hashable, Any]]) -> Dict[Hashable, Any]:
+        """
+        Versão em lote de `do`: `fn(chaves)` roda uma vez para as chaves sem execução
+        em andamento e devolve um dict chave -> resultado; as chaves que outra chamada
+        já está executando aguardam o resultado dela. Retorna o dict de todas as chaves.
+        """
+        proprias: Dict[Hashable, Future] = {}
+        alheias: Dict[Hashable, Future] = {}
+        with self._lock:
+            for key in dict.fromkeys(keys):
+                self._calls += 1
+                future = self._em_andamento.get(key)
+                if future is None:
+                    future = Future()
+                    self._em_andamento[key] = future
+                    proprias[key] = future
+                else:
+                    self._coalesced += 1
+                    alheias[key] = future
+            if proprias:
+                self._executions += 1
+
+        for _ in alheias:
+            self._contar_coalescida()
+
+        resultados = {}
+        if proprias:
+            try:
+                obtidos = fn(list(proprias))
+            except BaseException as e:
+                for future in proprias.values():
+                    future.set_exception(e)
+                raise
+            else:
+                for key, future in proprias.items():
+                    resultados[key] = obtidos.get(key)
+                    future.set_result(resultados[key])
+            finally:
+                with self._lock:
+                    for key in proprias:
+                        self._em_andamento.pop(key, None)
+
+        for key, future in alheias.items():
+            resultados[key] = future.result()
+        return resultados
+
+    async def ado(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """
+        Versão assíncrona de `do`: `fn()` devolve a corrotina a executar. A execução
+        roda em uma task própria, então o cancelamento de uma requisição não
+        cancela as demais que aguardam o mesmo resultado.
+        """
+        loop = asyncio.get_running_loop()
+        chave = (id(loop), key)
+        with self._lock:
+            self._calls += 1
+            task = self._em_andamento_async.get(chave)
+            lider = task is None
+            if lider:
+                task = loop.create_task(fn())
+                self._em_andamento_async[chave] = task
+                task.add_done_callback(lambda _: self._encerrar_async(chave, task))
+                self._executions += 1
+            else:
+                self._coalesced += 1
+
+        if not lider:
+            self._contar_coalescida()
+        return await asyncio.shield(task), not lider
+
+    def _encerrar_async(self, chave, task) -> None:
+        with self._lock:
+            if self._em_andamento_async.get(chave) is task:
+                del self._em_andamento_async[chave]
+
+    def _contar_coalescida(self) -> None:
+        increment_counter("single_flight.coalesced", tags=[f"group:{self.name}"])
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                "calls": self._calls,
+                "executions": self._executions,
+                "coalesced": self._coalesced,
+                "coalesced_ratio": (self._coalesced / self._calls) if self._calls else 0.0,
+                "in_flight": len(self._em_andamento) + len(self._em_andamento_async),
+            }
+
+
+_groups: Dict[str, SingleFlight] = {}
+_groups_guard = threading.Lock()
+
+
+def get_single_flight(name: str) -> SingleFlight:
+    """Grupo único do processo para `name`."""
+    group = _groups.get(name)
+    if group is None:
+        with _groups_guard:
+            group = _groups.setdefault(name, SingleFlight(name))
+    return group
+
+
+def single_flight_stats() -> Dict[str, Dict[str, float]]:
+    with _groups_guard:
+        return {name: group.stats() for name, group in _groups.items()}
+
+
+def _chave_previsao(func, req, model, context) -> Optional[tuple]:
+    if not settings.SINGLE_FLIGHT_ENABLED or context is None:
+        return None
+    marker = bar_marker(context.frame)
+    if marker is None:
+        return None
+    return response_cache_key(func.__name__.removesuffix("_async"), req, model) + (marker,)
+
+
+def with_single_flight(func):
+    """
+    Requisições idênticas (mesmo payload, modelo e marcador de pregão) em andamento
+    ao mesmo tempo compartilham um único cálculo. Fica logo abaixo do cache de
+    respostas: numa rajada de misses só a primeira requisição calcula.
+    """
+    @wraps(func)
+    def wrapper(req, model, *args, **kwargs):
+        key = _chave_previsao(func, req, model, kwargs.get("context"))
+        if key is None:
+            return func(req, model, *args, **kwargs)
+        response, _ = get_single_flight("prediction").do(key, lambda: func(req, model, *args, **kwargs))
+        return response
+    return wrapper
+
+
+def with_single_flight_async(func):
+    """Equivalente assíncrono de with_single_flight."""
+    @wraps(func)
+    async def wrapper(req, model, *args, **kwargs):
+        key = _chave_previsao(func, req, model, kwargs.get("context"))
+        if key is None:
+            return await func(req, model, *args, **kwargs)
+        response, _ = await get_single_flight("prediction").ado(key, lambda: func(req, model, *args, **kwargs))
+        return response
+    return wrapper
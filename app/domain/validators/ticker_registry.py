@@ -0,0 +1,211 @@
+'''
+Cache de existência de tickers com TTL separado para respostas positivas e
+negativas, limite de tamanho com despejo LRU e snapshot em disco para
+sobreviver a deploys/restarts.
+
+O snapshot é gravado no shutdown e também a cada `snapshot_every_puts` entradas
+novas ou `snapshot_interval` segundos, para que uma queda sem shutdown (OOM,
+kill) não perca o registro. Cada gravação usa um temporário próprio e mescla as
+entradas válidas que outros workers já gravaram no mesmo arquivo.
+
+Erros do upstream nunca são cacheados: só um "existe"/"não existe" confirmado.
+'''
+
+import json
+import os
+import tempfile
+import threading
+import time
+import logging
+from collections import OrderedDict
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from app.config.settings import get_settings
+from app.config.datadog_metrics import increment_counter
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+
+class TickerRegistryCache:
+    def __init__(
+        self,
+        max_size: int = 1024,
+        positive_ttl: float = 24 * 3600,
+        negative_ttl: float = 15 * 60,
+        snapshot_path: Optional[Path] = None,
+        snapshot_every_puts: int = 50,
+        snapshot_interval: float = 60.0,
+        clock: Callable[[], float] = time.time,
+    ):
+        self._max_size = max_size
+        self._positive_ttl = positive_ttl
+        self._negative_ttl = negative_ttl
+        self._snapshot_path = Path(snapshot_path) if snapshot_path else None
+        self._snapshot_every_puts = snapshot_every_puts
+        self._snapshot_interval = snapshot_interval
+        self._clock = clock
+
+        # símbolo -> (existe, expira_em); ordem = uso mais recente no fim
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._expired = 0
+        self._evictions = 0
+        # Entradas novas desde o último snapshot e quando ele foi gravado
+        self._snapshot_lock = threading.Lock()
+        self._puts_pendentes = 0
+        self._ultimo_snapshot = clock()
+
+    def get(self, symbol: str) -> Optional[bool]:
+        """Retorna True/False se houver entrada válida, ou None (miss)."""
+        with self._lock:
+            entry = self._entries.get(symbol)
+            if entry is not None and entry[1] <= self._clock():
+                del self._entries[symbol]
+                self._expired += 1
+                entry = None
+
+            if entry is None:
+                self._misses += 1
+                hit = False
+            else:
+                self._entries.move_to_end(symbol)
+                self._hits += 1
+                hit = True
+
+        increment_counter("ticker_registry.lookup", tags=[f"result:{'hit' if hit else 'miss'}"])
+        return entry[0] if hit else None
+
+    def put(self, symbol: str, exists: bool) -> None:
+        ttl = self._positive_ttl if exists else self._negative_ttl
+        with self._lock:
+            self._entries[symbol] = (bool(exists), self._clock() + ttl)
+            self._entries.move_to_end(symbol)
+            while len(self._entries) > self._max_size:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+            self._puts_pendentes += 1
+            salvar = self._snapshot_path is not None and (
+                self._puts_pendentes >= self._snapshot_every_puts
+                or self._clock() - self._ultimo_snapshot >= self._snapshot_interval
+            )
+
+        # Snapshot periódico: se outra thread já está gravando, esta não espera
+        if salvar and self._snapshot_lock.acquire(blocking=False):
+            try:
+                self._gravar_snapshot()
+            finally:
+                self._snapshot_lock.release()
+
+    def lookup(self, symbol: str, probe: Callable[[str], bool]) -> bool:
+        """
+        Consulta o cache e, em caso de miss, chama `probe`.
+        Exceções do probe são propagadas sem cachear nada.
+        """
+        cached = self.get(symbol)
+        if cached is not None:
+            return cached
+        exists = probe(symbol)
+        self.put(symbol, exists)
+        return exists
+
+    async def alookup(self, symbol: str, probe: Callable[[str], Awaitable[bool]]) -> bool:
+        """Versão assíncrona de lookup, com `probe` assíncrono."""
+        cached = self.get(symbol)
+        if cached is not None:
+            return cached
+        exists = await probe(symbol)
+        self.put(symbol, exists)
+        return exists
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            total = self._hits + self._misses
+            positivos = sum(1 for existe, _ in self._entries.values() if existe)
+            return {
+                "size": len(self._entries),
+                "max_size": self._max_size,
+                "positive_entries": positivos,
+                "negative_entries": len(self._entries) - positivos,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_ratio": (self._hits / total) if total else 0.0,
+                "expired": self._expired,
+                "evictions": self._evictions,
+            }
+
+    # -------------------------------------------------------------- snapshot
+    def _ler_snapshot(self) -> List[tuple]:
+        """Entradas (símbolo, existe, expira_em) ainda válidas do arquivo, da menos para a mais recente."""
+        if self._snapshot_path is None or not self._snapshot_path.exists():
+            return []
+        try:
+            with open(self._snapshot_path, "r", encoding="utf-8") as f:
+                dados = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning("Snapshot do registro de tickers ilegível (%s): %s", self._snapshot_path, e)
+            return []
+        agora = self._clock()
+        return [(s, bool(e), float(t)) for s, e, t in dados.get("entries", []) if float(t) > agora]
+
+    def load_snapshot(self) -> int:
+        """Carrega entradas ainda válidas do snapshot. Retorna quantas foram carregadas."""
+        validas = self._ler_snapshot()
+        with self._lock:
+            for symbol, exists, expira_em in validas[-self._max_size:]:
+                self._entries[symbol] = (exists, expira_em)
+                self._entries.move_to_end(symbol)
+            while len(self._entries) > self._max_size:
+                self._entries.popitem(last=False)
+        return len(validas)
+
+    def save_snapshot(self) -> None:
+        if self._snapshot_path is None:
+            return
+        with self._snapshot_lock:
+            self._gravar_snapshot()
+
+    def _gravar_snapshot(self) -> None:
+        with self._lock:
+            entries = {s: [s, e, t] for s, (e, t) in self._entries.items()}
+            self._puts_pendentes = 0
+            self._ultimo_snapshot = self._clock()
+
+        # Outros workers gravam o mesmo arquivo: as entradas deles que este não tem entram como mais antigas
+        anteriores = [[s, e, t] for s, e, t in self._ler_snapshot() if s not in entries]
+        entries = (anteriores + list(entries.values()))[-self._max_size:]
+
+        tmp = None
+        try:
+            self._snapshot_path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=self._snapshot_path.parent, prefix=self._snapshot_path.name, suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump({"entries": entries}, f)
+            os.replace(tmp, self._snapshot_path)
+        except OSError as e:
+            logger.warning("Falha ao salvar snapshot do registro de tickers: %s", e)
+            if tmp is not None:
+                Path(tmp).unlink(missing_ok=True)
+
+
+_registry: Optional[TickerRegistryCache] = None
+_registry_guard = threading.Lock()
+
+
+def get_ticker_registry() -> TickerRegistryCache:
+    global _registry
+    if _registry is None:
+        with _registry_guard:
+            if _registry is None:
+                _registry = TickerRegistryCache(
+                    max_size=settings.TICKER_REGISTRY_MAX_SIZE,
+                    positive_ttl=settings.TICKER_REGISTRY_POSITIVE_TTL_SECONDS,
+                    negative_ttl=settings.TICKER_REGISTRY_NEGATIVE_TTL_SECONDS,
+                    snapshot_path=settings.TICKER_REGISTRY_SNAPSHOT_PATH,
+                    snapshot_every_puts=settings.TICKER_REGISTRY_SNAPSHOT_EVERY_PUTS,
+                    snapshot_interval=settings.TICKER_REGISTRY_SNAPSHOT_INTERVAL_SECONDS,
+                )
+    return _registry
@@ -1,50 +1,213 @@
 from datetime import timedelta
-import yfinance as yf
-from functools import wraps, lru_cache
+from functools import wraps
 from fastapi import HTTPException
 from datetime import date
 import logging
+from app.domain.services.market_data_context import LOOKBACK_VALIDACAO_ENTRE_DATAS, LOOKBACK_VALIDACAO_DIA
+from app.domain.services.market_data_context import MarketDataContext
+from app.domain.services.market_data_provider import get_market_data_provider
+from app.domain.validators.ticker_registry import get_ticker_registry
+from app.config.settings import get_settings
+
+settings = get_settings()
 
 logger = logging.getLogger(__name__)
 
-# 1. Função auxiliar com CACHE. 
-# O Python lembrará dos últimos 1024 tickers verificados para não travar a API.
-@lru_cache(maxsize=1024)
-def _check_ticker_on_yahoo(symbol: str) -> bool:
+def _probe_ticker_on_yahoo(symbol: str) -> bool:
     """
-    Tenta buscar o histórico de 1 dia. 
+    Pergunta ao provedor de dados de mercado se o ticker tem pregões recentes.
     Retorna True se vierem dados, False se estiver vazio/inválido.
+    Erros de rede/upstream são propagados.
+    """
+    return get_market_data_provider().ticker_exists(symbol)
+
+# 1. Função auxiliar com CACHE (TTL positivo/negativo, LRU e snapshot em disco).
+def _check_ticker_on_yahoo(symbol: str, context=None) -> bool:
     """
+    Consulta o registro de tickers; em caso de miss, usa o histórico já baixado
+    pela requisição (se houver dados, o ticker existe) ou faz o probe no Yahoo.
+    Falhas do upstream retornam False sem serem cacheadas.
+    """
+    def probe(simbolo: str) -> bool:
+        if context is not None and context.ticker == simbolo and not context.frame.empty:
+            return True
+        return _probe_ticker_on_yahoo(simbolo)
+
     try:
-        # period="1d" é a request mais leve possível que confirma existência
-        ticker = yf.Ticker(symbol)
-        history = ticker.history(period="1d")
-        return not history.empty
-    except Exception:
+        return get_ticker_registry().lookup(symbol, probe)
+    except Exception as e:
+        logger.warning("Não foi possível verificar o ticker %s no Yahoo: %s", symbol, e)
         return False
 
-# 2. O Decorator Principal
-def validate_ticker_exists(func):
-    @wraps(func)
-    def wrapper(req, *args, **kwargs):
-        # Extrai o ticker do objeto request (assumindo que ele tem o atributo .ticker)
-        ticker_symbol = getattr(req, "ticker", None)
+async def _check_ticker_on_yahoo_async(symbol: str, context=None) -> bool:
+    """
+    Versão assíncrona de _check_ticker_on_yahoo: o probe usa a API assíncrona
+    do provedor, sem bloquear o event loop.
+    """
+    async def probe(simbolo: str) -> bool:
+        if context is not None and context.ticker == simbolo:
+            frame = await context.aload()
+            if not frame.empty:
+                return True
+        return await get_market_data_provider().aticker_exists(simbolo)
+
+    try:
+        return await get_ticker_registry().alookup(symbol, probe)
+    except Exception as e:
+        logger.warning("Não foi possível verificar o ticker %s no Yahoo: %s", symbol, e)
+        return False
+
+def _historico_para_validacao(ticker, inicio, fim, context=None):
+    """
+    Histórico [inicio, fim) para as checagens de lookback.
+    Usa o contexto da requisição quando disponível (sem novo download).
+    """
+    if context is not None:
+        return context.slice(inicio, fim)
+    return get_market_data_provider().fetch_history(ticker, inicio, fim)
+
+# 2. Regras de validação (compartilhadas pelos decorators síncronos e assíncronos)
+def _normalizar_ticker(req) -> str:
+    # Extrai o ticker do objeto request (assumindo que ele tem o atributo .ticker)
+    ticker_symbol = getattr(req, "ticker", None)
+
+    if not ticker_symbol:
+         raise HTTPException(status_code=400, detail="Ticker não fornecido no payload.")
 
-        if not ticker_symbol:
-             raise HTTPException(status_code=400, detail="Ticker não fornecido no payload.")
+    ticker_symbol = ticker_symbol.upper().strip()
 
-        ticker_symbol = ticker_symbol.upper().strip()
+    if not ticker_symbol.endswith(".SA") and len(ticker_symbol) <= 5: 
+        pass 
 
-        if not ticker_symbol.endswith(".SA") and len(ticker_symbol) <= 5: 
-            pass 
+    return ticker_symbol
 
-        is_valid = _check_ticker_on_yahoo(ticker_symbol)
+def _ticker_nao_encontrado(ticker_symbol: str) -> HTTPException:
+    return HTTPException(
+        status_code=404, 
+        detail=f"O ticker '{ticker_symbol}' não foi encontrado ou não possui dados ativos no Yahoo Finance."
+    )
 
-        if not is_valid:
+def _validar_intervalo(req, context=None):
+    # 1. Extração dos dados
+    start = getattr(req, 'init_date', None)
+    end = getattr(req, 'end_date', None)
+    ticker = getattr(req, 'ticker', None)
+    
+    hoje = date.today()
+    limite_futuro = hoje + timedelta(days=60)
+
+    # 2. Validações de Lógica Temporal
+    if end <= start:
+        raise HTTPException(status_code=400, detail="A data final deve ser posterior à data inicial.")
+    
+    if (end - start) < timedelta(days=60):
+        raise HTTPException(status_code=400, detail="Período de intervalo muito curto: a previsão exige pelo menos 60 dias entre inicio e fim.")
+
+    if end > limite_futuro:
+        raise HTTPException(
+            status_code=400, 
+            detail=f"Data final muito distante. O modelo só permite previsões até 60 dias a partir de hoje ({limite_futuro})."
+        )
+
+    # 3. Validação de Histórico Mínimo (Que fizemos antes)
+    # Verifica se existe histórico antes do 'start' para alimentar o LSTM
+    lookback_date = start - timedelta(days=LOOKBACK_VALIDACAO_ENTRE_DATAS)
+    try:
+        hist_check = _historico_para_validacao(ticker, lookback_date, start, context)
+        if len(hist_check) < 30:
+            first_valid = hist_check.index[0].date() if not hist_check.empty else "desconhecida"
             raise HTTPException(
-                status_code=404, 
-                detail=f"O ticker '{ticker_symbol}' não foi encontrado ou não possui dados ativos no Yahoo Finance."
+                status_code=400, 
+                detail=f"Data inicial inválida para {ticker}. Histórico insuficiente antes de {start}. Tente a partir de {first_valid}."
             )
+    except Exception as e:
+        if isinstance(e, HTTPException): raise e
+        # Em produção, logar o erro do yfinance mas talvez não bloquear o usuário
+        logger.warning("Aviso: Não foi possível validar histórico no YF: %s", e)
+
+def _validar_data_alvo(req, context=None):
+    target_date = getattr(req, 'date', getattr(req, 'target_date', None))
+    ticker = getattr(req, 'ticker', None)
+
+    if not target_date:
+        raise HTTPException(status_code=400, detail="Data alvo não fornecida.")
+
+    hoje = date.today()
+    limite_futuro = hoje + timedelta(days=60)
+
+    if target_date > limite_futuro:
+        raise HTTPException(
+            status_code=400, 
+            detail=f"Data muito distante. O modelo limita previsões a no máximo 60 dias futuros ({limite_futuro})."
+        )
+
+    lookback_date = target_date - timedelta(days=LOOKBACK_VALIDACAO_DIA)
+    try:
+        hist_check = _historico_para_validacao(ticker, lookback_date, target_date, context)
+        if len(hist_check) < 30:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Sem histórico suficiente para prever o dia {target_date}. O ticker {ticker} parece não ter dados suficientes neste período passado."
+            )
+    except Exception as e:
+        if isinstance(e, HTTPException):
+            raise e
+        logger.warning("Aviso YF: %s", e)
+
+def _validar_lote(req):
+    """
+    Normaliza e deduplica os tickers do lote (mantendo a ordem) e aplica os
+    limites que valem para a requisição inteira: tamanho e data alvo.
+    """
+    tickers = []
+    for symbol in getattr(req, "tickers", None) or []:
+        symbol = (symbol or "").upper().strip()
+        if symbol and symbol not in tickers:
+            tickers.append(symbol)
+
+    if not tickers:
+        raise HTTPException(status_code=400, detail="Nenhum ticker fornecido no payload.")
+
+    if len(tickers) > settings.BATCH_MAX_TICKERS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Lote muito grande: {len(tickers)} tickers. O máximo por requisição é {settings.BATCH_MAX_TICKERS}."
+        )
+
+    limite_futuro = date.today() + timedelta(days=60)
+    if req.target_date > limite_futuro:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Data muito distante. O modelo limita previsões a no máximo 60 dias futuros ({limite_futuro})."
+        )
+
+    req.tickers = tickers
+
+def validar_item_lote(req, context):
+    """
+    Regras por ticker de um lote, sobre o histórico já baixado em lote.
+    Em vez de abortar a requisição inteira, devolve o erro do item
+    ({"status_code", "detail"}) ou None se o ticker pode ser previsto.
+    """
+    if context.frame.empty:
+        erro = _ticker_nao_encontrado(req.ticker)
+        return {"status_code": erro.status_code, "detail": erro.detail}
+
+    get_ticker_registry().put(req.ticker, True)
+    try:
+        _validar_data_alvo(req, context)
+    except HTTPException as e:
+        return {"status_code": e.status_code, "detail": e.detail}
+    return None
+
+# 3. Decorators síncronos
+def validate_ticker_exists(func):
+    @wraps(func)
+    def wrapper(req, *args, **kwargs):
+        ticker_symbol = _normalizar_ticker(req)
+
+        if not _check_ticker_on_yahoo(ticker_symbol, kwargs.get("context")):
+            raise _ticker_nao_encontrado(ticker_symbol)
 
         # Se passou, injetamos o ticker (talvez normalizado) de volta no req e prosseguimos
         req.ticker = ticker_symbol
@@ -54,77 +217,55 @@ def validate_ticker_exists(func):
 def validate_date_rangefunc(func):
     @wraps(func)
     def wrapper(req, *args, **kwargs):
-        # 1. Extração dos dados
-        start = getattr(req, 'init_date', None)
-        end = getattr(req, 'end_date', None)
-        ticker = getattr(req, 'ticker', None)
-        
-        hoje = date.today()
-        limite_futuro = hoje + timedelta(days=60)
-
-        # 2. Validações de Lógica Temporal
-        if end <= start:
-            raise HTTPException(status_code=400, detail="A data final deve ser posterior à data inicial.")
-        
-        if (end - start) < timedelta(days=60):
-            raise HTTPException(status_code=400, detail="Período de intervalo muito curto: a previsão exige pelo menos 60 dias entre inicio e fim.")
-
-        if end > limite_futuro:
-            raise HTTPException(
-                status_code=400, 
-                detail=f"Data final muito distante. O modelo só permite previsões até 60 dias a partir de hoje ({limite_futuro})."
-            )
-
-        # 3. Validação de Histórico Mínimo (Que fizemos antes)
-        # Verifica se existe histórico antes do 'start' para alimentar o LSTM
-        lookback_date = start - timedelta(days=90)
-        try:
-            hist_check = yf.download(ticker, start=lookback_date, end=start, progress=False, auto_adjust=True)
-            if len(hist_check) < 30:
-                first_valid = hist_check.index[0].date() if not hist_check.empty else "desconhecida"
-                raise HTTPException(
-                    status_code=400, 
-                    detail=f"Data inicial inválida para {ticker}. Histórico insuficiente antes de {start}. Tente a partir de {first_valid}."
-                )
-        except Exception as e:
-            if isinstance(e, HTTPException): raise e
-            # Em produção, logar o erro do yfinance mas talvez não bloquear o usuário
-            logger.warning("Aviso: Não foi possível validar histórico no YF: %s", e)
-
+        _validar_intervalo(req, kwargs.get("context"))
         return func(req, *args, **kwargs)
     return wrapper
 
 def validate_has_date(func):
     @wraps(func)
     def wrapper(req, *args, **kwargs):
+        _validar_data_alvo(req, kwargs.get("context"))
+        return func(req, *args, **kwargs)
+    return wrapper
 
-        target_date = getattr(req, 'date', getattr(req, 'target_date', None))
-        ticker = getattr(req, 'ticker', None)
+# 4. Decorators assíncronos: garantem o contexto carregado (sem bloquear o
+# event loop) e então aplicam as mesmas regras sobre os dados em memória.
+async def _contexto_carregado(req, kwargs):
+    context = kwargs.get("context")
+    if context is None:
+        context = kwargs["context"] = MarketDataContext.for_request(req)
+    await context.aload()
+    return context
 
-        if not target_date:
-            raise HTTPException(status_code=400, detail="Data alvo não fornecida.")
+def validate_ticker_exists_async(func):
+    @wraps(func)
+    async def wrapper(req, *args, **kwargs):
+        ticker_symbol = _normalizar_ticker(req)
 
-        hoje = date.today()
-        limite_futuro = hoje + timedelta(days=60)
+        if not await _check_ticker_on_yahoo_async(ticker_symbol, kwargs.get("context")):
+            raise _ticker_nao_encontrado(ticker_symbol)
 
-        if target_date > limite_futuro:
-            raise HTTPException(
-                status_code=400, 
-                detail=f"Data muito distante. O modelo limita previsões a no máximo 60 dias futuros ({limite_futuro})."
-            )
+        req.ticker = ticker_symbol
+        return await func(req, *args, **kwargs)
+    return wrapper
 
-        lookback_date = target_date - timedelta(days=60)
-        try:
-            hist_check = yf.download(ticker, start=lookback_date, end=target_date, progress=False, auto_adjust=True)
-            if len(hist_check) < 30:
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"Sem histórico suficiente para prever o dia {target_date}. O ticker {ticker} parece não ter dados suficientes neste período passado."
-                )
-        except Exception as e:
-            if isinstance(e, HTTPException):
-                raise e
-            logger.warning("Aviso YF: %s", e)
+def validate_date_range_async(func):
+    @wraps(func)
+    async def wrapper(req, *args, **kwargs):
+        _validar_intervalo(req, await _contexto_carregado(req, kwargs))
+        return await func(req, *args, **kwargs)
+    return wrapper
 
-        return func(req, *args, **kwargs)
-    return wrapper
\ No newline at end of file
+def validate_batch_request(func):
+    @wraps(func)
+    async def wrapper(req, *args, **kwargs):
+        _validar_lote(req)
+        return await func(req, *args, **kwargs)
+    return wrapper
+
+def validate_has_date_async(func):
+    @wraps(func)
+    async def wrapper(req, *args, **kwargs):
+        _validar_data_alvo(req, await _contexto_carregado(req, kwargs))
+        return await func(req, *args, **kwargs)
+    return wrapper
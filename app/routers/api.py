@@ -1,10 +1,22 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
 from app.config.dependencies import get_model
-from app.schemas.ticker_request import TickerRequestBetweenDates, TickerRequest
-from app.domain.commands.avaluation_prices_commands import handle_ticker_info_specific_date, handle_ticker_info_between_dates
+from app.schemas.ticker_request import TickerRequestBetweenDates, TickerRequest, TickerBatchRequest
+from app.domain.commands.avaluation_prices_commands import handle_ticker_info_specific_date_async, handle_ticker_info_between_dates_async, handle_ticker_batch_async, handle_ticker_info_between_dates_stream_async
 from app.config.datadog_config import get_datadog_tracer
 from app.config.datadog_metrics import increment_counter, metric
+from app.domain.validators.ticker_registry import get_ticker_registry
+from app.domain.services.inference_batcher import get_inference_scheduler
+from app.domain.services.inference_process_pool import get_inference_process_pool
+from app.domain.services.ml_handler.model_registry import get_model_registry
+from app.domain.services.response_cache import get_response_cache
+from app.domain.services.single_flight import single_flight_stats
+from app.domain.services.forecast_precompute import get_forecast_precompute_scheduler, get_precomputed_forecasts
+from app.domain.services.ml_handler.backends import model_version
+from app.routers.response_encoding import encode_response_async, negotiated_media_type
+from app.config.process_memory import memory_snapshot
 import logging
+import os
 import time
 
 router = APIRouter()
@@ -13,21 +25,35 @@ tracer = get_datadog_tracer()
 
 
 @router.post("/v1/previsao-entre-datas", response_model=dict, summary="Previsão de preços por ticker")
-def ticker_info(payload: TickerRequestBetweenDates, model = Depends(get_model)):
+async def ticker_info(
+    payload: TickerRequestBetweenDates,
+    request: Request,
+    model = Depends(get_model),
+    media_type: str = Depends(negotiated_media_type),
+    stream: bool = Query(False, description="Resposta NDJSON em blocos, sem materializar o período inteiro"),
+):
     """
     Recebe data inicial, data final e ticker, retornando a previsão de preços da bolsa para esse período.
+    Com ?stream=true a resposta é NDJSON: cabeçalho, um ponto por linha e um resumo final.
+    O formato segue o Accept (JSON, msgpack ou Arrow IPC; ver response_encoding).
     """
     start_time = time.time()
     
     try:
-        with tracer.trace("ticker_prediction_between_dates", tags={"ticker": payload.ticker}):
-            result = handle_ticker_info_between_dates(payload, model)
+        with tracer.trace("ticker_prediction_between_dates") as span:
+            span.set_tag("ticker", payload.ticker)
+            span.set_tag("stream", stream)
+            if stream:
+                linhas = await handle_ticker_info_between_dates_stream_async(payload, model)
+                result = StreamingResponse(linhas, media_type="application/x-ndjson")
+            else:
+                result = await handle_ticker_info_between_dates_async(payload, model)
         
         duration = (time.time() - start_time) * 1000
         metric("prediction.latency", duration, tags=[f"endpoint:previsao-entre-datas", f"ticker:{payload.ticker}"])
         increment_counter("predictions.total", tags=[f"endpoint:previsao-entre-datas", "status:success"])
         
-        return result
+        return await encode_response_async(request, result, media_type)
     except Exception as e:
         logger.error(f"Erro na previsão entre datas para {payload.ticker}: {e}")
         increment_counter("predictions.total", tags=[f"endpoint:previsao-entre-datas", "status:error"])
@@ -35,22 +61,130 @@ def ticker_info(payload: TickerRequestBetweenDates, model = Depends(get_model)):
 
 
 @router.post("/v1/previsao-dia", response_model=dict, summary="Previsão de preço por ticker em um dia específico")
-def ticker_info_specific(payload: TickerRequest, model = Depends(get_model)):
+async def ticker_info_specific(payload: TickerRequest, request: Request, model = Depends(get_model),
+                               media_type: str = Depends(negotiated_media_type)):
     """
     Recebe data e ticker, retornando a previsão de preço da bolsa e se houver, o preço real.
     """
     start_time = time.time()
     
     try:
-        with tracer.trace("ticker_prediction_specific_date", tags={"ticker": payload.ticker, "date": str(payload.date)}):
-            result = handle_ticker_info_specific_date(payload, model)
+        with tracer.trace("ticker_prediction_specific_date") as span:
+            span.set_tag("ticker", payload.ticker)
+            span.set_tag("date", str(payload.target_date))
+            result = await handle_ticker_info_specific_date_async(payload, model)
         
         duration = (time.time() - start_time) * 1000
         metric("prediction.latency", duration, tags=[f"endpoint:previsao-dia", f"ticker:{payload.ticker}"])
         increment_counter("predictions.total", tags=[f"endpoint:previsao-dia", "status:success"])
         
-        return result
+        return await encode_response_async(request, result, media_type)
     except Exception as e:
-        logger.error(f"Erro na previsão para {payload.ticker} em {payload.date}: {e}")
+        logger.error(f"Erro na previsão para {payload.ticker} em {payload.target_date}: {e}")
         increment_counter("predictions.total", tags=[f"endpoint:previsao-dia", "status:error"])
         raise
+
+
+@router.post("/v1/previsao-lote", response_model=dict, summary="Previsão de preço de vários tickers em um dia específico")
+async def ticker_info_batch(payload: TickerBatchRequest, request: Request, model = Depends(get_model),
+                            media_type: str = Depends(negotiated_media_type)):
+    """
+    Recebe uma data e uma lista de tickers, retornando a previsão de cada um na ordem enviada.
+    Tickers inválidos ou sem histórico retornam um item com "error", sem falhar o lote.
+    """
+    start_time = time.time()
+
+    try:
+        with tracer.trace("ticker_prediction_batch") as span:
+            span.set_tag("tickers", len(payload.tickers))
+            span.set_tag("date", str(payload.target_date))
+            result = await handle_ticker_batch_async(payload, model)
+
+        duration = (time.time() - start_time) * 1000
+        metric("prediction.latency", duration, tags=[f"endpoint:previsao-lote"])
+        metric("prediction.batch_size", len(payload.tickers), tags=[f"endpoint:previsao-lote"])
+        increment_counter("predictions.total", tags=[f"endpoint:previsao-lote", "status:success"])
+
+        return await encode_response_async(request, result, media_type)
+    except Exception as e:
+        logger.error(f"Erro na previsão em lote para {payload.target_date}: {e}")
+        increment_counter("predictions.total", tags=[f"endpoint:previsao-lote", "status:error"])
+        raise
+
+
+@router.get("/v1/cache/stats", response_model=dict, summary="Estatísticas dos caches internos")
+def cache_stats():
+    """
+    Contadores de hit/miss e ocupação dos caches, para dimensionamento.
+    """
+    return {
+        "ticker_registry": get_ticker_registry().stats(),
+        "prediction_responses": get_response_cache().stats(),
+        "single_flight": single_flight_stats(),
+    }
+
+
+@router.get("/v1/models", response_model=dict, summary="Modelos disponíveis no registro")
+def list_models():
+    """
+    Configurações do best_strategy_2.csv com artefato disponível, e ocupação do LRU de modelos residentes.
+    """
+    registry = get_model_registry()
+    return {
+        "models": [registry.specs[nr].to_dict() for nr in registry.available_ids() if nr in registry.specs],
+        "registry": registry.stats(),
+    }
+
+
+@router.get("/v1/process/memory", response_model=dict, summary="Memória e startup do worker que atendeu")
+def process_memory(request: Request):
+    """
+    Tempo de carga do modelo e memória antes/depois no startup, e memória atual
+    (RSS/PSS) do processo worker que atendeu a requisição.
+    """
+    return {
+        "pid": os.getpid(),
+        "startup": getattr(request.app.state, "startup_report", None),
+        "memory": memory_snapshot(),
+    }
+
+
+@router.get("/v1/inference/stats", response_model=dict, summary="Estatísticas do micro-batching de inferência")
+def inference_stats():
+    """
+    Distribuição de tamanho de lote e tempo de espera na fila do agendador, e
+    uso por worker do pool de processos de inferência.
+    """
+    scheduler = get_inference_scheduler()
+    pool = get_inference_process_pool()
+    return {
+        "batching_enabled": scheduler is not None,
+        "inference_batcher": scheduler.stats() if scheduler is not None else None,
+        "process_pool_enabled": pool is not None,
+        "inference_process_pool": pool.stats() if pool is not None else None,
+    }
+
+
+@router.get("/v1/precompute/status", response_model=dict, summary="Status do pré-cálculo da watchlist")
+def precompute_status():
+    """
+    Última execução do pré-cálculo pós-fechamento (início, duração, falhas por ticker),
+    próxima execução agendada e uso das previsões pré-calculadas.
+    """
+    scheduler = get_forecast_precompute_scheduler()
+    return {
+        "enabled": scheduler is not None,
+        "scheduler": scheduler.status() if scheduler is not None else None,
+        "store": get_precomputed_forecasts().stats(),
+    }
+
+
+@router.get("/v1/precompute/forecasts/{ticker}", response_model=dict, summary="Horizonte pré-calculado de um ticker")
+def precomputed_forecast(ticker: str, model = Depends(get_model)):
+    """
+    Previsões dos próximos dias úteis calculadas na última execução do pré-cálculo.
+    """
+    entry = get_precomputed_forecasts().get(ticker, model_version(model))
+    if entry is None:
+        raise HTTPException(status_code=404, detail=f"Não há previsão pré-calculada para '{ticker}'.")
+    return entry.to_dict()
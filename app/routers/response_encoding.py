@@ -0,0 +1,292 @@
+'''
+Negociação de conteúdo das rotas de previsão (Accept e Accept-Encoding).
+
+Os handlers devolvem dicts; em vez do caminho padrão do FastAPI
+(jsonable_encoder + json.dumps, que percorre o payload inteiro duas vezes),
+encode_response serializa direto no formato pedido:
+
+- application/json (padrão, também para */* ou sem Accept): orjson;
+- application/x-msgpack: msgpack, mesmo conteúdo do JSON em binário;
+- application/vnd.apache.arrow.stream: Arrow IPC (stream) com uma linha por
+  ponto (date, prediction, actual, diff; no lote também ticker e error), para
+  consumidores internos que leem direto em pandas. Ticker e metadata vão como
+  JSON nos metadados do schema (chave b"prediction"). Payloads que não são
+  tabulares (ex.: {"error": ...}) saem em JSON.
+
+Acima de RESPONSE_COMPRESSION_MIN_BYTES o corpo é comprimido com brotli ou gzip,
+conforme o Accept-Encoding do cliente.
+
+Nas rotas async (encode_response_async) a serialização de respostas com
+RESPONSE_ENCODE_OFFLOAD_MIN_POINTS pontos ou mais, e a compressão de qualquer
+corpo acima do limiar, rodam no executor de inferência: o event loop não fica
+parado em orjson/Arrow/gzip enquanto outras requisições esperam. orjson, msgpack, pyarrow e brotli são
+opcionais: sem eles o formato correspondente simplesmente não é oferecido
+(JSON cai no json da biblioteca padrão). Accept que só lista formatos
+indisponíveis recebe 406.
+'''
+
+import gzip
+import json
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from fastapi import HTTPException, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import Response
+
+from app.config.settings import get_settings
+from app.domain.services.inference_executor import run_in_inference_executor
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+MEDIA_JSON = "application/json"
+MEDIA_MSGPACK = "application/x-msgpack"
+MEDIA_ARROW = "application/vnd.apache.arrow.stream"
+
+# Tipo canônico -> nomes aceitos no Accept (ordem = preferência do servidor em empates)
+_ALIASES = {
+    MEDIA_JSON: (MEDIA_JSON,),
+    MEDIA_MSGPACK: (MEDIA_MSGPACK, "application/msgpack", "application/vnd.msgpack"),
+    MEDIA_ARROW: (MEDIA_ARROW,),
+}
+
+CAMPOS_PONTO = ("date", "prediction", "actual", "diff")
+
+
+def available_media_types() -> List[str]:
+    tipos = [MEDIA_JSON]
+    if msgpack is not None:
+        tipos.append(MEDIA_MSGPACK)
+    if pa is not None:
+        tipos.append(MEDIA_ARROW)
+    return tipos
+
+
+def available_encodings() -> List[str]:
+    return (["br"] if brotli is not None else []) + ["gzip"]
+
+
+def _preferencias(header: str) -> Dict[str, float]:
+    """Itens de um header Accept/Accept-Encoding -> q (sem q vale 1)."""
+    itens = {}
+    for parte in header.split(","):
+        campos = [c.strip() for c in parte.split(";")]
+        nome = campos[0].lower()
+        if not nome:
+            continue
+        q = 1.0
+        for campo in campos[1:]:
+            if campo.lower().startswith("q="):
+                try:
+                    q = float(campo[2:])
+                except ValueError:
+                    q = 0.0
+        itens[nome] = max(q, itens.get(nome, 0.0))
+    return itens
+
+
+def negotiate_media_type(accept: Optional[str]) -> str:
+    """Formato da resposta para o header Accept (o mais específico define o q de cada tipo)."""
+    if not accept or not accept.strip():
+        return MEDIA_JSON
+    pedidos = _preferencias(accept)
+
+    melhor, melhor_q = None, 0.0
+    for tipo in available_media_types():
+        q = max((pedidos[a] for a in _ALIASES[tipo] if a in pedidos), default=None)
+        if q is None:
+            q = pedidos.get(tipo.split("/")[0] + "/*", pedidos.get("*/*", 0.0))
+        if q > melhor_q:
+            melhor, melhor_q = tipo, q
+
+    if melhor is None:
+        raise HTTPException(
+            status_code=406,
+            detail=f"Nenhum formato aceitável em Accept: {accept}. Disponíveis: {', '.join(available_media_types())}.",
+        )
+    return melhor
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """Compressão preferida pelo cliente (br ou gzip), ou None."""
+    if not accept_encoding:
+        return None
+    pedidos = _preferencias(accept_encoding)
+    curinga = pedidos.get("*", 0.0)
+    candidatos = [(pedidos.get(enc, curinga), enc) for enc in available_encodings()]
+    q, enc = max(candidatos, key=lambda c: c[0])
+    return enc if q > 0 else None
+
+
+def encode_json(payload: Any) -> bytes:
+    if orjson is not None:
+        try:
+            return orjson.dumps(payload, option=orjson.OPT_SERIALIZE_NUMPY)
+        except TypeError:
+            pass  # tipo que o orjson não conhece: caminho padrão do FastAPI
+    return json.dumps(jsonable_encoder(payload), ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def _msgpack_default(valor):
+    # Tipos fora do modelo do msgpack (escalares NumPy, datas) no mesmo formato do JSON
+    if isinstance(valor, np.generic):
+        return valor.item()
+    return jsonable_encoder(valor)
+
+
+def encode_msgpack(payload: Any) -> bytes:
+    return msgpack.packb(payload, use_bin_type=True, default=_msgpack_default)
+
+
+def _colunas_pontos(data) -> Dict[str, list]:
+    if isinstance(data, dict):  # layout "columns"
+        return {"date": data["dates"], "prediction": data["predictions"], "actual": data["actuals"], "diff": data["diffs"]}
+    return {campo: [p.get(campo) for p in data] for campo in CAMPOS_PONTO}
+
+
+def arrow_table(payload: Any):
+    """Tabela Arrow de uma resposta de previsão (única ou lote); None se o payload não for tabular."""
+    if not isinstance(payload, dict):
+        return None
+
+    if isinstance(payload.get("data"), (list, dict)):
+        colunas = _colunas_pontos(payload["data"])
+        meta = {"ticker": payload.get("ticker"), "metadata": payload.get("metadata")}
+    elif isinstance(payload.get("results"), list):
+        colunas = {campo: [] for campo in ("ticker",) + CAMPOS_PONTO + ("error",)}
+        for item in payload["results"]:
+            pontos = _colunas_pontos(item.get("data", []))
+            erro = item.get("error")
+            n = max(len(pontos["date"]), 1 if erro is not None else 0)
+            colunas["ticker"] += [item.get("ticker")] * n
+            for campo in CAMPOS_PONTO:
+                colunas[campo] += pontos[campo] or [None] * n
+            erro = erro if erro is None or isinstance(erro, str) else json.dumps(erro, ensure_ascii=False)
+            colunas["error"] += [erro] * n
+        meta = {"metadata": payload.get("metadata")}
+    else:
+        return None
+
+    arrays = {}
+    for campo, valores in colunas.items():
+        if campo == "date":
+            # None vira NaT, que from_pandas=True grava como nulo
+            arrays[campo] = pa.array(np.array(valores, dtype="datetime64[D]"), type=pa.date32(), from_pandas=True)
+        elif campo in ("ticker", "error"):
+            arrays[campo] = pa.array(valores, type=pa.string())
+        else:
+            arrays[campo] = pa.array(valores, type=pa.float64())
+    tabela = pa.table(arrays)
+    return tabela.replace_schema_metadata({b"prediction": json.dumps(jsonable_encoder(meta)).encode()})
+
+
+def encode_arrow(tabela) -> bytes:
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, tabela.schema) as writer:
+        writer.write_table(tabela)
+    return sink.getvalue().to_pybytes()
+
+
+def encode_payload(payload: Any, media_type: str) -> Tuple[bytes, str]:
+    """(corpo, media type efetivo). Arrow de payload não tabular cai para JSON."""
+    if media_type == MEDIA_MSGPACK:
+        return encode_msgpack(payload), MEDIA_MSGPACK
+    if media_type == MEDIA_ARROW:
+        tabela = arrow_table(payload)
+        if tabela is not None:
+            return encode_arrow(tabela), MEDIA_ARROW
+    return encode_json(payload), MEDIA_JSON
+
+
+def compress(body: bytes, encoding: Optional[str]) -> Tuple[bytes, Optional[str]]:
+    """Comprime `body` se passar do limiar e o cliente aceitar; senão devolve como está."""
+    if encoding is None or len(body) < settings.RESPONSE_COMPRESSION_MIN_BYTES:
+        return body, None
+    if encoding == "br":
+        return brotli.compress(body, quality=settings.RESPONSE_BROTLI_QUALITY), "br"
+    return gzip.compress(body, compresslevel=settings.RESPONSE_GZIP_LEVEL), "gzip"
+
+
+def negotiated_media_type(request: Request) -> str:
+    """Dependência das rotas: negocia o formato antes do handler (406 sem gastar a inferência)."""
+    return negotiate_media_type(request.headers.get("accept"))
+
+
+def _response(body: bytes, media_type: str, encoding: Optional[str]) -> Response:
+    headers = {"Vary": "Accept, Accept-Encoding"}
+    if encoding is not None:
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type=media_type, headers=headers)
+
+
+def _encode_and_compress(payload: Any, media_type: str, encoding: Optional[str]) -> Tuple[bytes, str, Optional[str]]:
+    body, media_type = encode_payload(payload, media_type)
+    body, encoding = compress(body, encoding)
+    return body, media_type, encoding
+
+
+def encode_response(request: Request, payload: Any, media_type: Optional[str] = None) -> Response:
+    """Response no formato e compressão negociados com o cliente (respostas prontas passam direto)."""
+    if isinstance(payload, Response):
+        return payload
+
+    media_type = media_type or negotiate_media_type(request.headers.get("accept"))
+    return _response(*_encode_and_compress(payload, media_type, negotiate_encoding(request.headers.get("accept-encoding"))))
+
+
+def _num_pontos(payload: Any) -> int:
+    """Pontos de uma resposta de previsão (única ou lote), para estimar o custo da serialização."""
+    if not isinstance(payload, dict):
+        return 0
+    data = payload.get("data")
+    if isinstance(data, dict):  # layout "columns"
+        return len(data.get("dates") or ())
+    if isinstance(data, list):
+        return len(data)
+    if isinstance(payload.get("results"), list):
+        return sum(_num_pontos(item) for item in payload["results"])
+    return 0
+
+
+async def encode_response_async(request: Request, payload: Any, media_type: Optional[str] = None) -> Response:
+    """
+    Equivalente assíncrono de encode_response: respostas grandes são serializadas
+    e comprimidas no executor de inferência; as pequenas, no event loop, com a
+    compressão (se o corpo passar do limiar) no executor.
+    """
+    if isinstance(payload, Response):
+        return payload
+
+    media_type = media_type or negotiate_media_type(request.headers.get("accept"))
+    encoding = negotiate_encoding(request.headers.get("accept-encoding"))
+    if _num_pontos(payload) >= settings.RESPONSE_ENCODE_OFFLOAD_MIN_POINTS:
+        return _response(*await run_in_inference_executor(_encode_and_compress, payload, media_type, encoding))
+
+    body, media_type = encode_payload(payload, media_type)
+    if encoding is not None and len(body) >= settings.RESPONSE_COMPRESSION_MIN_BYTES:
+        body, encoding = await run_in_inference_executor(compress, body, encoding)
+    else:
+        encoding = None
+    return _response(body, media_type, encoding)
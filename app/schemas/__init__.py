@@ -1,3 +1,3 @@
-from .ticker_request import TickerRequestBetweenDates
+from .ticker_request import TickerRequestBetweenDates, TickerRequest, TickerBatchRequest
 
-__all__ = ["TickerRequestBetweenDates", "TickerRequest"]
+__all__ = ["TickerRequestBetweenDates", "TickerRequest", "TickerBatchRequest"]
@@ -1,12 +1,21 @@
 from pydantic import BaseModel, Field
 from datetime import date as Date
+from typing import List, Literal, Optional
 
 """Payloads da aplicação"""
 class TickerRequestBetweenDates(BaseModel):
     init_date: Date = Field(..., example="2025-06-01")
     end_date: Date = Field(..., example="2025-08-01")
     ticker: str = Field(..., example="ITUB4.SA")
+    model_id: Optional[int] = Field(None, example=41, description="nr_model do best_strategy_2.csv; omitido usa o modelo padrão")
+    layout: Literal["rows", "columns"] = Field("rows", description="'columns' devolve data como listas paralelas (dates, predictions, actuals, diffs)")
 
 class TickerRequest(BaseModel):
     target_date: Date = Field(..., example="2025-06-01")
     ticker: str = Field(..., example="ITUB4.SA")
+    model_id: Optional[int] = Field(None, example=41, description="nr_model do best_strategy_2.csv; omitido usa o modelo padrão")
+
+class TickerBatchRequest(BaseModel):
+    target_date: Date = Field(..., example="2025-06-01")
+    tickers: List[str] = Field(..., example=["ITUB4.SA", "PETR4.SA", "VALE3.SA"])
+    model_id: Optional[int] = Field(None, example=41, description="nr_model do best_strategy_2.csv; omitido usa o modelo padrão")
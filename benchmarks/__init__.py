@@ -0,0 +1 @@
+"""Benchmarks offline do caminho de previsão (sem rede)."""
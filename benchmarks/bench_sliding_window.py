@@ -0,0 +1,78 @@
+'''
+Benchmark da construção das janelas deslizantes normalizadas.
+
+Compara o pipeline antigo (loop Python + np.array + reshape/fit/transform +
+torch.from_numpy(...).float()) com build_normalized_windows (sliding_window_view +
+uma única cópia para o tensor float32), para séries de 1k a 20k pregões.
+
+Uso:
+    python -m benchmarks.bench_sliding_window
+'''
+
+import gc
+import time
+import tracemalloc
+
+import numpy as np
+import torch
+from sklearn.preprocessing import MinMaxScaler
+
+from app.domain.services.avaluation_model_service import build_normalized_windows
+
+SEQ_LENGTH = 30
+TAMANHOS = (1_000, 5_000, 10_000, 20_000)
+REPETICOES = 5
+
+
+def pipeline_loop(data_np, seq_length):
+    X, y = [], []
+    for i in range(len(data_np) - seq_length):
+        X.append(data_np[i:i + seq_length, :])
+        y.append(data_np[i + seq_length, 0])
+    X, y = np.array(X), np.array(y)
+
+    X_reshaped = X.reshape(-1, 1)
+    scaler = MinMaxScaler(feature_range=(-1, 1))
+    scaler.fit(X_reshaped)
+    X_norm = scaler.transform(X_reshaped).reshape(X.shape)
+    y_norm = scaler.transform(y.reshape(-1, 1))
+
+    X_test = torch.from_numpy(X_norm).float().unsqueeze(-1)
+    y_test = torch.from_numpy(y_norm).float().unsqueeze(1)
+    return X_test, y_test, scaler
+
+
+def medir(fn, data_np):
+    """
+    Retorna (melhor tempo em ms, pico de memória em MB).
+    O pico vem do tracemalloc e conta só alocações NumPy: a cópia extra feita por
+    `.float()` no pipeline antigo (memória do torch) não entra na medida.
+    """
+    tempos = []
+    for _ in range(REPETICOES):
+        gc.collect()
+        t0 = time.perf_counter()
+        fn(data_np, SEQ_LENGTH)
+        tempos.append((time.perf_counter() - t0) * 1000)
+
+    gc.collect()
+    tracemalloc.start()
+    resultado = fn(data_np, SEQ_LENGTH)
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del resultado
+    return min(tempos), pico / 2**20
+
+
+def main():
+    rng = np.random.default_rng(42)
+    print(f"{'barras':>8} | {'loop ms':>9} {'loop MB':>9} | {'strided ms':>10} {'strided MB':>10} | {'speedup':>7}")
+    for n in TAMANHOS:
+        data_np = (30 + rng.standard_normal(n).cumsum() * 0.3).reshape(-1, 1)
+        t_loop, m_loop = medir(pipeline_loop, data_np)
+        t_new, m_new = medir(build_normalized_windows, data_np)
+        print(f"{n:>8} | {t_loop:>9.2f} {m_loop:>9.2f} | {t_new:>10.2f} {m_new:>10.2f} | {t_loop / t_new:>6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
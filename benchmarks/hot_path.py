@@ -0,0 +1,279 @@
+'''
+Micro-benchmarks do caminho quente da previsão, com baselines em JSON.
+
+Tudo roda offline: séries de preço sintéticas (passeio aleatório com semente
+fixa) e um SimpleLSTM determinístico com a arquitetura do lstm_39 (hidden 64,
+2 camadas). Casos medidos:
+
+- create_sequences_multivariate e fit/transform do MinMaxNormalizer;
+- run_forecast com batch 1, 8, 64 e 256;
+- generate_recursive_forecast com 1, 20 e 60 passos;
+- PredictionResponseBuilder (500 pontos + build);
+- process_ticker de ponta a ponta (backtest + 20 dias de previsão recursiva),
+  com um provedor de dados falso no contexto.
+
+Uso:
+
+    # mede e grava a baseline
+    python -m benchmarks.hot_path run --output benchmarks/baselines/hot_path.json
+
+    # mede de novo e compara com a baseline (sai com código 1 se houver regressão)
+    python -m benchmarks.hot_path compare benchmarks/baselines/hot_path.json --threshold 0.10
+
+    # compara dois arquivos já gravados
+    python -m benchmarks.hot_path compare base.json atual.json
+
+A comparação usa a mediana de cada caso (ou --stat min_ms/p90_ms): regressão é
+valor atual maior que (1 + threshold) vezes o da baseline. Baselines só são
+comparáveis na mesma máquina e com o mesmo número de threads do torch
+(--threads, padrão 1); o metadata do JSON registra versões e ambiente.
+'''
+
+import argparse
+import json
+import platform
+import statistics
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import sklearn
+import torch
+
+from app.config.settings import get_settings
+from app.domain.command_handlers.avaluation_command_handler import process_ticker
+from app.domain.results.prediction_response_builder import PredictionResponseBuilder
+from app.domain.services.avaluation_model_service import (
+    SimpleLSTM, create_sequences_multivariate, generate_recursive_forecast, run_forecast,
+)
+from app.domain.services.market_data_context import MarketDataContext
+from app.domain.services.normalizer import MinMaxNormalizer
+from app.schemas.ticker_request import TickerRequestBetweenDates
+
+settings = get_settings()
+
+SEED = 20251120
+SEQ_LENGTH = 30
+N_BARRAS = 2_000
+BATCH_SIZES = (1, 8, 64, 256)
+PASSOS_RECURSIVOS = (1, 20, 60)
+PONTOS_RESPOSTA = 500
+THRESHOLD_PADRAO = 0.10
+ULTIMO_PREGAO = pd.Timestamp("2025-06-02")
+BASELINE_PADRAO = Path(__file__).resolve().parent / "baselines" / "hot_path.json"
+
+
+def modelo_deterministico() -> SimpleLSTM:
+    """SimpleLSTM com a arquitetura do lstm_39 e pesos fixos pela semente."""
+    torch.manual_seed(SEED)
+    return SimpleLSTM(input_size=1, hidden_size=64, num_layers=2, output_size=1, dropout_prob=0.0).eval()
+
+
+def serie_sintetica(n: int = N_BARRAS, seed: int = SEED) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    return (30.0 * np.exp(np.cumsum(rng.normal(0.0, 0.015, size=n)))).reshape(-1, 1)
+
+
+def provedor_falso(ticker, data_inicial, data_final) -> pd.DataFrame:
+    """
+    Histórico diário sintético em [data_inicial, data_final), no formato do price
+    store, até ULTIMO_PREGAO (o que vier depois é previsão recursiva).
+    """
+    fim = min(pd.Timestamp(data_final) - pd.Timedelta(days=1), ULTIMO_PREGAO)
+    idx = pd.bdate_range(pd.Timestamp(data_inicial), fim, name="Date")
+    close = serie_sintetica(len(idx)).reshape(-1)
+    return pd.DataFrame({"Close": close, "High": close, "Low": close, "Open": close, "Volume": 1e6}, index=idx)
+
+
+def _janelas(batch_size: int) -> torch.Tensor:
+    gerador = torch.Generator().manual_seed(batch_size)
+    return (torch.rand((batch_size, SEQ_LENGTH, 1, 1), generator=gerador) * 2 - 1)
+
+
+def casos() -> Dict[str, Callable[[], object]]:
+    """Nome do caso -> função sem argumentos medida a cada repetição."""
+    modelo = modelo_deterministico()
+    dados = serie_sintetica()
+    X, _ = create_sequences_multivariate(dados, SEQ_LENGTH)
+    janelas_flat = X.reshape(-1, 1)
+
+    registro: Dict[str, Callable[[], object]] = {
+        "create_sequences_multivariate": lambda: create_sequences_multivariate(dados, SEQ_LENGTH),
+        "scaler_fit_transform": lambda: MinMaxNormalizer(feature_range=(-1, 1)).fit(janelas_flat).transform(janelas_flat),
+    }
+
+    for batch_size in BATCH_SIZES:
+        janelas = _janelas(batch_size)
+        registro[f"run_forecast_batch_{batch_size}"] = lambda j=janelas: run_forecast(modelo, j)
+
+    scaler = MinMaxNormalizer(feature_range=(-1, 1)).fit(dados[-SEQ_LENGTH:])
+    ultima_janela = _janelas(1)[0]
+    ultima_data = ULTIMO_PREGAO
+    for passos in PASSOS_RECURSIVOS:
+        alvo = ultima_data + pd.offsets.BDay(passos)
+        registro[f"recursive_forecast_{passos}_steps"] = lambda a=alvo: generate_recursive_forecast(
+            modelo, scaler, ultima_janela, 0.0, ultima_data, a, mode="exact"
+        )
+
+    datas = pd.bdate_range("2023-01-02", periods=PONTOS_RESPOSTA)
+    preds = dados[:PONTOS_RESPOSTA, 0].tolist()
+    reais = dados[1:PONTOS_RESPOSTA + 1, 0].tolist()
+    registro[f"response_builder_{PONTOS_RESPOSTA}_points"] = lambda: (
+        PredictionResponseBuilder()
+        .set_ticker("BENCH3.SA")
+        .set_metadata(model_version=settings.MODEL_VERSION, period_type="janela_deslizante")
+        .add_batch_predictions(list(datas), preds, reais)
+        .build()
+    )
+
+    # 100 pregões de backtest e 20 dias úteis de previsão recursiva
+    req = TickerRequestBetweenDates(init_date="2025-01-10", end_date="2025-06-30", ticker="BENCH3.SA")
+    registro["process_ticker_end_to_end"] = lambda: process_ticker(
+        req, modelo, MarketDataContext.for_request(req, fetcher=provedor_falso)
+    )
+    return registro
+
+
+def medir(fn: Callable[[], object], repeticoes: int, aquecimento: int) -> Dict[str, float]:
+    """Mediana, mínimo e p90 (ms) de `repeticoes` chamadas, depois de `aquecimento` chamadas."""
+    with torch.inference_mode():
+        for _ in range(aquecimento):
+            fn()
+        tempos = []
+        for _ in range(repeticoes):
+            inicio = time.perf_counter()
+            fn()
+            tempos.append((time.perf_counter() - inicio) * 1000)
+    tempos.sort()
+    return {
+        "median_ms": statistics.median(tempos),
+        "min_ms": tempos[0],
+        "p90_ms": tempos[min(len(tempos) - 1, int(len(tempos) * 0.9))],
+        "repeats": repeticoes,
+    }
+
+
+def ambiente() -> dict:
+    return {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "torch": torch.__version__,
+        "sklearn": sklearn.__version__,
+        "torch_threads": torch.get_num_threads(),
+    }
+
+
+def run_suite(filtro: Optional[str] = None, repeticoes: int = 50, aquecimento: int = 5) -> dict:
+    resultados = {}
+    for nome, fn in casos().items():
+        if filtro and filtro not in nome:
+            continue
+        resultados[nome] = medir(fn, repeticoes, aquecimento)
+    return {"metadata": ambiente(), "results": resultados}
+
+
+def compare(baseline: dict, atual: dict, threshold: float = THRESHOLD_PADRAO,
+            estatistica: str = "median_ms") -> Tuple[List[dict], List[str]]:
+    """
+    Compara `estatistica` (mediana, por padrão) caso a caso. Retorna (linhas, regressões):
+    cada linha tem baseline, atual, razão e status ("ok", "regression",
+    "improvement", "new" ou "missing").
+    """
+    linhas, regressoes = [], []
+    base, novo = baseline["results"], atual["results"]
+    for nome in sorted(set(base) | set(novo)):
+        if nome not in base or nome not in novo:
+            linhas.append({"case": nome, "status": "new" if nome not in base else "missing"})
+            continue
+        razao = novo[nome][estatistica] / base[nome][estatistica]
+        if razao > 1 + threshold:
+            status = "regression"
+            regressoes.append(nome)
+        elif razao < 1 - threshold:
+            status = "improvement"
+        else:
+            status = "ok"
+        linhas.append({
+            "case": nome,
+            "baseline_ms": base[nome][estatistica],
+            "current_ms": novo[nome][estatistica],
+            "ratio": razao,
+            "status": status,
+        })
+    return linhas, regressoes
+
+
+def _imprimir_resultados(relatorio: dict) -> None:
+    print(f"{'caso':<36} | {'mediana ms':>10} {'mín ms':>9} {'p90 ms':>9}")
+    for nome, r in relatorio["results"].items():
+        print(f"{nome:<36} | {r['median_ms']:>10.3f} {r['min_ms']:>9.3f} {r['p90_ms']:>9.3f}")
+
+
+def _imprimir_comparacao(linhas: List[dict], threshold: float) -> None:
+    print(f"{'caso':<36} | {'baseline ms':>11} {'atual ms':>9} {'razão':>6} | status (limite +{threshold:.0%})")
+    for linha in linhas:
+        if "ratio" not in linha:
+            print(f"{linha['case']:<36} | {'-':>11} {'-':>9} {'-':>6} | {linha['status']}")
+            continue
+        print(f"{linha['case']:<36} | {linha['baseline_ms']:>11.3f} {linha['current_ms']:>9.3f} "
+              f"{linha['ratio']:>6.2f} | {linha['status']}")
+
+
+def _ler(path) -> dict:
+    return json.loads(Path(path).read_text())
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Micro-benchmarks do caminho quente da previsão.")
+    parser.add_argument("--threads", type=int, default=1, help="torch.set_num_threads (padrão 1, para estabilidade)")
+    parser.add_argument("--repeats", type=int, default=50, help="Repetições medidas por caso")
+    parser.add_argument("--warmup", type=int, default=5, help="Chamadas de aquecimento por caso")
+    parser.add_argument("--filter", default=None, help="Só os casos cujo nome contém este texto")
+    sub = parser.add_subparsers(dest="comando", required=True)
+
+    p_run = sub.add_parser("run", help="Mede a suíte e grava os resultados em JSON")
+    p_run.add_argument("--output", default=str(BASELINE_PADRAO), help="Arquivo JSON de saída")
+
+    p_cmp = sub.add_parser("compare", help="Compara com uma baseline e aponta regressões")
+    p_cmp.add_argument("baseline", help="JSON da baseline")
+    p_cmp.add_argument("current", nargs="?", help="JSON atual (omitido: mede agora)")
+    p_cmp.add_argument("--threshold", type=float, default=THRESHOLD_PADRAO,
+                       help="Aumento relativo máximo da mediana (padrão 0.10)")
+    p_cmp.add_argument("--stat", choices=("median_ms", "min_ms", "p90_ms"), default="median_ms",
+                       help="Estatística comparada (min_ms é menos sensível a ruído de máquina compartilhada)")
+
+    args = parser.parse_args(argv)
+    if args.comando == "run" or args.current is None:
+        torch.set_num_threads(args.threads)
+
+    if args.comando == "run":
+        relatorio = run_suite(args.filter, args.repeats, args.warmup)
+        saida = Path(args.output)
+        saida.parent.mkdir(parents=True, exist_ok=True)
+        saida.write_text(json.dumps(relatorio, indent=2))
+        _imprimir_resultados(relatorio)
+        print(f"\nBaseline gravada em {saida}")
+        return 0
+
+    baseline = _ler(args.baseline)
+    atual = _ler(args.current) if args.current else run_suite(args.filter, args.repeats, args.warmup)
+    if args.filter:
+        baseline = {**baseline, "results": {k: v for k, v in baseline["results"].items() if args.filter in k}}
+    linhas, regressoes = compare(baseline, atual, args.threshold, args.stat)
+    _imprimir_comparacao(linhas, args.threshold)
+    if regressoes:
+        print(f"\n{len(regressoes)} regressão(ões): {', '.join(regressoes)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
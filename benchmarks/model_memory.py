@@ -0,0 +1,137 @@
+'''
+Tempo de startup e memória por worker: pesos .pkl x mmap, com e sem preload.
+
+Para cada cenário sobe N workers como o servidor faria e, com todos vivos ao
+mesmo tempo, mede em cada um o RSS e o PSS depois de carregar o modelo e rodar
+um forward:
+
+- sem preload: workers criados por spawn (como o uvicorn --workers), cada um
+  importa o app e carrega o modelo;
+- com preload: um processo pai importa o app e chama preload_model, e os
+  workers são criados por fork (como o gunicorn --preload).
+
+A soma do PSS é o consumo real do conjunto (páginas compartilhadas divididas
+entre os processos). "startup_s" vai da criação do processo até o modelo pronto.
+O artefato .weights.pt é gerado antes, fora da medição.
+
+Uso:
+
+    python -m benchmarks.model_memory
+    python -m benchmarks.model_memory --workers 8 --output model_memory.json
+'''
+
+import argparse
+import json
+import multiprocessing
+import statistics
+import time
+from pathlib import Path
+
+from app.config.settings import get_settings
+
+settings = get_settings()
+
+CENARIOS = (("pickle", False), ("mmap", False), ("pickle", True), ("mmap", True))
+
+
+def _worker(formato, model_path, fila, barreira, criado_em) -> None:
+    import torch
+
+    import app  # noqa: F401 (o que o worker do servidor importa)
+    from app.config.process_memory import memory_snapshot
+    from app.domain.services.ml_handler import ml_handler
+
+    ml_handler.settings.MODEL_WEIGHTS_FORMAT = formato
+    inicio = time.perf_counter()
+    modelo = ml_handler.carregar_modelo_global(model_path)
+    carga = time.perf_counter() - inicio
+    with torch.inference_mode():
+        modelo(torch.zeros(1, settings.SEQ_LENGTH, 1))
+    pronto_em = time.time()
+
+    barreira.wait()  # todos vivos: o PSS divide as páginas entre eles
+    fila.put({"startup_s": pronto_em - criado_em, "load_s": carga, **memory_snapshot()})
+    barreira.wait()
+
+
+def _supervisor(formato, preload, workers, model_path, saida) -> None:
+    if preload:
+        import app  # noqa: F401
+        from app.domain.services.ml_handler import ml_handler
+
+        ml_handler.settings.MODEL_WEIGHTS_FORMAT = formato
+        ml_handler.preload_model(model_path)
+        contexto = multiprocessing.get_context("fork")
+    else:
+        contexto = multiprocessing.get_context("spawn")
+
+    fila, barreira = contexto.Queue(), contexto.Barrier(workers)
+    processos = [contexto.Process(target=_worker, args=(formato, model_path, fila, barreira, time.time()))
+                 for _ in range(workers)]
+    for p in processos:
+        p.start()
+    medidas = [fila.get() for _ in range(workers)]
+    for p in processos:
+        p.join()
+    saida.put(medidas)
+
+
+def medir_cenario(formato: str, preload: bool, workers: int, model_path) -> dict:
+    contexto = multiprocessing.get_context("spawn")
+    saida = contexto.Queue()
+    supervisor = contexto.Process(target=_supervisor, args=(formato, preload, workers, str(model_path), saida))
+    supervisor.start()
+    medidas = saida.get()
+    supervisor.join()
+
+    def media(campo):
+        valores = [m[campo] for m in medidas if campo in m]
+        return round(statistics.fmean(valores), 1) if valores else None
+
+    return {
+        "workers": workers,
+        "startup_s_median": round(statistics.median(m["startup_s"] for m in medidas), 3),
+        "load_s_median": round(statistics.median(m["load_s"] for m in medidas), 4),
+        "rss_mb_mean": media("rss_mb"),
+        "pss_mb_mean": media("pss_mb"),
+        "pss_mb_total": round(sum(m["pss_mb"] for m in medidas), 1) if all("pss_mb" in m for m in medidas) else None,
+    }
+
+
+def run_suite(workers: int = 4, model_path=None) -> dict:
+    from app.domain.services.ml_handler.ml_handler import carregar_modelo_mmap
+
+    model_path = Path(model_path or settings.MODEL_PATH)
+    carregar_modelo_mmap(model_path)  # gera o .weights.pt fora da medição
+
+    resultados = {}
+    for formato, preload in CENARIOS:
+        if preload and "fork" not in multiprocessing.get_all_start_methods():
+            continue
+        resultados[f"{formato}{'+preload' if preload else ''}"] = medir_cenario(formato, preload, workers, model_path)
+    return {"metadata": {"model": str(model_path), "workers": workers}, "results": resultados}
+
+
+def _imprimir(relatorio: dict) -> None:
+    print(f"{'cenário':<16} | {'startup s':>9} {'carga s':>8} {'RSS MB':>8} {'PSS MB':>8} {'PSS total':>9}")
+    for nome, r in relatorio["results"].items():
+        pss = f"{r['pss_mb_mean']:>8.1f} {r['pss_mb_total']:>9.1f}" if r["pss_mb_total"] is not None else f"{'-':>8} {'-':>9}"
+        print(f"{nome:<16} | {r['startup_s_median']:>9.3f} {r['load_s_median']:>8.4f} {r['rss_mb_mean']:>8.1f} {pss}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Startup e memória por worker com pesos .pkl/mmap, com e sem preload.")
+    parser.add_argument("--workers", type=int, default=4, help="Workers por cenário")
+    parser.add_argument("--model", default=str(settings.MODEL_PATH), help="Modelo .pkl")
+    parser.add_argument("--output", default=None, help="Grava os resultados em JSON")
+    args = parser.parse_args(argv)
+
+    relatorio = run_suite(args.workers, args.model)
+    _imprimir(relatorio)
+    if args.output:
+        Path(args.output).write_text(json.dumps(relatorio, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
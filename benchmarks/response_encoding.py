@@ -0,0 +1,121 @@
+'''
+Benchmark das codificações de resposta (response_encoding) para um intervalo de 2 anos.
+
+Monta a resposta de previsao-entre-datas de ~2 anos de pregões (backtest) mais
+20 dias úteis de previsão recursiva, nos layouts "rows" e "columns", e mede para
+cada formato e compressão o tempo de codificação (serialização + compressão) e
+os bytes que vão para a rede. A referência "fastapi_json" é o caminho padrão do
+FastAPI (jsonable_encoder + json.dumps do JSONResponse).
+
+Formatos cujo pacote não está instalado (msgpack, pyarrow, brotli) aparecem
+como indisponíveis.
+
+Uso:
+
+    python -m benchmarks.response_encoding
+    python -m benchmarks.response_encoding --days 504 --repeats 30 --output encoding.json
+'''
+
+import argparse
+import gzip
+import json
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+import numpy as np
+import pandas as pd
+from fastapi.encoders import jsonable_encoder
+
+from app.config.settings import get_settings
+from app.domain.results.prediction_response_builder import PredictionResponseBuilder
+from app.routers import response_encoding as enc
+from benchmarks.hot_path import SEED, ambiente, medir
+
+settings = get_settings()
+
+DIAS_PADRAO = 504  # ~2 anos de pregões
+DIAS_FUTUROS = 20
+
+
+def resposta_sintetica(dias: int = DIAS_PADRAO, layout: str = "rows", seed: int = SEED) -> dict:
+    rng = np.random.default_rng(seed)
+    reais = 30.0 * np.exp(np.cumsum(rng.normal(0.0, 0.015, size=dias)))
+    preds = reais * (1 + rng.normal(0.0, 0.01, size=dias))
+    datas = pd.bdate_range("2023-06-01", periods=dias + DIAS_FUTUROS)
+    futuras = preds[-1] * np.exp(np.cumsum(rng.normal(0.0, 0.01, size=DIAS_FUTUROS)))
+    return (PredictionResponseBuilder()
+            .set_ticker("BENCH3.SA")
+            .set_metadata(model_version=settings.MODEL_VERSION, period_type="janela_deslizante")
+            .add_batch_predictions(datas[:dias], preds, reais)
+            .add_batch_predictions(datas[dias:], futuras)
+            .build(layout=layout))
+
+
+def _fastapi_json(payload) -> bytes:
+    # O que o JSONResponse faz hoje com response_model=dict
+    return json.dumps(jsonable_encoder(payload), ensure_ascii=False, allow_nan=False,
+                      indent=None, separators=(",", ":")).encode("utf-8")
+
+
+def codificadores() -> Dict[str, Optional[Callable[[dict], bytes]]]:
+    """Nome -> função payload -> bytes (None quando o pacote não está instalado)."""
+    return {
+        "fastapi_json": _fastapi_json,
+        "orjson": (lambda p: enc.encode_json(p)) if enc.orjson is not None else None,
+        "msgpack": enc.encode_msgpack if enc.msgpack is not None else None,
+        "arrow": (lambda p: enc.encode_arrow(enc.arrow_table(p))) if enc.pa is not None else None,
+    }
+
+
+def compressores() -> Dict[str, Optional[Callable[[bytes], bytes]]]:
+    return {
+        "identity": lambda b: b,
+        "gzip": lambda b: gzip.compress(b, compresslevel=settings.RESPONSE_GZIP_LEVEL),
+        "br": (lambda b: enc.brotli.compress(b, quality=settings.RESPONSE_BROTLI_QUALITY))
+        if enc.brotli is not None else None,
+    }
+
+
+def run_suite(dias: int = DIAS_PADRAO, repeticoes: int = 30, aquecimento: int = 3) -> dict:
+    resultados = {}
+    for layout in ("rows", "columns"):
+        payload = resposta_sintetica(dias, layout)
+        for nome_fmt, codificar in codificadores().items():
+            for nome_comp, comprimir in compressores().items():
+                caso = f"{layout}/{nome_fmt}/{nome_comp}"
+                if codificar is None or comprimir is None:
+                    resultados[caso] = {"available": False}
+                    continue
+                fn = lambda c=codificar, z=comprimir: z(c(payload))
+                resultados[caso] = {"available": True, "bytes": len(fn()), **medir(fn, repeticoes, aquecimento)}
+    return {"metadata": {**ambiente(), "days": dias, "future_days": DIAS_FUTUROS}, "results": resultados}
+
+
+def _imprimir(relatorio: dict) -> None:
+    base = relatorio["results"].get("rows/fastapi_json/identity", {})
+    print(f"{'layout/formato/compressão':<32} | {'mediana ms':>10} {'bytes':>9} {'vs fastapi':>10}")
+    for caso, r in relatorio["results"].items():
+        if not r["available"]:
+            print(f"{caso:<32} | {'indisponível':>10}")
+            continue
+        razao = r["median_ms"] / base["median_ms"] if base.get("median_ms") else float("nan")
+        print(f"{caso:<32} | {r['median_ms']:>10.3f} {r['bytes']:>9d} {razao:>9.2f}x")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Tempo de codificação e bytes na rede por formato de resposta.")
+    parser.add_argument("--days", type=int, default=DIAS_PADRAO, help="Pregões de backtest (padrão ~2 anos)")
+    parser.add_argument("--repeats", type=int, default=30, help="Repetições medidas por caso")
+    parser.add_argument("--warmup", type=int, default=3, help="Chamadas de aquecimento por caso")
+    parser.add_argument("--output", default=None, help="Grava os resultados em JSON")
+    args = parser.parse_args(argv)
+
+    relatorio = run_suite(args.days, args.repeats, args.warmup)
+    _imprimir(relatorio)
+    if args.output:
+        Path(args.output).write_text(json.dumps(relatorio, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
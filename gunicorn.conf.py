@@ -0,0 +1,36 @@
+'''
+Vários workers uvicorn sob o gunicorn, com o app e o modelo carregados antes do fork.
+
+Com preload_app o processo pai importa o app uma vez, e o hook on_starting
+carrega o modelo padrão (preload_model) ainda no pai: os workers herdam essas
+páginas por copy-on-write e o lifespan de cada um reaproveita o modelo em vez
+de importar e carregar tudo de novo. Os pesos no formato mmap
+(Settings.MODEL_WEIGHTS_FORMAT) já são compartilhados pelo page cache mesmo
+sem o preload.
+
+Uso (é o CMD do Dockerfile):
+
+    gunicorn -c gunicorn.conf.py app:app
+
+O tempo de carga e a memória de cada worker saem no log de startup e em
+GET /api/v1/process/memory.
+'''
+
+import os
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", "4"))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+
+
+def on_starting(server):
+    # Roda no processo pai, antes do fork dos workers
+    from app.config.settings import get_settings
+    from app.domain.services.ml_handler.ml_handler import preload_model
+
+    try:
+        preload_model(get_settings().MODEL_PATH)
+    except Exception as e:
+        # Sem o preload cada worker carrega o modelo no próprio lifespan
+        server.log.error("Falha ao pré-carregar o modelo: %r", e)
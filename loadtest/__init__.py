@@ -0,0 +1 @@
+"""Teste de carga HTTP offline da API (provedor de preços falso, sem Yahoo)."""
@@ -0,0 +1,114 @@
+'''
+Provedor de preços falso: imita o endpoint de chart do Yahoo (/v8/finance/chart/{symbol}).
+
+A API é apontada para ele via Settings.YAHOO_CHART_URL, então todo o caminho
+assíncrono (httpx, price store, validadores) roda sem alteração. Configurável:
+
+- latência fixa + jitter por resposta (asyncio.sleep, não ocupa thread);
+- taxa de erro: fração das respostas que volta HTTP 500 (sorteio com semente);
+- séries determinísticas (as mesmas do SyntheticProvider): o fechamento de cada pregão depende só do ticker e
+  da data, então recortes diferentes do mesmo ticker sempre coincidem;
+- tickers inexistentes: os que começam com INVALID recebem 404.
+
+Uso isolado:
+
+    python -m loadtest.fake_yahoo --port 8900 --latency-ms 80 --error-rate 0.01
+'''
+
+import argparse
+import asyncio
+import random
+from typing import Optional
+
+import pandas as pd
+from fastapi import FastAPI, HTTPException, Query
+
+from app.domain.services.market_data_provider import PREFIXO_INEXISTENTE, serie_deterministica
+
+def chart_payload(symbol: str, frame: pd.DataFrame) -> dict:
+    """Resposta no formato do endpoint de chart (o que parse_chart_response espera)."""
+    # Pregão às 10h de Brasília (13h UTC), em segundos desde a época
+    timestamps = (frame.index + pd.Timedelta(hours=13) - pd.Timestamp("1970-01-01")) // pd.Timedelta(seconds=1)
+    return {
+        "chart": {
+            "result": [{
+                "meta": {"symbol": symbol, "exchangeTimezoneName": "America/Sao_Paulo"},
+                "timestamp": timestamps.tolist(),
+                "indicators": {
+                    "quote": [{
+                        "close": frame["Close"].tolist(),
+                        "high": frame["High"].tolist(),
+                        "low": frame["Low"].tolist(),
+                        "open": frame["Open"].tolist(),
+                        "volume": frame["Volume"].tolist(),
+                    }],
+                    "adjclose": [{"adjclose": frame["Close"].tolist()}],
+                },
+            }],
+            "error": None,
+        }
+    }
+
+
+def create_fake_yahoo_app(latency_ms: float = 0.0, jitter_ms: float = 0.0, error_rate: float = 0.0,
+                          seed: int = 0, today=None) -> FastAPI:
+    """App FastAPI do provedor falso. `today` fixa o último pregão disponível (padrão: hoje)."""
+    app = FastAPI(title="Fake Yahoo chart")
+    sorteio = random.Random(seed)
+    app.state.requests = 0
+    app.state.errors = 0
+
+    @app.get("/v8/finance/chart/{symbol}")
+    async def chart(
+        symbol: str,
+        period1: Optional[int] = Query(None),
+        period2: Optional[int] = Query(None),
+        range_: Optional[str] = Query(None, alias="range"),
+    ):
+        app.state.requests += 1
+        espera = latency_ms + (sorteio.uniform(-jitter_ms, jitter_ms) if jitter_ms else 0.0)
+        if espera > 0:
+            await asyncio.sleep(espera / 1000.0)
+        if error_rate and sorteio.random() < error_rate:
+            app.state.errors += 1
+            raise HTTPException(status_code=500, detail="Erro injetado pelo provedor falso.")
+        if symbol.upper().startswith(PREFIXO_INEXISTENTE):
+            raise HTTPException(status_code=404, detail="No data found, symbol may be delisted")
+
+        hoje = pd.Timestamp(today or pd.Timestamp.today()).normalize()
+        if range_ is not None:
+            inicio, fim = hoje - pd.Timedelta(days=7), hoje + pd.Timedelta(days=1)
+        else:
+            inicio = pd.Timestamp(period1 or 0, unit="s")
+            fim = min(pd.Timestamp(period2, unit="s") if period2 else hoje, hoje + pd.Timedelta(days=1))
+        frame = serie_deterministica(symbol, inicio, fim)
+        if range_ is not None:
+            frame = frame.iloc[-1:]
+        return chart_payload(symbol, frame)
+
+    @app.get("/stats")
+    def stats():
+        return {"requests": app.state.requests, "errors": app.state.errors}
+
+    return app
+
+
+def main(argv=None) -> int:
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Provedor falso do endpoint de chart do Yahoo.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Latência por resposta")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="Variação uniforme (+/-) da latência")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fração de respostas HTTP 500")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    app = create_fake_yahoo_app(args.latency_ms, args.jitter_ms, args.error_rate, args.seed)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,391 @@
+'''
+Teste de carga HTTP da API, sem Yahoo.
+
+Sobe o provedor falso (loadtest.fake_yahoo) e a API real apontada para ele
+(loadtest.server, com N workers do uvicorn), dispara requisições de
+/api/v1/previsao-dia e /api/v1/previsao-entre-datas com concorrência e mix
+configuráveis e reporta, para cada nível de concorrência:
+
+- throughput (req/s) e latência p50/p95/p99 por endpoint;
+- taxa de erros (5xx/exceções) e de 4xx (tickers inexistentes injetados);
+- CPU (% de um núcleo, média e pico) e RSS (MB, pico) do servidor, somando os workers.
+
+Exemplos:
+
+    # varredura de concorrência com 2 workers e 1 thread do torch por worker
+    python -m loadtest.run --concurrency 1,8,32 --duration 20 --workers 2 --torch-threads 1
+
+    # upstream lento e instável, sem price store (toda requisição vai ao provedor)
+    python -m loadtest.run --latency-ms 150 --jitter-ms 50 --error-rate 0.02 --no-price-store
+
+    # contra uma API já rodando (não sobe nada; sem métricas de CPU/RSS)
+    python -m loadtest.run --target http://127.0.0.1:8000 --mix dia=1
+
+As requisições são sorteadas com semente fixa (--seed), então duas execuções
+com os mesmos parâmetros enviam a mesma sequência.
+'''
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+import numpy as np
+import pandas as pd
+
+from loadtest.fake_yahoo import PREFIXO_INEXISTENTE
+
+ENDPOINTS = {
+    "dia": "/api/v1/previsao-dia",
+    "entre": "/api/v1/previsao-entre-datas",
+}
+TICKERS_PADRAO = ("PETR4.SA", "VALE3.SA", "ITUB4.SA", "BBDC4.SA", "BBAS3.SA", "ABEV3.SA", "WEGE3.SA", "RENT3.SA")
+_PAGINA = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+_TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+
+
+# ------------------------------------------------------------------ requisições
+def parse_mix(texto: str) -> Dict[str, float]:
+    """"dia=0.7,entre=0.3" -> pesos normalizados por endpoint."""
+    pesos = {}
+    for parte in texto.split(","):
+        nome, _, peso = parte.partition("=")
+        nome = nome.strip()
+        if nome not in ENDPOINTS:
+            raise ValueError(f"Endpoint desconhecido no mix: {nome}. Use {tuple(ENDPOINTS)}.")
+        pesos[nome] = float(peso or 1.0)
+    total = sum(pesos.values())
+    return {nome: peso / total for nome, peso in pesos.items()}
+
+
+class RequestGenerator:
+    """Sequência determinística de (endpoint, payload) segundo o mix."""
+
+    def __init__(self, mix: Dict[str, float], tickers, invalid_rate: float = 0.0, seed: int = 0, hoje=None):
+        self._mix = list(mix.items())
+        self._tickers = list(tickers)
+        self._invalid_rate = invalid_rate
+        self._sorteio = random.Random(seed)
+        self._hoje = pd.Timestamp(hoje or pd.Timestamp.today()).normalize()
+        self._lock = threading.Lock()
+
+    def _ticker(self) -> str:
+        if self._invalid_rate and self._sorteio.random() < self._invalid_rate:
+            return f"{PREFIXO_INEXISTENTE}{self._sorteio.randint(0, 999)}.SA"
+        return self._sorteio.choice(self._tickers)
+
+    def _dia(self, dias_atras: int) -> str:
+        return (self._hoje - pd.offsets.BDay(dias_atras)).strftime("%Y-%m-%d")
+
+    def next(self) -> Tuple[str, dict]:
+        with self._lock:
+            nome = self._sorteio.choices([m[0] for m in self._mix], weights=[m[1] for m in self._mix])[0]
+            ticker = self._ticker()
+            if nome == "dia":
+                # Histórico recente ou até 5 dias úteis à frente
+                payload = {"ticker": ticker, "target_date": self._dia(self._sorteio.randint(-5, 250))}
+            else:
+                # Períodos de 45 a 120 pregões (a API exige pelo menos 60 dias corridos)
+                fim = self._sorteio.randint(-10, 120)
+                payload = {"ticker": ticker, "init_date": self._dia(fim + self._sorteio.randint(45, 120)),
+                           "end_date": self._dia(fim)}
+            return nome, payload
+
+
+# ------------------------------------------------------------ métricas do servidor
+def _pids_do_processo(pid: int) -> List[int]:
+    """O processo e seus descendentes (workers do uvicorn), via /proc."""
+    filhos: Dict[int, List[int]] = {}
+    for entrada in Path("/proc").iterdir():
+        if not entrada.name.isdigit():
+            continue
+        try:
+            ppid = int((entrada / "stat").read_text().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        filhos.setdefault(ppid, []).append(int(entrada.name))
+
+    pids, pendentes = [], [pid]
+    while pendentes:
+        atual = pendentes.pop()
+        pids.append(atual)
+        pendentes.extend(filhos.get(atual, []))
+    return pids
+
+
+def amostra_recursos(pid: int) -> Tuple[float, float]:
+    """(tempo de CPU em s, RSS em MB) do processo e descendentes. Usa psutil se instalado."""
+    try:
+        import psutil
+    except ImportError:
+        psutil = None
+
+    if psutil is not None:
+        raiz = psutil.Process(pid)
+        processos = [raiz] + raiz.children(recursive=True)
+        cpu = rss = 0.0
+        for p in processos:
+            try:
+                tempos = p.cpu_times()
+                cpu += tempos.user + tempos.system
+                rss += p.memory_info().rss
+            except psutil.Error:
+                continue
+        return cpu, rss / 2**20
+
+    cpu = rss = 0.0
+    for p in _pids_do_processo(pid):
+        try:
+            campos = Path(f"/proc/{p}/stat").read_text().rsplit(")", 1)[1].split()
+        except OSError:
+            continue
+        cpu += (int(campos[11]) + int(campos[12])) / _TICKS
+        rss += int(campos[21]) * _PAGINA
+    return cpu, rss / 2**20
+
+
+class ResourceSampler:
+    """Amostra CPU/RSS do servidor em background durante uma fase do teste."""
+
+    def __init__(self, pid: Optional[int], intervalo: float = 0.5):
+        self._pid = pid
+        self._intervalo = intervalo
+        self._parar = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.cpu_percent: List[float] = []
+        self.rss_mb: List[float] = []
+
+    def __enter__(self) -> "ResourceSampler":
+        if self._pid is not None:
+            self._thread = threading.Thread(target=self._loop, daemon=True)
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._parar.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _loop(self) -> None:
+        cpu_anterior, _ = amostra_recursos(self._pid)
+        t_anterior = time.perf_counter()
+        while not self._parar.wait(self._intervalo):
+            cpu, rss = amostra_recursos(self._pid)
+            agora = time.perf_counter()
+            self.cpu_percent.append(100.0 * (cpu - cpu_anterior) / (agora - t_anterior))
+            self.rss_mb.append(rss)
+            cpu_anterior, t_anterior = cpu, agora
+
+    def summary(self) -> Optional[dict]:
+        if not self.rss_mb:
+            return None
+        return {
+            "cpu_percent_avg": float(np.mean(self.cpu_percent)),
+            "cpu_percent_max": float(np.max(self.cpu_percent)),
+            "rss_mb_max": float(np.max(self.rss_mb)),
+            "rss_mb_end": float(self.rss_mb[-1]),
+        }
+
+
+# ------------------------------------------------------------------- execução
+def summarize(amostras: List[Tuple[str, int, float]], duracao: float) -> dict:
+    """Resumo de (endpoint, status, latência ms): throughput, percentis e taxas de erro."""
+    def bloco(itens):
+        latencias = np.array([lat for _, _, lat in itens]) if itens else np.zeros(1)
+        status = [s for _, s, _ in itens]
+        n = len(itens)
+        return {
+            "requests": n,
+            "throughput_rps": n / duracao if duracao > 0 else 0.0,
+            "p50_ms": float(np.percentile(latencias, 50)),
+            "p95_ms": float(np.percentile(latencias, 95)),
+            "p99_ms": float(np.percentile(latencias, 99)),
+            "max_ms": float(latencias.max()),
+            "error_rate": sum(1 for s in status if s == 0 or s >= 500) / n if n else 0.0,
+            "client_error_rate": sum(1 for s in status if 400 <= s < 500) / n if n else 0.0,
+        }
+
+    resumo = {"total": bloco(amostras)}
+    for nome in ENDPOINTS:
+        itens = [a for a in amostras if a[0] == nome]
+        if itens:
+            resumo[nome] = bloco(itens)
+    return resumo
+
+
+async def _disparar(base_url: str, gerador: RequestGenerator, concorrencia: int,
+                    duracao: float = None, total: int = None, timeout: float = 60.0) -> Tuple[list, float]:
+    amostras: List[Tuple[str, int, float]] = []
+    restantes = [total] if total is not None else None
+    limites = httpx.Limits(max_connections=concorrencia, max_keepalive_connections=concorrencia)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout, limits=limites) as client:
+        inicio = time.perf_counter()
+        fim = inicio + duracao if duracao is not None else None
+
+        async def usuario():
+            while True:
+                if fim is not None and time.perf_counter() >= fim:
+                    return
+                if restantes is not None:
+                    if restantes[0] <= 0:
+                        return
+                    restantes[0] -= 1
+                nome, payload = gerador.next()
+                t0 = time.perf_counter()
+                try:
+                    status = (await client.post(ENDPOINTS[nome], json=payload)).status_code
+                except httpx.HTTPError:
+                    status = 0
+                amostras.append((nome, status, (time.perf_counter() - t0) * 1000))
+
+        await asyncio.gather(*(usuario() for _ in range(concorrencia)))
+        return amostras, time.perf_counter() - inicio
+
+
+def run_level(base_url: str, gerador: RequestGenerator, concorrencia: int, duracao: float = None,
+              total: int = None, server_pid: Optional[int] = None) -> dict:
+    """Um nível de concorrência: dispara a carga e resume latências e recursos."""
+    with ResourceSampler(server_pid) as sampler:
+        amostras, decorrido = asyncio.run(_disparar(base_url, gerador, concorrencia, duracao, total))
+    resultado = {"concurrency": concorrencia, "duration_s": decorrido, **summarize(amostras, decorrido)}
+    resultado["server"] = sampler.summary()
+    return resultado
+
+
+# --------------------------------------------------------------- processos
+def _esperar(url: str, processo: subprocess.Popen, timeout: float = 120.0) -> None:
+    limite = time.time() + timeout
+    while time.time() < limite:
+        if processo.poll() is not None:
+            raise RuntimeError(f"Processo encerrou antes de ficar pronto (código {processo.returncode}): {url}")
+        try:
+            if httpx.get(url, timeout=2.0).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    raise TimeoutError(f"Timeout esperando {url}")
+
+
+def start_stack(args) -> Tuple[str, List[subprocess.Popen], int]:
+    """Sobe o provedor falso e a API; devolve (URL da API, processos, pid do servidor)."""
+    data_dir = Path(tempfile.mkdtemp(prefix="loadtest-"))
+    # Logs dos servidores vão para arquivo, para não misturar com o relatório
+    log = open(data_dir / "server.log", "ab")
+    print(f"Logs do provedor falso e da API em {data_dir / 'server.log'}")
+
+    fake_url = f"http://127.0.0.1:{args.fake_port}"
+    fake = subprocess.Popen([
+        sys.executable, "-m", "loadtest.fake_yahoo", "--port", str(args.fake_port),
+        "--latency-ms", str(args.latency_ms), "--jitter-ms", str(args.jitter_ms),
+        "--error-rate", str(args.error_rate), "--seed", str(args.seed),
+    ], stdout=log, stderr=subprocess.STDOUT)
+    processos = [fake]
+    _esperar(f"{fake_url}/stats", fake)
+
+    env = dict(os.environ)
+    env.update({
+        "LOADTEST_UPSTREAM_URL": f"{fake_url}/v8/finance/chart/{{symbol}}",
+        "LOADTEST_DATA_DIR": str(data_dir),
+        "LOADTEST_PRICE_STORE": "0" if args.no_price_store else "1",
+        "LOADTEST_TORCH_THREADS": str(args.torch_threads or ""),
+    })
+    api = subprocess.Popen(
+        [sys.executable, "-m", "loadtest.server", "--port", str(args.port), "--workers", str(args.workers)],
+        env=env, stdout=log, stderr=subprocess.STDOUT,
+    )
+    processos.append(api)
+    api_url = f"http://127.0.0.1:{args.port}"
+    _esperar(f"{api_url}/api/v1/cache/stats", api)
+    return api_url, processos, api.pid
+
+
+def stop_stack(processos: List[subprocess.Popen]) -> None:
+    for p in reversed(processos):
+        p.terminate()
+    for p in processos:
+        try:
+            p.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            p.kill()
+
+
+def _imprimir(resultado: dict) -> None:
+    total = resultado["total"]
+    print(f"\nconcorrência {resultado['concurrency']}: {total['requests']} req em {resultado['duration_s']:.1f} s "
+          f"({total['throughput_rps']:.1f} req/s)")
+    print(f"  {'endpoint':<8} {'req':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'erros':>7} {'4xx':>7}")
+    for nome in ("total",) + tuple(ENDPOINTS):
+        if nome in resultado:
+            r = resultado[nome]
+            print(f"  {nome:<8} {r['requests']:>6} {r['p50_ms']:>8.1f} {r['p95_ms']:>8.1f} {r['p99_ms']:>8.1f} "
+                  f"{r['error_rate']:>7.2%} {r['client_error_rate']:>7.2%}")
+    servidor = resultado.get("server")
+    if servidor:
+        print(f"  servidor: CPU média {servidor['cpu_percent_avg']:.0f}% (pico {servidor['cpu_percent_max']:.0f}%), "
+              f"RSS pico {servidor['rss_mb_max']:.0f} MB")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Teste de carga HTTP offline da API de previsão.")
+    parser.add_argument("--concurrency", default="1,8,32", help="Níveis de concorrência, separados por vírgula")
+    parser.add_argument("--duration", type=float, default=15.0, help="Segundos por nível")
+    parser.add_argument("--requests", type=int, default=None, help="Total de requisições por nível (em vez de --duration)")
+    parser.add_argument("--warmup", type=int, default=20, help="Requisições de aquecimento antes da medição")
+    parser.add_argument("--mix", default="dia=0.7,entre=0.3", help="Pesos por endpoint (dia, entre)")
+    parser.add_argument("--tickers", default=",".join(TICKERS_PADRAO))
+    parser.add_argument("--invalid-rate", type=float, default=0.0, help="Fração de requisições com ticker inexistente")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="Latência do provedor falso")
+    parser.add_argument("--jitter-ms", type=float, default=10.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fração de respostas 500 do provedor falso")
+    parser.add_argument("--no-price-store", action="store_true", help="Desliga o price store da API")
+    parser.add_argument("--workers", type=int, default=1, help="Workers do uvicorn")
+    parser.add_argument("--torch-threads", type=int, default=None, help="torch.set_num_threads por worker")
+    parser.add_argument("--port", type=int, default=8800)
+    parser.add_argument("--fake-port", type=int, default=8900)
+    parser.add_argument("--target", default=None, help="URL de uma API já rodando (não sobe o provedor nem a API)")
+    parser.add_argument("--output", default=None, help="Grava o relatório em JSON")
+    args = parser.parse_args(argv)
+
+    niveis = [int(c) for c in args.concurrency.split(",")]
+    gerador = RequestGenerator(parse_mix(args.mix), args.tickers.split(","), args.invalid_rate, args.seed)
+
+    processos, server_pid = [], None
+    try:
+        if args.target:
+            base_url = args.target.rstrip("/")
+        else:
+            base_url, processos, server_pid = start_stack(args)
+
+        if args.warmup:
+            run_level(base_url, gerador, min(niveis), total=args.warmup)
+
+        resultados = []
+        for concorrencia in niveis:
+            duracao = None if args.requests else args.duration
+            resultado = run_level(base_url, gerador, concorrencia, duracao, args.requests, server_pid)
+            resultados.append(resultado)
+            _imprimir(resultado)
+    finally:
+        stop_stack(processos)
+
+    if args.output:
+        relatorio = {"config": vars(args), "levels": resultados}
+        Path(args.output).write_text(json.dumps(relatorio, indent=2))
+        print(f"\nRelatório gravado em {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
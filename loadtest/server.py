@@ -0,0 +1,65 @@
+'''
+Sobe a API real apontada para o provedor de preços falso (loadtest.fake_yahoo).
+
+A configuração vem de variáveis de ambiente, para valer em todos os workers do uvicorn:
+
+- LOADTEST_UPSTREAM_URL: URL de chart do provedor falso (com "{symbol}");
+- LOADTEST_DATA_DIR: diretório temporário do price store e do snapshot de tickers;
+- LOADTEST_PRICE_STORE: "0" desliga o price store (toda requisição vai ao upstream);
+- LOADTEST_TORCH_THREADS: torch.set_num_threads por worker (vazio mantém o padrão).
+
+Uso isolado (o loadtest.run faz isso sozinho):
+
+    LOADTEST_UPSTREAM_URL=http://127.0.0.1:8900/v8/finance/chart/{symbol} \\
+        python -m loadtest.server --port 8800 --workers 2
+'''
+
+import argparse
+import os
+import tempfile
+from pathlib import Path
+
+from app.config.settings import get_settings
+
+
+def configure_from_env() -> None:
+    """Aplica as variáveis LOADTEST_* nas Settings antes de a app ser importada."""
+    settings = get_settings()
+    url = os.environ.get("LOADTEST_UPSTREAM_URL")
+    if url:
+        settings.YAHOO_CHART_URL = url
+
+    data_dir = Path(os.environ.get("LOADTEST_DATA_DIR") or tempfile.mkdtemp(prefix="loadtest-"))
+    settings.PRICE_STORE_DIR = data_dir / "prices"
+    settings.TICKER_REGISTRY_SNAPSHOT_PATH = data_dir / "ticker_registry.json"
+    settings.PRICE_STORE_ENABLED = os.environ.get("LOADTEST_PRICE_STORE", "1") != "0"
+
+    threads = os.environ.get("LOADTEST_TORCH_THREADS")
+    if threads:
+        import torch
+        torch.set_num_threads(int(threads))
+
+
+def create_app():
+    """Factory para o uvicorn (--factory): configura e devolve a app da API."""
+    configure_from_env()
+    from app import app
+    return app
+
+
+def main(argv=None) -> int:
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="API de previsão apontada para o provedor falso.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8800)
+    parser.add_argument("--workers", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    uvicorn.run("loadtest.server:create_app", factory=True, host=args.host, port=args.port,
+                workers=args.workers, log_level="warning")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
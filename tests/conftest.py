@@ -0,0 +1,50 @@
+'''
+Fixtures compartilhadas dos testes: um SimpleLSTM pequeno e determinístico
+(make_model) e um wrapper que registra o shape de cada forward (counting_model).
+'''
+
+import pytest
+import torch
+
+from app.domain.services.avaluation_model_service import SimpleLSTM
+
+
+def _tiny_lstm(hidden_size: int = 4, num_layers: int = 1, dropout_prob: float = 0.0, seed: int = 0) -> SimpleLSTM:
+    torch.manual_seed(seed)
+    return SimpleLSTM(input_size=1, hidden_size=hidden_size, num_layers=num_layers,
+                      output_size=1, dropout_prob=dropout_prob).eval()
+
+
+class CountingModel(torch.nn.Module):
+    """Encaminha o forward para `model` (padrão: o SimpleLSTM pequeno) e guarda o shape de cada chamada."""
+
+    def __init__(self, model=None, version: str = None):
+        super().__init__()
+        self.model = model if model is not None else _tiny_lstm()
+        self.shapes = []
+        if version:
+            self.version = version
+
+    def forward(self, x):
+        self.shapes.append(tuple(x.shape))
+        return self.model(x)
+
+    @property
+    def chamadas(self) -> int:
+        return len(self.shapes)
+
+    @property
+    def batches(self) -> list:
+        return [shape[0] for shape in self.shapes]
+
+
+@pytest.fixture(scope="session")
+def make_model():
+    """Fábrica do SimpleLSTM de teste: make_model(hidden_size=4, num_layers=1, dropout_prob=0.0, seed=0)."""
+    return _tiny_lstm
+
+
+@pytest.fixture(scope="session")
+def counting_model():
+    """Fábrica do wrapper contador: counting_model(model=None, version=None)."""
+    return CountingModel
@@ -3,12 +3,12 @@ Teste de integração das rotas da API em app.routers.api com handlers monkeypat
 Passos principais:
 Define a função
         make_app_with_monkeypatched_handlers()
-        Define duas funções dummy:
+        Define duas corrotinas dummy (as rotas são async):
         dummy_between_dates(req, model) — retorna um dict simples com keys: "ticker", "predictions" e "type": "between_dates".
         dummy_single_day(req, model) — retorna um dict com "ticker", "prediction" e "type": "single_day".
         Substitui (monkeypatch) as funções originais importadas no módulo app.routers.api:
-        api_module.handle_ticker_info_between_dates = dummy_between_dates
-        api_module.handle_ticker_info_specific_date = dummy_single_day
+        api_module.handle_ticker_info_between_dates_async = dummy_between_dates
+        api_module.handle_ticker_info_specific_date_async = dummy_single_day
         Isso faz com que, quando as rotas chamarem os handlers, os dummies sejam executados em vez da lógica real.
         Cria uma instância FastAPI(), define app.state.model = object() (um modelo dummy no estado, para que a dependência get_model não falhe)
         e inclui o router do módulo (app.include_router(api_module.router, prefix="/api")).
@@ -37,14 +37,14 @@ import app.routers.api as api_module
 
 
 def make_app_with_monkeypatched_handlers():
-    def dummy_between_dates(req, model):
+    async def dummy_between_dates(req, model):
         return {"ticker": req.ticker, "predictions": [1.23, 1.45], "type": "between_dates"}
 
-    def dummy_single_day(req, model):
+    async def dummy_single_day(req, model):
         return {"ticker": req.ticker, "prediction": 2.34, "type": "single_day"}
 
-    api_module.handle_ticker_info_between_dates = dummy_between_dates
-    api_module.handle_ticker_info_specific_date = dummy_single_day
+    api_module.handle_ticker_info_between_dates_async = dummy_between_dates
+    api_module.handle_ticker_info_specific_date_async = dummy_single_day
 
     app = FastAPI()
     
@@ -11,6 +11,7 @@ import torch
 
 from app.domain.services.avaluation_model_service import (
     create_sequences_multivariate,
+    build_normalized_windows,
     build_features_estrategia2,
     SimpleLSTM,
     run_forecast,
@@ -30,6 +31,29 @@ def test_create_sequences_multivariate_shapes():
     assert y.shape[0] == 40 - seq_length
 
 
+def test_build_normalized_windows_matches_loop_and_sklearn_pipeline():
+    from sklearn.preprocessing import MinMaxScaler
+
+    rng = np.random.default_rng(0)
+    data = (30 + rng.standard_normal(200).cumsum()).reshape(-1, 1)
+    seq_length = 30
+
+    # Pipeline original: loop + np.array + scaler ajustado sobre as janelas empilhadas
+    X_loop = np.array([data[i:i + seq_length, :] for i in range(len(data) - seq_length)])
+    y_loop = np.array([data[i + seq_length, 0] for i in range(len(data) - seq_length)])
+    scaler_ref = MinMaxScaler(feature_range=(-1, 1)).fit(X_loop.reshape(-1, 1))
+    X_ref = torch.from_numpy(scaler_ref.transform(X_loop.reshape(-1, 1)).reshape(X_loop.shape)).float().unsqueeze(-1)
+    y_ref = torch.from_numpy(scaler_ref.transform(y_loop.reshape(-1, 1))).float().unsqueeze(1)
+
+    X_test, y_test, scaler = build_normalized_windows(data, seq_length)
+
+    assert X_test.dtype == torch.float32
+    assert torch.equal(X_test, X_ref)
+    assert torch.equal(y_test, y_ref)
+    assert np.array_equal(scaler.data_min_, scaler_ref.data_min_)
+    assert np.array_equal(scaler.data_max_, scaler_ref.data_max_)
+
+
 def test_build_features_estrategia2_returns_close_column():
     # Build dataframe with standard yfinance columns
     idx = pd.date_range('2025-01-01', periods=3, freq='D')
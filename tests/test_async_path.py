@@ -0,0 +1,129 @@
+'''
+Testes do caminho assíncrono: parsing da resposta de chart do Yahoo (cliente
+httpx) e handlers async, que devem baixar uma única vez sem bloquear o loop e
+levar só a inferência para o executor (que, com micro-batching, não limita o
+tamanho do lote).
+'''
+
+import asyncio
+
+import numpy as np
+import pandas as pd
+import pytest
+from fastapi import HTTPException
+
+from app.config.settings import get_settings
+from app.domain.services.async_market_data import parse_chart_response
+from app.domain.services.inference_batcher import start_inference_scheduler, stop_inference_scheduler
+from app.domain.services.inference_executor import shutdown_inference_executor
+from app.domain.services.market_data_context import MarketDataContext
+from app.domain.commands.avaluation_prices_commands import (
+    handle_ticker_info_between_dates_async,
+    handle_ticker_info_specific_date_async,
+)
+from app.schemas.ticker_request import TickerRequest, TickerRequestBetweenDates
+
+settings = get_settings()
+
+
+class CountingAsyncFetcher:
+    def __init__(self, vazio=False):
+        self.chamadas = 0
+        self.vazio = vazio
+
+    async def __call__(self, ticker, inicio, fim):
+        self.chamadas += 1
+        await asyncio.sleep(0)
+        if self.vazio:
+            return pd.DataFrame({"Close": []}, index=pd.DatetimeIndex([], name="Date"))
+        idx = pd.bdate_range(pd.Timestamp(inicio), pd.Timestamp(fim) - pd.Timedelta(days=1), name="Date")
+        close = 30 + np.cos(np.arange(len(idx)) / 7.0)
+        return pd.DataFrame({"Close": close}, index=idx)
+
+
+def test_parse_chart_response_ajusta_precos_e_datas():
+    payload = {
+        "chart": {
+            "result": [{
+                "meta": {"exchangeTimezoneName": "America/Sao_Paulo"},
+                "timestamp": [1748869200, 1748955600, 1749042000],  # 02, 03 e 04/06/2025 às 10h BRT
+                "indicators": {
+                    "quote": [{
+                        "open": [10.0, 11.0, 12.0],
+                        "high": [10.5, 11.5, None],
+                        "low": [9.5, 10.5, 11.5],
+                        "close": [10.0, 11.0, None],
+                        "volume": [100, 200, 300],
+                    }],
+                    "adjclose": [{"adjclose": [5.0, 5.5, None]}],
+                },
+            }]
+        }
+    }
+
+    df = parse_chart_response(payload)
+
+    assert list(df.columns) == ["Close", "High", "Low", "Open", "Volume"]
+    assert list(df.index) == [pd.Timestamp("2025-06-02"), pd.Timestamp("2025-06-03")]
+    assert df["Close"].tolist() == [5.0, 5.5]
+    assert df["Open"].tolist() == [5.0, 5.5]
+
+
+def test_parse_chart_response_sem_resultado_retorna_vazio():
+    assert parse_chart_response({"chart": {"result": None, "error": {"code": "Not Found"}}}).empty
+
+
+def test_handlers_async_fazem_um_unico_download(make_model):
+    fetcher = CountingAsyncFetcher()
+    req = TickerRequestBetweenDates(init_date="2025-03-03", end_date="2025-06-02", ticker="ITUB4.SA")
+    ctx = MarketDataContext.for_request(req, afetcher=fetcher)
+
+    result = asyncio.run(handle_ticker_info_between_dates_async(req, make_model(), context=ctx))
+    assert fetcher.chamadas == 1
+    assert result["metadata"]["count"] > 0
+
+    fetcher = CountingAsyncFetcher()
+    req = TickerRequest(target_date="2025-06-03", ticker="ITUB4.SA")
+    ctx = MarketDataContext.for_request(req, afetcher=fetcher)
+
+    result = asyncio.run(handle_ticker_info_specific_date_async(req, make_model(), context=ctx))
+    assert fetcher.chamadas == 1
+    assert result["data"][0]["actual"] is not None
+
+
+def test_handler_async_valida_historico_insuficiente(make_model):
+    fetcher = CountingAsyncFetcher()
+    # O intervalo começa com só ~15 pregões de histórico antes da data inicial
+    req = TickerRequestBetweenDates(init_date="2025-03-03", end_date="2025-06-02", ticker="ITUB4.SA")
+    ctx = MarketDataContext(req.ticker, "2025-02-10", "2025-06-03", afetcher=fetcher)
+
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(handle_ticker_info_between_dates_async(req, make_model(), context=ctx))
+    assert exc.value.status_code == 400
+
+
+def test_requisicoes_async_concorrentes_formam_lote_maior_que_o_executor(monkeypatch, make_model, counting_model):
+    monkeypatch.setattr(settings, "INFERENCE_BATCHING_ENABLED", True)
+    monkeypatch.setattr(settings, "INFERENCE_BATCH_MAX_WAIT_MS", 300.0)
+    monkeypatch.setattr(settings, "INFERENCE_EXECUTOR_WORKERS", 4)
+    shutdown_inference_executor()  # recriado com o tamanho do lote
+    padrao = counting_model(make_model())
+    scheduler = start_inference_scheduler(padrao)
+
+    async def cenario():
+        pedidos = []
+        for i in range(8):
+            req = TickerRequest(target_date="2025-06-03", ticker=f"TICK{i}.SA")
+            ctx = MarketDataContext.for_request(req, afetcher=CountingAsyncFetcher())
+            pedidos.append(handle_ticker_info_specific_date_async(req, padrao, context=ctx))
+        return await asyncio.gather(*pedidos)
+
+    try:
+        resultados = asyncio.run(cenario())
+    finally:
+        stop_inference_scheduler()
+        shutdown_inference_executor()
+
+    assert all(r["data"][0]["actual"] is not None for r in resultados)
+    # Mais de INFERENCE_EXECUTOR_WORKERS forwards esperando juntos o mesmo lote
+    assert max(scheduler.stats()["batch_size_histogram"]) > 4
@@ -0,0 +1,87 @@
+'''
+Testes da previsão em lote (/v1/previsao-lote): um único forward para todos os
+tickers válidos, itens de erro sem derrubar o lote, ordem preservada e um único
+download multi-ticker no store de preços.
+'''
+
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import pytest
+from fastapi import HTTPException
+
+from app.domain.command_handlers.avaluation_command_handler import process_ticker_batch, process_ticker_single_day
+from app.domain.services.market_data_context import MarketDataContext
+from app.domain.services.price_store import PriceStore, COLUNAS_PRECO
+from app.domain.validators.ticker_service_validator import _validar_lote
+from app.schemas.ticker_request import TickerBatchRequest, TickerRequest
+
+
+def _serie(inicio, fim, fase):
+    idx = pd.bdate_range(pd.Timestamp(inicio), pd.Timestamp(fim), name="Date")
+    close = 30 + fase + np.cos(np.arange(len(idx)) / 7.0 + fase)
+    return pd.DataFrame({"Close": close}, index=idx)
+
+
+def test_lote_faz_um_forward_e_isola_erros(make_model, counting_model):
+    alvo = date(2024, 6, 3)
+    frames = {
+        "ITUB4.SA": _serie("2024-03-01", "2024-06-07", 0.0),
+        "PETR4.SA": _serie("2024-03-01", "2024-06-07", 1.5),
+        "XXXX3.SA": pd.DataFrame({"Close": []}, index=pd.DatetimeIndex([], name="Date")),
+    }
+    req = TickerBatchRequest(target_date=alvo, tickers=["PETR4.SA", "XXXX3.SA", "ITUB4.SA"])
+    modelo = counting_model(make_model())
+
+    resposta = process_ticker_batch(req, modelo, frames)
+
+    assert modelo.batches == [2]
+    assert [r["ticker"] for r in resposta["results"]] == ["PETR4.SA", "XXXX3.SA", "ITUB4.SA"]
+    assert resposta["results"][1]["error"]["status_code"] == 404
+    assert resposta["metadata"]["count"] == 3
+    assert resposta["metadata"]["errors"] == 1
+
+    # Cada item bate com a previsão individual do mesmo ticker
+    for pos in (0, 2):
+        ticker = req.tickers[pos]
+        item = TickerRequest(ticker=ticker, target_date=alvo)
+        individual = process_ticker_single_day(item, modelo.model, MarketDataContext.preloaded(item, frames[ticker]))
+        assert resposta["results"][pos]["data"] == individual["data"]
+
+
+def test_validar_lote_normaliza_deduplica_e_limita(monkeypatch):
+    req = TickerBatchRequest(target_date=date.today(), tickers=[" itub4.sa", "ITUB4.SA", "petr4.sa", ""])
+    _validar_lote(req)
+    assert req.tickers == ["ITUB4.SA", "PETR4.SA"]
+
+    from app.domain.validators import ticker_service_validator
+    monkeypatch.setattr(ticker_service_validator.settings, "BATCH_MAX_TICKERS", 1)
+    with pytest.raises(HTTPException) as exc:
+        _validar_lote(TickerBatchRequest(target_date=date.today(), tickers=["A", "B"]))
+    assert exc.value.status_code == 400
+
+
+def test_store_baixa_o_lote_em_uma_chamada(tmp_path):
+    chamadas = []
+
+    def batch_fetcher(tickers, inicio, fim):
+        chamadas.append((tuple(tickers), inicio, fim))
+        idx = pd.bdate_range(pd.Timestamp(inicio), pd.Timestamp("2024-03-28"), name="Date")
+        base = np.arange(len(idx), dtype=float)
+        return {t: pd.DataFrame({col: base for col in COLUNAS_PRECO}, index=idx) for t in tickers}
+
+    def fetcher(*args):
+        raise AssertionError("o lote não deve baixar ticker a ticker")
+
+    store = PriceStore(tmp_path, fetcher=fetcher, batch_fetcher=batch_fetcher,
+                       history_start="2024-01-01", refresh_interval_seconds=3600)
+
+    frames = store.get_ranges(["ITUB4.SA", "PETR4.SA"], "2024-02-01", "2024-02-10")
+    assert len(chamadas) == 1
+    assert set(chamadas[0][0]) == {"ITUB4.SA", "PETR4.SA"}
+    assert frames["PETR4.SA"].index[0] == pd.Timestamp("2024-02-01")
+
+    # Intervalo já coberto pelo disco: nenhuma ida ao upstream
+    store.get_ranges(["ITUB4.SA", "PETR4.SA"], "2024-01-10", "2024-03-01")
+    assert len(chamadas) == 1
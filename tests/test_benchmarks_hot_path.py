@@ -0,0 +1,32 @@
+'''
+Testes da comparação de baselines da suíte de micro-benchmarks (benchmarks.hot_path):
+regressão acima do limite, melhora, casos novos/removidos e o código de saída da CLI.
+'''
+
+import json
+
+from benchmarks.hot_path import compare, main
+
+
+def _relatorio(**medianas):
+    return {"metadata": {}, "results": {nome: {"median_ms": v, "min_ms": v, "p90_ms": v} for nome, v in medianas.items()}}
+
+
+def test_compare_aponta_regressao_acima_do_limite():
+    base = _relatorio(a=10.0, b=10.0, c=10.0, removido=1.0)
+    atual = _relatorio(a=10.5, b=12.0, c=5.0, novo=1.0)
+
+    linhas, regressoes = compare(base, atual, threshold=0.10)
+    status = {linha["case"]: linha["status"] for linha in linhas}
+
+    assert regressoes == ["b"]
+    assert status == {"a": "ok", "b": "regression", "c": "improvement", "novo": "new", "removido": "missing"}
+
+
+def test_cli_compare_sai_com_erro_na_regressao(tmp_path):
+    base, atual = tmp_path / "base.json", tmp_path / "atual.json"
+    base.write_text(json.dumps(_relatorio(a=10.0)))
+    atual.write_text(json.dumps(_relatorio(a=13.0)))
+
+    assert main(["compare", str(base), str(atual), "--threshold", "0.5"]) == 0
+    assert main(["compare", str(base), str(atual), "--threshold", "0.2"]) == 1
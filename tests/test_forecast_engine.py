@@ -0,0 +1,98 @@
+'''
+Testes do motor de previsão recursiva (app.domain.services.forecast_engine).
+O modo "exact" é comparado com o laço original (torch.cat + inverse_transform
+por passo); o modo "fast" é checado no primeiro passo, na tolerância documentada ao longo
+do horizonte e no fallback.
+'''
+
+import numpy as np
+import torch
+from sklearn.preprocessing import MinMaxScaler
+
+from app.domain.services.forecast_engine import FAST_MODE_TOLERANCIA_RELATIVA, RecursiveForecastEngine
+
+
+def _laco_original(model, scaler, last_window, last_val_norm, steps):
+    window = last_window.unsqueeze(0)
+    window = torch.cat((window[:, 1:, :], torch.tensor([[[last_val_norm]]])), dim=1)
+    preds = []
+    with torch.no_grad():
+        for _ in range(steps):
+            pred_norm = model(window).item()
+            preds.append(scaler.inverse_transform([[pred_norm]])[0][0])
+            window = torch.cat((window[:, 1:, :], torch.tensor([[[pred_norm]]])), dim=1)
+    return np.array(preds)
+
+
+def _cenario():
+    rng = np.random.default_rng(1)
+    serie = (30 + rng.standard_normal(30).cumsum()).reshape(-1, 1)
+    scaler = MinMaxScaler(feature_range=(-1, 1)).fit(serie)
+    window = torch.from_numpy(scaler.transform(serie)).float()
+    return scaler, window
+
+
+def test_modo_exact_identico_ao_laco_original(make_model):
+    model = make_model(hidden_size=8, num_layers=2)
+    scaler, window = _cenario()
+
+    esperado = _laco_original(model, scaler, window, 0.25, 20)
+    obtido = RecursiveForecastEngine(model, "exact").forecast(scaler, window, 0.25, 20)
+
+    assert np.array_equal(obtido, esperado)
+
+
+def test_modo_fast_primeiro_passo_igual_e_demais_finitos(make_model):
+    model = make_model(hidden_size=8, num_layers=2)
+    scaler, window = _cenario()
+
+    exact = RecursiveForecastEngine(model, "exact").forecast_norm(window, 0.25, 10)
+    fast = RecursiveForecastEngine(model, "fast").forecast_norm(window, 0.25, 10)
+
+    assert fast[0] == exact[0]
+    assert np.all(np.isfinite(fast))
+
+
+def test_modo_fast_dentro_da_tolerancia_documentada_no_horizonte(make_model):
+    model = make_model(hidden_size=8, num_layers=2)
+    scaler, window = _cenario()
+
+    for passos in (30, 60):
+        exact = RecursiveForecastEngine(model, "exact").forecast(scaler, window, 0.25, passos)
+        fast = RecursiveForecastEngine(model, "fast").forecast(scaler, window, 0.25, passos)
+        assert np.allclose(fast, exact, rtol=FAST_MODE_TOLERANCIA_RELATIVA, atol=0)
+
+
+def test_modo_fast_cai_para_exact_sem_lstm():
+    class DummyModel:
+        def __call__(self, x):
+            return torch.tensor(0.1)
+
+    engine = RecursiveForecastEngine(DummyModel(), "fast")
+    assert engine.mode == "exact"
+    assert np.allclose(engine.forecast_norm(torch.zeros(5, 1), 0.2, 3), 0.1)
+
+
+def test_forecast_batch_equivale_ao_individual_com_datas_alvo_diferentes(make_model):
+    model = make_model(hidden_size=8, num_layers=2)
+    rng = np.random.default_rng(2)
+    scalers, windows, last_vals = [], [], []
+    for _ in range(3):
+        serie = (30 + rng.standard_normal(30).cumsum()).reshape(-1, 1)
+        scaler = MinMaxScaler(feature_range=(-1, 1)).fit(serie)
+        scalers.append(scaler)
+        windows.append(torch.from_numpy(scaler.transform(serie)).float())
+        last_vals.append(float(rng.uniform(-1, 1)))
+    last_dates = ["2025-06-02", "2025-06-02", "2025-06-10"]
+    targets = ["2025-06-20", "2025-06-05", "2025-07-01"]
+
+    engine = RecursiveForecastEngine(model, "exact")
+    lote = engine.forecast_batch(scalers, windows, last_vals, last_dates, targets)
+
+    for i, (datas, preds) in enumerate(lote):
+        esperado = _laco_original(model, scalers[i], windows[i], last_vals[i], len(datas))
+        assert len(preds) == len(datas)
+        assert datas[-1] <= np.datetime64(targets[i])
+        np.testing.assert_allclose(preds, esperado, rtol=1e-5)
+
+    assert len(lote[1][0]) == 3  # 06-03, 06-04, 06-05: sai do lote antes das demais
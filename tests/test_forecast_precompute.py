@@ -0,0 +1,99 @@
+'''
+Testes do pré-cálculo da watchlist (app.domain.services.forecast_precompute):
+horizonte em lote com falhas por ticker, previsão de dia alvo servida do estado
+pré-calculado (igual ao cálculo normal) até entrar um novo pregão, e o horário
+das execuções após o fechamento.
+'''
+
+import asyncio
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.domain.command_handlers.avaluation_command_handler import process_ticker_single_day
+from app.domain.commands.avaluation_prices_commands import handle_ticker_info_specific_date_async
+from app.domain.services import forecast_precompute, response_cache
+from app.domain.services.forecast_precompute import (
+    ForecastPrecomputeScheduler, PrecomputedForecastStore, precompute_watchlist,
+)
+from app.domain.services.market_data_context import MarketDataContext
+from app.domain.services.response_cache import PredictionResponseCache
+from app.schemas.ticker_request import TickerRequest
+
+ULTIMO_PREGAO = "2025-06-13"
+
+
+def _serie(ticker, inicio, ultimo_dia=ULTIMO_PREGAO):
+    idx = pd.bdate_range(pd.Timestamp(inicio), pd.Timestamp(ultimo_dia), name="Date")
+    fase = sum(map(ord, ticker)) % 11
+    # O valor depende só da data: recortes com início diferente coincidem
+    dias = (idx - pd.Timestamp("1970-01-01")).days.to_numpy()
+    return pd.DataFrame({"Close": 30 + np.sin((dias + fase) / 5.0)}, index=idx)
+
+
+def _fetcher(tickers, inicio, fim):
+    return {t: _serie(t, inicio) for t in tickers if t != "SEMDADOS3.SA"}
+
+
+@pytest.fixture
+def store(monkeypatch):
+    novo = PrecomputedForecastStore()
+    monkeypatch.setattr(forecast_precompute, "_store", novo)
+    monkeypatch.setattr(response_cache, "_cache", PredictionResponseCache())
+    return novo
+
+
+def test_precompute_lote_com_falhas_por_ticker(store, counting_model):
+    resumo = precompute_watchlist(
+        counting_model(), ["itub4.sa", "PETR4.SA", "SEMDADOS3.SA"], horizon_days=5,
+        fetcher=_fetcher, as_of=ULTIMO_PREGAO,
+    )
+
+    assert resumo["succeeded"] == 2
+    assert list(resumo["failures"]) == ["SEMDADOS3.SA"]
+
+    entry = store.get("ITUB4.SA", "lstm_39")
+    assert entry.dates == ["2025-06-16", "2025-06-17", "2025-06-18", "2025-06-19", "2025-06-20"]
+    assert entry.marker[0] == ULTIMO_PREGAO
+    assert len(entry.predictions) == 5
+
+
+def test_previsao_dia_servida_do_pre_calculo_ate_novo_pregao(store, counting_model):
+    modelo = counting_model()
+    precompute_watchlist(modelo, ["ITUB4.SA", "PETR4.SA"], horizon_days=5, fetcher=_fetcher, as_of=ULTIMO_PREGAO)
+    req = TickerRequest(target_date="2025-06-18", ticker="ITUB4.SA")
+
+    def contexto(ultimo_dia):
+        async def afetcher(ticker, inicio, fim):
+            return _serie(ticker, inicio, ultimo_dia)
+        return MarketDataContext.for_request(req, afetcher=afetcher)
+
+    esperado = process_ticker_single_day(req, modelo, MarketDataContext.preloaded(
+        req, _serie("ITUB4.SA", "2025-03-01"),
+    ))
+
+    chamadas = modelo.chamadas
+    servido = asyncio.run(handle_ticker_info_specific_date_async(req, modelo, context=contexto(ULTIMO_PREGAO)))
+    assert servido == esperado
+    assert modelo.chamadas == chamadas
+    assert store.stats()["hits"] == 1
+
+    # Novo pregão: o pré-cálculo deixa de valer e a previsão é recalculada
+    asyncio.run(handle_ticker_info_specific_date_async(req, modelo, context=contexto("2025-06-16")))
+    assert modelo.chamadas == chamadas + 1
+    assert store.stats()["misses"] == 1
+
+
+def test_proxima_execucao_apos_fechamento_em_dia_util(counting_model):
+    tz = ZoneInfo("America/Sao_Paulo")
+    agendador = ForecastPrecomputeScheduler(counting_model(), [], run_at="18:30", timezone="America/Sao_Paulo")
+
+    segunda = agendador.next_run_after(datetime(2025, 6, 16, 10, 0, tzinfo=tz))
+    assert (segunda.day, segunda.hour, segunda.minute) == (16, 18, 30)
+
+    # Sexta depois do horário: só na segunda seguinte
+    proxima = agendador.next_run_after(datetime(2025, 6, 20, 19, 0, tzinfo=tz))
+    assert (proxima.weekday(), proxima.day) == (0, 23)
@@ -0,0 +1,108 @@
+'''
+Testes do agendador de micro-batching (app.domain.services.inference_batcher).
+Jobs concorrentes devem ser agrupados em um único forward, separados por shape
+de janela, e cada chamador deve receber exatamente a sua fatia do resultado.
+'''
+
+import threading
+import time
+
+import numpy as np
+import pytest
+import torch
+
+from app.domain.services.avaluation_model_service import run_forecast
+from app.domain.services.inference_batcher import (
+    MicroBatchScheduler,
+    start_inference_scheduler,
+    stop_inference_scheduler,
+)
+from app.domain.services.ml_handler.model_registry import RegisteredModel
+
+
+def test_jobs_concorrentes_viram_um_forward_por_shape(make_model, counting_model):
+    base = make_model()
+    model = counting_model(base)
+    scheduler = MicroBatchScheduler(model, max_wait_ms=200, max_batch_size=64).start()
+
+    entradas = [torch.randn(2, 30, 1) for _ in range(4)] + [torch.randn(1, 45, 1) for _ in range(2)]
+    resultados = [None] * len(entradas)
+
+    def chamar(i):
+        resultados[i] = scheduler.predict(entradas[i])
+
+    threads = [threading.Thread(target=chamar, args=(i,)) for i in range(len(entradas))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    scheduler.stop()
+
+    assert sorted(model.shapes) == [(2, 45, 1), (8, 30, 1)]
+    with torch.no_grad():
+        for x, y in zip(entradas, resultados):
+            np.testing.assert_allclose(y, base(x).numpy(), rtol=1e-5, atol=1e-6)
+
+    stats = scheduler.stats()
+    assert stats["batches"] == 2
+    assert stats["jobs"] == 6
+    assert stats["batch_size_histogram"] == {2: 1, 8: 1}
+
+
+def test_erro_no_forward_vai_para_o_future():
+    def quebra(x):
+        raise RuntimeError("falhou")
+
+    scheduler = MicroBatchScheduler(quebra, max_wait_ms=1).start()
+    with pytest.raises(RuntimeError):
+        scheduler.predict(torch.randn(1, 30, 1))
+    scheduler.stop()
+
+
+def test_stop_falha_jobs_pendentes_e_submit_depois_levanta():
+    liberar = threading.Event()
+
+    def lento(x):
+        liberar.wait(5)
+        return x[:, -1, :]
+
+    scheduler = MicroBatchScheduler(lento, max_wait_ms=0, max_batch_size=1).start()
+    em_execucao = scheduler.submit(torch.randn(1, 30, 1))
+    time.sleep(0.05)  # o primeiro job já saiu da fila e está no forward
+    pendente = scheduler.submit(torch.randn(1, 30, 1))
+
+    # O join estoura com o forward ainda preso: o job que ficou na fila é falhado
+    scheduler.stop(timeout=0.05)
+    liberar.set()
+
+    assert em_execucao.result(timeout=1).shape == (1, 1)
+    with pytest.raises(RuntimeError):
+        pendente.result(timeout=1)
+    with pytest.raises(RuntimeError):
+        scheduler.submit(torch.randn(1, 30, 1))
+
+
+def test_erro_fora_do_forward_resolve_todos_os_futures(monkeypatch, make_model):
+    scheduler = MicroBatchScheduler(make_model(), max_wait_ms=1).start()
+
+    def quebra(*args):
+        raise ValueError("métrica")
+
+    monkeypatch.setattr(scheduler, "_registrar", quebra)
+    with pytest.raises(ValueError):
+        scheduler.predict(torch.randn(1, 30, 1), timeout=2)
+    scheduler.stop()
+
+
+def test_modelo_padrao_pedido_por_model_id_passa_pelo_agendador(make_model, counting_model):
+    padrao = counting_model(make_model())
+    scheduler = start_inference_scheduler(padrao)
+    try:
+        # O registro devolve o padrão adotado embrulhado em um RegisteredModel
+        registrado = RegisteredModel(padrao, seq_length=30, version="lstm_39")
+        pred, erro = run_forecast(registrado, torch.randn(1, 30, 1, 1))
+    finally:
+        stop_inference_scheduler()
+
+    assert erro is None and pred.shape == (1, 1)
+    assert scheduler.stats()["jobs"] == 1
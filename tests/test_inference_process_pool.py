@@ -0,0 +1,143 @@
+'''
+Testes do pool de processos de inferência (app.domain.services.inference_process_pool).
+Os workers carregam o modelo do artefato e devolvem, via memória compartilhada,
+o mesmo resultado do forward no processo, inclusive com lotes fatiados e
+chamadas concorrentes; workers que travam ou caem são recriados ou saem de
+rotação sem deixar chamadas esperando.
+'''
+
+import os
+import pickle
+import signal
+import threading
+import time
+
+import numpy as np
+import pytest
+import torch
+
+from app.domain.services.inference_process_pool import InferenceProcessPool, ProcessPoolBackend
+from app.domain.services.ml_handler.backends import as_backend
+
+
+@pytest.fixture(scope="module")
+def pool_e_modelo(tmp_path_factory, make_model):
+    modelo = make_model(hidden_size=8, num_layers=2)
+    caminho = tmp_path_factory.mktemp("pool") / "modelo.pkl"
+    caminho.write_bytes(pickle.dumps(modelo))
+
+    # Segmento pequeno (8 janelas de até 40 passos) para forçar o fatiamento
+    pool = InferenceProcessPool(modelo, caminho, workers=2, slot_windows=8, max_seq_length=40,
+                                backend="eager").start()
+    yield pool, modelo
+    pool.stop()
+
+
+def _esperado(modelo, janelas):
+    return as_backend(modelo).predict(torch.from_numpy(janelas))
+
+
+def test_previsao_igual_ao_forward_no_processo(pool_e_modelo):
+    pool, modelo = pool_e_modelo
+    janelas = np.random.default_rng(1).normal(size=(5, 30, 1)).astype(np.float32)
+
+    np.testing.assert_allclose(pool.predict(janelas), _esperado(modelo, janelas), rtol=1e-5, atol=1e-6)
+    # Tensores 2-D (batch, seq) como em run_forecast
+    np.testing.assert_allclose(ProcessPoolBackend(pool).predict(torch.from_numpy(janelas[..., 0])),
+                               _esperado(modelo, janelas), rtol=1e-5, atol=1e-6)
+
+
+def test_lote_maior_que_o_segmento_e_fatiado(pool_e_modelo):
+    pool, modelo = pool_e_modelo
+    janelas = np.random.default_rng(2).normal(size=(50, 40, 1)).astype(np.float32)
+
+    resultado = pool.predict(janelas)
+    assert resultado.shape == (50, 1)
+    np.testing.assert_allclose(resultado, _esperado(modelo, janelas), rtol=1e-5, atol=1e-6)
+
+    with pytest.raises(ValueError):
+        pool.predict(np.zeros((1, 400, 1), dtype=np.float32))
+
+
+def test_chamadas_concorrentes_recebem_o_proprio_resultado(pool_e_modelo):
+    pool, modelo = pool_e_modelo
+    entradas = [np.random.default_rng(10 + i).normal(size=(3, 20, 1)).astype(np.float32) for i in range(8)]
+    resultados = [None] * len(entradas)
+
+    def chamar(i):
+        resultados[i] = pool.predict(entradas[i])
+
+    threads = [threading.Thread(target=chamar, args=(i,)) for i in range(len(entradas))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    for entrada, resultado in zip(entradas, resultados):
+        np.testing.assert_allclose(resultado, _esperado(modelo, entrada), rtol=1e-5, atol=1e-6)
+
+    stats = pool.stats()
+    assert stats["idle"] == 2
+    assert sum(w["windows"] for w in stats["per_worker"]) >= 24
+
+
+def test_worker_que_cai_e_recriado(pool_e_modelo):
+    pool, modelo = pool_e_modelo
+    worker = pool._workers[0]
+    worker.process.kill()
+    worker.process.join()
+
+    janelas = np.random.default_rng(3).normal(size=(2, 10, 1)).astype(np.float32)
+    # A chamada que cai no worker morto falha; as seguintes voltam a funcionar
+    for _ in range(3):
+        try:
+            resultado = pool.predict(janelas)
+        except RuntimeError:
+            continue
+    np.testing.assert_allclose(resultado, _esperado(modelo, janelas), rtol=1e-5, atol=1e-6)
+    assert worker.restarts == 1 and worker.process.is_alive()
+
+
+@pytest.fixture
+def pool_unico(tmp_path, make_model):
+    modelo = make_model()
+    caminho = tmp_path / "modelo.pkl"
+    caminho.write_bytes(pickle.dumps(modelo))
+    pool = InferenceProcessPool(modelo, caminho, workers=1, slot_windows=8, max_seq_length=40,
+                                backend="eager", call_timeout=0.5).start()
+    yield pool, modelo
+    pool.stop()
+
+
+@pytest.mark.skipif(not hasattr(signal, "SIGSTOP"), reason="precisa de SIGSTOP")
+def test_worker_sem_resposta_estoura_o_timeout_e_e_recriado(pool_unico):
+    pool, modelo = pool_unico
+    worker = pool._workers[0]
+    assert worker.cpus is None  # fixação de CPUs é opt-in
+    os.kill(worker.process.pid, signal.SIGSTOP)
+
+    janelas = np.random.default_rng(4).normal(size=(2, 10, 1)).astype(np.float32)
+    inicio = time.perf_counter()
+    with pytest.raises(RuntimeError, match="sem resposta"):
+        pool.predict(janelas)
+    assert time.perf_counter() - inicio < 10
+
+    assert worker.restarts == 1 and worker.ativo
+    np.testing.assert_allclose(pool.predict(janelas), _esperado(modelo, janelas), rtol=1e-5, atol=1e-6)
+
+
+def test_worker_que_nao_sobe_sai_de_rotacao(pool_unico, tmp_path):
+    pool, _ = pool_unico
+    worker = pool._workers[0]
+    pool.model_path = tmp_path / "inexistente.pkl"
+    worker.process.kill()
+    worker.process.join()
+
+    janelas = np.zeros((1, 10, 1), dtype=np.float32)
+    with pytest.raises(RuntimeError):
+        pool.predict(janelas)
+    assert not worker.ativo and pool.stats()["active"] == 0
+
+    # Sem worker ativo a chamada falha na hora em vez de esperar um worker livre
+    with pytest.raises(RuntimeError, match="Nenhum worker"):
+        pool.predict(janelas)
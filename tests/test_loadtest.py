@@ -0,0 +1,61 @@
+'''
+Testes do harness de carga (loadtest): provedor falso compatível com o parser
+de chart do Yahoo, com séries determinísticas e injeção de erros, e o resumo
+de latências/erros do relatório.
+'''
+
+import pandas as pd
+from fastapi.testclient import TestClient
+
+from app.domain.services.async_market_data import parse_chart_response
+from loadtest.fake_yahoo import create_fake_yahoo_app
+from loadtest.run import RequestGenerator, parse_mix, summarize
+
+HOJE = "2025-06-13"
+
+
+def _epoch(data):
+    return int(pd.Timestamp(data).tz_localize("UTC").timestamp())
+
+
+def test_provedor_falso_serie_deterministica_e_404():
+    client = TestClient(create_fake_yahoo_app(today=HOJE))
+
+    def baixar(inicio, fim):
+        resposta = client.get("/v8/finance/chart/PETR4.SA", params={"period1": _epoch(inicio), "period2": _epoch(fim)})
+        return parse_chart_response(resposta.json())
+
+    longo, curto = baixar("2025-01-01", "2025-07-01"), baixar("2025-06-02", "2025-06-10")
+    assert longo.index[-1] == pd.Timestamp(HOJE)
+    assert list(curto.index.strftime("%Y-%m-%d")) == [
+        "2025-06-02", "2025-06-03", "2025-06-04", "2025-06-05", "2025-06-06", "2025-06-09",
+    ]
+    pd.testing.assert_frame_equal(curto, longo.loc[curto.index])
+
+    assert client.get("/v8/finance/chart/INVALID1.SA", params={"range": "1d"}).status_code == 404
+
+
+def test_provedor_falso_injeta_erros():
+    client = TestClient(create_fake_yahoo_app(error_rate=1.0, today=HOJE))
+    assert client.get("/v8/finance/chart/PETR4.SA", params={"range": "1d"}).status_code == 500
+    assert client.get("/stats").json() == {"requests": 1, "errors": 1}
+
+
+def test_gerador_deterministico_e_resumo():
+    mix = parse_mix("dia=3,entre=1")
+    assert mix == {"dia": 0.75, "entre": 0.25}
+
+    gerador_1 = RequestGenerator(mix, ["PETR4.SA", "VALE3.SA"], invalid_rate=0.2, seed=7, hoje=HOJE)
+    gerador_2 = RequestGenerator(mix, ["PETR4.SA", "VALE3.SA"], invalid_rate=0.2, seed=7, hoje=HOJE)
+    sequencia = [gerador_1.next() for _ in range(50)]
+    assert sequencia == [gerador_2.next() for _ in range(50)]
+    assert {nome for nome, _ in sequencia} == {"dia", "entre"}
+
+    amostras = [("dia", 200, float(i)) for i in range(1, 101)] + [("entre", 500, 10.0), ("entre", 404, 20.0)]
+    resumo = summarize(amostras, duracao=2.0)
+    assert resumo["total"]["requests"] == 102
+    assert resumo["total"]["throughput_rps"] == 51.0
+    assert resumo["dia"]["p50_ms"] == 50.5
+    assert resumo["dia"]["error_rate"] == 0.0
+    assert resumo["entre"]["error_rate"] == 0.5
+    assert resumo["entre"]["client_error_rate"] == 0.5
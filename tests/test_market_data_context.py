@@ -0,0 +1,56 @@
+'''
+Testes do contexto de dados de mercado por requisição.
+Verifica que validadores e serviços compartilham um único download,
+usando um fetcher falso e o modelo pequeno da fixture make_model (sem rede).
+'''
+
+import numpy as np
+import pandas as pd
+
+from app.domain.services.market_data_context import MarketDataContext
+from app.domain.commands.avaluation_prices_commands import (
+    handle_ticker_info_between_dates,
+    handle_ticker_info_specific_date,
+)
+from app.schemas.ticker_request import TickerRequest, TickerRequestBetweenDates
+
+
+class CountingFetcher:
+    def __init__(self):
+        self.chamadas = 0
+
+    def __call__(self, ticker, inicio, fim):
+        self.chamadas += 1
+        idx = pd.bdate_range(pd.Timestamp(inicio), pd.Timestamp(fim) - pd.Timedelta(days=1), name="Date")
+        close = 30 + np.sin(np.arange(len(idx)) / 5.0)
+        return pd.DataFrame({"Close": close, "Open": close}, index=idx)
+
+
+def test_for_request_cobre_lookback_dos_validadores_e_do_servico():
+    req = TickerRequestBetweenDates(init_date="2025-06-01", end_date="2025-08-01", ticker=" itub4.sa ")
+    ctx = MarketDataContext.for_request(req)
+    assert ctx.ticker == "ITUB4.SA"
+    assert ctx.inicio <= pd.Timestamp("2025-06-01") - pd.Timedelta(days=90)
+    assert ctx.fim == pd.Timestamp("2025-08-02")
+
+
+def test_previsao_dia_faz_um_unico_download(make_model):
+    fetcher = CountingFetcher()
+    req = TickerRequest(target_date="2025-06-03", ticker="ITUB4.SA")
+    ctx = MarketDataContext.for_request(req, fetcher=fetcher)
+
+    result = handle_ticker_info_specific_date(req, make_model(), context=ctx)
+
+    assert fetcher.chamadas == 1
+    assert result["data"][0]["actual"] is not None
+
+
+def test_previsao_entre_datas_faz_um_unico_download(make_model):
+    fetcher = CountingFetcher()
+    req = TickerRequestBetweenDates(init_date="2025-03-03", end_date="2025-06-02", ticker="ITUB4.SA")
+    ctx = MarketDataContext.for_request(req, fetcher=fetcher)
+
+    result = handle_ticker_info_between_dates(req, make_model(), context=ctx)
+
+    assert fetcher.chamadas == 1
+    assert result["metadata"]["count"] > 0
@@ -0,0 +1,61 @@
+'''
+Testes dos provedores de dados de mercado: séries sintéticas determinísticas,
+leitura de arquivos locais e retry do cliente HTTP compartilhado do Yahoo.
+'''
+
+import httpx
+import numpy as np
+import pandas as pd
+
+from app.domain.services import market_data_provider
+from app.domain.services.market_data_provider import LocalFileProvider, SyntheticProvider, YahooProvider
+from loadtest.fake_yahoo import chart_payload
+
+
+def test_provedor_sintetico_e_deterministico():
+    provider = SyntheticProvider(today="2025-06-13")
+
+    longo = provider.fetch_history("PETR4.SA", "2025-01-01", "2025-07-01")
+    curto = provider.fetch_history("PETR4.SA", "2025-06-02", "2025-06-10")
+    assert longo.index[-1] == pd.Timestamp("2025-06-13")
+    assert curto.index[-1] == pd.Timestamp("2025-06-09")
+    pd.testing.assert_frame_equal(curto, longo.loc[curto.index])
+
+    assert provider.ticker_exists("VALE3.SA")
+    assert not provider.ticker_exists("INVALID1.SA")
+    assert provider.fetch_many(["INVALID1.SA"], "2025-01-01", "2025-07-01")["INVALID1.SA"].empty
+
+
+def test_provedor_local_le_csv(tmp_path):
+    origem = SyntheticProvider(today="2025-06-13").fetch_history("PETR4.SA", "2025-05-01", "2025-06-14")
+    origem.reset_index().to_csv(tmp_path / "PETR4.SA.csv", index=False)
+    provider = LocalFileProvider(tmp_path)
+
+    recorte = provider.fetch_history("petr4.sa", "2025-06-02", "2025-06-10")
+    pd.testing.assert_frame_equal(recorte, origem.loc["2025-06-02":"2025-06-09"], check_freq=False)
+    assert provider.ticker_exists("PETR4.SA")
+    assert provider.fetch_history("VALE3.SA", "2025-06-02", "2025-06-10").empty
+    assert not provider.ticker_exists("VALE3.SA")
+
+
+def test_yahoo_repete_falhas_transitorias(monkeypatch):
+    monkeypatch.setattr(market_data_provider.settings, "YAHOO_HTTP_RETRY_BACKOFF_SECONDS", 0.0)
+    frame = SyntheticProvider(today="2025-06-13").fetch_history("PETR4.SA", "2025-06-02", "2025-06-10")
+    chamadas = []
+
+    def responder(request):
+        chamadas.append(request.url.path)
+        if len(chamadas) == 1:
+            return httpx.Response(503)
+        return httpx.Response(200, json=chart_payload("PETR4.SA", frame))
+
+    provider = YahooProvider()
+    provider._client = httpx.Client(transport=httpx.MockTransport(responder))
+    try:
+        baixado = provider.fetch_history("PETR4.SA", "2025-06-02", "2025-06-10")
+    finally:
+        provider.close()
+
+    assert len(chamadas) == 2
+    assert list(baixado.index) == list(frame.index)
+    np.testing.assert_allclose(baixado["Close"].to_numpy(), frame["Close"].to_numpy())
@@ -0,0 +1,90 @@
+'''
+Testes do formato de pesos mapeáveis (app.domain.services.ml_handler.mmap_weights)
+e do preload no ml_handler: o artefato é gerado do .pkl, carrega mapeado em
+memória com saída idêntica, é refeito quando o .pkl muda, e formatos não
+suportados caem para o .pkl.
+'''
+
+import os
+import pickle
+import stat
+
+import pytest
+import torch
+
+from app.config.process_memory import memory_snapshot
+from app.domain.services.ml_handler import ml_handler
+from app.domain.services.ml_handler import mmap_weights
+from app.domain.services.ml_handler.mmap_weights import load_mmap_weights, weights_path_for
+
+
+@pytest.fixture
+def modelo_pkl(tmp_path, make_model):
+    modelo = make_model(hidden_size=8, num_layers=2, dropout_prob=0.2)
+    caminho = tmp_path / "modelo_lstm_7.pkl"
+    caminho.write_bytes(pickle.dumps(modelo))
+    return modelo, caminho
+
+
+def test_pesos_mapeados_tem_saida_identica_ao_pkl(modelo_pkl):
+    modelo, caminho = modelo_pkl
+    carregado = ml_handler.carregar_modelo_eager(caminho, "mmap")
+
+    pesos = weights_path_for(caminho)
+    assert pesos.name == "modelo_lstm_7.weights.pt" and pesos.exists()
+    # Modo de arquivo comum (0644 com o umask), não o 0600 do temporário
+    assert stat.S_IMODE(pesos.stat().st_mode) == 0o644 & ~mmap_weights._umask()
+    assert not carregado.training and not any(p.requires_grad for p in carregado.parameters())
+
+    x = torch.randn(4, 30, 1)
+    with torch.inference_mode():
+        assert torch.equal(carregado(x), modelo(x))
+
+    # O arquivo está mapeado no processo (não foi lido para memória anônima)
+    with open(f"/proc/{os.getpid()}/maps") as f:
+        assert str(pesos) in f.read()
+
+
+def test_artefato_e_refeito_quando_o_pkl_e_mais_novo(modelo_pkl, make_model):
+    _, caminho = modelo_pkl
+    ml_handler.carregar_modelo_eager(caminho, "mmap")
+
+    novo = make_model(hidden_size=8, num_layers=2, dropout_prob=0.2, seed=1)
+    caminho.write_bytes(pickle.dumps(novo))
+    pesos = weights_path_for(caminho)
+    antigo = pesos.stat().st_mtime - 10
+    os.utime(pesos, (antigo, antigo))
+
+    x = torch.randn(2, 30, 1)
+    with torch.inference_mode():
+        assert torch.equal(ml_handler.carregar_modelo_eager(caminho, "mmap")(x), novo(x))
+        assert torch.equal(load_mmap_weights(pesos)(x), novo(x))
+
+
+def test_modelo_nao_suportado_cai_para_o_pkl(tmp_path):
+    caminho = tmp_path / "modelo.pkl"
+    caminho.write_bytes(pickle.dumps(torch.nn.Linear(3, 1)))
+
+    carregado = ml_handler.carregar_modelo_eager(caminho, "mmap")
+    assert isinstance(carregado, torch.nn.Linear)
+    assert not weights_path_for(caminho).exists()
+
+    with pytest.raises(ValueError):
+        ml_handler.carregar_modelo_eager(caminho, "safetensors")
+
+
+def test_carga_global_reaproveita_o_modelo_pre_carregado(modelo_pkl, monkeypatch):
+    _, caminho = modelo_pkl
+    monkeypatch.setattr(ml_handler, "_modelo_preload", None)
+    monkeypatch.setattr(ml_handler, "_modelo_carregado", None)
+    monkeypatch.setattr(ml_handler.gc, "freeze", lambda: None)
+
+    assert not ml_handler.is_preloaded(caminho)
+    pre_carregado = ml_handler.preload_model(caminho)
+    assert ml_handler.is_preloaded(str(caminho))
+    assert ml_handler.carregar_modelo_global(str(caminho)) is pre_carregado
+
+
+def test_memory_snapshot_tem_rss():
+    memoria = memory_snapshot()
+    assert memoria["rss_mb"] > 0
@@ -0,0 +1,68 @@
+'''
+Testes da interface de backend do modelo (app.domain.services.ml_handler.backends):
+TorchBackend com entrada ndarray/tensor e backend ONNX Runtime equivalente ao
+torch no forward, no run_forecast e na previsão recursiva.
+'''
+
+import numpy as np
+import pytest
+import torch
+
+from app.domain.services.avaluation_model_service import run_forecast
+from app.domain.services.forecast_engine import RecursiveForecastEngine
+from app.domain.services.ml_handler.backends import TorchBackend, as_backend, attach_backend, export_onnx
+from app.domain.services.ml_handler.model_registry import RegisteredModel
+
+
+def _janelas(batch=5, seq=30):
+    return np.random.default_rng(0).uniform(-1, 1, size=(batch, seq, 1)).astype(np.float32)
+
+
+def test_torch_backend_aceita_ndarray_e_tensor(make_model):
+    modelo = make_model(hidden_size=8, num_layers=2)
+    backend = as_backend(modelo)
+    assert isinstance(backend, TorchBackend)
+    assert as_backend(backend) is backend
+    assert backend.supports_step
+
+    x = _janelas()
+    np.testing.assert_array_equal(backend.predict(x), backend(torch.from_numpy(x)).detach().numpy())
+
+
+def test_backend_criado_uma_vez_por_modelo(make_model, monkeypatch):
+    modelo = make_model(hidden_size=8, num_layers=1)
+    backend = attach_backend(modelo)
+
+    chamadas_eval = []
+    monkeypatch.setattr(modelo, "eval", lambda: chamadas_eval.append(1) or modelo)
+    assert as_backend(modelo) is backend
+    assert RegisteredModel(modelo, 30, "lstm_teste").backend is backend
+    # O caminho quente não volta a mexer no módulo compartilhado
+    as_backend(modelo).predict(_janelas())
+    assert chamadas_eval == []
+
+
+def test_onnxruntime_equivale_ao_torch(tmp_path, make_model):
+    pytest.importorskip("onnxruntime")
+    from app.domain.services.ml_handler.backends import OnnxRuntimeBackend
+
+    modelo = make_model(hidden_size=8, num_layers=2)
+    backend = OnnxRuntimeBackend(export_onnx(modelo, tmp_path / "modelo.onnx", seq_length=30))
+    assert not backend.supports_step
+
+    x = _janelas(batch=7)
+    np.testing.assert_allclose(backend.predict(x), as_backend(modelo).predict(x), atol=1e-5)
+
+    preds, erro = run_forecast(backend, torch.from_numpy(x).unsqueeze(-1))
+    assert erro is None
+    assert preds.shape == (7, 1)
+
+    # Sem avanço com estado, o modo fast cai para o exato
+    engine = RecursiveForecastEngine(backend, "fast")
+    assert engine.mode == "exact"
+    janela = torch.from_numpy(x[0])
+    np.testing.assert_allclose(
+        engine.forecast_norm(janela, 0.1, 10),
+        RecursiveForecastEngine(modelo, "exact").forecast_norm(janela, 0.1, 10),
+        atol=1e-5,
+    )
@@ -0,0 +1,50 @@
+'''
+Testes do backend compilado do modelo (app.domain.services.ml_handler.model_export):
+artefato TorchScript idêntico ao eager, fallback para eager e modo "exact"
+da previsão recursiva quando o nn.LSTM não está acessível.
+'''
+
+import pytest
+import torch
+
+from app.domain.services.forecast_engine import RecursiveForecastEngine
+from app.domain.services.ml_handler.model_export import (
+    benchmark_latency,
+    export_torchscript,
+    load_torchscript,
+    prepare_backend,
+    verify_against_eager,
+)
+
+
+def test_artefato_torchscript_bate_com_o_eager(tmp_path, make_model):
+    modelo = make_model(hidden_size=8, num_layers=2)
+    caminho = tmp_path / "modelo.torchscript.pt"
+    export_torchscript(modelo, caminho)
+
+    carregado = load_torchscript(caminho)
+    assert verify_against_eager(modelo, carregado, seq_length=30) == 0.0
+
+    latencias = benchmark_latency(carregado, seq_length=30, repeticoes=3, aquecimento=1)
+    assert set(latencias) == {1, 8, 64}
+
+
+def test_prepare_backend_torchscript_sem_artefato_exporta_em_memoria(tmp_path, make_model):
+    modelo = make_model(hidden_size=8, num_layers=2)
+    backend = prepare_backend(modelo, "torchscript", artifact_path=tmp_path / "inexistente.pt")
+    assert isinstance(backend, torch.jit.ScriptModule)
+
+    # Sem nn.LSTM acessível, o modo fast cai para o exato
+    assert RecursiveForecastEngine(backend, "fast").mode == "exact"
+
+
+def test_prepare_backend_valida_nome(make_model):
+    modelo = make_model(hidden_size=8, num_layers=2)
+    assert prepare_backend(modelo, "eager") is modelo
+    with pytest.raises(ValueError):
+        prepare_backend(modelo, "tensorrt")
+
+
+def test_verify_against_eager_rejeita_divergencia(make_model):
+    with pytest.raises(ValueError):
+        verify_against_eager(make_model(hidden_size=8, num_layers=2), lambda x: torch.zeros(x.shape[0], 1) + 10, seq_length=30)
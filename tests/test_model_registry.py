@@ -0,0 +1,171 @@
+'''
+Testes do registro de modelos (app.domain.services.ml_handler.model_registry):
+carregamento preguiçoso, LRU por memória, escolha do melhor por métrica e
+seq_length de cada modelo usado na montagem das janelas e criação única do
+registro com acessos concorrentes.
+'''
+
+import asyncio
+import threading
+import time
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import pytest
+from fastapi import HTTPException
+
+from app.domain.command_handlers.avaluation_command_handler import process_ticker_single_day
+from app.domain.services.market_data_context import MarketDataContext
+from app.domain.services.ml_handler import model_registry
+from app.domain.services.ml_handler.model_registry import ModelRegistry, RegisteredModel, with_resolved_model_async
+from app.schemas.ticker_request import TickerRequest
+
+CSV = """nr_model,seq_length,batch_size,hidden_size,num_layers,lr,dropout_prob,num_epochs,loss_function,data_inicial,data_final,dias_futuros,mae,mse,rmse,dac
+1,30,32,8,1,0.002,0.1,30,MSE,2025-11-20 21:50:50,2025-11-20 21:51:04,1,0.30,0.02,0.16,0.79
+2,45,32,8,1,0.002,0.1,30,MSE,2025-11-20 21:50:50,2025-11-20 21:51:04,1,0.10,0.02,0.16,0.70
+3,30,32,8,1,0.002,0.1,30,MSE,2025-11-20 21:50:50,2025-11-20 21:51:04,1,0.05,0.02,0.16,0.90
+"""
+
+
+@pytest.fixture
+def novo_modelo(make_model, counting_model):
+    """Modelo do registro: registra o shape de cada forward."""
+    return lambda: counting_model(make_model(hidden_size=8))
+
+
+def _registro(tmp_path, novo_modelo, max_bytes=10**9):
+    csv = tmp_path / "best.csv"
+    csv.write_text(CSV)
+    for nr in (1, 2):  # o modelo 3 não tem artefato
+        (tmp_path / f"modelo_lstm_{nr}.pkl").write_bytes(b"")
+    carregados = []
+
+    def loader(spec):
+        carregados.append(spec.nr_model)
+        return novo_modelo()
+
+    return ModelRegistry(csv, tmp_path, max_resident_bytes=max_bytes, loader=loader), carregados
+
+
+def test_carrega_sob_demanda_e_reaproveita(tmp_path, novo_modelo):
+    registro, carregados = _registro(tmp_path, novo_modelo)
+    assert carregados == []
+
+    modelo = registro.get(2)
+    assert isinstance(modelo, RegisteredModel)
+    assert modelo.seq_length == 45
+    assert modelo.version == "lstm_2"
+    assert registro.get(2) is modelo
+    assert carregados == [2]
+
+    with pytest.raises(KeyError):
+        registro.get(3)
+
+
+def test_lru_respeita_limite_de_memoria(tmp_path, novo_modelo):
+    registro, carregados = _registro(tmp_path, novo_modelo, max_bytes=1)
+    registro.adopt(3, novo_modelo())
+
+    registro.get(1)
+    registro.get(2)
+    registro.get(1)
+
+    assert carregados == [1, 2, 1]
+    stats = registro.stats()
+    assert stats["evictions"] == 2
+    # O modelo adotado é fixo e não conta para o despejo
+    assert 3 in stats["resident"]
+    assert registro.get(3).seq_length == 30
+
+
+def test_best_escolhe_entre_os_disponiveis(tmp_path, novo_modelo):
+    registro, _ = _registro(tmp_path, novo_modelo)
+    assert registro.best("mae") == 2
+    assert registro.best("dac") == 1
+    with pytest.raises(ValueError):
+        registro.best("r2")
+
+
+def test_janela_usa_o_seq_length_do_modelo(tmp_path, novo_modelo):
+    registro, _ = _registro(tmp_path, novo_modelo)
+    modelo = registro.get(2)
+
+    req = TickerRequest(ticker="ITUB4.SA", target_date=date(2024, 6, 3), model_id=2)
+    idx = pd.bdate_range("2023-06-01", "2024-06-07", name="Date")
+    frame = pd.DataFrame({"Close": 30 + np.sin(np.arange(len(idx)) / 5.0)}, index=idx)
+    context = MarketDataContext.preloaded(req, frame, modelo.seq_length)
+    assert context.inicio == pd.Timestamp("2024-06-03") - pd.Timedelta(days=100)
+
+    resposta = process_ticker_single_day(req, modelo, context)
+    assert resposta["metadata"]["model_version"] == "lstm_2"
+    assert modelo.module.shapes == [(1, 45, 1)]
+
+
+def test_model_id_inexistente_responde_404(tmp_path, monkeypatch, novo_modelo):
+    registro, _ = _registro(tmp_path, novo_modelo)
+    monkeypatch.setattr(model_registry, "_registry", registro)
+
+    @with_resolved_model_async
+    async def handler(req, model):
+        return model
+
+    padrao = object()
+    assert asyncio.run(handler(TickerRequest(ticker="A", target_date=date(2024, 6, 3)), padrao)) is padrao
+    assert asyncio.run(handler(TickerRequest(ticker="A", target_date=date(2024, 6, 3), model_id=1), padrao)).version == "lstm_1"
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(handler(TickerRequest(ticker="A", target_date=date(2024, 6, 3), model_id=3), padrao))
+    assert exc.value.status_code == 404
+
+
+def test_carga_lenta_nao_bloqueia_hits_de_outros_modelos(tmp_path, novo_modelo):
+    csv = tmp_path / "best.csv"
+    csv.write_text(CSV)
+    for nr in (1, 2):
+        (tmp_path / f"modelo_lstm_{nr}.pkl").write_bytes(b"")
+    liberar, carregando = threading.Event(), threading.Event()
+    carregados = []
+
+    def loader(spec):
+        carregados.append(spec.nr_model)
+        if spec.nr_model == 2:
+            carregando.set()
+            liberar.wait(5)
+        return novo_modelo()
+
+    registro = ModelRegistry(csv, tmp_path, loader=loader)
+    registro.get(1)
+
+    threads = [threading.Thread(target=registro.get, args=(2,)) for _ in range(2)]
+    for t in threads:
+        t.start()
+    assert carregando.wait(5)
+    # Com o modelo 2 carregando, o hit do modelo 1 não espera
+    assert registro.get(1) is not None
+    liberar.set()
+    for t in threads:
+        t.join()
+
+    assert carregados == [1, 2]
+    assert registro.stats()["loads"] == 2
+
+
+def test_get_model_registry_concorrente_cria_um_registro(monkeypatch):
+    criados = []
+
+    class RegistroLento:
+        def __init__(self):
+            criados.append(self)
+            time.sleep(0.05)
+
+    monkeypatch.setattr(model_registry, "_registry", None)
+    monkeypatch.setattr(model_registry, "ModelRegistry", RegistroLento)
+    vistos = []
+    threads = [threading.Thread(target=lambda: vistos.append(model_registry.get_model_registry())) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(criados) == 1
+    assert all(r is criados[0] for r in vistos)
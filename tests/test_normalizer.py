@@ -0,0 +1,60 @@
+'''
+Testes do MinMaxNormalizer (app.domain.services.normalizer): resultados idênticos
+aos do MinMaxScaler(feature_range=(-1, 1)) do sklearn em NumPy e torch, séries
+constantes e serialização (JSON e pickle).
+'''
+
+import json
+import pickle
+
+import numpy as np
+import pytest
+import torch
+from sklearn.preprocessing import MinMaxScaler
+
+from app.domain.services.normalizer import MinMaxNormalizer
+
+
+@pytest.fixture
+def serie():
+    rng = np.random.default_rng(7)
+    return (30 + rng.standard_normal(300).cumsum()).reshape(-1, 1)
+
+
+def test_identico_ao_sklearn(serie):
+    ref = MinMaxScaler(feature_range=(-1, 1)).fit(serie[:-1])
+    norm = MinMaxNormalizer(feature_range=(-1, 1)).fit(serie[:-1])
+
+    for atributo in ("data_min_", "data_max_", "data_range_", "scale_", "min_"):
+        assert np.array_equal(getattr(norm, atributo), getattr(ref, atributo))
+    assert np.array_equal(norm.transform(serie), ref.transform(serie))
+    assert np.array_equal(norm.transform(serie.astype(np.float32)), ref.transform(serie.astype(np.float32)))
+
+    preds = ref.transform(serie)[:20]
+    assert np.array_equal(norm.inverse_transform(preds), ref.inverse_transform(preds))
+    # 1-D e tensores, sem reshape nem conversão pelo chamador
+    assert np.array_equal(norm.inverse_transform(preds.reshape(-1)), ref.inverse_transform(preds).reshape(-1))
+
+    tensor = torch.from_numpy(serie).float()
+    esperado = ref.transform(tensor.double().numpy()).astype(np.float32)
+    assert torch.equal(norm.transform(tensor), torch.from_numpy(esperado))
+    assert torch.equal(norm.inverse_transform(torch.from_numpy(preds)), torch.from_numpy(ref.inverse_transform(preds)))
+
+
+def test_serie_constante_como_sklearn():
+    constante = np.full((30, 1), 12.5)
+    ref = MinMaxScaler(feature_range=(-1, 1)).fit(constante)
+    norm = MinMaxNormalizer().fit(constante)
+    assert np.array_equal(norm.scale_, ref.scale_)
+    assert np.array_equal(norm.transform(constante), ref.transform(constante))
+
+
+def test_serializavel(serie):
+    norm = MinMaxNormalizer().fit(serie)
+    norm.transform(torch.from_numpy(serie))  # popula o cache de parâmetros torch
+
+    de_json = MinMaxNormalizer.from_dict(json.loads(json.dumps(norm.to_dict())))
+    de_pickle = pickle.loads(pickle.dumps(norm))
+    for copia in (de_json, de_pickle):
+        assert np.array_equal(copia.scale_, norm.scale_) and np.array_equal(copia.min_, norm.min_)
+        assert np.array_equal(copia.transform(serie), norm.transform(serie))
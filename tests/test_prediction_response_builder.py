@@ -0,0 +1,80 @@
+'''
+Testes do PredictionResponseBuilder colunar: o JSON é idêntico ao da formatação
+ponto a ponto (format_prediction_point), inclusive em quase empates do
+arredondamento, e o layout "columns" carrega os mesmos valores.
+'''
+
+import json
+from itertools import zip_longest
+
+import numpy as np
+import pandas as pd
+
+from app.domain.results.prediction_response_builder import (
+    PredictionResponseBuilder, format_prediction_point, format_prediction_points, round2,
+)
+
+
+def _referencia(dates, predictions, actuals):
+    # Caminho original: zip_longest + um format_prediction_point por ponto
+    return [
+        format_prediction_point(d, p, a)
+        for d, p, a in zip_longest(dates, predictions, actuals, fillvalue=None)
+        if d is not None
+    ]
+
+
+def test_round2_igual_ao_round_do_python():
+    rng = np.random.default_rng(3)
+    valores = np.concatenate([
+        rng.uniform(-500, 500, 20000),
+        # Empates decimais e seus vizinhos em ponto flutuante
+        np.array([2.675, 1.005, 0.125, 0.285, -0.125, 1.115, 8.345, 10.005, 0.5, 1e9 + 0.005]),
+        np.round(rng.uniform(0, 100, 2000), 3) + 0.005,
+    ])
+    assert [round(float(v), 2) for v in valores] == round2(valores).tolist()
+
+
+def test_builder_igual_ao_ponto_a_ponto():
+    rng = np.random.default_rng(11)
+    datas = list(pd.bdate_range("2024-01-02", periods=300))
+    preds = (30 + rng.standard_normal(300).cumsum()).tolist()
+    reais = (30 + rng.standard_normal(280).cumsum()).tolist()
+    futuras = list(pd.bdate_range("2025-03-01", periods=10, tz="America/Sao_Paulo"))
+    preds_futuras = np.linspace(29.995, 31.005, 10)
+
+    resposta = (PredictionResponseBuilder()
+                .set_ticker("PETR4.SA")
+                .set_metadata(model_version="v1", period_type="janela_deslizante")
+                .add_batch_predictions(datas, np.asarray(preds), reais)
+                .add_batch_predictions(futuras, preds_futuras, [])
+                .build())
+
+    esperado = _referencia(datas, preds, reais) + _referencia(futuras, preds_futuras, [])
+    assert json.dumps(resposta["data"]) == json.dumps(esperado)
+    assert resposta["metadata"] == {"model_version": "v1", "period": "janela_deslizante", "type": "backtest", "count": 310}
+
+    # Ponto único com data datetime.date e datas ausentes no lote
+    assert format_prediction_points([None, "2025-06-02"], [1.0, 2.345], [None, None]) == [
+        format_prediction_point("2025-06-02", 2.345)
+    ]
+    unico = PredictionResponseBuilder().add_prediction(pd.Timestamp("2025-06-02").date(), 12.345, None).build()
+    assert unico["data"] == [format_prediction_point("2025-06-02", 12.345)]
+    assert unico["metadata"]["type"] == "forecast"
+
+
+def test_layout_colunar():
+    datas = pd.bdate_range("2025-06-02", periods=4)
+    resposta = (PredictionResponseBuilder()
+                .set_ticker("VALE3.SA")
+                .set_metadata(model_version="v1", period_type="janela_deslizante")
+                .add_batch_predictions(datas, [10.004, 10.5, 11.0, 11.25], [10.0, 10.25])
+                .build(layout="columns"))
+
+    assert resposta["metadata"]["layout"] == "columns"
+    assert resposta["data"] == {
+        "dates": ["2025-06-02", "2025-06-03", "2025-06-04", "2025-06-05"],
+        "predictions": [10.0, 10.5, 11.0, 11.25],
+        "actuals": [10.0, 10.25, None, None],
+        "diffs": [0.0, 0.25, None, None],
+    }
@@ -0,0 +1,211 @@
+'''
+Testes do store local de preços (app.domain.services.price_store).
+Usa um fetcher falso no lugar do Yahoo para verificar que o histórico é gravado
+uma vez, que só a cauda faltante é baixada depois (mais o último pregão, que
+detecta mudança na base de ajuste e faz o histórico ser regravado), que
+atualizações concorrentes do mesmo ticker compartilham um download e que os
+recortes por data saem no mesmo formato do yfinance.
+'''
+
+import asyncio
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from app.domain.services.price_store import PriceStore, COLUNAS_PRECO
+
+
+class FakeFetcher:
+    """Preço de cada dia = ordinal da data x `fator` (o fator faz o papel do ajuste por proventos)."""
+
+    def __init__(self, ultimo_dia):
+        self.ultimo_dia = pd.Timestamp(ultimo_dia)
+        self.fator = 1.0
+        self.chamadas = []
+
+    def __call__(self, ticker, inicio, fim):
+        self.chamadas.append((ticker, inicio, fim))
+        fim = min(pd.Timestamp(fim), self.ultimo_dia + pd.Timedelta(days=1))
+        idx = pd.bdate_range(pd.Timestamp(inicio), fim - pd.Timedelta(days=1), name="Date")
+        base = np.array([d.toordinal() for d in idx], dtype=float) * self.fator
+        return pd.DataFrame({col: base for col in COLUNAS_PRECO}, index=idx)
+
+
+def test_get_range_grava_historico_e_serve_recorte(tmp_path):
+    fetcher = FakeFetcher("2024-03-28")
+    store = PriceStore(tmp_path, fetcher=fetcher, history_start="2024-01-01", refresh_interval_seconds=0)
+
+    df = store.get_range("ITUB4.SA", "2024-02-01", "2024-02-10")
+
+    assert list(df.columns) == list(COLUNAS_PRECO)
+    assert df.index.name == "Date"
+    assert df.index[0] == pd.Timestamp("2024-02-01")
+    assert df.index[-1] == pd.Timestamp("2024-02-09")
+    assert len(fetcher.chamadas) == 1
+
+    # Intervalo já coberto pelo disco: nenhuma ida ao upstream
+    store.get_range("ITUB4.SA", "2024-01-10", "2024-03-01")
+    assert len(fetcher.chamadas) == 1
+
+
+def test_refresh_baixa_somente_a_cauda(tmp_path):
+    fetcher = FakeFetcher("2024-03-28")
+    store = PriceStore(tmp_path, fetcher=fetcher, history_start="2024-01-01", refresh_interval_seconds=0)
+    store.get_range("ITUB4.SA", "2024-01-01", "2024-02-01")
+
+    fetcher.ultimo_dia = pd.Timestamp("2024-04-05")
+    df = store.get_range("ITUB4.SA", "2024-03-25", "2024-04-06")
+
+    # A cauda começa no último pregão gravado (comparação da base de ajuste)
+    _, inicio_cauda, _ = fetcher.chamadas[-1]
+    assert pd.Timestamp(inicio_cauda) == pd.Timestamp("2024-03-28")
+    assert df.index[-1] == pd.Timestamp("2024-04-05")
+    assert not df.index.duplicated().any()
+
+    # Um novo store sobre o mesmo diretório lê o que já foi persistido
+    reaberto = PriceStore(tmp_path, fetcher=fetcher, refresh_interval_seconds=3600)
+    assert reaberto.last_date("ITUB4.SA") == np.datetime64("2024-04-05")
+
+
+def test_ticker_sem_dados_retorna_frame_vazio(tmp_path):
+    store = PriceStore(tmp_path, fetcher=lambda *a: pd.DataFrame(), refresh_interval_seconds=0)
+    df = store.get_range("XXXX3.SA", "2024-01-01", "2024-02-01")
+    assert df.empty
+    assert store.last_date("XXXX3.SA") is None
+
+
+def test_refresh_many_agrupa_downloads_por_data_de_inicio(tmp_path):
+    fetcher = FakeFetcher("2024-03-28")
+    lotes = []
+
+    def batch_fetcher(tickers, inicio, fim):
+        lotes.append((sorted(tickers), pd.Timestamp(inicio)))
+        return {t: fetcher(t, inicio, fim) for t in tickers}
+
+    store = PriceStore(tmp_path, fetcher=fetcher, batch_fetcher=batch_fetcher,
+                       history_start="2024-01-01", refresh_interval_seconds=0)
+    store.get_range("ITUB4.SA", "2024-01-01", "2024-02-01")
+    store.get_range("BBAS3.SA", "2024-01-01", "2024-02-01")
+
+    fetcher.ultimo_dia = pd.Timestamp("2024-04-05")
+    store.refresh_many(["ITUB4.SA", "BBAS3.SA", "PETR4.SA"])
+
+    # Só o ticker novo baixa desde o início do histórico; os demais, só a cauda
+    assert sorted(lotes) == [
+        (["BBAS3.SA", "ITUB4.SA"], pd.Timestamp("2024-03-28")),
+        (["PETR4.SA"], pd.Timestamp("2024-01-01")),
+    ]
+    assert store.last_date("PETR4.SA") == store.last_date("ITUB4.SA") == np.datetime64("2024-04-05")
+
+
+def test_arefresh_nao_trava_o_event_loop_com_o_lock_ocupado(tmp_path):
+    fetcher = FakeFetcher("2024-03-28")
+    store = PriceStore(tmp_path, fetcher=fetcher, history_start="2024-01-01", refresh_interval_seconds=0)
+
+    async def afetcher(ticker, inicio, fim):
+        return fetcher(ticker, inicio, fim)
+
+    async def cenario():
+        lock = store._lock("ITUB4.SA")
+        lock.acquire()  # um refresh síncrono em outra thread segurando o ticker
+        tarefa = asyncio.create_task(store.arefresh("ITUB4.SA", afetcher))
+        await asyncio.sleep(0.05)  # o loop segue atendendo
+        assert not tarefa.done()
+        lock.release()
+        return await asyncio.wait_for(tarefa, 5)
+
+    assert asyncio.run(cenario()) > 0
+    assert store.last_date("ITUB4.SA") == np.datetime64("2024-03-28")
+
+
+def test_mudanca_na_base_de_ajuste_regrava_o_historico(tmp_path):
+    fetcher = FakeFetcher("2024-03-28")
+    store = PriceStore(tmp_path, fetcher=fetcher, history_start="2024-01-01", refresh_interval_seconds=0)
+    antes = store.get_range("ITUB4.SA", "2024-01-01", "2024-03-29")
+    colunas_antigas = store._colunas("ITUB4.SA")
+
+    # Provento/desdobramento: toda a série ajustada muda de escala
+    fetcher.ultimo_dia, fetcher.fator = pd.Timestamp("2024-04-05"), 0.5
+    depois = store.get_range("ITUB4.SA", "2024-01-01", "2024-04-06")
+
+    assert pd.Timestamp(fetcher.chamadas[-1][1]) == pd.Timestamp("2024-01-01")
+    np.testing.assert_allclose(depois.loc[antes.index, "Close"], antes["Close"] * 0.5)
+    assert depois.index[-1] == pd.Timestamp("2024-04-05")
+    # A versão anterior continua legível para quem já a tinha mapeada
+    np.testing.assert_allclose(np.asarray(colunas_antigas["Close"]), antes["Close"])
+
+    # Um novo store (outro processo) enxerga a versão regravada
+    reaberto = PriceStore(tmp_path, fetcher=fetcher, refresh_interval_seconds=3600)
+    np.testing.assert_allclose(reaberto.get_range("ITUB4.SA", "2024-01-01", "2024-04-06")["Close"], depois["Close"])
+
+    # Sem nova mudança, a atualização seguinte volta a só anexar a cauda
+    fetcher.ultimo_dia = pd.Timestamp("2024-04-12")
+    store.get_range("ITUB4.SA", "2024-04-01", "2024-04-13")
+    assert pd.Timestamp(fetcher.chamadas[-1][1]) == pd.Timestamp("2024-04-05")
+    assert store.last_date("ITUB4.SA") == np.datetime64("2024-04-12")
+
+
+class FetcherBloqueante(FakeFetcher):
+    """Segura o download até `liberar`, para haver chamadas concorrentes em andamento."""
+
+    def __init__(self, ultimo_dia):
+        super().__init__(ultimo_dia)
+        self.entrou = threading.Event()
+        self.liberar = threading.Event()
+
+    def __call__(self, ticker, inicio, fim):
+        self.entrou.set()
+        self.liberar.wait(5)
+        return super().__call__(ticker, inicio, fim)
+
+
+def test_refresh_concorrente_do_ticker_frio_baixa_uma_vez(tmp_path):
+    fetcher = FetcherBloqueante("2024-03-28")
+    store = PriceStore(tmp_path, fetcher=fetcher, history_start="2024-01-01", refresh_interval_seconds=0)
+    resultados = {}
+
+    def ler(nome, inicio, fim):
+        resultados[nome] = store.get_range("ITUB4.SA", inicio, fim)
+
+    # Janelas diferentes (o single-flight das requisições não as junta)
+    lider = threading.Thread(target=ler, args=("a", "2024-02-01", "2024-03-01"))
+    lider.start()
+    fetcher.entrou.wait(5)
+    outra = threading.Thread(target=ler, args=("b", "2024-03-01", "2024-03-29"))
+    outra.start()
+    time.sleep(0.1)
+    fetcher.liberar.set()
+    lider.join()
+    outra.join()
+
+    assert len(fetcher.chamadas) == 1
+    assert resultados["a"].index[0] == pd.Timestamp("2024-02-01")
+    assert resultados["b"].index[-1] == pd.Timestamp("2024-03-28")
+
+
+def test_refresh_many_aguarda_download_em_andamento_do_mesmo_ticker(tmp_path):
+    fetcher = FetcherBloqueante("2024-03-28")
+    lotes = []
+
+    def batch_fetcher(tickers, inicio, fim):
+        lotes.append(sorted(tickers))
+        return {t: FakeFetcher.__call__(fetcher, t, inicio, fim) for t in tickers}
+
+    store = PriceStore(tmp_path, fetcher=fetcher, batch_fetcher=batch_fetcher,
+                       history_start="2024-01-01", refresh_interval_seconds=0)
+    individual = threading.Thread(target=store.refresh, args=("ITUB4.SA",))
+    individual.start()
+    fetcher.entrou.wait(5)
+    em_lote = threading.Thread(target=store.refresh_many, args=(["ITUB4.SA", "BBAS3.SA"],))
+    em_lote.start()
+    time.sleep(0.1)
+    fetcher.liberar.set()
+    individual.join()
+    em_lote.join()
+
+    # ITUB4 veio do download individual; o lote só baixou o que ninguém estava baixando
+    assert lotes == [["BBAS3.SA"]]
+    assert sorted(c[0] for c in fetcher.chamadas) == ["BBAS3.SA", "ITUB4.SA"]
+    assert store.last_date("ITUB4.SA") == store.last_date("BBAS3.SA") == np.datetime64("2024-03-28")
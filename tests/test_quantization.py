@@ -0,0 +1,72 @@
+'''
+Testes da variante int8 dinâmica (app.domain.services.ml_handler.quantization):
+dataset de replay determinístico, métricas do gate e recusa quando a degradação
+passa do limite configurado.
+'''
+
+import numpy as np
+import torch
+
+from app.domain.services.ml_handler import quantization
+from app.domain.services.ml_handler.model_export import prepare_backend
+from app.domain.services.ml_handler.quantization import (
+    accuracy_gate,
+    evaluate_model,
+    prepare_quantized,
+    quantize_model,
+    replay_dataset,
+)
+
+
+def test_replay_dataset_e_deterministico():
+    a = replay_dataset(n_series=2, length=80)
+    b = replay_dataset(n_series=2, length=80)
+    for (xa, ya, _), (xb, yb, _) in zip(a, b):
+        assert torch.equal(xa, xb)
+        assert torch.equal(ya, yb)
+
+
+def test_quantize_model_troca_camadas_e_preserva_original(make_model):
+    modelo = make_model(hidden_size=16, num_layers=2)
+    quantizado = quantize_model(modelo)
+    assert isinstance(modelo.lstm, torch.nn.LSTM)
+    assert not isinstance(quantizado.lstm, torch.nn.LSTM)
+
+    metricas = evaluate_model(quantizado, replay_dataset(n_series=2, length=80))
+    assert set(metricas) == {"mae", "rmse", "dac"}
+    assert 0.0 <= metricas["dac"] <= 1.0
+
+
+def test_gate_compara_com_fp32(monkeypatch, tmp_path, make_model):
+    modelo = make_model(hidden_size=16, num_layers=2)
+    dataset = replay_dataset(n_series=2, length=80)
+
+    aprovado, relatorio = accuracy_gate(modelo, modelo, dataset)
+    assert aprovado
+    assert relatorio["degradation"] == {"mae": 0.0, "rmse": 0.0, "dac": 0.0}
+
+    # Limites impossíveis: a variante int8 é recusada e o fp32 continua em uso
+    monkeypatch.setattr(quantization.settings, "QUANTIZATION_MAX_MAE_INCREASE", -1.0)
+    monkeypatch.setattr(quantization, "replay_dataset", lambda **_: dataset)
+    assert prepare_quantized(modelo, tmp_path / "inexistente.pt") is modelo
+    assert prepare_backend(modelo, "quantized", tmp_path / "inexistente.pt") is modelo
+
+
+def test_gate_aprova_degradacao_dentro_do_limite(monkeypatch, tmp_path, make_model):
+    modelo = make_model(hidden_size=16, num_layers=2)
+    dataset = replay_dataset(n_series=2, length=80)
+    for nome in ("QUANTIZATION_MAX_MAE_INCREASE", "QUANTIZATION_MAX_RMSE_INCREASE", "QUANTIZATION_MAX_DAC_DROP"):
+        monkeypatch.setattr(quantization.settings, nome, np.inf)
+    monkeypatch.setattr(quantization, "replay_dataset", lambda **_: dataset)
+
+    assert prepare_quantized(modelo, tmp_path / "inexistente.pt") is not modelo
+
+
+def test_falha_na_quantizacao_cai_para_o_fp32(monkeypatch, tmp_path, make_model):
+    modelo = make_model(hidden_size=16, num_layers=2)
+
+    def quebra(*args, **kwargs):
+        raise RuntimeError("sem backend de quantização")
+
+    monkeypatch.setattr(quantization, "quantize_model", quebra)
+    assert prepare_backend(modelo, "quantized", tmp_path / "inexistente.pt") is modelo
@@ -0,0 +1,81 @@
+'''
+Testes do cache de respostas de previsão (app.domain.services.response_cache):
+invalidação por novo pregão (e não por tempo), chave com a versão do modelo,
+despejo por tamanho e handlers async servindo hits sem nova inferência.
+'''
+
+import asyncio
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.domain.commands.avaluation_prices_commands import handle_ticker_info_specific_date_async
+from app.domain.services import response_cache
+from app.domain.services.market_data_context import MarketDataContext
+from app.domain.services.response_cache import PredictionResponseCache, bar_marker
+from app.schemas.ticker_request import TickerRequest
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    novo = PredictionResponseCache(max_bytes=10**6)
+    monkeypatch.setattr(response_cache, "_cache", novo)
+    return novo
+
+
+def _contexto(req, ultimo_dia, ultimo_close=None):
+    async def afetcher(ticker, inicio, fim):
+        idx = pd.bdate_range(pd.Timestamp(inicio), pd.Timestamp(ultimo_dia), name="Date")
+        close = 30 + np.cos(np.arange(len(idx)) / 7.0)
+        if ultimo_close is not None:
+            close[-1] = ultimo_close
+        return pd.DataFrame({"Close": close}, index=idx)
+    return MarketDataContext.for_request(req, afetcher=afetcher)
+
+
+def test_invalida_por_marcador_e_despeja_por_tamanho():
+    cache = PredictionResponseCache(max_bytes=120, max_entry_bytes=100)
+    resposta = {"data": [1, 2, 3]}
+
+    assert cache.put(("a",), ("2025-06-02", 30.0), resposta)
+    assert cache.get(("a",), ("2025-06-02", 30.0)) is resposta
+    assert cache.get(("a",), ("2025-06-03", 31.0)) is None
+    assert cache.stats()["invalidations"] == 1
+
+    assert not cache.put(("grande",), ("d", 1.0), {"data": "x" * 200})
+    for i in range(10):
+        cache.put((i,), ("d", 1.0), resposta)
+    stats = cache.stats()
+    assert stats["bytes"] <= 120
+    assert stats["evictions"] > 0
+    assert stats["hits"] == 1
+
+
+def test_bar_marker_usa_ultimo_pregao():
+    idx = pd.DatetimeIndex(["2025-06-02", "2025-06-03"], name="Date")
+    assert bar_marker(pd.DataFrame({"Close": [10.0, 11.5]}, index=idx)) == ("2025-06-03", 11.5)
+    assert bar_marker(pd.DataFrame({"Close": []})) is None
+
+
+def test_handler_async_serve_hit_ate_chegar_novo_pregao(cache, counting_model):
+    modelo = counting_model()
+    req = TickerRequest(target_date="2025-06-20", ticker="ITUB4.SA")
+
+    primeira = asyncio.run(handle_ticker_info_specific_date_async(req, modelo, context=_contexto(req, "2025-06-16")))
+    segunda = asyncio.run(handle_ticker_info_specific_date_async(req, modelo, context=_contexto(req, "2025-06-16")))
+    assert segunda == primeira
+    assert modelo.chamadas == 1
+
+    # Novo pregão disponível: a entrada é invalidada e a previsão recalculada
+    asyncio.run(handle_ticker_info_specific_date_async(req, modelo, context=_contexto(req, "2025-06-17")))
+    assert modelo.chamadas == 2
+
+    # Outra versão de modelo nunca reaproveita a resposta
+    outro = counting_model(version="lstm_41")
+    asyncio.run(handle_ticker_info_specific_date_async(req, outro, context=_contexto(req, "2025-06-17")))
+    assert outro.chamadas == 1
+
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["invalidations"] == 1
@@ -0,0 +1,125 @@
+'''
+Testes da negociação de conteúdo das rotas de previsão (app.routers.response_encoding):
+escolha do formato pelo Accept, 406 antes de rodar o handler, compressão só acima
+do limiar, codificações binárias (quando os pacotes opcionais estão instalados)
+e serialização das respostas grandes fora do event loop.
+'''
+
+import json
+import threading
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import app.routers.api as api_module
+from app.domain.results.prediction_response_builder import PredictionResponseBuilder
+from app.routers import response_encoding
+from app.routers.response_encoding import MEDIA_ARROW, MEDIA_JSON, MEDIA_MSGPACK, negotiate_media_type
+
+
+def _resposta(pontos: int, layout: str = "rows") -> dict:
+    import pandas as pd
+    datas = pd.bdate_range("2024-01-02", periods=pontos)
+    return (PredictionResponseBuilder()
+            .set_ticker("ITUB4.SA")
+            .set_metadata(model_version="v1", period_type="janela_deslizante")
+            .add_batch_predictions(datas, [30.0 + i / 100 for i in range(pontos)], [30.0] * (pontos - 2))
+            .build(layout=layout))
+
+
+@pytest.fixture
+def client(monkeypatch):
+    chamadas = []
+
+    async def handler(req, model):
+        chamadas.append(req)
+        return _resposta(300 if req.ticker == "GRANDE" else 2, req.layout)
+
+    monkeypatch.setattr(api_module, "handle_ticker_info_between_dates_async", handler)
+    app = FastAPI()
+    app.state.model = object()
+    app.include_router(api_module.router, prefix="/api")
+    test_client = TestClient(app)
+    test_client.chamadas = chamadas
+    return test_client
+
+
+def test_negociacao_pelo_accept():
+    assert negotiate_media_type(None) == MEDIA_JSON
+    assert negotiate_media_type("*/*") == MEDIA_JSON
+    assert negotiate_media_type("text/html, application/*;q=0.2") == MEDIA_JSON
+
+    binario = negotiate_media_type(f"{MEDIA_ARROW}, {MEDIA_MSGPACK};q=0.9, application/json;q=0.1")
+    if response_encoding.pa is not None:
+        assert binario == MEDIA_ARROW
+    elif response_encoding.msgpack is not None:
+        assert binario == MEDIA_MSGPACK
+    else:
+        assert binario == MEDIA_JSON
+
+
+def test_rota_json_compressao_e_406(client):
+    payload = {"init_date": "2025-06-01", "end_date": "2025-06-10"}
+
+    pequena = client.post("/api/v1/previsao-entre-datas", json={**payload, "ticker": "PEQUENA"})
+    assert pequena.status_code == 200
+    assert pequena.headers["content-type"] == MEDIA_JSON
+    assert "content-encoding" not in pequena.headers
+    assert pequena.json() == _resposta(2)
+
+    grande = client.post("/api/v1/previsao-entre-datas", json={**payload, "ticker": "GRANDE"},
+                         headers={"Accept-Encoding": "gzip"})
+    assert grande.headers["content-encoding"] == "gzip"
+    assert grande.json() == _resposta(300)
+    assert "Accept" in grande.headers["vary"]
+
+    colunas = client.post("/api/v1/previsao-entre-datas", json={**payload, "ticker": "PEQUENA", "layout": "columns"})
+    assert colunas.json()["data"]["dates"] == ["2024-01-02", "2024-01-03"]
+
+    recusada = client.post("/api/v1/previsao-entre-datas", json={**payload, "ticker": "GRANDE"},
+                           headers={"Accept": "text/csv"})
+    assert recusada.status_code == 406
+    assert len(client.chamadas) == 3  # o handler não roda quando não há formato aceitável
+
+
+def test_codificacoes_binarias():
+    resposta = _resposta(10)
+
+    if response_encoding.msgpack is not None:
+        corpo, tipo = response_encoding.encode_payload(resposta, MEDIA_MSGPACK)
+        assert tipo == MEDIA_MSGPACK
+        assert response_encoding.msgpack.unpackb(corpo, raw=False) == resposta
+
+    pa = pytest.importorskip("pyarrow")
+    corpo, tipo = response_encoding.encode_payload(resposta, MEDIA_ARROW)
+    assert tipo == MEDIA_ARROW
+    tabela = pa.ipc.open_stream(corpo).read_all()
+    assert tabela.column_names == ["date", "prediction", "actual", "diff"]
+    assert tabela.column("prediction").to_pylist() == [p["prediction"] for p in resposta["data"]]
+    assert json.loads(tabela.schema.metadata[b"prediction"])["ticker"] == "ITUB4.SA"
+
+    # Payload não tabular cai para JSON
+    assert response_encoding.encode_payload({"error": "x"}, MEDIA_ARROW)[1] == MEDIA_JSON
+
+
+def test_respostas_grandes_sao_codificadas_fora_do_event_loop(client, monkeypatch):
+    threads = []
+    original = response_encoding.encode_payload
+
+    def encode_payload(payload, media_type):
+        threads.append(threading.current_thread().name)
+        return original(payload, media_type)
+
+    monkeypatch.setattr(response_encoding, "encode_payload", encode_payload)
+    monkeypatch.setattr(response_encoding.settings, "RESPONSE_ENCODE_OFFLOAD_MIN_POINTS", 64)
+    payload = {"init_date": "2025-06-01", "end_date": "2025-06-10"}
+
+    assert client.post("/api/v1/previsao-entre-datas", json={**payload, "ticker": "PEQUENA"}).json() == _resposta(2)
+    grande = client.post("/api/v1/previsao-entre-datas", json={**payload, "ticker": "GRANDE"},
+                         headers={"Accept-Encoding": "gzip"})
+    assert grande.headers["content-encoding"] == "gzip"
+    assert grande.json() == _resposta(300)
+
+    assert not threads[0].startswith("inference")
+    assert threads[1].startswith("inference")
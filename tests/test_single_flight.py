@@ -0,0 +1,94 @@
+'''
+Testes do single-flight (app.domain.services.single_flight): chamadas idênticas
+simultâneas, em threads ou no event loop, compartilham uma execução (e sua
+exceção), e downloads concorrentes da mesma janela vão uma vez ao provedor.
+'''
+
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.domain.services import avaluation_model_service
+from app.domain.services.market_data_provider import SyntheticProvider, set_market_data_provider
+from app.domain.services.single_flight import SingleFlight
+
+
+def test_threads_compartilham_execucao_e_excecao():
+    grupo = SingleFlight("teste")
+    liberar = threading.Event()
+    chamadas = []
+
+    def calcular():
+        chamadas.append(1)
+        liberar.wait(5)
+        return {"valor": 42}
+
+    with ThreadPoolExecutor(8) as pool:
+        futuros = [pool.submit(grupo.do, "k", calcular) for _ in range(8)]
+        while grupo.stats()["calls"] < 8:
+            time.sleep(0.005)
+        liberar.set()
+        resultados = [f.result() for f in futuros]
+
+    assert len(chamadas) == 1
+    assert sorted(compartilhado for _, compartilhado in resultados) == [False] + [True] * 7
+    assert all(r is resultados[0][0] for r, _ in resultados)
+    assert grupo.stats()["coalesced"] == 7 and grupo.stats()["in_flight"] == 0
+
+    def falhar():
+        raise RuntimeError("upstream fora")
+
+    with pytest.raises(RuntimeError):
+        grupo.do("k", falhar)
+    # Terminada a execução, a chave não fica presa: a próxima chamada executa de novo
+    assert grupo.do("k", lambda: 1) == (1, False)
+
+
+def test_corrotinas_compartilham_execucao():
+    grupo = SingleFlight("teste_async")
+    chamadas = []
+
+    async def calcular():
+        chamadas.append(1)
+        await asyncio.sleep(0.05)
+        return "ok"
+
+    async def cenario():
+        return await asyncio.gather(*(grupo.ado(("PETR4.SA", 1), calcular) for _ in range(5)))
+
+    resultados = asyncio.run(cenario())
+    assert len(chamadas) == 1
+    assert [r for r, _ in resultados] == ["ok"] * 5
+    assert grupo.stats()["coalesced"] == 4
+
+
+class SlowProvider(SyntheticProvider):
+    def __init__(self):
+        super().__init__(today="2025-06-13")
+        self.chamadas = 0
+
+    def fetch_history(self, ticker, data_inicial, data_final):
+        self.chamadas += 1
+        time.sleep(0.2)
+        return super().fetch_history(ticker, data_inicial, data_final)
+
+
+def test_downloads_concorrentes_vao_uma_vez_ao_provedor(monkeypatch):
+    monkeypatch.setattr(avaluation_model_service.settings, "PRICE_STORE_ENABLED", False)
+    provider = SlowProvider()
+    set_market_data_provider(provider)
+    try:
+        with ThreadPoolExecutor(6) as pool:
+            frames = list(pool.map(
+                lambda _: avaluation_model_service.obtemDadosHistoricos("PETR4.SA", "2025-01-02", "2025-06-10"),
+                range(6),
+            ))
+    finally:
+        set_market_data_provider(None)
+
+    assert provider.chamadas == 1
+    assert len({id(f) for f in frames}) == 6
+    assert all(f.equals(frames[0]) for f in frames)
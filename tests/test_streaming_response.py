@@ -0,0 +1,58 @@
+'''
+Testes do modo streaming (NDJSON) da previsão entre datas: mesmos pontos da
+resposta completa, inferência em blocos limitados e linhas de cabeçalho/resumo.
+'''
+
+import asyncio
+import json
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from app.domain.command_handlers.avaluation_command_handler import process_ticker, stream_ticker
+from app.domain.command_handlers import avaluation_command_handler
+from app.domain.services.inference_executor import iterate_in_inference_executor
+from app.domain.services.market_data_context import MarketDataContext
+from app.schemas.ticker_request import TickerRequestBetweenDates
+
+
+def _contexto(req):
+    idx = pd.bdate_range("2023-01-02", "2024-06-28", name="Date")
+    close = 30 + np.cos(np.arange(len(idx)) / 7.0)
+    return MarketDataContext.preloaded(req, pd.DataFrame({"Close": close}, index=idx))
+
+
+def test_stream_emite_os_mesmos_pontos_em_blocos(monkeypatch, make_model, counting_model):
+    monkeypatch.setattr(avaluation_command_handler.settings, "STREAM_CHUNK_SIZE", 64)
+    req = TickerRequestBetweenDates(ticker="ITUB4.SA", init_date=date(2023, 3, 1), end_date=date(2024, 7, 15))
+    modelo = make_model()
+
+    completo = process_ticker(req, modelo, _contexto(req))
+
+    contador = counting_model(modelo)
+    linhas = [json.loads(l) for bloco in stream_ticker(req, contador, _contexto(req)) for l in bloco.splitlines()]
+
+    cabecalho, pontos, resumo = linhas[0], linhas[1:-1], linhas[-1]
+    assert cabecalho["ticker"] == "ITUB4.SA"
+    assert cabecalho["metadata"]["format"] == "ndjson"
+    assert resumo["summary"] == {"type": completo["metadata"]["type"], "count": completo["metadata"]["count"]}
+
+    assert [p["date"] for p in pontos] == [p["date"] for p in completo["data"]]
+    np.testing.assert_allclose(
+        [p["prediction"] for p in pontos], [p["prediction"] for p in completo["data"]], atol=0.011
+    )
+
+    # O histórico é inferido em blocos de no máximo 64 janelas
+    n_historico = sum(1 for p in completo["data"] if p["actual"] is not None)
+    n_blocos = -(-n_historico // 64)
+    assert n_blocos > 1
+    assert max(contador.batches[:n_blocos]) == 64
+    assert sum(contador.batches[:n_blocos]) == n_historico
+
+
+def test_iterate_in_inference_executor_repassa_todos_os_itens():
+    async def consumir():
+        return [item async for item in iterate_in_inference_executor(iter(["a", "b", "c"]))]
+
+    assert asyncio.run(consumir()) == ["a", "b", "c"]
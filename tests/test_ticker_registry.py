@@ -0,0 +1,123 @@
+'''
+Testes do cache de existência de tickers (app.domain.validators.ticker_registry):
+TTL positivo/negativo, despejo LRU, erros não cacheados e snapshot em disco
+(periódico e mesclado entre workers).
+'''
+
+import asyncio
+
+import pytest
+
+from app.domain.validators.ticker_registry import TickerRegistryCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.agora = 1_000.0
+
+    def __call__(self):
+        return self.agora
+
+
+def test_ttl_positivo_e_negativo_expiram_separadamente():
+    clock = FakeClock()
+    cache = TickerRegistryCache(positive_ttl=100, negative_ttl=10, clock=clock)
+    cache.put("ITUB4.SA", True)
+    cache.put("XXXX3.SA", False)
+
+    clock.agora += 11
+    assert cache.get("ITUB4.SA") is True
+    assert cache.get("XXXX3.SA") is None
+
+    clock.agora += 100
+    assert cache.get("ITUB4.SA") is None
+
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 2
+    assert stats["expired"] == 2
+
+
+def test_lru_despeja_o_menos_usado():
+    cache = TickerRegistryCache(max_size=2)
+    cache.put("A", True)
+    cache.put("B", True)
+    cache.get("A")
+    cache.put("C", True)
+
+    assert cache.get("B") is None
+    assert cache.get("A") is True
+    assert cache.stats()["evictions"] == 1
+
+
+def test_erro_no_probe_nao_e_cacheado():
+    cache = TickerRegistryCache()
+
+    def probe_com_erro(symbol):
+        raise ConnectionError("timeout")
+
+    with pytest.raises(ConnectionError):
+        cache.lookup("ITUB4.SA", probe_com_erro)
+    assert cache.lookup("ITUB4.SA", lambda s: True) is True
+
+
+def test_alookup_cacheia_resposta_negativa():
+    cache = TickerRegistryCache()
+    chamadas = []
+
+    async def probe(symbol):
+        chamadas.append(symbol)
+        return False
+
+    assert asyncio.run(cache.alookup("XXXX3.SA", probe)) is False
+    assert asyncio.run(cache.alookup("XXXX3.SA", probe)) is False
+    assert chamadas == ["XXXX3.SA"]
+
+
+def test_snapshot_sobrevive_a_restart(tmp_path):
+    clock = FakeClock()
+    caminho = tmp_path / "registry.json"
+    cache = TickerRegistryCache(positive_ttl=100, negative_ttl=5, snapshot_path=caminho, clock=clock)
+    cache.put("ITUB4.SA", True)
+    cache.put("XXXX3.SA", False)
+    cache.save_snapshot()
+
+    clock.agora += 10
+    restaurado = TickerRegistryCache(snapshot_path=caminho, clock=clock)
+    assert restaurado.load_snapshot() == 1
+    assert restaurado.get("ITUB4.SA") is True
+    assert restaurado.get("XXXX3.SA") is None
+
+
+def test_snapshot_periodico_por_entradas_e_por_tempo(tmp_path):
+    clock = FakeClock()
+    caminho = tmp_path / "registry.json"
+    cache = TickerRegistryCache(snapshot_path=caminho, snapshot_every_puts=3, snapshot_interval=60, clock=clock)
+
+    cache.put("A.SA", True)
+    cache.put("B.SA", True)
+    assert not caminho.exists()
+    cache.put("C.SA", True)  # 3ª entrada nova: grava sem esperar o shutdown
+    assert TickerRegistryCache(snapshot_path=caminho, clock=clock).load_snapshot() == 3
+
+    clock.agora += 61
+    cache.put("D.SA", False)  # intervalo vencido
+    assert TickerRegistryCache(snapshot_path=caminho, clock=clock).load_snapshot() == 4
+
+
+def test_workers_no_mesmo_snapshot_mesclam_entradas(tmp_path):
+    clock = FakeClock()
+    caminho = tmp_path / "registry.json"
+    worker_a = TickerRegistryCache(snapshot_path=caminho, clock=clock)
+    worker_b = TickerRegistryCache(snapshot_path=caminho, clock=clock)
+    worker_a.put("ITUB4.SA", True)
+    worker_b.put("PETR4.SA", True)
+
+    worker_a.save_snapshot()
+    worker_b.save_snapshot()
+
+    restaurado = TickerRegistryCache(snapshot_path=caminho, clock=clock)
+    assert restaurado.load_snapshot() == 2
+    assert restaurado.get("ITUB4.SA") is True and restaurado.get("PETR4.SA") is True
+    # Cada gravação usa um temporário próprio, sempre renomeado ou removido
+    assert [p.name for p in tmp_path.iterdir()] == ["registry.json"]